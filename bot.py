@@ -9,11 +9,23 @@ import random
 import io
 import time
 import shutil
+import sqlite3
 import base64
+import copy
+import hashlib
+import heapq
+import gzip
+import zlib
+import pickle
 import subprocess
 import sys
+import math
+from contextlib import asynccontextmanager
 from pathlib import Path
 from itertools import cycle
+from functools import lru_cache
+from collections import deque, OrderedDict
+from array import array
 from datetime import datetime, timezone, timedelta
 from aiohttp import web
 from discord.ext import tasks
@@ -49,20 +61,66 @@ STATUS_FILE = Path("/app/data/statuses.json")
 WEEKLY_STATS_FILE = Path("/app/data/weekly_stats.json")
 IGNORED_FILE = Path("/app/data/ignored.json")
 CHARTERS_FILE = Path("/app/data/charters.json")
+DB_FILE = Path("/app/data/bot.db")
+AIRPORTS_CACHE_FILE = Path("/app/data/airports.bin")
 CHECK_INTERVAL = 10
 BASE_URL = "https://newsky.app/api/airline-api"
 AIRPORTS_DB_URL = "https://raw.githubusercontent.com/mwgg/Airports/master/airports.json"
 
+HTTP_POOL_LIMIT = 100
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", 10))
+HTTP_DNS_CACHE_TTL = 300
+HTTP_KEEPALIVE_TIMEOUT = 60
+
+# --- 🌐 СПІЛЬНИЙ HTTP-КЛІЄНТ (ОДИН ПУЛ З'ЄДНАНЬ НА ВЕСЬ БОТ) ---
+# Одна довгоживуча сесія замість нової aiohttp.ClientSession() на кожен запит:
+# TCP+TLS рукостискання з newsky.app та api.github.com робиться один раз,
+# а далі з'єднання перевикористовуються (keep-alive + кеш DNS).
+HTTP_SESSION = None
+
+def create_http_session():
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        enable_cleanup_closed=True
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+async def get_http_session():
+    global HTTP_SESSION
+    if HTTP_SESSION is None or HTTP_SESSION.closed:
+        HTTP_SESSION = create_http_session()
+        print("🌐 Shared HTTP session created (connection pool is ready)")
+    return HTTP_SESSION
+
+@asynccontextmanager
+async def shared_http_session():
+    # Замінник "async with shared_http_session() as session:" — віддає спільну сесію і НЕ закриває її
+    yield await get_http_session()
+
+async def close_http_session():
+    global HTTP_SESSION
+    if HTTP_SESSION is not None and not HTTP_SESSION.closed:
+        await HTTP_SESSION.close()
+        # Даємо SSL-транспортам закритися коректно
+        await asyncio.sleep(0.25)
+    HTTP_SESSION = None
+
+class KazuarClient(discord.Client):
+    async def close(self):
+        await close_http_session()
+        await super().close()
+
 logging.basicConfig(level=logging.INFO)
 intents = discord.Intents.default()
 intents.message_content = True
-client = discord.Client(intents=intents)
+client = KazuarClient(intents=intents)
 
-AIRPORTS_DB = {}
 HIDDEN_USERS = {}
 BANNED_WOW_MESSAGES = set()
 MONITORING_STARTED = False
-LAST_TRAFFIC_TIME = 0.0
 TAXIING_FLIGHTS = set()
 last_sent_message = None
 
@@ -181,238 +239,507 @@ def format_flight_for_db(f):
             
     return cleanFlight
 
-async def get_updated_liveries_content(session, target_ac_id, actual_arr_icao):
-    if not NEWSKY_SID or not GITHUB_TOKEN: return None
-    
-    # 1. Запит до Newsky (список всіх бортів компанії)
+# --- 🛩️ МОДЕЛЬ ФЛОТУ (aircraft id -> локація, назва, останній аеропорт посадки) ---
+# Список бортів Newsky тягнемо посторінково раз на FLEET_REFRESH_MINUTES, а посадки
+# оновлюють модель точково за O(1). livery-matching.json тримаємо в пам'яті (перечитуємо
+# лише якщо його SHA на GitHub змінився) і перегенеровуємо тільки коли локація реально змінилась.
+NEWSKY_AIRLINE_ID = "695810be3dc76275ba8befa9"
+FLEET_REFRESH_MINUTES = int(os.getenv("FLEET_REFRESH_MINUTES", 15))
+FLEET_PAGE_SIZE = 100
+FLEET = {}
+FLEET_DIRTY = set()
+FLEET_REFRESHED_AT = None
+FLEET_LIVERY = {"doc": None, "sha": None, "index": {}, "unpushed": False}
+LIVERY_FILE_PATH = "COMPANY/livery-matching.json"
+# Поле моделі флоту -> поле в livery-matching.json
+LIVERY_FIELDS = {"locationIcao": "locationIcao", "name": "name", "lastFlightIcao": "lastflightlocationICAO"}
+
+def _apply_fleet_update(ac_id, **fields):
+    entry = FLEET.setdefault(str(ac_id), {})
+    for key, value in fields.items():
+        if value and entry.get(key) != value:
+            entry[key] = value
+            FLEET_DIRTY.add(str(ac_id))
+
+def record_fleet_landing(ac_id, icao):
+    # Борт щойно сів: він тепер стоїть в аеропорту прибуття
+    if ac_id and icao:
+        _apply_fleet_update(ac_id, locationIcao=icao, lastFlightIcao=icao)
+
+async def refresh_fleet(session):
+    global FLEET_REFRESHED_AT
+    if not NEWSKY_SID: return False
     ns_headers = {
         "User-Agent": "Mozilla/5.0",
         "Cookie": f"sid={NEWSKY_SID}" if not NEWSKY_SID.startswith("sid=") else NEWSKY_SID,
         "Content-Type": "application/json"
     }
-    payload = {"skip": 0, "count": 100, "needle": "", "sort": "airframe.icao", "order": 1}
-    airline_id = "695810be3dc76275ba8befa9"
-    
-    ns_aircraft = {}
-    try:
-        async with session.post(f"https://newsky.app/api/airline/{airline_id}/aircraft/list", headers=ns_headers, json=payload) as resp:
-            if resp.status == 200:
-                data = await resp.json()
-                for ac in data.get("results", []):
-                    ns_aircraft[str(ac.get("_id"))] = {
-                        "locationIcao": ac.get("locationIcao"),
-                        "name": ac.get("name")
-                    }
-    except Exception as e: 
-        print(f"Error fetching aircraft list: {e}")
-        pass
-    
-    # 2. Читання livery-matching.json через Blob API (Миттєво, 100% без кешу)
-    gh_headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json",
-        "Cache-Control": "no-cache"
-    }
-    livery_data = None
-    
-    try:
-        # Шукаємо SHA файлу в папці COMPANY (з антикеш-таймером)
-        dir_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/COMPANY?t={int(time.time())}"
-        file_sha = None
+    skip = 0
+    while True:
+        payload = {"skip": skip, "count": FLEET_PAGE_SIZE, "needle": "", "sort": "airframe.icao", "order": 1}
+        try:
+            async with session.post(f"https://newsky.app/api/airline/{NEWSKY_AIRLINE_ID}/aircraft/list", headers=ns_headers, json=payload) as resp:
+                if resp.status != 200:
+                    print(f"⚠️ Fleet refresh failed: HTTP {resp.status}")
+                    return False
+                results = (await resp.json()).get("results", [])
+        except Exception as e:
+            print(f"Error fetching aircraft list: {e}")
+            return False
+            
+        for ac in results:
+            _apply_fleet_update(
+                ac.get("_id"),
+                locationIcao=ac.get("locationIcao"),
+                name=ac.get("name"),
+                airframe=(ac.get("airframe") or {}).get("icao")
+            )
+        if len(results) < FLEET_PAGE_SIZE: break
+        skip += FLEET_PAGE_SIZE
         
-        async with session.get(dir_url, headers=gh_headers) as dir_resp:
-            if dir_resp.status == 200:
-                for item in await dir_resp.json():
-                    if item.get("name") == "livery-matching.json":
-                        file_sha = item.get("sha")
-                        break
-                        
-        # Якщо знайшли SHA, викачуємо "м'ясо" файлу напряму
-        if file_sha:
-            blob_url = f"https://api.github.com/repos/{GITHUB_REPO}/git/blobs/{file_sha}"
-            async with session.get(blob_url, headers=gh_headers) as blob_resp:
-                if blob_resp.status == 200:
-                    blob_data = await blob_resp.json()
-                    livery_data = json.loads(base64.b64decode(blob_data['content']).decode('utf-8'))
+    FLEET_REFRESHED_AT = datetime.now(timezone.utc)
+    return True
+
+async def load_livery_document(session):
+    # Перечитуємо livery-matching.json лише якщо на GitHub інший SHA, ніж у нашій копії
+    try:
+        file_sha = (await get_github_repo_tree(session)).get(LIVERY_FILE_PATH)
+        if not file_sha or file_sha == FLEET_LIVERY["sha"]:
+            return FLEET_LIVERY["doc"]
+        text_content = await fetch_github_blob_text(session, file_sha)
+        if text_content is None: return FLEET_LIVERY["doc"]
+        doc = json.loads(text_content)
     except Exception as e:
         print(f"Помилка читання livery: {e}")
-        return None
+        return FLEET_LIVERY["doc"]
+        
+    FLEET_LIVERY.update(doc=doc, sha=file_sha, unpushed=False)
+    FLEET_LIVERY["index"] = {str(ac.get("_id")): ac for ac in doc.get("liveries", [])}
+    # Новий документ — всі відомі борти треба накласти на нього заново
+    FLEET_DIRTY.update(FLEET.keys())
+    return doc
+
+async def get_updated_liveries_content(session, landings):
+    # landings: {aircraft_id: ICAO фактичного прибуття} — всі борти, що сіли за вікно батчу.
+    # Повертає новий текст livery-matching.json або None, якщо жодна локація не змінилась.
+    if not NEWSKY_SID or not GITHUB_TOKEN: return None
+    if FLEET_REFRESHED_AT is None:
+        await refresh_fleet(session)
+    for ac_id, icao in landings.items():
+        record_fleet_landing(ac_id, icao)
         
+    livery_data = await load_livery_document(session)
     if not livery_data: return None
     
-    # 3. М'ясорубка: оновлюємо локації
-    for ac in livery_data.get("liveries", []):
-        ac_id = str(ac.get("_id"))
-        
-        # А) Оновлюємо загальну локацію та назву з Newsky (якщо борт є у списку)
-        if ac_id in ns_aircraft:
-            ac["locationIcao"] = ns_aircraft[ac_id].get("locationIcao")
-            if ns_aircraft[ac_id].get("name"):
-                ac["name"] = ns_aircraft[ac_id].get("name")
-            
-        # Б) Оновлюємо lastflightlocationICAO ТІЛЬКИ для літака, що щойно сів (замінюючи логіку Newsky)
-        if ac_id == str(target_ac_id) and actual_arr_icao:
-            ac["lastflightlocationICAO"] = actual_arr_icao
-            
-    # 4. Оновлюємо час генерації
-    livery_data["generatedAtUtc"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    # Накладаємо на документ лише змінені борти
+    for ac_id in FLEET_DIRTY:
+        ac = FLEET_LIVERY["index"].get(ac_id)
+        fleet_entry = FLEET.get(ac_id)
+        if not ac or not fleet_entry: continue
+        for fleet_key, livery_key in LIVERY_FIELDS.items():
+            value = fleet_entry.get(fleet_key)
+            if value and ac.get(livery_key) != value:
+                ac[livery_key] = value
+                FLEET_LIVERY["unpushed"] = True
+    FLEET_DIRTY.clear()
     
-    # Повертаємо готовий текст для запису
+    if not FLEET_LIVERY["unpushed"]: return None
+    
+    # Оновлюємо час генерації
+    livery_data["generatedAtUtc"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
     return json.dumps(livery_data, ensure_ascii=False, indent=2)
+
+def mark_livery_pushed(content_str):
+    # Викликаємо ПІСЛЯ успішного коміту: наша копія тепер збігається з GitHub
+    FLEET_LIVERY["sha"] = git_blob_sha(content_str)
+    FLEET_LIVERY["unpushed"] = False
+
+@tasks.loop(minutes=FLEET_REFRESH_MINUTES)
+async def fleet_refresh_task():
+    async with shared_http_session() as session:
+        await refresh_fleet(session)
+
+# --- 🏷️ УМОВНІ GET-ЗАПИТИ ДО GITHUB (ETag / If-None-Match) ---
+# Замість антикеш-таймерів (?t=...) пам'ятаємо ETag кожної відповіді і надсилаємо його назад.
+# Якщо нічого не змінилось, GitHub відповідає 304 без тіла, і такий запит НЕ рахується в ліміт.
+# Списки файлів беремо з рекурсивного дерева гілки main: один запит = всі шляхи репо -> SHA.
+GH_ETAG_CACHE = OrderedDict()
+GH_ETAG_CACHE_MAX = 64
+GH_ETAG_STATS = {"hits": 0, "misses": 0}
+GIT_SHA_RE = re.compile(r"^[0-9a-f]{40}$")
+
+async def gh_get_json(session, url, cache=True):
+    # cache=False — для незмінних адрес (дерево за SHA): ETag їм нічого не дає, а LRU вони засмічують
+    gh_headers = {"Authorization": f"token {GITHUB_TOKEN}", "Accept": "application/vnd.github.v3+json"}
+    cached = GH_ETAG_CACHE.get(url) if cache else None
+    if cached:
+        gh_headers["If-None-Match"] = cached[0]
+    async with session.get(url, headers=gh_headers) as resp:
+        if resp.status == 304 and cached:
+            GH_ETAG_STATS["hits"] += 1
+            GH_ETAG_CACHE.move_to_end(url)
+            return cached[1]
+        if resp.status != 200:
+            return None
+        data = await resp.json()
+        if not cache:
+            return data
+        GH_ETAG_STATS["misses"] += 1
+        if resp.headers.get("ETag"):
+            GH_ETAG_CACHE[url] = (resp.headers["ETag"], data)
+            GH_ETAG_CACHE.move_to_end(url)
+            while len(GH_ETAG_CACHE) > GH_ETAG_CACHE_MAX:
+                GH_ETAG_CACHE.popitem(last=False)
+        return data
+
+def github_etag_report():
+    total = GH_ETAG_STATS["hits"] + GH_ETAG_STATS["misses"]
+    rate = f"{GH_ETAG_STATS['hits'] / total:.0%}" if total else "—"
+    return (f"304 (без ліміту): **{GH_ETAG_STATS['hits']}** | 200: **{GH_ETAG_STATS['misses']}** | влучання: **{rate}**\n"
+            f"ETag-кеш: **{len(GH_ETAG_CACHE)}/{GH_ETAG_CACHE_MAX}** URL")
+
+async def get_github_repo_tree(session, ref="main"):
+    # path -> blob SHA для всього репозиторію. Порожній словник, якщо GitHub недоступний
+    data = await gh_get_json(session, f"https://api.github.com/repos/{GITHUB_REPO}/git/trees/{ref}?recursive=1",
+                             cache=not GIT_SHA_RE.match(ref))
+    if not data: return {}
+    return {item["path"]: item["sha"] for item in data.get("tree", []) if item.get("type") == "blob"}
+
+# --- 🪞 ЛОКАЛЬНЕ ДЗЕРКАЛО GITHUB FLIGHTS/*.json ---
+# Файли тижнів лежать у /app/data/gh_flights разом із manifest.json (ім'я -> blob SHA).
+# При оновленні з GitHub качаємо лише ті файли, чий SHA змінився, а після власного
+# пушу SHA рахуємо локально (git_blob_sha), тож свої ж зміни ніколи не перекачуємо.
+# В пам'яті тримаємо індекси: flight_id -> (тиждень, pilot_id) і pilot_id -> {тижні}.
+FLIGHTS_MIRROR_DIR = Path("/app/data/gh_flights")
+FLIGHTS_MIRROR_MANIFEST = FLIGHTS_MIRROR_DIR / "manifest.json"
+GH_FLIGHTS_MIRROR = {}   # "2026-W10.json" -> {"sha": ..., "content": [...]}
+GH_FLIGHT_INDEX = {}     # flight_id -> (week_tag, pilot_id)
+GH_PILOT_WEEKS = {}      # pilot_id -> {week_tag, ...}
+GH_MIRROR_LOADED = False
+GH_BLOB_FETCH_CONCURRENCY = 4
+WEEK_FILE_RE = re.compile(r"^\d{4}-W\d{2}\.json$")
+
+def git_blob_sha(data):
+    # Той самий SHA, який GitHub покаже для файлу з таким вмістом
+    if isinstance(data, str): data = data.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+def _index_mirror_week(week_filename, content, add=True):
+    week_tag = week_filename[:-5]
+    for p in content:
+        pid = p.get("pilot_id")
+        for f in p.get("flights", []):
+            fid = str(f.get("_id") or f.get("id"))
+            if add:
+                GH_FLIGHT_INDEX[fid] = (week_tag, pid)
+            elif GH_FLIGHT_INDEX.get(fid, (None,))[0] == week_tag:
+                del GH_FLIGHT_INDEX[fid]
+        if add:
+            GH_PILOT_WEEKS.setdefault(pid, set()).add(week_tag)
+        elif pid in GH_PILOT_WEEKS:
+            GH_PILOT_WEEKS[pid].discard(week_tag)
+
+def _store_mirror_week(week_filename, raw_text, sha=None):
+    old = GH_FLIGHTS_MIRROR.get(week_filename)
+    if old: _index_mirror_week(week_filename, old["content"], add=False)
+    content = json.loads(raw_text) if raw_text.strip() else []
+    GH_FLIGHTS_MIRROR[week_filename] = {"sha": sha or git_blob_sha(raw_text), "content": content}
+    _index_mirror_week(week_filename, content)
+    try:
+        FLIGHTS_MIRROR_DIR.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(FLIGHTS_MIRROR_DIR / week_filename, raw_text.encode("utf-8"))
+    except Exception as e:
+        print(f"⚠️ Failed to write mirror file {week_filename}: {e}")
+
+def _drop_mirror_week(week_filename):
+    old = GH_FLIGHTS_MIRROR.pop(week_filename, None)
+    if old: _index_mirror_week(week_filename, old["content"], add=False)
+    try: (FLIGHTS_MIRROR_DIR / week_filename).unlink()
+    except FileNotFoundError: pass
+
+def _save_mirror_manifest():
+    try:
+        FLIGHTS_MIRROR_DIR.mkdir(parents=True, exist_ok=True)
+        manifest = {name: entry["sha"] for name, entry in GH_FLIGHTS_MIRROR.items()}
+        atomic_write_bytes(FLIGHTS_MIRROR_MANIFEST, json.dumps(manifest).encode("utf-8"))
+    except Exception as e:
+        print(f"⚠️ Failed to save mirror manifest: {e}")
+
+def load_flights_mirror():
+    global GH_MIRROR_LOADED
+    if GH_MIRROR_LOADED: return
+    GH_MIRROR_LOADED = True
+    try:
+        manifest = json.loads(FLIGHTS_MIRROR_MANIFEST.read_text(encoding="utf-8")) if FLIGHTS_MIRROR_MANIFEST.exists() else {}
+    except Exception as e:
+        print(f"⚠️ Mirror manifest is corrupted, rebuilding from GitHub: {e}")
+        manifest = {}
+    for name, sha in manifest.items():
+        try:
+            raw = (FLIGHTS_MIRROR_DIR / name).read_bytes()
+            if git_blob_sha(raw) != sha: continue # Файл пошкоджений — перекачаємо
+            content = json.loads(raw.decode("utf-8")) if raw.strip() else []
+        except Exception:
+            continue
+        GH_FLIGHTS_MIRROR[name] = {"sha": sha, "content": content}
+        _index_mirror_week(name, content)
+
+async def fetch_github_blob_text(session, blob_sha):
+    gh_headers = {"Authorization": f"token {GITHUB_TOKEN}", "Accept": "application/vnd.github.v3+json"}
+    blob_url = f"https://api.github.com/repos/{GITHUB_REPO}/git/blobs/{blob_sha}"
+    async with session.get(blob_url, headers=gh_headers) as blob_resp:
+        if blob_resp.status != 200: return None
+        blob_data = await blob_resp.json()
+        return base64.b64decode(blob_data['content']).decode('utf-8')
+
+async def refresh_flights_mirror(session):
+    # Звіряємо дзеркало з GitHub: дерево main (зазвичай 304) + завантаження лише змінених файлів.
+    # Повертає False, якщо список файлів отримати не вдалося (тоді дзеркало може бути застарілим).
+    load_flights_mirror()
+    if not GITHUB_TOKEN: return False
+    tree = await get_github_repo_tree(session)
+    if not tree: return False
+    
+    remote = {}
+    for path, sha in tree.items():
+        folder, _, name = path.partition("/")
+        if folder == "FLIGHTS" and WEEK_FILE_RE.match(name):
+            remote[name] = sha
+    stale = [(name, sha) for name, sha in remote.items() if GH_FLIGHTS_MIRROR.get(name, {}).get("sha") != sha]
+    semaphore = asyncio.Semaphore(GH_BLOB_FETCH_CONCURRENCY)
     
-async def save_flight_to_github(clean_flight, pilot_id, pilot_name, pilot_avatar, week_tag):
+    async def fetch_one(name, sha):
+        async with semaphore:
+            try: return await fetch_github_blob_text(session, sha)
+            except Exception as e:
+                print(f"⚠️ Failed to mirror {name}: {e}")
+                return None
+                
+    # Змінені файли качаємо паралельно, а в дзеркало кладемо по порядку
+    texts = await asyncio.gather(*(fetch_one(name, sha) for name, sha in stale))
+    changed = False
+    for (name, sha), raw_text in zip(stale, texts):
+        if raw_text is None: continue
+        _store_mirror_week(name, raw_text, sha)
+        changed = True
+    for name in [n for n in GH_FLIGHTS_MIRROR if n not in remote]:
+        _drop_mirror_week(name)
+        changed = True
+    if changed: _save_mirror_manifest()
+    return True
+
+def get_mirror_week(week_filename):
+    # Повертає (копія вмісту, SHA). Копія — щоб невдалий пуш не зіпсував дзеркало
+    entry = GH_FLIGHTS_MIRROR.get(week_filename)
+    if not entry: return [], None
+    return copy.deepcopy(entry["content"]), entry["sha"]
+
+def record_mirror_week(week_filename, content_str):
+    # Викликаємо ПІСЛЯ успішного запису на GitHub: SHA рахуємо самі, без повторного завантаження
+    _store_mirror_week(week_filename, content_str)
+    _save_mirror_manifest()
+
+def find_flight_in_mirror(fid):
+    return GH_FLIGHT_INDEX.get(str(fid))
+
+def pilot_mirror_weeks(pilot_id):
+    return sorted(GH_PILOT_WEEKS.get(pilot_id, ()))
+
+# --- 📮 ЧЕРГА ЗАПИСУ РЕЙСІВ НА GITHUB (WRITE-BEHIND) ---
+# Рейси, що сіли протягом GITHUB_BATCH_WINDOW секунд, їдуть на GitHub ОДНИМ комітом.
+# Черга одразу пишеться на диск (gh_pending.json), тож якщо процес впаде посеред вікна —
+# після рестарту main_loop дошле все, що не встигло потрапити в коміт.
+GH_PENDING_FILE = Path("/app/data/gh_pending.json")
+GITHUB_BATCH_WINDOW = int(os.getenv("GITHUB_BATCH_WINDOW", 60))
+GH_PENDING = None
+GH_FLUSH_TASK = None
+
+def load_github_queue():
+    global GH_PENDING
+    if GH_PENDING is None:
+        GH_PENDING = []
+        if GH_PENDING_FILE.exists():
+            try: GH_PENDING = json.loads(GH_PENDING_FILE.read_text(encoding="utf-8"))
+            except Exception as e: print(f"⚠️ gh_pending.json is corrupted, queue reset: {e}")
+    return GH_PENDING
+
+def save_github_queue():
+    try:
+        GH_PENDING_FILE.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(GH_PENDING_FILE, json.dumps(GH_PENDING, ensure_ascii=False).encode("utf-8"))
+    except Exception as e:
+        print(f"⚠️ Failed to persist GitHub queue: {e}")
+
+def schedule_github_flush(delay=None):
+    # Один таймер на вікно: усі рейси, що прийдуть поки він тікає, потраплять у той самий коміт
+    global GH_FLUSH_TASK
+    if GH_FLUSH_TASK and not GH_FLUSH_TASK.done(): return
+    GH_FLUSH_TASK = asyncio.get_running_loop().create_task(_github_flush_after(GITHUB_BATCH_WINDOW if delay is None else delay))
+
+async def _github_flush_after(delay):
+    global GH_FLUSH_TASK
+    await asyncio.sleep(delay)
+    GH_FLUSH_TASK = None
+    try:
+        success = await flush_github_queue()
+    except Exception as e:
+        print(f"❌ GitHub queue flush error: {e}")
+        success = False
+    if not success and GH_PENDING:
+        schedule_github_flush() # GitHub недоступний — пробуємо в наступному вікні
+
+async def save_flight_to_github(clean_flight, pilot_id, pilot_name, pilot_avatar, week_tag, flush_now=False):
+    # Ставить рейс у чергу. flush_now=True — для адмін-команд, які хочуть дочекатися коміту
     if not GITHUB_TOKEN:
         print("⚠️ Немає токену GitHub, рейс не збережено в БД.")
-        return
-        
-    week_filename = f"{week_tag}.json"
-    file_path = f"FLIGHTS/{week_filename}"
+        return False
+        
+    queue = load_github_queue()
+    fid = str(clean_flight.get("_id"))
+    # Якщо цей рейс уже в черзі (напр. !addghflight emer після авто-запису) — новіша версія перемагає
+    queue[:] = [item for item in queue if str(item["flight"].get("_id")) != fid]
+    queue.append({
+        "flight": clean_flight, "pilot_id": pilot_id, "pilot_name": pilot_name,
+        "pilot_avatar": pilot_avatar, "week": week_tag
+    })
+    save_github_queue()
     
-    # 🔥 Додано антикеш заголовок
-    gh_headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json",
-        "Cache-Control": "no-cache"
-    }
+    if flush_now:
+        try:
+            success = await flush_github_queue()
+        except Exception as e:
+            print(f"❌ GitHub queue flush error: {e}")
+            success = False
+        if not success:
+            schedule_github_flush() # Рейс лишається в черзі — таймер дошле його сам
+        return success
+    schedule_github_flush()
+    return True
+
+async def flush_github_queue():
+    queue = load_github_queue()
+    if not queue: return True
     
     async with GITHUB_DB_LOCK:
-        async with aiohttp.ClientSession() as session:
-            # 1. ШУКАЄМО SHA ФАЙЛУ (додано ?t=... для обходу кешу GitHub)
-            file_sha = None
-            dir_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/FLIGHTS?t={int(time.time())}"
-            async with session.get(dir_url, headers=gh_headers) as dir_resp:
-                if dir_resp.status == 200:
-                    dir_data = await dir_resp.json()
-                    if isinstance(dir_data, list):
-                        for item in dir_data:
-                            if item.get("name") == week_filename:
-                                file_sha = item.get("sha")
-                                break
-            
-            # 2. КАЧАЄМО ВМІСТ НАПРЯМУ З BLOB API (Миттєво, без кешу!)
-            github_file_content = []
-            if file_sha:
-                blob_url = f"https://api.github.com/repos/{GITHUB_REPO}/git/blobs/{file_sha}"
-                async with session.get(blob_url, headers=gh_headers) as blob_resp:
-                    if blob_resp.status == 200:
-                        try:
-                            blob_data = await blob_resp.json()
-                            text_content = base64.b64decode(blob_data['content']).decode('utf-8')
-                            github_file_content = json.loads(text_content)
-                        except Exception as e:
-                            print(f"Помилка читання Blob: {e}")
-                            github_file_content = []
-            
-            # 3. СОРТУВАННЯ І ДОДАВАННЯ РЕЙСУ ПО ПІЛОТАХ
-            existing_pilot = next((p for p in github_file_content if p.get("pilot_id") == pilot_id), None)
-            
-            profile_changed = False # 🔥 Флаг для запуску масового оновлення
-            
-            if existing_pilot:
-                # Перевіряємо, чи змінилася аватарка або ім'я порівняно з базою
-                if existing_pilot.get("avatar") != pilot_avatar or existing_pilot.get("fullname") != pilot_name:
-                    print(f"⚠️ Виявлено зміну профілю для {pilot_name}. Запускаю фонове оновлення бази...")
-                    existing_pilot["fullname"] = pilot_name
-                    existing_pilot["avatar"] = pilot_avatar
-                    profile_changed = True # Вмикаємо тригер!
-
+        batch = list(queue)
+        async with shared_http_session() as session:
+            # 1. ОНОВЛЮЄМО ДЗЕРКАЛО (качаються лише файли, змінені не ботом)
+            await refresh_flights_mirror(session)
+            
+            week_contents = {}
+            landings = {}
+            changed_profiles = {}
+            added = []
+            
+            # 2. СОРТУВАННЯ І ДОДАВАННЯ РЕЙСІВ ПО ПІЛОТАХ (у порядку посадки)
+            for item in batch:
+                clean_flight = item["flight"]
+                pilot_id, pilot_name, pilot_avatar = item["pilot_id"], item["pilot_name"], item["pilot_avatar"]
+                week_filename = f"{item['week']}.json"
+                
                 # Перевірка, щоб випадково не додати той самий рейс двічі
-                if not any(f.get("_id") == clean_flight["_id"] for f in existing_pilot["flights"]):
+                if find_flight_in_mirror(clean_flight["_id"]) is not None: continue
+                
+                if week_filename not in week_contents:
+                    week_contents[week_filename] = get_mirror_week(week_filename)[0]
+                github_file_content = week_contents[week_filename]
+                existing_pilot = next((p for p in github_file_content if p.get("pilot_id") == pilot_id), None)
+                
+                if existing_pilot:
+                    # Перевіряємо, чи змінилася аватарка або ім'я порівняно з базою
+                    if existing_pilot.get("avatar") != pilot_avatar or existing_pilot.get("fullname") != pilot_name:
+                        print(f"⚠️ Виявлено зміну профілю для {pilot_name}. Запускаю фонове оновлення бази...")
+                        existing_pilot["fullname"] = pilot_name
+                        existing_pilot["avatar"] = pilot_avatar
+                        changed_profiles[pilot_id] = (pilot_name, pilot_avatar)
                     existing_pilot["flights"].append(clean_flight)
-            else:
-                # Якщо пілот летить вперше на цьому тижні - створюємо його блок
-                new_pilot_block = {
-                    "pilot_id": pilot_id,
-                    "fullname": pilot_name,
-                    "avatar": pilot_avatar,
-                    "flights": [clean_flight]
-                }
-                github_file_content.append(new_pilot_block)
-            
-            # 4. ВІДПРАВКА НА GITHUB (ОДНИМ КОМІТОМ РАЗОМ ІЗ LIVERY-MATCHING)
-            new_content_str = json.dumps(github_file_content, ensure_ascii=False, indent=4)
-            
-            # Збираємо файли для відправки
+                else:
+                    # Якщо пілот летить вперше на цьому тижні - створюємо його блок
+                    github_file_content.append({
+                        "pilot_id": pilot_id,
+                        "fullname": pilot_name,
+                        "avatar": pilot_avatar,
+                        "flights": [clean_flight]
+                    })
+                added.append(clean_flight)
+                    
+                # Дістаємо ID літака та фактичний аеропорт прибуття з чистих даних рейсу
+                ac_id = clean_flight.get("aircraft", {}).get("_id")
+                act_arr = clean_flight.get("actArr")
+                arr = clean_flight.get("arr")
+                if ac_id:
+                    if isinstance(act_arr, dict) and act_arr.get("icao"):
+                        landings[str(ac_id)] = act_arr.get("icao")
+                    elif isinstance(arr, dict) and arr.get("icao"):
+                        landings[str(ac_id)] = arr.get("icao")
+                    else:
+                        landings.setdefault(str(ac_id), None)
+                        
+            # 3. ВІДПРАВКА НА GITHUB (ОДНИМ КОМІТОМ РАЗОМ ІЗ LIVERY-MATCHING)
             files_to_push = {
-                file_path: new_content_str
+                f"FLIGHTS/{name}": json.dumps(content, ensure_ascii=False, indent=4)
+                for name, content in week_contents.items()
             }
-            
-            # Дістаємо ID літака та фактичний аеропорт прибуття з чистих даних рейсу
-            ac_id = clean_flight.get("aircraft", {}).get("_id")
-            act_arr = clean_flight.get("actArr")
-            arr = clean_flight.get("arr")
-            
-            actual_arr_icao = None
-            if isinstance(act_arr, dict) and act_arr.get("icao"):
-                actual_arr_icao = act_arr.get("icao")
-            elif isinstance(arr, dict) and arr.get("icao"):
-                actual_arr_icao = arr.get("icao")
+            success = True
+            if files_to_push:
+                if landings:
+                    livery_content = await get_updated_liveries_content(session, landings)
+                    if livery_content:
+                        files_to_push[LIVERY_FILE_PATH] = livery_content
+                        
+                if len(added) == 1:
+                    commit_msg = f"🤖 Auto db update: flight {added[0].get('flightNumber')} & Fleet Loc"
+                else:
+                    commit_msg = f"🤖 Auto db update: {len(added)} flights & Fleet Loc"
+                success = await push_to_github_batch(session, files_to_push, commit_msg)
                 
-            # Генеруємо оновлений livery-matching.json і додаємо до списку файлів на відправку
-            if ac_id:
-                livery_content = await get_updated_liveries_content(session, ac_id, actual_arr_icao)
-                if livery_content:
-                    files_to_push["COMPANY/livery-matching.json"] = livery_content
-                    
-            commit_msg = f"🤖 Auto db update: flight {clean_flight.get('flightNumber')} & Fleet Loc"
-            
-            # Відправляємо єдиним пушем через вашу готову функцію push_to_github_batch
-            success = await push_to_github_batch(session, files_to_push, commit_msg)
-            
             if not success:
-                print(f"❌ Помилка пакетного запису рейсу та локацій на GitHub.")
-            else:
-                print(f"✅ Рейс та локації флоту успішно збережено одним комітом!")
-                if profile_changed:
-                    client.loop.create_task(update_pilot_history_on_github(pilot_id, pilot_name, pilot_avatar))
+                print(f"❌ Помилка пакетного запису {len(batch)} рейсів на GitHub, залишаю їх у черзі.")
+                return False
+                
+            for path, content_str in files_to_push.items():
+                if path.startswith("FLIGHTS/"):
+                    record_mirror_week(path.split("/", 1)[1], content_str)
+                elif path == LIVERY_FILE_PATH:
+                    mark_livery_pushed(content_str)
+            # Викидаємо з черги лише те, що реально поїхало (нові рейси могли прийти під час пушу)
+            flushed = {id(item) for item in batch}
+            queue[:] = [item for item in queue if id(item) not in flushed]
+            save_github_queue()
+            if added:
+                print(f"✅ {len(added)} рейс(ів) та локації флоту успішно збережено одним комітом!")
+                
+    for pilot_id, (pilot_name, pilot_avatar) in changed_profiles.items():
+        client.loop.create_task(update_pilot_history_on_github(pilot_id, pilot_name, pilot_avatar))
+    return True
 
 
 async def update_pilot_history_on_github(pilot_id, new_name, new_avatar):
     if not GITHUB_TOKEN: return
     
-    gh_headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json",
-        "Cache-Control": "no-cache"
-    }
-    
     print(f"🔄 Починаю масове оновлення профілю для {new_name} на GitHub...")
     
-    # Використовуємо замок, щоб не заважати запису нових рейсів
-    async with GITHUB_DB_LOCK:
-        async with aiohttp.ClientSession() as session:
-            # 1. Отримуємо список всіх файлів у папці FLIGHTS
-            dir_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/FLIGHTS?t={int(time.time())}"
-            async with session.get(dir_url, headers=gh_headers) as dir_resp:
-                if dir_resp.status != 200: 
-                    print("❌ Помилка доступу до папки FLIGHTS")
-                    return
-                dir_data = await dir_resp.json()
-                
-            updated_files_count = 0
+    async with shared_http_session() as session:
+        # 1. Оновлюємо дзеркало БЕЗ замка (змінені тижні качаються паралельно)
+        if not await refresh_flights_mirror(session):
+            print("❌ Помилка доступу до папки FLIGHTS")
+            return
             
-            # 2. Проходимося по кожному файлу
-            for item in dir_data:
-                file_name = item.get("name", "")
-                
-                if not re.match(r"^\d{4}-W\d{2}\.json$", file_name): 
-                    continue
-                
-                file_path = item["path"]
-                file_sha = item["sha"]
+        # 2. Під замком лише локальна перезбірка файлів і ОДИН коміт — запис нових рейсів чекає секунди
+        async with GITHUB_DB_LOCK:
+            # Поки ми чекали замок, flush_github_queue міг закомітити новий тиждень — звіряємося ще раз.
+            # Якщо нічого не змінилось, це один 304 на дерево; інакше докачуються лише змінені файли
+            if not await refresh_flights_mirror(session):
+                print("❌ Помилка доступу до папки FLIGHTS")
+                return
+            files_to_push = {}
+            
+            # Беремо лише тижні, де цей пілот взагалі літав
+            for week_tag in pilot_mirror_weeks(pilot_id):
+                file_name = f"{week_tag}.json"
+                file_content, file_sha = get_mirror_week(file_name)
+                if not file_sha: continue
                 
-                # Завантажуємо вміст файлу через Blob API (обхід кешу!)
-                blob_url = f"https://api.github.com/repos/{GITHUB_REPO}/git/blobs/{file_sha}"
-                async with session.get(blob_url, headers=gh_headers) as blob_resp:
-                    if blob_resp.status != 200: continue
-                    try:
-                        blob_data = await blob_resp.json()
-                        text_content = base64.b64decode(blob_data['content']).decode('utf-8')
-                        file_content = json.loads(text_content)
-                    except Exception as e: 
-                        print(f"Помилка читання Blob у фоні: {e}")
-                        continue
-                        
                 changed = False
                 
                 # 3. Шукаємо нашого пілота в цьому файлі
@@ -424,84 +751,319 @@ async def update_pilot_history_on_github(pilot_id, new_name, new_avatar):
                             changed = True
                         break 
                         
-                # 4. Якщо були зміни - пушимо файл назад на GitHub
                 if changed:
-                    new_content_str = json.dumps(file_content, ensure_ascii=False, indent=4)
-                    new_content_b64 = base64.b64encode(new_content_str.encode('utf-8')).decode('utf-8')
-                    
-                    push_payload = {
-                        "message": f"🤖 Auto update profile info for {new_name}",
-                        "content": new_content_b64,
-                        "sha": file_sha
-                    }
-                    put_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{file_path}"
+                    files_to_push[f"FLIGHTS/{file_name}"] = json.dumps(file_content, ensure_ascii=False, indent=4)
                     
-                    async with session.put(put_url, headers=gh_headers, json=push_payload) as put_resp:
-                        if put_resp.status in [200, 201]:
-                            updated_files_count += 1
+            if not files_to_push: return
+            
+            # 4. Всі змінені тижні — одним комітом
+            success = await push_to_github_batch(session, files_to_push, f"🤖 Auto update profile info for {new_name}")
+            if not success:
+                print(f"❌ Не вдалося оновити профіль {new_name} на GitHub.")
+                return
+            for path, content_str in files_to_push.items():
+                record_mirror_week(path.split("/", 1)[1], content_str)
                 
-                # Захист від лімітів
-                await asyncio.sleep(1.5) 
-
-            # 5. Відправляємо звіт тобі в ПП
-            if updated_files_count > 0:
-                try:
-                    owner = await client.fetch_user(ADMIN_IDS[0])
-                    await owner.send(f"🔄 **Системне оновлення!** Пілот `{new_name}` змінив нік або аватарку.\nУспішно оновлено файлів історії на GitHub: **{updated_files_count}** 🗂️.")
-                except Exception as e:
-                    print(f"Не вдалося відправити звіт адміну: {e}")
-    
-def load_charters_state():
-    if not CHARTERS_FILE.exists(): return {}
-    try: return json.loads(CHARTERS_FILE.read_text(encoding="utf-8"))
-    except: return {}
-
-def save_charters_state(state):
+    # 5. Відправляємо звіт тобі в ПП
     try:
-        if len(state) > 100: state = dict(list(state.items())[-50:])
-        CHARTERS_FILE.write_text(json.dumps(state), encoding="utf-8")
-    except: pass
+        owner = await client.fetch_user(ADMIN_IDS[0])
+        await owner.send(f"🔄 **Системне оновлення!** Пілот `{new_name}` змінив нік або аватарку.\nУспішно оновлено файлів історії на GitHub: **{len(files_to_push)}** 🗂️ (одним комітом).")
+    except Exception as e:
+        print(f"Не вдалося відправити звіт адміну: {e}")
+    
+def atomic_write_bytes(path, data):
+    # Безпечний запис: спершу тимчасовий файл, fsync, потім атомарна заміна (без "напівзаписаних" файлів)
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as fp:
+        fp.write(data)
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.replace(tmp_path, path)
+
+# --- 🗄️ ЛОКАЛЬНА БАЗА SQLITE (/app/data/bot.db) ---
+# Ігнор-лист, приховані юзери, статуси, тижнева статистика та чартери живуть в одній
+# базі (WAL), а не в п'яти JSON-файлах, які перечитувались і переписувались цілком.
+# Старі JSON-файли один раз імпортуються при першому відкритті бази і перейменовуються в *.imported.
+DB_CONN = None
+CHARTERS_RETENTION = 30 * 86400
+GSTATS_CARDS_RETENTION = 180 * 86400
+
+def get_db():
+    global DB_CONN
+    if DB_CONN is None:
+        DB_FILE.parent.mkdir(parents=True, exist_ok=True)
+        DB_CONN = sqlite3.connect(DB_FILE)
+        DB_CONN.execute("PRAGMA journal_mode=WAL")
+        DB_CONN.execute("PRAGMA synchronous=NORMAL")
+        DB_CONN.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS ignored_flights (fid TEXT PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS hidden_users (
+                channel_id TEXT NOT NULL, user_id INTEGER NOT NULL,
+                PRIMARY KEY (channel_id, user_id)
+            );
+            CREATE TABLE IF NOT EXISTS statuses (pos INTEGER PRIMARY KEY, data TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS weekly_stats (week TEXT PRIMARY KEY, data TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS charters (cid TEXT PRIMARY KEY, data TEXT, seen REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS idx_charters_seen ON charters (seen);
+            CREATE TABLE IF NOT EXISTS message_index (
+                message_id INTEGER PRIMARY KEY, channel_id INTEGER NOT NULL, seen REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_message_index_seen ON message_index (seen);
+            CREATE TABLE IF NOT EXISTS gstats_cards (
+                fid TEXT NOT NULL, locale TEXT NOT NULL, data BLOB NOT NULL, created REAL NOT NULL,
+                PRIMARY KEY (fid, locale)
+            );
+            CREATE INDEX IF NOT EXISTS idx_gstats_cards_created ON gstats_cards (created);
+            CREATE TABLE IF NOT EXISTS scheduled_actions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, due REAL NOT NULL, kind TEXT NOT NULL, data TEXT NOT NULL
+            );
+        """)
+        import_json_into_db(DB_CONN)
+    return DB_CONN
+
+def import_json_into_db(db):
+    # Одноразовий перенос старих JSON-файлів у базу
+    if db.execute("SELECT 1 FROM meta WHERE key = 'json_imported'").fetchone(): return
+    
+    def read_json(path, default):
+        if not path.exists(): return default
+        try: return json.loads(path.read_text(encoding="utf-8"))
+        except Exception as e:
+            print(f"⚠️ Skipping corrupted {path.name} during import: {e}")
+            return default
+            
+    now = time.time()
+    with db:
+        db.executemany("INSERT OR IGNORE INTO ignored_flights (fid) VALUES (?)",
+                       [(str(fid),) for fid in read_json(IGNORED_FILE, [])])
+        db.executemany("INSERT OR IGNORE INTO hidden_users (channel_id, user_id) VALUES (?, ?)",
+                       [(str(ch), int(uid)) for ch, users in read_json(HIDDEN_FILE, {}).items() for uid in users])
+        db.executemany("INSERT OR REPLACE INTO statuses (pos, data) VALUES (?, ?)",
+                       [(i, json.dumps(st)) for i, st in enumerate(read_json(STATUS_FILE, []))])
+        db.executemany("INSERT OR REPLACE INTO weekly_stats (week, data) VALUES (?, ?)",
+                       [(week, json.dumps(st)) for week, st in read_json(WEEKLY_STATS_FILE, {}).items()])
+        db.executemany("INSERT OR IGNORE INTO charters (cid, data, seen) VALUES (?, ?, ?)",
+                       [(str(cid), json.dumps(st), now) for cid, st in read_json(CHARTERS_FILE, {}).items()])
+        db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', ?)", (str(now),))
+        
+    for path in (IGNORED_FILE, HIDDEN_FILE, STATUS_FILE, WEEKLY_STATS_FILE, CHARTERS_FILE):
+        if path.exists():
+            try: path.rename(path.with_name(path.name + ".imported"))
+            except Exception as e: print(f"⚠️ Failed to rename imported {path.name}: {e}")
+    print("🗄️ JSON state imported into bot.db")
+
+def checkpoint_db():
+    # Зливаємо WAL в основний файл (перед тим, як віддавати bot.db через !cache)
+    try: get_db().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    except Exception as e: print(f"⚠️ WAL checkpoint failed: {e}")
+
+def is_charter_known(cid):
+    return get_db().execute("SELECT 1 FROM charters WHERE cid = ?", (str(cid),)).fetchone() is not None
+
+def mark_charter_notified(cid):
+    db = get_db()
+    with db:
+        db.execute("INSERT OR REPLACE INTO charters (cid, data, seen) VALUES (?, ?, ?)",
+                   (str(cid), json.dumps({"notified": True}), time.time()))
+        db.execute("DELETE FROM charters WHERE seen < ?", (time.time() - CHARTERS_RETENTION,))
+
+# Індекс "ID повідомлення -> ID каналу" для повідомлень бота, команд і вже знайдених повідомлень.
+# Команди з <Message_ID> (!wow, !pin, !del, !reply...) ідуть одразу в потрібний канал,
+# а не перебирають усі канали сервера по одному 404-запиту на кожен.
+MESSAGE_INDEX_RETENTION = 180 * 86400
+MESSAGE_INDEX_LAST_PRUNE = 0.0
+
+def index_message(message_id, channel_id):
+    global MESSAGE_INDEX_LAST_PRUNE
+    now = time.time()
+    db = get_db()
+    with db:
+        db.execute("INSERT OR REPLACE INTO message_index (message_id, channel_id, seen) VALUES (?, ?, ?)",
+                   (int(message_id), int(channel_id), now))
+        if now - MESSAGE_INDEX_LAST_PRUNE > 3600:
+            MESSAGE_INDEX_LAST_PRUNE = now
+            db.execute("DELETE FROM message_index WHERE seen < ?", (now - MESSAGE_INDEX_RETENTION,))
+
+def lookup_message_channel(message_id):
+    row = get_db().execute("SELECT channel_id FROM message_index WHERE message_id = ?", (int(message_id),)).fetchone()
+    return row[0] if row else None
+
+def forget_message(message_id):
+    db = get_db()
+    with db:
+        db.execute("DELETE FROM message_index WHERE message_id = ?", (int(message_id),))
+
+# --- 📒 ЖУРНАЛ СТАНУ РЕЙСІВ (sent.json + sent.journal) ---
+# sent.json — знімок, sent.journal — дописуваний лог змін (один рядок JSON на змінений рейс).
+# Кожен тік main_loop дописує лише те, що реально змінилося; раз на STATE_COMPACT_EVERY рядків
+# журнал "згортається" в новий знімок через атомарну заміну. Повтор журналу ідемпотентний:
+# останній рядок для рейсу завжди перемагає, тож падіння посеред компакції нічого не ламає.
+STATE_JOURNAL_FILE = Path("/app/data/sent.journal")
+STATE_COMPACT_EVERY = 500
+STATE_PRUNE_INTERVAL = 3600
+STATE_DONE_RETENTION = int(os.getenv("STATE_DONE_RETENTION_HOURS", 72)) * 3600
+STATE_MAX_AGE = int(os.getenv("STATE_MAX_AGE_DAYS", 14)) * 86400
+STATE_PERSISTED = {}
+STATE_TOUCHED = {}
+STATE_JOURNAL_LINES = 0
+STATE_LAST_PRUNE = 0.0
+
+def _state_record_text(record):
+    return json.dumps(record, sort_keys=True, separators=(",", ":"))
+
+def read_state_files():
+    # Знімок + повтор журналу, без зміни глобальних лічильників (для !cache і load_state)
+    state, touched, lines = {}, {}, 0
+    now = time.time()
+    
+    if STATE_FILE.exists():
+        try: state = json.loads(STATE_FILE.read_text(encoding="utf-8"))
+        except Exception as e: print(f"⚠️ sent.json is unreadable, starting from the journal only: {e}")
+    for fid, record in state.items():
+        touched[fid] = record.pop("touched", now) if isinstance(record, dict) else now
+        
+    if STATE_JOURNAL_FILE.exists():
+        try:
+            with open(STATE_JOURNAL_FILE, "r", encoding="utf-8") as fp:
+                for line in fp:
+                    try: entry = json.loads(line)
+                    except json.JSONDecodeError: continue # Обірваний останній рядок після падіння
+                    lines += 1
+                    fid = entry["id"]
+                    if entry.get("v") is None:
+                        state.pop(fid, None)
+                        touched.pop(fid, None)
+                    else:
+                        state[fid] = entry["v"]
+                        touched[fid] = entry.get("t", now)
+        except Exception as e:
+            print(f"⚠️ Failed to replay state journal: {e}")
+    return state, touched, lines
 
 def load_state():
-    if not STATE_FILE.exists(): return {}
-    try: return json.loads(STATE_FILE.read_text(encoding="utf-8"))
-    except: return {}
-
-def save_state(state):
+    global STATE_JOURNAL_LINES
+    state, touched, STATE_JOURNAL_LINES = read_state_files()
+    STATE_TOUCHED.clear()
+    STATE_TOUCHED.update(touched)
+    STATE_PERSISTED.clear()
+    for fid, record in state.items():
+        STATE_PERSISTED[fid] = _state_record_text(record)
+    return state
+
+def compact_state(state):
+    # Згортаємо журнал у новий знімок: tmp + fsync + os.replace, потім порожній журнал
+    global STATE_JOURNAL_LINES
+    snapshot = {fid: {**record, "touched": STATE_TOUCHED.get(fid, time.time())} for fid, record in state.items()}
+    atomic_write_bytes(STATE_FILE, json.dumps(snapshot).encode("utf-8"))
+    atomic_write_bytes(STATE_JOURNAL_FILE, b"")
+    STATE_JOURNAL_LINES = 0
+
+def replace_state_file(new_state):
+    # Повна заміна стану (!editsent): новий знімок і чистий журнал, щоб старі рядки не перекрили файл
+    atomic_write_bytes(STATE_FILE, json.dumps(new_state, indent=4).encode("utf-8"))
+    atomic_write_bytes(STATE_JOURNAL_FILE, b"")
+
+def prune_state(state, keep_ids=()):
+    # Викидаємо завершені рейси, які давно не змінювались, і зовсім старі "завислі" записи.
+    # Рейси, які ще видно в ongoing/recent, не чіпаємо — інакше бот відправив би звіт повторно.
+    now = time.time()
+    for fid in list(state):
+        if fid in keep_ids: continue
+        age = now - STATE_TOUCHED.get(fid, now)
+        record = state[fid]
+        done = isinstance(record, dict) and record.get("completed")
+        if (done and age > STATE_DONE_RETENTION) or age > STATE_MAX_AGE:
+            del state[fid]
+
+def save_state(state, keep_ids=()):
+    global STATE_JOURNAL_LINES, STATE_LAST_PRUNE
+    now = time.time()
+    if now - STATE_LAST_PRUNE > STATE_PRUNE_INTERVAL:
+        STATE_LAST_PRUNE = now
+        prune_state(state, keep_ids)
+        
+    lines = []
+    for fid, record in state.items():
+        text = _state_record_text(record)
+        if STATE_PERSISTED.get(fid) != text:
+            STATE_PERSISTED[fid] = text
+            STATE_TOUCHED[fid] = now
+            lines.append(json.dumps({"id": fid, "v": record, "t": now}, separators=(",", ":")))
+    for fid in [fid for fid in STATE_PERSISTED if fid not in state]:
+        del STATE_PERSISTED[fid]
+        STATE_TOUCHED.pop(fid, None)
+        lines.append(json.dumps({"id": fid, "v": None, "t": now}, separators=(",", ":")))
+    if not lines: return
+    
     try:
-        if len(state) > 100: state = dict(list(state.items())[-50:])
-        STATE_FILE.write_text(json.dumps(state), encoding="utf-8")
-    except: pass
+        with open(STATE_JOURNAL_FILE, "a", encoding="utf-8") as fp:
+            fp.write("\n".join(lines) + "\n")
+            fp.flush()
+            os.fsync(fp.fileno())
+        STATE_JOURNAL_LINES += len(lines)
+        if STATE_JOURNAL_LINES >= STATE_COMPACT_EVERY:
+            compact_state(state)
+    except Exception as e:
+        print(f"⚠️ Failed to persist flight state: {e}")
 
 def load_ignored():
-    if not IGNORED_FILE.exists(): return []
-    try: return json.loads(IGNORED_FILE.read_text(encoding="utf-8"))
-    except: return []
+    # Множина, а не список: перевірка `fid in ignored` у циклах синхронізації — O(1)
+    return {row[0] for row in get_db().execute("SELECT fid FROM ignored_flights")}
 
-def save_ignored(ignored_list):
-    try: IGNORED_FILE.write_text(json.dumps(ignored_list), encoding="utf-8")
-    except: pass
+def add_ignored_flight(fid):
+    db = get_db()
+    with db:
+        return db.execute("INSERT OR IGNORE INTO ignored_flights (fid) VALUES (?)", (str(fid),)).rowcount > 0
 
 def load_hidden_users():
-    if not HIDDEN_FILE.exists(): return {}
-    try: return json.loads(HIDDEN_FILE.read_text(encoding="utf-8"))
-    except: return {}
+    data = {}
+    for channel_id, user_id in get_db().execute("SELECT channel_id, user_id FROM hidden_users"):
+        data.setdefault(channel_id, []).append(user_id)
+    return data
+
+def add_hidden_user(channel_id, user_id):
+    db = get_db()
+    with db:
+        db.execute("INSERT OR IGNORE INTO hidden_users (channel_id, user_id) VALUES (?, ?)", (str(channel_id), int(user_id)))
 
-def save_hidden_users(data):
-    try: HIDDEN_FILE.write_text(json.dumps(data), encoding="utf-8")
-    except: pass
+def remove_hidden_user(channel_id, user_id):
+    db = get_db()
+    with db:
+        db.execute("DELETE FROM hidden_users WHERE channel_id = ? AND user_id = ?", (str(channel_id), int(user_id)))
 
 HIDDEN_USERS = load_hidden_users()
 
 # 🔥 БЛОК ФУНКЦІЙ ДЛЯ СТАТИСТИКИ 🔥
-def load_weekly_stats():
-    if not WEEKLY_STATS_FILE.exists(): return {}
-    try: return json.loads(WEEKLY_STATS_FILE.read_text(encoding="utf-8"))
-    except: return {}
+def load_weekly_stats(before=None):
+    # before="2026-W10" — лише завершені тижні (для щотижневої публікації), без розбору поточного
+    query, args = "SELECT week, data FROM weekly_stats", ()
+    if before:
+        query, args = query + " WHERE week < ?", (before,)
+    return {week: json.loads(data) for week, data in get_db().execute(query + " ORDER BY week", args)}
+
+def load_week_stats(week_tag):
+    row = get_db().execute("SELECT data FROM weekly_stats WHERE week = ?", (week_tag,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def save_week_stats(week_tag, s):
+    db = get_db()
+    with db:
+        db.execute("INSERT OR REPLACE INTO weekly_stats (week, data) VALUES (?, ?)", (week_tag, json.dumps(s)))
+
+def delete_week_stats(week_tag):
+    db = get_db()
+    with db:
+        db.execute("DELETE FROM weekly_stats WHERE week = ?", (week_tag,))
 
 def save_weekly_stats(stats):
-    try: WEEKLY_STATS_FILE.write_text(json.dumps(stats, indent=4), encoding="utf-8")
-    except: pass
+    # Повна заміна всіх тижнів (!clearstats)
+    db = get_db()
+    with db:
+        db.execute("DELETE FROM weekly_stats")
+        db.executemany("INSERT INTO weekly_stats (week, data) VALUES (?, ?)",
+                       [(week, json.dumps(s)) for week, s in stats.items()])
 
 def get_iso_week(dt_str=None):
     if dt_str:
@@ -536,11 +1098,7 @@ def init_week_stats():
     }
 
 def update_weekly_stats(f, week_tag):
-    stats = load_weekly_stats()
-    if week_tag not in stats:
-        stats[week_tag] = init_week_stats()
-        
-    s = stats[week_tag]
+    s = load_week_stats(week_tag) or init_week_stats()
     
     t = f.get("result", {}).get("totals", {})
     balance = int(t.get("balance", 0))
@@ -626,13 +1184,13 @@ def update_weekly_stats(f, week_tag):
             s["records"]["shortest"].append(flight_rec)
             s["records"]["shortest"] = sorted(s["records"]["shortest"], key=lambda x: x["time"])[:3]
             
-    save_weekly_stats(stats)
+    save_week_stats(week_tag, s)
 
 async def check_and_publish_weekly_stats(channel, state, ongoing_ids):
-    stats = load_weekly_stats()
+    current_week = get_iso_week()
+    stats = load_weekly_stats(before=current_week)
     if not stats: return
     
-    current_week = get_iso_week()
     weeks_to_delete = []
     
     for week_tag, s in stats.items():
@@ -680,19 +1238,17 @@ async def check_and_publish_weekly_stats(channel, state, ongoing_ids):
 
             weeks_to_delete.append(week_tag)
             
-    if weeks_to_delete:
-        for w in weeks_to_delete:
-            del stats[w]
-        save_weekly_stats(stats)
+    for w in weeks_to_delete:
+        delete_week_stats(w)
 
 async def publish_weekly_embed(channel, week_tag, s):
-	# --- НАШ БЕЗПЕЧНИЙ ЛОКАЛЬНИЙ СЛОВНИК ДЛЯ СТАТИСТИКИ ---
-    manual_map = {'UK': 'UA', 'VH': 'HK'}
+    # --- ПРАПОРИ ДЛЯ ЗВІТУ: КРАЇНА З БАЗИ АБО ЗА ПРЕФІКСОМ ICAO ---
     def get_report_flag(icao):
         if not icao or icao == "???": return "🏳️"
-        country = AIRPORTS_DB.get(icao.upper(), {}).get("country", "XX")
-        if country == "XX" and len(icao) >= 2:
-            country = manual_map.get(icao[:2].upper(), "XX")
+        airport = AIRPORTS_DB.get(icao.upper())
+        country = airport.country if airport else "XX"
+        if country == "XX":
+            country = AIRPORTS_DB.prefix_country(icao)
         return get_flag(country)
     # -----------------------------------------------------
     dates_str = get_week_dates_string(week_tag)
@@ -817,55 +1373,251 @@ DEFAULT_STATUSES = [
 ]
 
 def load_statuses():
-    if not STATUS_FILE.exists():
-        return list(DEFAULT_STATUSES)
     try:
-        data = json.loads(STATUS_FILE.read_text(encoding="utf-8"))
+        data = [json.loads(row[0]) for row in get_db().execute("SELECT data FROM statuses ORDER BY pos")]
         if not data: return list(DEFAULT_STATUSES)
         return data
-    except:
+    except Exception as e:
+        print(f"⚠️ Failed to load statuses: {e}")
         return list(DEFAULT_STATUSES)
 
 def save_statuses():
     try:
-        STATUS_FILE.write_text(json.dumps(status_list, indent=4), encoding="utf-8")
+        db = get_db()
+        with db:
+            db.execute("DELETE FROM statuses")
+            db.executemany("INSERT INTO statuses (pos, data) VALUES (?, ?)",
+                           [(i, json.dumps(st)) for i, st in enumerate(status_list)])
     except Exception as e:
         print(f"⚠️ Failed to save statuses: {e}")
 
 status_list = load_statuses()
 status_cycle = cycle(status_list)
 
+# Регулярки для clean_text компілюються один раз, а не на кожен виклик
+CLEAN_TEXT_PARENS = re.compile(r"\(.*?\)")
+CLEAN_TEXT_REMOVALS = [re.compile(re.escape(word), re.IGNORECASE) for word in ("International", "Regional", "Airport", "Aerodrome", "Air Base", "Intl")]
+
 def clean_text(text):
     if not text: return ""
-    text = re.sub(r"\(.*?\)", "", text)
-    removals = ["International", "Regional", "Airport", "Aerodrome", "Air Base", "Intl"]
-    for word in removals:
-        pattern = re.compile(re.escape(word), re.IGNORECASE)
+    text = CLEAN_TEXT_PARENS.sub("", text)
+    for pattern in CLEAN_TEXT_REMOVALS:
         text = pattern.sub("", text)
     return text.strip().strip(",").strip()
 
 # --- 🌍 ЗАВАНТАЖЕННЯ БАЗИ ---
+# Оброблена таблиця аеропортів зберігається в /app/data/airports.bin (zlib + pickle) разом з ETag,
+# тож після рестарту база піднімається з диска за мілісекунди. Перевірка свіжості йде у фоні
+# умовним запитом (If-None-Match); нова версія будується в окремому потоці і підміняється одним присвоєнням.
+# Разом із таблицею кешуються й готові підписи аеропортів для карток (AIRPORT_LABELS).
+AIRPORTS_CACHE_VERSION = 3
+AIRPORTS_ETAG = None
+AIRPORT_LABELS = {}  # ICAO -> готовий рядок "прапор **ICAO** (назва)"
+
+# ~28 тис. аеропортів тримаємо не словником словників, а паралельними колонками:
+# рядки — у списках (коди країн інтерновані), координати й висота — упаковані float32 в array('f').
+# AIRPORTS_DB.get(icao) повертає легкий AirportRecord (вид на рядок таблиці) або None.
+class AirportRecord:
+    __slots__ = ("table", "row")
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    @property
+    def country(self): return self.table.countries[self.row]
+    @property
+    def city(self): return self.table.cities[self.row]
+    @property
+    def name(self): return self.table.names[self.row]
+    @property
+    def lat(self): return self.table.lat[self.row]
+    @property
+    def lon(self): return self.table.lon[self.row]
+    @property
+    def elevation(self): return self.table.elevation[self.row]
+
+def haversine_nm(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 3440.065 * math.asin(min(1.0, math.sqrt(a)))
+
+# Просторовий індекс — сітка 1°×1°: (floor(lat), floor(lon)) -> рядки таблиці.
+# Пошук у радіусі перебирає лише клітинки, що перетинають коло, тож запит коштує мікросекунди.
+# prefix_countries — найчастіша країна для кожного 2-літерного префікса ICAO (замість ручної мапи).
+class AirportTable:
+    __slots__ = ("index", "icaos", "countries", "cities", "names", "lat", "lon", "elevation", "grid", "prefix_countries")
+
+    def __init__(self):
+        self.index = {}
+        self.grid = {}
+        self.prefix_countries = {}
+        self.icaos, self.countries, self.cities, self.names = [], [], [], []
+        self.lat, self.lon, self.elevation = array("f"), array("f"), array("f")
+
+    def __len__(self): return len(self.icaos)
+    def __iter__(self): return iter(self.icaos)
+    def __contains__(self, icao): return icao in self.index
+
+    def add(self, icao, country, city, name, lat, lon, elevation):
+        self.index[icao] = len(self.icaos)
+        self.icaos.append(icao)
+        self.countries.append(sys.intern(country or "XX"))
+        self.cities.append(city or "")
+        self.names.append(name or "")
+        self.lat.append(lat)
+        self.lon.append(lon)
+        self.elevation.append(elevation)
+
+    def get(self, icao, default=None):
+        row = self.index.get(icao)
+        return AirportRecord(self, row) if row is not None else default
+
+    def finalize(self):
+        # Індекси, що виводяться з колонок: ICAO -> рядок, сітка, префікс -> країна
+        self.index = {icao: row for row, icao in enumerate(self.icaos)}
+        self.grid = {}
+        prefix_votes = {}
+        for row, icao in enumerate(self.icaos):
+            lat, lon = self.lat[row], self.lon[row]
+            if not (math.isnan(lat) or math.isnan(lon)):
+                self.grid.setdefault((math.floor(lat), math.floor(lon)), []).append(row)
+            country = self.countries[row]
+            if len(icao) == 4 and country != "XX":
+                votes = prefix_votes.setdefault(icao[:2], {})
+                votes[country] = votes.get(country, 0) + 1
+        self.prefix_countries = {prefix: max(votes, key=votes.get) for prefix, votes in prefix_votes.items()}
+
+    def prefix_country(self, icao):
+        return self.prefix_countries.get(icao[:2].upper(), "XX") if icao and len(icao) >= 2 else "XX"
+
+    def within(self, lat, lon, radius_nm):
+        # [(відстань_nm, ICAO), ...] по зростанню відстані
+        dlat = radius_nm / 60.0
+        # Ширину по довготі беремо для найближчої до полюса широти кола — з запасом, але без пропусків
+        far_lat = min(abs(lat) + dlat, 90.0)
+        dlon = radius_nm / (60.0 * max(math.cos(math.radians(far_lat)), 1e-6))
+        found = []
+        for cell_lat in range(math.floor(max(lat - dlat, -90)), math.floor(min(lat + dlat, 89.999)) + 1):
+            if dlon >= 180:
+                lon_cells = range(-180, 180)
+            else:
+                lon_cells = (((c + 180) % 360) - 180 for c in range(math.floor(lon - dlon), math.floor(lon + dlon) + 1))
+            for cell_lon in lon_cells:
+                for row in self.grid.get((cell_lat, cell_lon), ()):
+                    dist = haversine_nm(lat, lon, self.lat[row], self.lon[row])
+                    if dist <= radius_nm:
+                        found.append((dist, self.icaos[row]))
+        found.sort()
+        return found
+
+    def nearest(self, lat, lon, max_nm=500):
+        # Розширюємо радіус, доки не знайдемо хоч щось: найближчий у колі r — найближчий взагалі
+        radius = 25
+        while True:
+            radius = min(radius, max_nm)
+            found = self.within(lat, lon, radius)
+            if found:
+                return found[0]
+            if radius >= max_nm:
+                return None
+            radius *= 2
+
+    def distance_nm(self, icao_a, icao_b):
+        a, b = self.index.get(icao_a), self.index.get(icao_b)
+        if a is None or b is None: return None
+        dist = haversine_nm(self.lat[a], self.lon[a], self.lat[b], self.lon[b])
+        return None if math.isnan(dist) else dist
+
+    def to_columns(self):
+        # Для кешу на диску: лише прості типи, без посилань на клас
+        return (self.icaos, self.countries, self.cities, self.names,
+                self.lat.tobytes(), self.lon.tobytes(), self.elevation.tobytes())
+
+    @classmethod
+    def from_columns(cls, columns):
+        table = cls()
+        table.icaos, countries, table.cities, table.names, lat, lon, elevation = columns
+        table.countries = [sys.intern(c) for c in countries]
+        table.lat.frombytes(lat)
+        table.lon.frombytes(lon)
+        table.elevation.frombytes(elevation)
+        table.finalize()
+        return table
+
+AIRPORTS_DB = AirportTable()
+HOME_AIRPORT = os.getenv("HOME_AIRPORT", "UKBB")
+CHARTER_RADIUS_NM = int(os.getenv("CHARTER_RADIUS_NM", 0))  # 0 — лише українські аеропорти
+TRAFFIC_NEAR_NM = 40
+
+def _float_or_nan(value):
+    try: return float(value)
+    except (TypeError, ValueError): return math.nan
+
+def build_airports_db(raw):
+    data = json.loads(raw)
+    airports = AirportTable()
+    for k, v in data.items():
+        airports.add(k.upper(), v.get("country", "XX"), v.get("city", ""), v.get("name", ""),
+                     _float_or_nan(v.get("lat")), _float_or_nan(v.get("lon")), _float_or_nan(v.get("elevation")))
+    airports.finalize()
+    return airports, build_airport_labels(airports)
+
+def build_airport_labels(airports):
+    labels = {}
+    for icao in airports:
+        label = render_airport_label(icao, airports.get(icao))
+        if label: labels[icao] = label
+    return labels
+
+def set_airports_db(airports, labels, etag):
+    global AIRPORTS_DB, AIRPORT_LABELS, AIRPORTS_ETAG
+    AIRPORTS_DB, AIRPORT_LABELS, AIRPORTS_ETAG = airports, labels, etag
+    format_airport_fallback.cache_clear()
+
+def load_airports_cache():
+    if not AIRPORTS_CACHE_FILE.exists(): return False
+    try:
+        cached = pickle.loads(zlib.decompress(AIRPORTS_CACHE_FILE.read_bytes()))
+        if cached.get("version") != AIRPORTS_CACHE_VERSION:
+            print("🌍 Airports cache has an old format, will rebuild it")
+            return False
+        set_airports_db(AirportTable.from_columns(cached["airports"]), cached["labels"], cached.get("etag"))
+        print(f"✅ Airports DB loaded from disk! ({len(AIRPORTS_DB)} airports)")
+        return True
+    except Exception as e:
+        print(f"⚠️ Airports cache is unreadable: {e}")
+        return False
+
+def save_airports_cache(airports, labels, etag):
+    payload = {"version": AIRPORTS_CACHE_VERSION, "etag": etag, "airports": airports.to_columns(), "labels": labels}
+    atomic_write_bytes(AIRPORTS_CACHE_FILE, zlib.compress(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL), 6))
+
 async def update_airports_db():
-    global AIRPORTS_DB
-    print("🌍 Downloading airports database...")
-    async with aiohttp.ClientSession() as session:
+    headers = {"If-None-Match": AIRPORTS_ETAG} if AIRPORTS_ETAG and AIRPORTS_DB else {}
+    async with shared_http_session() as session:
         try:
-            async with session.get(AIRPORTS_DB_URL) as resp:
-                if resp.status == 200:
-                    data = await resp.json(content_type=None)
-                    AIRPORTS_DB = {}
-                    for k, v in data.items():
-                        AIRPORTS_DB[k.upper()] = {
-                            "country": v.get("country", "XX"),
-                            "city": v.get("city", ""),
-                            "name": v.get("name", "")
-                        }
-                    print(f"✅ Airports DB loaded! ({len(AIRPORTS_DB)} airports)")
-                else:
+            async with session.get(AIRPORTS_DB_URL, headers=headers) as resp:
+                if resp.status == 304:
+                    print("🌍 Airports DB is up to date")
+                    return
+                if resp.status != 200:
                     print(f"⚠️ Failed to load airports DB: Status {resp.status}")
+                    return
+                raw = await resp.read()
+                etag = resp.headers.get("ETag")
+            print("🌍 New airports database downloaded, rebuilding...")
+            new_db, new_labels = await asyncio.to_thread(build_airports_db, raw)
+            set_airports_db(new_db, new_labels, etag)
+            await asyncio.to_thread(save_airports_cache, new_db, new_labels, etag)
+            print(f"✅ Airports DB loaded! ({len(AIRPORTS_DB)} airports)")
         except Exception as e:
             print(f"⚠️ Error loading DB: {e}")
 
+@tasks.loop(hours=12)
+async def airports_refresh_task():
+    await update_airports_db()
+
 def get_flag(country_code):
     if not country_code or country_code == "XX": return "🏳️"
     try:
@@ -874,61 +1626,65 @@ def get_flag(country_code):
         return "🏳️"
 
 # --- 🧠 РОЗУМНЕ ФОРМУВАННЯ НАЗВИ ---
-def format_airport_string(icao, api_name):
-    icao = icao.upper()
-    db_data = AIRPORTS_DB.get(icao)
+# ВИПРАВЛЕННЯ НАЗВ МІСТ
+CITY_FIXES = {
+    "Kiev": "Kyiv",
+    "Dnipropetrovsk": "Dnipro",
+    "Kirovograd": "Kropyvnytskyi",
+    "Nikolayev": "Mykolaiv",
+    "Odessa": "Odesa",
+    "Vinnitsa": "Vinnytsia",
+    "Zaporizhia": "Zaporizhzhia",
+    "Larnarca": "Larnaca",
+    "Frankfurt-am-Main": "Frankfurt am Main",
+    "Sharm el-Sheikh": "Sharm El Sheikh",
+    "Ajaccio/Napoléon Bonaparte": "Ajaccio",
+    "Ajaccio/Napoleon Bonaparte": "Ajaccio"
+}
+
+def render_airport_label(icao, db_data, api_name=""):
+    # Підпис аеропорту з бази; None, якщо в базі немає ні міста, ні назви (тоді потрібна назва з API)
+    city = db_data.city
+    name = db_data.name
+    country = db_data.country
     
-    if db_data:
-        city = db_data.get("city", "") or ""
-        name = db_data.get("name", "") or ""
-        country = db_data.get("country", "XX")
-        
-        # ВИПРАВЛЕННЯ НАЗВ МІСТ
-        CITY_FIXES = {
-            "Kiev": "Kyiv",
-            "Dnipropetrovsk": "Dnipro",
-            "Kirovograd": "Kropyvnytskyi",
-            "Nikolayev": "Mykolaiv",
-            "Odessa": "Odesa",
-            "Vinnitsa": "Vinnytsia",
-            "Zaporizhia": "Zaporizhzhia",
-            "Larnarca": "Larnaca",
-            "Frankfurt-am-Main": "Frankfurt am Main",
-            "Sharm el-Sheikh": "Sharm El Sheikh",
-            "Ajaccio/Napoléon Bonaparte": "Ajaccio",
-            "Ajaccio/Napoleon Bonaparte": "Ajaccio"
-        }
-        
-        for old, new in CITY_FIXES.items():
-            if city.lower() == old.lower(): 
-                city = new
-            name = name.replace(old, new)
-        
-        clean_name = clean_text(name)
-        display_text = ""
-        
-        if city and clean_name:
-            if city.lower() in clean_name.lower():
-                display_text = clean_name
-            else:
-                display_text = f"{city} {clean_name}"
-        elif clean_name:
+    for old, new in CITY_FIXES.items():
+        if city.lower() == old.lower(): 
+            city = new
+        name = name.replace(old, new)
+    
+    clean_name = clean_text(name)
+    display_text = ""
+    
+    if city and clean_name:
+        if city.lower() in clean_name.lower():
             display_text = clean_name
-        elif city:
-            display_text = city
         else:
-            display_text = clean_text(api_name)
+            display_text = f"{city} {clean_name}"
+    elif clean_name:
+        display_text = clean_name
+    elif city:
+        display_text = city
+    elif api_name:
+        display_text = clean_text(api_name)
+    else:
+        return None
 
-        return f"{get_flag(country)} **{icao}** ({display_text})"
+    return f"{get_flag(country)} **{icao}** ({display_text})"
+
+@lru_cache(maxsize=2048)
+def format_airport_fallback(icao, api_name):
+    # Аеропорти поза базою (або без назви в ній) — підпис залежить від назви з API
+    db_data = AIRPORTS_DB.get(icao)
+    if db_data:
+        return render_airport_label(icao, db_data, api_name) or f"{get_flag(db_data.country)} **{icao}** ()"
     
-    flag = "🏳️"
-    if len(icao) >= 2:
-        prefix = icao[:2]
-        manual_map = {'UK': 'UA', 'VH': 'HK'}
-        code = manual_map.get(prefix, "XX")
-        if code != "XX": flag = get_flag(code)
+    # Країну невідомого аеропорту вгадуємо за префіксом ICAO, зібраним із самої бази
+    return f"{get_flag(AIRPORTS_DB.prefix_country(icao))} **{icao}** ({clean_text(api_name)})"
 
-    return f"{flag} **{icao}** ({clean_text(api_name)})"
+def format_airport_string(icao, api_name):
+    icao = icao.upper()
+    return AIRPORT_LABELS.get(icao) or format_airport_fallback(icao, api_name or "")
 
 def get_timing(delay):
     try:
@@ -1022,64 +1778,408 @@ def get_landing_data(f, details_type):
     
     return "📉 **N/A**"
 
-API_LOCK = None
 GITHUB_DB_LOCK = asyncio.Lock()
-KEY_USAGE_HISTORY = {key: [] for key in NEWSKY_API_KEYS}
 
-async def fetch_api(session, path, method="GET", body=None):
-    global KEY_USAGE_HISTORY, API_LOCK
+# --- 🚦 КОВЗНЕ ВІКНО ДЛЯ КЛЮЧІВ NEWSKY (5 запитів / 10 сек на ключ) ---
+# На кожен ключ — deque(maxlen=5) з моментами останніх відправок. Ключ вільний, якщо
+# вікно ще не заповнене або найстаріша відправка старша за 10 сек, тож жоден 10-секундний
+# проміжок не містить більше 5 запитів (token bucket з поповненням дозволяв до 10).
+# Ніхто не спить під спільним замком: хто не отримав ключ одразу — стає в FIFO-чергу
+# свого класу, а єдиний диспетчер будить перших у черзі рівно тоді, коли вікно звільняється.
+API_RATE_LIMIT = 5
+API_RATE_WINDOW = 10.0
+API_KEY_WINDOWS = {key: deque(maxlen=API_RATE_LIMIT) for key in NEWSKY_API_KEYS}
+
+# Класи запитів у порядку пріоритету:
+#   live        — main_loop (зльоти/посадки кожні 10 сек)
+#   interactive — кнопки та команди користувачів
+#   bulk        — масові синхронізації (!syncall, !syncghweek, !syncweek, !patchnames)
+# Резерв = скільки вільних місць у вікні клас ЗОБОВ'ЯЗАНИЙ залишити для старших класів.
+# Bulk ніколи не заповнює вікно ключа до кінця, тож живий цикл завжди має свої місця.
+API_PRIORITIES = ("live", "interactive", "bulk")
+API_CLASS_RESERVE = {"live": 0, "interactive": 1, "bulk": 2}
+API_WAITERS = {cls: deque() for cls in API_PRIORITIES}
+API_STATS = {cls: {"served": 0, "queued": 0, "wait_total": 0.0, "wait_max": 0.0} for cls in API_PRIORITIES}
+API_DISPATCHER = None
+
+def _api_window_recent(key, now):
+    # Відправки ключа за останні API_RATE_WINDOW секунд (від найстарішої)
+    return [ts for ts in API_KEY_WINDOWS[key] if now - ts < API_RATE_WINDOW]
+
+def api_key_ready_in(key, now=None, priority="live"):
+    # Точний час (у секундах), через який ключ зможе прийняти запит цього класу. 0 — можна слати вже
+    now = now if now is not None else time.monotonic()
+    recent = _api_window_recent(key, now)
+    # Класу дозволено займати вікно лише до (ліміт - резерв) відправок
+    excess = len(recent) - (API_RATE_LIMIT - API_CLASS_RESERVE[priority]) + 1
+    if excess <= 0:
+        return 0.0
+    return max(0.0, recent[excess - 1] + API_RATE_WINDOW - now)
+
+def _take_api_token(now, priority):
+    # Проходимося по ключах ПО ЧЕРЗІ (спочатку головний, потім резервний)
+    for key in NEWSKY_API_KEYS:
+        if api_key_ready_in(key, now, priority) == 0.0:
+            API_KEY_WINDOWS[key].append(now)
+            return key
+    return None
+
+def _record_api_wait(priority, waited):
+    st = API_STATS[priority]
+    st["served"] += 1
+    st["wait_total"] += waited
+    if waited > st["wait_max"]:
+        st["wait_max"] = waited
+
+def _has_api_waiters(up_to_priority=None):
+    for cls in API_PRIORITIES:
+        if API_WAITERS[cls]:
+            return True
+        if cls == up_to_priority:
+            break
+    return False
+
+async def _api_dispatcher():
+    global API_DISPATCHER
+    try:
+        while _has_api_waiters():
+            now = time.monotonic()
+            served = False
+            
+            # Старші класи завжди обслуговуються першими, всередині класу — FIFO
+            for cls in API_PRIORITIES:
+                queue = API_WAITERS[cls]
+                while queue and queue[0][0].done():
+                    # Запит скасували, поки він стояв у черзі — токен йому не потрібен
+                    queue.popleft()
+                if not queue:
+                    continue
+                    
+                key = _take_api_token(now, cls)
+                if key is not None:
+                    waiter, enqueued = queue.popleft()
+                    _record_api_wait(cls, now - enqueued)
+                    waiter.set_result(key)
+                    served = True
+                    break
+                    
+            if served:
+                continue
+                
+            # Спимо рівно до найближчого вільного місця у вікні, яке хтось із черги зможе забрати (без жодних замків)
+            wait_time = min(
+                api_key_ready_in(k, now, cls)
+                for cls in API_PRIORITIES if API_WAITERS[cls]
+                for k in NEWSKY_API_KEYS
+            )
+            await asyncio.sleep(wait_time + 0.001)
+    finally:
+        API_DISPATCHER = None
+
+async def acquire_api_key(path="", priority="interactive"):
+    global API_DISPATCHER
+    if priority not in API_WAITERS:
+        priority = "interactive"
     
-    if API_LOCK is None:
-        API_LOCK = asyncio.Lock()
+    # Швидкий шлях: ні в нашому, ні в старших класах ніхто не чекає, і є вільне місце у вікні
+    if not _has_api_waiters(priority):
+        key = _take_api_token(time.monotonic(), priority)
+        if key is not None:
+            _record_api_wait(priority, 0.0)
+            return key
+            
+    wait_time = min(api_key_ready_in(k, priority=priority) for k in NEWSKY_API_KEYS)
+    print(f"🚦 API Limit: Ключі зайняті! Запит [{priority}] у черзі (позиція {len(API_WAITERS[priority]) + 1}, найближче вільне місце через {wait_time:.2f} сек). (Запит: {path})")
     
-    # 1. ШУКАЄМО ВІЛЬНИЙ КЛЮЧ
-    async with API_LOCK:
-        now = time.time()
-        
-        # Очищаємо історію від старих запитів для ВСІХ ключів (> 10 сек)
-        for key in NEWSKY_API_KEYS:
-            KEY_USAGE_HISTORY[key] = [t for t in KEY_USAGE_HISTORY[key] if now - t < 10.0]
-        
-        selected_key = None
-        
-        # Проходимося по ключах ПО ЧЕРЗІ (спочатку головний, потім резервний)
-        for key in NEWSKY_API_KEYS:
-            if len(KEY_USAGE_HISTORY[key]) < 5:
-                selected_key = key
-                break # Знайшли ключ, у якого менше 5 запитів! Зупиняємо пошук.
-                
-        # Якщо ВСІ ключі зайняті (у всіх по 5 запитів)
-        if selected_key is None:
-            # Знаходимо ключ, який звільниться найшвидше (у кого найстаріший запит)
-            best_key_to_wait = min(NEWSKY_API_KEYS, key=lambda k: KEY_USAGE_HISTORY[k][0])
-            oldest_request = KEY_USAGE_HISTORY[best_key_to_wait][0]
-            wait_time = 10.0 - (now - oldest_request)
-            
-            if wait_time > 0:
-                print(f"🚦 API Limit: Обидва ключі зайняті! Чекаємо {wait_time:.2f} сек... (Запит: {path})")
-                await asyncio.sleep(wait_time)
-                now = time.time()
-                
-            selected_key = best_key_to_wait
+    API_STATS[priority]["queued"] += 1
+    waiter = asyncio.get_running_loop().create_future()
+    API_WAITERS[priority].append((waiter, time.monotonic()))
+    if API_DISPATCHER is None:
+        API_DISPATCHER = asyncio.create_task(_api_dispatcher())
+    return await waiter
+
+def api_scheduler_report():
+    # Глибина черг та час очікування по класах (для !status)
+    lines = []
+    for cls in API_PRIORITIES:
+        st = API_STATS[cls]
+        avg_wait = st["wait_total"] / st["served"] if st["served"] else 0.0
+        lines.append(
+            f"`{cls}`: черга **{len(API_WAITERS[cls])}** | виконано {st['served']} "
+            f"(в черзі побували {st['queued']}) | очікування avg {avg_wait:.2f}s / max {st['wait_max']:.2f}s"
+        )
+    now = time.monotonic()
+    tokens = " | ".join(f"🔑{i + 1}: {API_RATE_LIMIT - len(_api_window_recent(k, now))}/{API_RATE_LIMIT}" for i, k in enumerate(NEWSKY_API_KEYS))
+    lines.append(f"Вільно у вікні: {tokens}")
+    return "\n".join(lines)
+
+DETAIL_FETCH_CONCURRENCY = int(os.getenv("DETAIL_FETCH_CONCURRENCY", 4))
+
+async def fetch_flight_details(session, fids, priority="live"):
+    # Паралельно тягнемо /flight/{id} для кількох рейсів (не більше DETAIL_FETCH_CONCURRENCY одночасно).
+    # Темп все одно задає ковзне вікно ключів, а результати повертаються в ТОМУ Ж порядку, що й fids
+    semaphore = asyncio.Semaphore(max(1, DETAIL_FETCH_CONCURRENCY))
+    
+    async def fetch_one(fid):
+        async with semaphore:
+            return await fetch_flight(session, fid, priority=priority)
             
-        # Записуємо використання вибраного ключа
-        KEY_USAGE_HISTORY[selected_key].append(now)
+    return await asyncio.gather(*(fetch_one(fid) for fid in fids))
+
+async def newsky_request(session, path, method="GET", body=None, priority="interactive", extra_headers=None):
+    # Низькорівневий запит: повертає (статус, JSON або None, заголовки відповіді)
+    # 1. БЕРЕМО ТОКЕН У ВІЛЬНОГО КЛЮЧА (або чесно чекаємо своєї черги у своєму класі)
+    selected_key = await acquire_api_key(path, priority)
 
     # 2. РОБИМО ЗАПИТ З ВИБРАНИМ КЛЮЧЕМ
     headers = {"Authorization": f"Bearer {selected_key}"}
+    if extra_headers:
+        headers.update(extra_headers)
     
     try:
         async with session.request(method, f"{BASE_URL}{path}", headers=headers, json=body, timeout=10) as r:
             if r.status == 200:
-                return await r.json()
+                return r.status, await r.json(), r.headers
             elif r.status == 429:
                 print(f"⚠️ Зловили 429 Too Many Requests на {path}! Сервер просить пригальмувати.")
-                return None
-            else:
-                return None
+            return r.status, None, r.headers
     except Exception as e:
         print(f"⚠️ API Error ({path}): {e}")
+        return None, None, {}
+
+async def fetch_api(session, path, method="GET", body=None, priority="interactive"):
+    status, data, _ = await newsky_request(session, path, method=method, body=body, priority=priority)
+    return data if status == 200 else None
+
+# --- 🗃️ КЕШ ДЕТАЛЕЙ РЕЙСІВ (/flight/{id}) ---
+# Закритий рейс з результатами більше ніколи не змінюється — такий запис вічний (до витіснення LRU).
+# Живі рейси кешуються на FLIGHT_CACHE_TTL секунд, а після цього перевіряються умовним
+# запитом (If-None-Match / If-Modified-Since), якщо Newsky віддав ETag або Last-Modified.
+FLIGHT_CACHE_MAX = int(os.getenv("FLIGHT_CACHE_MAX", 500))
+FLIGHT_CACHE_TTL = float(os.getenv("FLIGHT_CACHE_TTL", 5))
+FLIGHT_CACHE = OrderedDict()
+FLIGHT_CACHE_STATS = {"hits": 0, "disk_hits": 0, "misses": 0, "revalidated": 0, "stale": 0}
+
+def is_flight_final(f):
+    # Рейс "остаточний", якщо закритий і вже має підсумки (інакше запобіжники main_loop ще чекають оновлення)
+    if not f or not f.get("close"): return False
+    totals = f.get("result", {}).get("totals", {})
+    return bool(totals.get("distance", 0) or totals.get("time", 0))
+
+def cache_flight_details(fid, data, resp_headers=None):
+    resp_headers = resp_headers or {}
+    FLIGHT_CACHE[fid] = {
+        "data": data,
+        "final": is_flight_final(data.get("flight")),
+        "stamp": time.monotonic(),
+        "etag": resp_headers.get("ETag"),
+        "last_modified": resp_headers.get("Last-Modified")
+    }
+    FLIGHT_CACHE.move_to_end(fid)
+    while len(FLIGHT_CACHE) > FLIGHT_CACHE_MAX:
+        FLIGHT_CACHE.popitem(last=False)
+
+async def fetch_flight(session, fid, priority="interactive", force=False):
+    # Те саме, що fetch_api(session, f"/flight/{fid}"), але через кеш. force=True — завжди йти в API
+    fid = str(fid)
+    entry = FLIGHT_CACHE.get(fid)
+    
+    if entry and not force and (entry["final"] or time.monotonic() - entry["stamp"] < FLIGHT_CACHE_TTL):
+        FLIGHT_CACHE_STATS["hits"] += 1
+        FLIGHT_CACHE.move_to_end(fid)
+        return entry["data"]
+        
+    if not entry and not force:
+        # Закритий рейс, який ми вже колись бачили, лежить на диску — в API не йдемо
+        stored = await flight_store_get(fid)
+        if stored:
+            FLIGHT_CACHE_STATS["disk_hits"] += 1
+            cache_flight_details(fid, stored)
+            return stored
+            
+    FLIGHT_CACHE_STATS["misses"] += 1
+    cond_headers = {}
+    if entry and not force:
+        if entry.get("etag"): cond_headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"): cond_headers["If-Modified-Since"] = entry["last_modified"]
+        
+    status, data, resp_headers = await newsky_request(session, f"/flight/{fid}", priority=priority, extra_headers=cond_headers)
+    
+    if status == 304 and entry:
+        FLIGHT_CACHE_STATS["revalidated"] += 1
+        entry["stamp"] = time.monotonic()
+        FLIGHT_CACHE.move_to_end(fid)
+        return entry["data"]
+        
+    if status == 200 and data and "flight" in data:
+        cache_flight_details(fid, data, resp_headers)
+        if FLIGHT_CACHE[fid]["final"]:
+            await flight_store_put(fid, data)
+        return data
+        
+    if entry and not force:
+        # API не відповіло — краще трохи застарілі дані, ніж нічого (але не для force: там потрібні свіжі)
+        FLIGHT_CACHE_STATS["stale"] += 1
+        return entry["data"]
+    return None
+
+def flight_cache_report():
+    st = FLIGHT_CACHE_STATS
+    total = st["hits"] + st["disk_hits"] + st["misses"]
+    hit_rate = ((st["hits"] + st["disk_hits"]) / total * 100) if total else 0.0
+    final_count = sum(1 for e in FLIGHT_CACHE.values() if e["final"])
+    load_flight_store_index()
+    store_mb = FLIGHT_STORE_BYTES / (1024 * 1024)
+    return (
+        f"Записів: **{len(FLIGHT_CACHE)}** / {FLIGHT_CACHE_MAX} (закритих: {final_count})\n"
+        f"Hits: {st['hits']} | Disk hits: {st['disk_hits']} | Misses: {st['misses']} ({hit_rate:.1f}% hit rate)\n"
+        f"304 revalidated: {st['revalidated']} | Stale fallback: {st['stale']}\n"
+        f"💾 Диск: {len(FLIGHT_STORE_INDEX)} рейсів, {store_mb:.2f} / {FLIGHT_STORE_MAX_MB:.0f} MB"
+    )
+
+# --- 💾 ДИСКОВЕ СХОВИЩЕ ЗАКРИТИХ РЕЙСІВ (/app/data/flights_cache) ---
+# Кожен закритий рейс — окремий стиснутий gzip-файл, а index.json тримає
+# flight_id -> {тиждень, розмір, останнє використання}. Переживає рестарти, тож
+# повторні !syncall / !syncghweek / !patchnames качають з Newsky тільки нові рейси.
+# Коли сховище перевищує FLIGHT_STORE_MAX_MB — викидаємо найдавніше використані (LRU).
+FLIGHT_STORE_DIR = Path("/app/data/flights_cache")
+FLIGHT_STORE_INDEX_FILE = FLIGHT_STORE_DIR / "index.json"
+FLIGHT_STORE_MAX_MB = float(os.getenv("FLIGHT_STORE_MAX_MB", 50))
+FLIGHT_STORE_INDEX_SAVE_DELAY = 5
+FLIGHT_STORE_INDEX = {}
+FLIGHT_STORE_BYTES = 0  # поточний сумарний розмір, щоб не рахувати його заново на кожен запис
+FLIGHT_STORE_LOADED = False
+FLIGHT_STORE_SAVE_TASK = None
+
+def _flight_store_path(fid):
+    return FLIGHT_STORE_DIR / f"{fid}.json.gz"
+
+def load_flight_store_index():
+    global FLIGHT_STORE_LOADED, FLIGHT_STORE_BYTES
+    if FLIGHT_STORE_LOADED: return FLIGHT_STORE_INDEX
+    FLIGHT_STORE_LOADED = True
+    try:
+        if FLIGHT_STORE_INDEX_FILE.exists():
+            FLIGHT_STORE_INDEX.update(json.loads(FLIGHT_STORE_INDEX_FILE.read_text(encoding="utf-8")))
+    except Exception as e:
+        print(f"⚠️ Flight store index is corrupted, starting empty: {e}")
+        FLIGHT_STORE_INDEX.clear()
+    _reconcile_flight_store()
+    FLIGHT_STORE_BYTES = sum(meta.get("size", 0) for meta in FLIGHT_STORE_INDEX.values())
+    return FLIGHT_STORE_INDEX
+
+def _reconcile_flight_store():
+    # Індекс пишеться із затримкою, тож після падіння на диску можуть лишитись файли без запису в індексі.
+    # Підхоплюємо їх з реальним розміром (інакше вони ніколи не витісняться), а записи без файлів — прибираємо.
+    if not FLIGHT_STORE_DIR.exists(): return
+    on_disk = set()
+    adopted = 0
+    for path in FLIGHT_STORE_DIR.iterdir():
+        try:
+            if path.name.endswith(".json.gz.tmp"):
+                path.unlink() # Недописаний файл з обірваного atomic_write_bytes
+                continue
+            if not path.name.endswith(".json.gz"): continue
+            fid = path.name[:-len(".json.gz")]
+            on_disk.add(fid)
+            if fid not in FLIGHT_STORE_INDEX:
+                st = path.stat()
+                FLIGHT_STORE_INDEX[fid] = {"week": None, "size": st.st_size, "used": st.st_mtime}
+                adopted += 1
+        except Exception as e:
+            print(f"⚠️ Failed to check cached flight file {path.name}: {e}")
+    missing = [fid for fid in FLIGHT_STORE_INDEX if fid not in on_disk]
+    for fid in missing:
+        del FLIGHT_STORE_INDEX[fid]
+    if adopted or missing:
+        print(f"💾 Flight store reconciled: +{adopted} files without index, -{len(missing)} entries without files")
+
+def _write_flight_store_index(payload):
+    try:
+        FLIGHT_STORE_DIR.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(FLIGHT_STORE_INDEX_FILE, payload)
+    except Exception as e:
+        print(f"⚠️ Failed to save flight store index: {e}")
+
+async def _flight_store_save_later():
+    global FLIGHT_STORE_SAVE_TASK
+    try:
+        # Під час !syncall сюди прилітають тисячі записів — index.json пишемо не частіше ніж раз на кілька секунд
+        await asyncio.sleep(FLIGHT_STORE_INDEX_SAVE_DELAY)
+    finally:
+        FLIGHT_STORE_SAVE_TASK = None
+    payload = json.dumps(FLIGHT_STORE_INDEX, separators=(",", ":")).encode("utf-8")
+    await asyncio.to_thread(_write_flight_store_index, payload)
+
+def mark_flight_store_dirty():
+    global FLIGHT_STORE_SAVE_TASK
+    if FLIGHT_STORE_SAVE_TASK is None:
+        FLIGHT_STORE_SAVE_TASK = asyncio.get_running_loop().create_task(_flight_store_save_later())
+
+def _unlink_flight_files(fids):
+    for fid in fids:
+        try: _flight_store_path(fid).unlink()
+        except FileNotFoundError: pass
+        except Exception as e: print(f"⚠️ Failed to delete cached flight {fid}: {e}")
+
+def _flight_store_forget(fid):
+    global FLIGHT_STORE_BYTES
+    meta = FLIGHT_STORE_INDEX.pop(fid, None)
+    if meta:
+        FLIGHT_STORE_BYTES -= meta.get("size", 0)
+    return meta is not None
+
+def _read_flight_file(fid):
+    return json.loads(gzip.decompress(_flight_store_path(fid).read_bytes()).decode("utf-8"))
+
+def _write_flight_file(fid, data):
+    FLIGHT_STORE_DIR.mkdir(parents=True, exist_ok=True)
+    blob = gzip.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    atomic_write_bytes(_flight_store_path(fid), blob)
+    return len(blob)
+
+async def flight_store_get(fid):
+    index = load_flight_store_index()
+    meta = index.get(fid)
+    if not meta: return None
+    try:
+        data = await asyncio.to_thread(_read_flight_file, fid)
+    except Exception as e:
+        print(f"⚠️ Cached flight {fid} is unreadable, dropping it: {e}")
+        _flight_store_forget(fid)
+        await asyncio.to_thread(_unlink_flight_files, [fid])
+        mark_flight_store_dirty()
         return None
+    # Час використання оновлюємо лише в пам'яті — на диск він потрапить з наступним записом індексу
+    meta["used"] = time.time()
+    return data
+
+async def flight_store_put(fid, data):
+    global FLIGHT_STORE_BYTES
+    index = load_flight_store_index()
+    if fid in index: return
+    f = data.get("flight", {})
+    week_tag = get_iso_week(f.get("arrTimeAct") or f.get("close"))
+    try:
+        size = await asyncio.to_thread(_write_flight_file, fid, data)
+    except Exception as e:
+        print(f"⚠️ Failed to store flight {fid} on disk: {e}")
+        return
+    if fid in index: return # Поки писали файл, той самий рейс уже зберіг інший запит
+    index[fid] = {"week": week_tag, "size": size, "used": time.time()}
+    FLIGHT_STORE_BYTES += size
+    
+    # Витіснення: найдавніше використані рейси йдуть першими, поки не влізли в ліміт
+    limit = FLIGHT_STORE_MAX_MB * 1024 * 1024
+    if FLIGHT_STORE_BYTES > limit:
+        evicted = []
+        for old_fid, meta in sorted(index.items(), key=lambda item: item[1].get("used", 0)):
+            if FLIGHT_STORE_BYTES <= limit * 0.9: break
+            if old_fid == fid: continue
+            _flight_store_forget(old_fid)
+            evicted.append(old_fid)
+        await asyncio.to_thread(_unlink_flight_files, evicted)
+    mark_flight_store_dirty()
 
 # ---------- MESSAGE GENERATOR ----------
 async def send_flight_message(channel, status, f, details_type="ongoing", reply_to_id=None):
@@ -1118,8 +2218,11 @@ async def send_flight_message(channel, status, f, details_type="ongoing", reply_
         # Якщо фактичний ICAO є, і він відрізняється від запланованого
         if act_arr_icao and act_arr_icao != planned_arr_icao and act_arr_icao != "???":
             act_arr_str = format_airport_string(act_arr_icao, act_arr.get("name", ""))
-            # Закреслюємо старий аеропорт і додаємо фактичний
+            # Закреслюємо старий аеропорт і додаємо фактичний (з відстанню від запланованого)
             arr_str = f"~~{arr_str}~~ \u2003🔀\u2003 {act_arr_str}"
+            divert_nm = AIRPORTS_DB.distance_nm(planned_arr_icao, act_arr_icao)
+            if divert_nm is not None:
+                arr_str += f" · {divert_nm:.0f} nm"
     # ---------------------------------------------
     
     ac = f.get("aircraft", {}).get("airframe", {}).get("name", "A/C")
@@ -1366,31 +2469,529 @@ async def status_loop():
         await asyncio.sleep(sleep_seconds)
 
 # --- 🔍 ФУНКЦІЯ: Універсальний пошук повідомлень (DRY принцип) ---
-async def find_discord_message(target_id, command_message):
-    found_message = None
-    main_channel = client.get_channel(CHANNEL_ID)
-    
-    if main_channel:
-        try:
-            found_message = await main_channel.fetch_message(target_id)
+# Спершу індекс message_index, потім головний канал, і лише тоді — паралельний
+# перебір інших каналів (не більше MESSAGE_SEARCH_CONCURRENCY запитів одночасно) до першого збігу.
+MESSAGE_SEARCH_CONCURRENCY = 8
+
+async def fetch_message_in(channel_id, target_id):
+    channel = client.get_channel(channel_id)
+    if not channel:
+        try:
+            channel = await client.fetch_channel(channel_id)
         except:
-            pass
-    
+            return None
+    try:
+        return await channel.fetch_message(target_id)
+    except:
+        return None
+
+async def search_channels_for_message(target_id, channels):
+    sem = asyncio.Semaphore(MESSAGE_SEARCH_CONCURRENCY)
+
+    async def probe(channel):
+        async with sem:
+            try:
+                return await channel.fetch_message(target_id)
+            except:
+                return None
+
+    tasks = [asyncio.create_task(probe(channel)) for channel in channels]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            found = await next_done
+            if found:
+                return found
+    finally:
+        for task in tasks:
+            task.cancel()
+    return None
+
+async def find_discord_message(target_id, command_message=None):
+    channel_id = lookup_message_channel(target_id)
+    if channel_id:
+        found_message = await fetch_message_in(channel_id, target_id)
+        if found_message:
+            return found_message
+        forget_message(target_id) # Повідомлення видалене або канал недоступний
+
+    found_message = await fetch_message_in(CHANNEL_ID, target_id) if CHANNEL_ID else None
+
     if not found_message:
-        await command_message.channel.send("🔍 **Searching for message...**")
-        for guild in client.guilds:
-            for channel in guild.text_channels:
-                if channel.id == CHANNEL_ID: continue
-                try:
-                    found_message = await channel.fetch_message(target_id)
-                    if found_message: break
-                except:
-                    continue
-            if found_message: break
-            
+        if command_message:
+            await command_message.channel.send("🔍 **Searching for message...**")
+        channels = [
+            channel for guild in client.guilds for channel in guild.text_channels
+            if channel.id != CHANNEL_ID and channel.permissions_for(guild.me).read_message_history
+        ]
+        found_message = await search_channels_for_message(target_id, channels)
+
+    if found_message:
+        index_message(found_message.id, found_message.channel.id)
     return found_message
+
+@client.event
+async def on_raw_message_delete(payload):
+    forget_message(payload.message_id)
 # -----------------------------------------------------------------
 
+# --- 🌍 КАРТКИ GLOBAL STATS (ПАЛИВО / ПАСАЖИРИ-КАРГО / АДВАНСЕД) ---
+def build_gstats_embeds(f, is_uk):
+    t = f.get("result", {}).get("totals", {})
+    exp = f.get("result", {}).get("expenses", {})
+
+    # ==========================================
+    # --- 1. КАРТКА ПАЛИВА ---
+    # ==========================================
+    fuel_kg = int(t.get("fuel", 0))
+    fuel_price = int(exp.get("fuel", 0) or t.get("fuelPrice", 0))
+    dist = float(t.get("distance", 0))
+
+    cost_per_ton = round((fuel_price / fuel_kg) * 1000) if fuel_kg > 0 else 0
+    burn_per_nm = round(fuel_kg / dist, 1) if dist > 0 else 0
+
+    if is_uk:
+        fuel_desc = (
+            f"🛢️ **Спалено палива:** {fuel_kg:,} кг\n".replace(",", " ") +
+            f"💵 **Вартість палива:** {fuel_price:,} $\n".replace(",", " ") +
+            f"📊 **Ціна за 1 тонну:** {cost_per_ton:,} $\n".replace(",", " ") +
+            f"📏 **Витрата на милю:** {burn_per_nm} кг/nm"
+        )
+        embed_fuel = discord.Embed(title="⛽ Детальна статистика палива", description=fuel_desc, color=0xf1c40f)
+    else:
+        fuel_desc = (
+            f"🛢️ **Fuel Burned:** {fuel_kg:,} kg\n".replace(",", " ") +
+            f"💵 **Fuel Cost:** {fuel_price:,} $\n".replace(",", " ") +
+            f"📊 **Price per Tonne:** {cost_per_ton:,} $\n".replace(",", " ") +
+            f"📏 **Burn per NM:** {burn_per_nm} kg/nm"
+        )
+        embed_fuel = discord.Embed(title="⛽ Detailed Fuel Stats", description=fuel_desc, color=0xf1c40f)
+
+    # ==========================================
+    # --- 2. КАРТКА ПАСАЖИРІВ / КАРГО ---
+    # ==========================================
+    flight_type = f.get("type", "pax")
+
+    if flight_type == "cargo":
+        cargo_cap = int(f.get("payload", {}).get("cargoCapacity", 1))
+        cargo_actual = int(t.get("payload", {}).get("cargo", 0))
+        if cargo_actual == 0: cargo_actual = int(f.get("payload", {}).get("cargo", 0))
+
+        load_factor = round((cargo_actual / cargo_cap) * 100, 1) if cargo_cap > 0 else 0.0
+        cargo_kg = int(f.get("payload", {}).get("weights", {}).get("cargo", 0))
+
+        cargo_rev = int(f.get("result", {}).get("revenue", {}).get("cargo", 0))
+        unit_price = int(t.get("prices", {}).get("cargoUnitPrice", 0))
+        total_expenses = int(f.get("result", {}).get("totals", {}).get("expenses", 0))
+        balance = int(t.get("balance", 0))
+
+        if is_uk:
+            payload_desc = (
+                f"⚖️ **Завантаженість об'єму:** {cargo_actual} / {cargo_cap} одиниць ({load_factor}%)\n"
+                f"📦 **Загальна маса вантажу:** {cargo_kg:,} кг\n\n".replace(",", " ") +
+                f"📉 **Економіка рейсу:**\n"
+                f"├ 💵 Дохід з вантажу: {cargo_rev:,} $ *(Тариф: {unit_price} $ / од.)*\n".replace(",", " ") +
+                f"├ 🧾 Витрати: {total_expenses:,} $\n".replace(",", " ") +
+                f"└ 💰 Чистий прибуток: {balance:,} $".replace(",", " ")
+            )
+            embed_payload = discord.Embed(title="📦 СТАТИСТИКА КОМЕРЦІЙНОГО ВАНТАЖУ", description=payload_desc, color=0xe67e22)
+        else:
+            payload_desc = (
+                f"⚖️ **Volume Load:** {cargo_actual} / {cargo_cap} units ({load_factor}%)\n"
+                f"📦 **Total Cargo Weight:** {cargo_kg:,} kg\n\n".replace(",", " ") +
+                f"📉 **Flight Economics:**\n"
+                f"├ 💵 Cargo Revenue: {cargo_rev:,} $ *(Rate: {unit_price} $ / unit)*\n".replace(",", " ") +
+                f"├ 🧾 Expenses: {total_expenses:,} $\n".replace(",", " ") +
+                f"└ 💰 Net Profit: {balance:,} $".replace(",", " ")
+            )
+            embed_payload = discord.Embed(title="📦 COMMERCIAL CARGO STATS", description=payload_desc, color=0xe67e22)
+    else:
+        pax_cap = int(f.get("payload", {}).get("paxCapacity", 1))
+        pax_actual = int(t.get("payload", {}).get("pax", 0))
+        if pax_actual == 0: pax_actual = int(f.get("payload", {}).get("pax", 0))
+
+        load_factor = round((pax_actual / pax_cap) * 100, 1) if pax_cap > 0 else 0.0
+
+        classes_data = t.get("payload", {}).get("paxByClass", {})
+        base_price = int(t.get("prices", {}).get("ticketPrice", 0))
+
+        str_fare = "Тариф" if is_uk else "Fare"
+        str_first = "Перший" if is_uk else "First"
+        str_bus = "Бізнес" if is_uk else "Business"
+        str_eco = "Економ" if is_uk else "Economy"
+        str_pax = "пас." if is_uk else "pax"
+
+        # Збираємо всі наявні класи в окремий список
+        available_classes = []
+        if classes_data.get("F", 0) > 0:
+            available_classes.append(f"🥂**{str_first}:** {classes_data['F']} {str_pax} ({str_fare}: {base_price * 4} $)")
+        if classes_data.get("C", 0) > 0:
+            available_classes.append(f"💼**{str_bus}:** {classes_data['C']} {str_pax} ({str_fare}: {base_price * 2} $)")
+        if classes_data.get("Y", 0) > 0:
+            available_classes.append(f"🎟️**{str_eco}:** {classes_data['Y']} {str_pax} ({str_fare}: {base_price} $)")
+
+        # Формуємо красивий текст із правильними лініями
+        classes_str = ""
+        if not available_classes:
+            classes_str = "└ 🎟️ Немає даних про класи\n" if is_uk else "└ 🎟️ No class data available\n"
+        else:
+            for i, cls_text in enumerate(available_classes):
+                # Якщо це останній елемент у списку — закриваємо гілку
+                if i == len(available_classes) - 1:
+                    classes_str += f"└ {cls_text}\n"
+                # Усім іншим ставимо проміжну гілку
+                else:
+                    classes_str += f"├ {cls_text}\n"
+
+        revenue_tickets = int(f.get("result", {}).get("revenue", {}).get("tickets", 0))
+        total_expenses = int(f.get("result", {}).get("totals", {}).get("expenses", 0))
+        balance = int(t.get("balance", 0))
+
+        rev_per_pax = round(revenue_tickets / pax_actual) if pax_actual > 0 else 0
+        exp_per_pax = round(total_expenses / pax_actual) if pax_actual > 0 else 0
+        prof_per_pax = round(balance / pax_actual) if pax_actual > 0 else 0
+
+        cargo_rev = int(f.get("result", {}).get("revenue", {}).get("cargo", 0))
+
+        cargo_cap = int(f.get("payload", {}).get("cargoCapacity", 0))
+        cargo_actual_pax_flight = int(t.get("payload", {}).get("cargo", 0))
+        if cargo_actual_pax_flight == 0: cargo_actual_pax_flight = int(f.get("payload", {}).get("cargo", 0))
+        cargo_load_factor = round((cargo_actual_pax_flight / cargo_cap) * 100, 1) if cargo_cap > 0 else 0.0
+        cargo_unit_price = int(t.get("prices", {}).get("cargoUnitPrice", 0))
+
+        if is_uk:
+            cargo_ext_str = f"╰ Завантаженість об'єму: {cargo_actual_pax_flight} / {cargo_cap} одиниць ({cargo_load_factor}%), (Тариф: {cargo_unit_price} $ / од.)" if cargo_cap > 0 and cargo_actual_pax_flight > 0 else ""
+        else:
+            cargo_ext_str = f"╰ Volume Load: {cargo_actual_pax_flight} / {cargo_cap} units ({cargo_load_factor}%), (Rate: {cargo_unit_price} $ / unit)" if cargo_cap > 0 and cargo_actual_pax_flight > 0 else ""
+
+        if is_uk:
+            payload_desc = (
+                f"👥 **Завантаженість:** {pax_actual} / {pax_cap} ({load_factor}%)\n\n"
+                f"💺 **Пасажири по класах:**\n{classes_str}\n"
+                f"📉 **Економіка на 1 пасажира:**\n"
+                f"├ 💵 Дохід: {rev_per_pax} $ | 🧾 Витрати: {exp_per_pax} $\n"
+                f"└ 💰 Чистий прибуток: {prof_per_pax} $\n\n"
+                f"📦 **Комерційний вантаж:** {cargo_rev:,} $\n".replace(",", " ") +
+                cargo_ext_str
+            )
+            embed_payload = discord.Embed(title="🎫 СТАТИСТИКА ПАСАЖИРІВ ТА КОМЕРЦІЇ", description=payload_desc, color=0x3498db)
+        else:
+            payload_desc = (
+                f"👥 **Load Factor:** {pax_actual} / {pax_cap} ({load_factor}%)\n\n"
+                f"💺 **Passengers by Class:**\n{classes_str}\n"
+                f"📉 **Economics per Passenger:**\n"
+                f"├ 💵 Revenue: {rev_per_pax} $ | 🧾 Expenses: {exp_per_pax} $\n"
+                f"└ 💰 Net Profit: {prof_per_pax} $\n\n"
+                f"📦 **Commercial Cargo:** {cargo_rev:,} $\n".replace(",", " ") +
+                cargo_ext_str
+            )
+            embed_payload = discord.Embed(title="🎫 PASSENGER & COMMERCIAL STATS", description=payload_desc, color=0x3498db)
+
+    # ==========================================
+    # --- 3. КАРТКА АДВАНСЕД СТАТИСТИКИ ---
+    # ==========================================
+    sim = str(f.get("simulator", "Unknown")).lower()
+    fps = "Невідомо" if is_uk else "Unknown"
+
+    violations = f.get("result", {}).get("violations", [])
+    for v in violations:
+        entry = v.get("entry", {})
+        payload = entry.get("payload", {})
+        # Шукаємо FPS строго у події типу "landing"
+        if entry.get("type") == "landing" and "system" in payload and "fps" in payload["system"]:
+            fps = payload["system"]["fps"]
+            break
+
+    # Резервний пошук (якщо раптом немає у violations, але є в прямому об'єкті landing)
+    if fps in ["Невідомо", "Unknown"] and "landing" in f:
+        if "system" in f["landing"] and "fps" in f["landing"]["system"]:
+            fps = f["landing"]["system"]["fps"]
+
+    ac_cost = int(exp.get("aircraft", 0))
+    fuel_cost = int(exp.get("fuel", 0))
+    hand_cost = int(exp.get("handling", 0))
+    land_cost = int(exp.get("landing", 0))
+    total_exp = int(t.get("expenses", 0))
+
+    scalars = t.get("prices", {}).get("costScalars", {})
+    dep_sc = float(scalars.get("dep", 1.0))
+    arr_sc = float(scalars.get("arr", 1.0))
+    gnd_sc = float(scalars.get("ground", 1.0))
+    fuel_sc = float(scalars.get("fuel", 1.0))
+    time_accel = float(scalars.get("timeAcceleration", 1.0))
+
+    def fmt_sc(val, uk):
+        if val >= 1.0: return "Без знижки" if uk else "No discount"
+        diff = int(round((1.0 - val) * 100))
+        return f"-{diff}% до зборів" if uk else f"-{diff}% to fees"
+    def fmt_sc_g(val, uk):
+        if val >= 1.0: return "Без знижки" if uk else "No discount"
+        diff = int(round((1.0 - val) * 100))
+        return f"-{diff}%"
+
+    penalties_str = ""
+    for v in violations:
+        points = float(v.get("penalty", {}).get("points", 0))
+        cash = int(v.get("penalty", {}).get("cash", 0))
+        if points < 0 or cash < 0:
+            title = v.get("title", "Unknown violation").replace("<br/>", " ")
+            rating_penalty = points / 100.0
+            if is_uk:
+                penalties_str += f"├ **{title}**\n└ ➖ Штраф: `{rating_penalty:.2f} рейтингу` | `-${abs(cash)}`\n"
+            else:
+                penalties_str += f"├ **{title}**\n└ ➖ Penalty: `{rating_penalty:.2f} rating` | `-${abs(cash)}`\n"
+
+    if not penalties_str:
+        penalties_str = "└ ✅ Штрафів немає! Ідеальний політ." if is_uk else "└ ✅ No penalties! Perfect flight."
+
+    if is_uk:
+        adv_desc = (
+            f"🖥️ **Технічна інформація:**\n"
+            f"├ 🕹️ Симулятор: {sim}\n"
+            f"└ 📈 FPS на посадці: {fps}\n\n"
+            f"💸 **Деталізація витрат:**\n"
+            f"├ ✈️ Літак: {ac_cost:,} $\n".replace(",", " ") +
+            f"├ 🛢️ Паливо: {fuel_cost:,} $\n".replace(",", " ") +
+            f"├ 🧳 Хендлінг: {hand_cost:,} $\n".replace(",", " ") +
+            f"├ 🛬 Посадковий збір: {land_cost:,} $\n".replace(",", " ") +
+            f"└ 🧾 Всього витрат: {total_exp:,} $\n\n".replace(",", " ") +
+            f"🏷️ **Економічні коефіцієнти:**\n"
+            f"├ 🛫 Виліт: {dep_sc} ({fmt_sc(dep_sc, True)})\n"
+            f"├ 🛬 Приліт: {arr_sc} ({fmt_sc(arr_sc, True)})\n"
+            f"├ 🚜 Наземне обслуговування: {gnd_sc} ({fmt_sc_g(gnd_sc, True)})\n"
+            f"├ ⛽ Паливо: {fuel_sc} ({fmt_sc_g(fuel_sc, True)})\n"
+            f"└ ⏱️ Прискорення часу (timeAcceleration): {time_accel}\n\n"
+            f"🚨 **Штрафи та Порушення:**\n"
+            f"{penalties_str}"
+        )
+        embed_adv = discord.Embed(title="📊 Розширена Статистика Рейсу", description=adv_desc, color=0x95a5a6)
+    else:
+        adv_desc = (
+            f"🖥️ **Technical Info:**\n"
+            f"├ 🕹️ Simulator: {sim}\n"
+            f"└ 📈 Landing FPS: {fps}\n\n"
+            f"💸 **Detailed Expenses:**\n"
+            f"├ ✈️ Aircraft: {ac_cost:,} $\n".replace(",", " ") +
+            f"├ 🛢️ Fuel: {fuel_cost:,} $\n".replace(",", " ") +
+            f"├ 🧳 Handling: {hand_cost:,} $\n".replace(",", " ") +
+            f"├ 🛬 Landing: {land_cost:,} $\n".replace(",", " ") +
+            f"└ 🧾 Total Expenses: {total_exp:,} $\n\n".replace(",", " ") +
+            f"🏷️ **Economic Multipliers:**\n"
+            f"├ 🛫 Departure: {dep_sc} ({fmt_sc(dep_sc, False)})\n"
+            f"├ 🛬 Arrival: {arr_sc} ({fmt_sc(arr_sc, False)})\n"
+            f"├ 🚜 Ground Handling: {gnd_sc} ({fmt_sc_g(gnd_sc, False)})\n"
+            f"├ ⛽ Fuel: {fuel_sc} ({fmt_sc_g(fuel_sc, False)})\n"
+            f"└ ⏱️ timeAcceleration: {time_accel}\n\n"
+            f"🚨 **Penalties & Violations:**\n"
+            f"{penalties_str}"
+        )
+        embed_adv = discord.Embed(title="📊 Advanced Flight Stats", description=adv_desc, color=0x95a5a6)
+
+    return [embed_fuel, embed_payload, embed_adv]
+
+# Картки рахуються один раз — коли main_loop публікує Completed — і лежать у bot.db
+# (zlib-стиснутий JSON на кожну пару рейс + мова). Клік по кнопці — локальне читання без Newsky API.
+GSTATS_LOCALES = {"uk": True, "en": False}
+
+def store_gstats_cards(fid, f):
+    cs = f.get("flightNumber") or f.get("callsign") or str(fid)
+    now = time.time()
+    rows = []
+    for locale, is_uk in GSTATS_LOCALES.items():
+        card = {"cs": cs, "embeds": [e.to_dict() for e in build_gstats_embeds(f, is_uk)]}
+        rows.append((str(fid), locale, zlib.compress(json.dumps(card, separators=(",", ":")).encode("utf-8")), now))
+    db = get_db()
+    with db:
+        db.executemany("INSERT OR REPLACE INTO gstats_cards (fid, locale, data, created) VALUES (?, ?, ?, ?)", rows)
+        db.execute("DELETE FROM gstats_cards WHERE created < ?", (now - GSTATS_CARDS_RETENTION,))
+
+def load_gstats_cards(fid, is_uk):
+    row = get_db().execute("SELECT data FROM gstats_cards WHERE fid = ? AND locale = ?",
+                           (str(fid), "uk" if is_uk else "en")).fetchone()
+    if not row: return None
+    try: return json.loads(zlib.decompress(row[0]))
+    except Exception as e:
+        print(f"⚠️ Corrupted gstats card for {fid}: {e}")
+        return None
+
+# --- ⏲️ ПЛАНУВАЛЬНИК ВІДКЛАДЕНИХ ДІЙ (АВТОВИДАЛЕННЯ ПОВІДОМЛЕНЬ ТОЩО) ---
+# Замість окремої задачі зі sleep(120) на кожне повідомлення — одна купа дедлайнів і один таймер.
+# Кожна дія пишеться в bot.db (scheduled_actions), тож після рестарту заплановане все одно виконається.
+# Обробники реєструються декоратором @scheduled_action("kind") і отримують збережені аргументи.
+SCHEDULE_HEAP = []      # (due, action_id)
+SCHEDULE_ENTRIES = {}   # action_id -> (kind, data); скасовані просто зникають звідси
+SCHEDULE_HANDLERS = {}
+SCHEDULE_WAKEUP = asyncio.Event()
+
+def scheduled_action(kind):
+    def register(func):
+        SCHEDULE_HANDLERS[kind] = func
+        return func
+    return register
+
+def _push_scheduled(action_id, due, kind, data):
+    SCHEDULE_ENTRIES[action_id] = (kind, data)
+    heapq.heappush(SCHEDULE_HEAP, (due, action_id))
+    if SCHEDULE_HEAP[0][1] == action_id:
+        SCHEDULE_WAKEUP.set() # Новий найближчий дедлайн — будимо таймер
+
+def schedule_action(kind, delay, **data):
+    due = time.time() + delay
+    db = get_db()
+    with db:
+        cur = db.execute("INSERT INTO scheduled_actions (due, kind, data) VALUES (?, ?, ?)", (due, kind, json.dumps(data)))
+    _push_scheduled(cur.lastrowid, due, kind, data)
+    return cur.lastrowid
+
+def cancel_action(action_id):
+    if SCHEDULE_ENTRIES.pop(action_id, None) is None: return False
+    db = get_db()
+    with db:
+        db.execute("DELETE FROM scheduled_actions WHERE id = ?", (action_id,))
+    return True
+
+def schedule_message_delete(msg, delay, interaction=None):
+    # Ефемерні followup-и видаляються лише через вебхук взаємодії (токен живе 15 хвилин)
+    if interaction is not None:
+        return schedule_action("delete_followup", delay, application_id=interaction.application_id,
+                               token=interaction.token, message_id=msg.id)
+    return schedule_action("delete_message", delay, channel_id=msg.channel.id, message_id=msg.id)
+
+@scheduled_action("delete_message")
+async def action_delete_message(channel_id, message_id):
+    await client.get_partial_messageable(channel_id).get_partial_message(message_id).delete()
+
+@scheduled_action("delete_followup")
+async def action_delete_followup(application_id, token, message_id):
+    await discord.Webhook.partial(application_id, token, client=client).delete_message(message_id)
+
+async def run_scheduled(action_id, kind, data):
+    handler = SCHEDULE_HANDLERS.get(kind)
+    if not handler:
+        print(f"⚠️ Unknown scheduled action '{kind}' (#{action_id})")
+        return
+    try:
+        await handler(**data)
+    except discord.NotFound:
+        pass # Вже видалено вручну
+    except Exception as e:
+        print(f"⚠️ Scheduled action '{kind}' (#{action_id}) failed: {e}")
+
+async def scheduler_loop():
+    # Піднімаємо незавершене з минулого запуску (прострочене виконається одразу)
+    for action_id, due, kind, data in get_db().execute("SELECT id, due, kind, data FROM scheduled_actions"):
+        if action_id not in SCHEDULE_ENTRIES:
+            _push_scheduled(action_id, due, kind, json.loads(data))
+    if SCHEDULE_ENTRIES:
+        print(f"⏲️ Restored {len(SCHEDULE_ENTRIES)} scheduled action(s)")
+
+    while True:
+        while SCHEDULE_HEAP and SCHEDULE_HEAP[0][1] not in SCHEDULE_ENTRIES:
+            heapq.heappop(SCHEDULE_HEAP) # скасовані
+        wait = SCHEDULE_HEAP[0][0] - time.time() if SCHEDULE_HEAP else None
+        if wait is None or wait > 0:
+            SCHEDULE_WAKEUP.clear()
+            try:
+                await asyncio.wait_for(SCHEDULE_WAKEUP.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        _, action_id = heapq.heappop(SCHEDULE_HEAP)
+        kind, data = SCHEDULE_ENTRIES.pop(action_id)
+        try:
+            db = get_db()
+            with db:
+                db.execute("DELETE FROM scheduled_actions WHERE id = ?", (action_id,))
+        except Exception as e:
+            print(f"⚠️ Failed to remove scheduled action #{action_id}: {e}")
+        client.loop.create_task(run_scheduled(action_id, kind, data))
+
+def scheduler_report():
+    # Для !status: скільки дій чекає і коли найближча
+    if not SCHEDULE_ENTRIES:
+        return "Idle"
+    next_due = min(due for due, action_id in SCHEDULE_HEAP if action_id in SCHEDULE_ENTRIES)
+    return f"**{len(SCHEDULE_ENTRIES)}** pending | next in {max(0, int(next_due - time.time()))}s"
+
+# --- 🔔 ФОНОВИЙ ЛОГ ДІЙ КОРИСТУВАЧІВ У КАНАЛ АУДИТУ ---
+# Обробник кліку лише кладе подію в обмежену чергу і одразу повертається. Раз на AUDIT_FLUSH_INTERVAL
+# секунд audit_log_task збирає накопичене в один embed. Якщо черга переповнена, нові події не губляться
+# безслідно: вони згортаються в лічильники "хто скільки разів" і потрапляють у наступний звіт.
+AUDIT_LOG_CHANNEL_ID = int(os.getenv("AUDIT_LOG_CHANNEL_ID", 1474817440516018186))
+AUDIT_FLUSH_INTERVAL = 15
+AUDIT_QUEUE_MAX = 200
+AUDIT_EMBED_LIMIT = 3800  # з запасом до ліміту опису embed у 4096 символів
+AUDIT_QUEUE = deque()
+AUDIT_OVERFLOW = {}  # "користувач" -> кількість згорнутих подій
+AUDIT_STATS = {"queued": 0, "sent": 0, "aggregated": 0, "batches": 0, "failed": 0}
+
+def audit_log(user, action, flight_cs="", msg_url="", locale=""):
+    # Синхронно і без мережі: безпечно викликати з будь-якого обробника
+    if len(AUDIT_QUEUE) >= AUDIT_QUEUE_MAX:
+        label = f"{user.display_name} (`{user.name}`)"
+        AUDIT_OVERFLOW[label] = AUDIT_OVERFLOW.get(label, 0) + 1
+        AUDIT_STATS["aggregated"] += 1
+        return
+    AUDIT_QUEUE.append({
+        "display": user.display_name, "name": user.name, "id": user.id, "locale": locale,
+        "cs": flight_cs, "url": msg_url, "action": action,
+    })
+    AUDIT_STATS["queued"] += 1
+
+def format_audit_event(ev):
+    line = f"👤 **{ev['display']}** (`{ev['name']}`) *(lang: {ev['locale'].upper()})* · 🆔 `{ev['id']}`\n╰ "
+    if ev["cs"]: line += f"✈️ {ev['cs']} · "
+    if ev["url"]: line += f"[Перейти до звіту]({ev['url']}) · "
+    return line + f"🔍 {ev['action']}"
+
+@tasks.loop(seconds=AUDIT_FLUSH_INTERVAL)
+async def audit_log_task():
+    if not AUDIT_QUEUE and not AUDIT_OVERFLOW: return
+    log_channel = client.get_channel(AUDIT_LOG_CHANNEL_ID)
+    if not log_channel: return
+
+    overflow = dict(AUDIT_OVERFLOW)
+    AUDIT_OVERFLOW.clear()
+    folded_line = ""
+    if overflow:
+        folded = ", ".join(f"{label} ×{count}" for label, count in sorted(overflow.items(), key=lambda kv: -kv[1]))
+        folded_line = f"📉 **Черга переповнена, згорнуто:** {folded}"[:500]
+
+    lines, size, batch = [], len(folded_line), []
+    while AUDIT_QUEUE:
+        text = format_audit_event(AUDIT_QUEUE[0])
+        if lines and size + len(text) > AUDIT_EMBED_LIMIT: break # решта — наступним разом
+        batch.append(AUDIT_QUEUE.popleft())
+        lines.append(text)
+        size += len(text) + 2
+    if folded_line:
+        lines.append(folded_line)
+
+    embed = discord.Embed(title=f"🔔 Лог натискання кнопки ({len(batch) + sum(overflow.values())})", description="\n\n".join(lines), color=0x3498db)
+    try:
+        await log_channel.send(embed=embed)
+        AUDIT_STATS["sent"] += len(batch)
+        AUDIT_STATS["batches"] += 1
+    except Exception as e:
+        AUDIT_STATS["failed"] += 1
+        print(f"Помилка відправки логу в канал: {e}")
+        # Повертаємо події в чергу, поки є місце; ті, що не влізли, згортаємо — наступний тік спробує ще раз
+        room = max(0, AUDIT_QUEUE_MAX - len(AUDIT_QUEUE))
+        for ev in reversed(batch[:room]):
+            AUDIT_QUEUE.appendleft(ev)
+        for ev in batch[room:]:
+            label = f"{ev['display']} (`{ev['name']}`)"
+            overflow[label] = overflow.get(label, 0) + 1
+            AUDIT_STATS["aggregated"] += 1
+        for label, count in overflow.items():
+            AUDIT_OVERFLOW[label] = AUDIT_OVERFLOW.get(label, 0) + count
+
+def audit_log_report():
+    # Для !status
+    st = AUDIT_STATS
+    return (f"черга **{len(AUDIT_QUEUE)}**/{AUDIT_QUEUE_MAX} | надіслано {st['sent']} у {st['batches']} пачках | "
+            f"згорнуто {st['aggregated']} | помилок {st['failed']}")
+
 # --- 🌍 РАДАР КНОПОК СТАТИСТИКИ (GLOBAL STATS) ---
 @client.event
 async def on_interaction(interaction):
@@ -1404,309 +3005,192 @@ async def on_interaction(interaction):
             
             await interaction.response.defer(ephemeral=True)
             
-            async with aiohttp.ClientSession() as session:
-                det = await fetch_api(session, f"/flight/{flight_id}")
+            # Спершу готові картки з bot.db; API — лише для старих звітів, опублікованих до появи кешу
+            card = load_gstats_cards(flight_id, is_uk)
+            if not card:
+                async with shared_http_session() as session:
+                    det = await fetch_flight(session, flight_id)
+                if det and "flight" in det:
+                    store_gstats_cards(flight_id, det["flight"])
+                    card = load_gstats_cards(flight_id, is_uk)
                 
-            if not det or "flight" not in det:
+            if not card:
                 err_msg_text = "❌ **Помилка:** Дані про рейс не знайдено в базі." if is_uk else "❌ **Error:** Flight data not found in the database."
                 err_msg = await interaction.followup.send(err_msg_text, ephemeral=True)
-                async def delete_err_msg():
-                    await asyncio.sleep(120)
-                    try: await err_msg.delete()
-                    except: pass
-                client.loop.create_task(delete_err_msg())
+                schedule_message_delete(err_msg, 120, interaction)
                 return
                 
-            f = det["flight"]
-            t = f.get("result", {}).get("totals", {})
-            exp = f.get("result", {}).get("expenses", {})
-            
-            # ==========================================
-            # --- 1. КАРТКА ПАЛИВА ---
-            # ==========================================
-            fuel_kg = int(t.get("fuel", 0))
-            fuel_price = int(exp.get("fuel", 0) or t.get("fuelPrice", 0))
-            dist = float(t.get("distance", 0))
-            
-            cost_per_ton = round((fuel_price / fuel_kg) * 1000) if fuel_kg > 0 else 0
-            burn_per_nm = round(fuel_kg / dist, 1) if dist > 0 else 0
-            
-            if is_uk:
-                fuel_desc = (
-                    f"🛢️ **Спалено палива:** {fuel_kg:,} кг\n".replace(",", " ") +
-                    f"💵 **Вартість палива:** {fuel_price:,} $\n".replace(",", " ") +
-                    f"📊 **Ціна за 1 тонну:** {cost_per_ton:,} $\n".replace(",", " ") +
-                    f"📏 **Витрата на милю:** {burn_per_nm} кг/nm"
-                )
-                embed_fuel = discord.Embed(title="⛽ Детальна статистика палива", description=fuel_desc, color=0xf1c40f)
-            else:
-                fuel_desc = (
-                    f"🛢️ **Fuel Burned:** {fuel_kg:,} kg\n".replace(",", " ") +
-                    f"💵 **Fuel Cost:** {fuel_price:,} $\n".replace(",", " ") +
-                    f"📊 **Price per Tonne:** {cost_per_ton:,} $\n".replace(",", " ") +
-                    f"📏 **Burn per NM:** {burn_per_nm} kg/nm"
-                )
-                embed_fuel = discord.Embed(title="⛽ Detailed Fuel Stats", description=fuel_desc, color=0xf1c40f)
-
-            # ==========================================
-            # --- 2. КАРТКА ПАСАЖИРІВ / КАРГО ---
-            # ==========================================
-            flight_type = f.get("type", "pax")
-            
-            if flight_type == "cargo":
-                cargo_cap = int(f.get("payload", {}).get("cargoCapacity", 1))
-                cargo_actual = int(t.get("payload", {}).get("cargo", 0))
-                if cargo_actual == 0: cargo_actual = int(f.get("payload", {}).get("cargo", 0))
-                
-                load_factor = round((cargo_actual / cargo_cap) * 100, 1) if cargo_cap > 0 else 0.0
-                cargo_kg = int(f.get("payload", {}).get("weights", {}).get("cargo", 0))
-                
-                cargo_rev = int(f.get("result", {}).get("revenue", {}).get("cargo", 0))
-                unit_price = int(t.get("prices", {}).get("cargoUnitPrice", 0))
-                total_expenses = int(f.get("result", {}).get("totals", {}).get("expenses", 0))
-                balance = int(t.get("balance", 0))
-                
-                if is_uk:
-                    payload_desc = (
-                        f"⚖️ **Завантаженість об'єму:** {cargo_actual} / {cargo_cap} одиниць ({load_factor}%)\n"
-                        f"📦 **Загальна маса вантажу:** {cargo_kg:,} кг\n\n".replace(",", " ") +
-                        f"📉 **Економіка рейсу:**\n"
-                        f"├ 💵 Дохід з вантажу: {cargo_rev:,} $ *(Тариф: {unit_price} $ / од.)*\n".replace(",", " ") +
-                        f"├ 🧾 Витрати: {total_expenses:,} $\n".replace(",", " ") +
-                        f"└ 💰 Чистий прибуток: {balance:,} $".replace(",", " ")
-                    )
-                    embed_payload = discord.Embed(title="📦 СТАТИСТИКА КОМЕРЦІЙНОГО ВАНТАЖУ", description=payload_desc, color=0xe67e22)
-                else:
-                    payload_desc = (
-                        f"⚖️ **Volume Load:** {cargo_actual} / {cargo_cap} units ({load_factor}%)\n"
-                        f"📦 **Total Cargo Weight:** {cargo_kg:,} kg\n\n".replace(",", " ") +
-                        f"📉 **Flight Economics:**\n"
-                        f"├ 💵 Cargo Revenue: {cargo_rev:,} $ *(Rate: {unit_price} $ / unit)*\n".replace(",", " ") +
-                        f"├ 🧾 Expenses: {total_expenses:,} $\n".replace(",", " ") +
-                        f"└ 💰 Net Profit: {balance:,} $".replace(",", " ")
-                    )
-                    embed_payload = discord.Embed(title="📦 COMMERCIAL CARGO STATS", description=payload_desc, color=0xe67e22)
-            else:
-                pax_cap = int(f.get("payload", {}).get("paxCapacity", 1))
-                pax_actual = int(t.get("payload", {}).get("pax", 0))
-                if pax_actual == 0: pax_actual = int(f.get("payload", {}).get("pax", 0))
-                
-                load_factor = round((pax_actual / pax_cap) * 100, 1) if pax_cap > 0 else 0.0
-                
-                classes_data = t.get("payload", {}).get("paxByClass", {})
-                base_price = int(t.get("prices", {}).get("ticketPrice", 0))
-                
-                str_fare = "Тариф" if is_uk else "Fare"
-                str_first = "Перший" if is_uk else "First"
-                str_bus = "Бізнес" if is_uk else "Business"
-                str_eco = "Економ" if is_uk else "Economy"
-                str_pax = "пас." if is_uk else "pax"
-                
-                # Збираємо всі наявні класи в окремий список
-                available_classes = []
-                if classes_data.get("F", 0) > 0:
-                    available_classes.append(f"🥂**{str_first}:** {classes_data['F']} {str_pax} ({str_fare}: {base_price * 4} $)")
-                if classes_data.get("C", 0) > 0:
-                    available_classes.append(f"💼**{str_bus}:** {classes_data['C']} {str_pax} ({str_fare}: {base_price * 2} $)")
-                if classes_data.get("Y", 0) > 0:
-                    available_classes.append(f"🎟️**{str_eco}:** {classes_data['Y']} {str_pax} ({str_fare}: {base_price} $)")
-
-                # Формуємо красивий текст із правильними лініями
-                classes_str = ""
-                if not available_classes:
-                    classes_str = "└ 🎟️ Немає даних про класи\n" if is_uk else "└ 🎟️ No class data available\n"
-                else:
-                    for i, cls_text in enumerate(available_classes):
-                        # Якщо це останній елемент у списку — закриваємо гілку
-                        if i == len(available_classes) - 1:
-                            classes_str += f"└ {cls_text}\n"
-                        # Усім іншим ставимо проміжну гілку
-                        else:
-                            classes_str += f"├ {cls_text}\n"
-                    
-                revenue_tickets = int(f.get("result", {}).get("revenue", {}).get("tickets", 0))
-                total_expenses = int(f.get("result", {}).get("totals", {}).get("expenses", 0))
-                balance = int(t.get("balance", 0))
-                
-                rev_per_pax = round(revenue_tickets / pax_actual) if pax_actual > 0 else 0
-                exp_per_pax = round(total_expenses / pax_actual) if pax_actual > 0 else 0
-                prof_per_pax = round(balance / pax_actual) if pax_actual > 0 else 0
-                
-                cargo_rev = int(f.get("result", {}).get("revenue", {}).get("cargo", 0))
-                
-                cargo_cap = int(f.get("payload", {}).get("cargoCapacity", 0))
-                cargo_actual_pax_flight = int(t.get("payload", {}).get("cargo", 0))
-                if cargo_actual_pax_flight == 0: cargo_actual_pax_flight = int(f.get("payload", {}).get("cargo", 0))
-                cargo_load_factor = round((cargo_actual_pax_flight / cargo_cap) * 100, 1) if cargo_cap > 0 else 0.0
-                cargo_unit_price = int(t.get("prices", {}).get("cargoUnitPrice", 0))
-                
-                if is_uk:
-                    cargo_ext_str = f"╰ Завантаженість об'єму: {cargo_actual_pax_flight} / {cargo_cap} одиниць ({cargo_load_factor}%), (Тариф: {cargo_unit_price} $ / од.)" if cargo_cap > 0 and cargo_actual_pax_flight > 0 else ""
-                else:
-                    cargo_ext_str = f"╰ Volume Load: {cargo_actual_pax_flight} / {cargo_cap} units ({cargo_load_factor}%), (Rate: {cargo_unit_price} $ / unit)" if cargo_cap > 0 and cargo_actual_pax_flight > 0 else ""
-                
-                if is_uk:
-                    payload_desc = (
-                        f"👥 **Завантаженість:** {pax_actual} / {pax_cap} ({load_factor}%)\n\n"
-                        f"💺 **Пасажири по класах:**\n{classes_str}\n"
-                        f"📉 **Економіка на 1 пасажира:**\n"
-                        f"├ 💵 Дохід: {rev_per_pax} $ | 🧾 Витрати: {exp_per_pax} $\n"
-                        f"└ 💰 Чистий прибуток: {prof_per_pax} $\n\n"
-                        f"📦 **Комерційний вантаж:** {cargo_rev:,} $\n".replace(",", " ") +
-                        cargo_ext_str
-                    )
-                    embed_payload = discord.Embed(title="🎫 СТАТИСТИКА ПАСАЖИРІВ ТА КОМЕРЦІЇ", description=payload_desc, color=0x3498db)
-                else:
-                    payload_desc = (
-                        f"👥 **Load Factor:** {pax_actual} / {pax_cap} ({load_factor}%)\n\n"
-                        f"💺 **Passengers by Class:**\n{classes_str}\n"
-                        f"📉 **Economics per Passenger:**\n"
-                        f"├ 💵 Revenue: {rev_per_pax} $ | 🧾 Expenses: {exp_per_pax} $\n"
-                        f"└ 💰 Net Profit: {prof_per_pax} $\n\n"
-                        f"📦 **Commercial Cargo:** {cargo_rev:,} $\n".replace(",", " ") +
-                        cargo_ext_str
-                    )
-                    embed_payload = discord.Embed(title="🎫 PASSENGER & COMMERCIAL STATS", description=payload_desc, color=0x3498db)
-
-            # ==========================================
-            # --- 3. КАРТКА АДВАНСЕД СТАТИСТИКИ ---
-            # ==========================================
-            sim = str(f.get("simulator", "Unknown")).lower()
-            fps = "Невідомо" if is_uk else "Unknown"
-            
-            violations = f.get("result", {}).get("violations", [])
-            for v in violations:
-                entry = v.get("entry", {})
-                payload = entry.get("payload", {})
-                # Шукаємо FPS строго у події типу "landing"
-                if entry.get("type") == "landing" and "system" in payload and "fps" in payload["system"]:
-                    fps = payload["system"]["fps"]
-                    break
-                    
-            # Резервний пошук (якщо раптом немає у violations, але є в прямому об'єкті landing)
-            if fps in ["Невідомо", "Unknown"] and "landing" in f:
-                if "system" in f["landing"] and "fps" in f["landing"]["system"]:
-                    fps = f["landing"]["system"]["fps"]
-            
-            ac_cost = int(exp.get("aircraft", 0))
-            fuel_cost = int(exp.get("fuel", 0))
-            hand_cost = int(exp.get("handling", 0))
-            land_cost = int(exp.get("landing", 0))
-            total_exp = int(t.get("expenses", 0))
-            
-            scalars = t.get("prices", {}).get("costScalars", {})
-            dep_sc = float(scalars.get("dep", 1.0))
-            arr_sc = float(scalars.get("arr", 1.0))
-            gnd_sc = float(scalars.get("ground", 1.0))
-            fuel_sc = float(scalars.get("fuel", 1.0))
-            time_accel = float(scalars.get("timeAcceleration", 1.0))
-            
-            def fmt_sc(val, uk):
-                if val >= 1.0: return "Без знижки" if uk else "No discount"
-                diff = int(round((1.0 - val) * 100))
-                return f"-{diff}% до зборів" if uk else f"-{diff}% to fees"
-            def fmt_sc_g(val, uk):
-                if val >= 1.0: return "Без знижки" if uk else "No discount"
-                diff = int(round((1.0 - val) * 100))
-                return f"-{diff}%"
-            
-            penalties_str = ""
-            for v in violations:
-                points = float(v.get("penalty", {}).get("points", 0))
-                cash = int(v.get("penalty", {}).get("cash", 0))
-                if points < 0 or cash < 0:
-                    title = v.get("title", "Unknown violation").replace("<br/>", " ")
-                    rating_penalty = points / 100.0
-                    if is_uk:
-                        penalties_str += f"├ **{title}**\n└ ➖ Штраф: `{rating_penalty:.2f} рейтингу` | `-${abs(cash)}`\n"
-                    else:
-                        penalties_str += f"├ **{title}**\n└ ➖ Penalty: `{rating_penalty:.2f} rating` | `-${abs(cash)}`\n"
-                        
-            if not penalties_str:
-                penalties_str = "└ ✅ Штрафів немає! Ідеальний політ." if is_uk else "└ ✅ No penalties! Perfect flight."
-                
-            if is_uk:
-                adv_desc = (
-                    f"🖥️ **Технічна інформація:**\n"
-                    f"├ 🕹️ Симулятор: {sim}\n"
-                    f"└ 📈 FPS на посадці: {fps}\n\n"
-                    f"💸 **Деталізація витрат:**\n"
-                    f"├ ✈️ Літак: {ac_cost:,} $\n".replace(",", " ") +
-                    f"├ 🛢️ Паливо: {fuel_cost:,} $\n".replace(",", " ") +
-                    f"├ 🧳 Хендлінг: {hand_cost:,} $\n".replace(",", " ") +
-                    f"├ 🛬 Посадковий збір: {land_cost:,} $\n".replace(",", " ") +
-                    f"└ 🧾 Всього витрат: {total_exp:,} $\n\n".replace(",", " ") +
-                    f"🏷️ **Економічні коефіцієнти:**\n"
-                    f"├ 🛫 Виліт: {dep_sc} ({fmt_sc(dep_sc, True)})\n"
-                    f"├ 🛬 Приліт: {arr_sc} ({fmt_sc(arr_sc, True)})\n"
-                    f"├ 🚜 Наземне обслуговування: {gnd_sc} ({fmt_sc_g(gnd_sc, True)})\n"
-                    f"├ ⛽ Паливо: {fuel_sc} ({fmt_sc_g(fuel_sc, True)})\n"
-                    f"└ ⏱️ Прискорення часу (timeAcceleration): {time_accel}\n\n"
-                    f"🚨 **Штрафи та Порушення:**\n"
-                    f"{penalties_str}"
-                )
-                embed_adv = discord.Embed(title="📊 Розширена Статистика Рейсу", description=adv_desc, color=0x95a5a6)
-            else:
-                adv_desc = (
-                    f"🖥️ **Technical Info:**\n"
-                    f"├ 🕹️ Simulator: {sim}\n"
-                    f"└ 📈 Landing FPS: {fps}\n\n"
-                    f"💸 **Detailed Expenses:**\n"
-                    f"├ ✈️ Aircraft: {ac_cost:,} $\n".replace(",", " ") +
-                    f"├ 🛢️ Fuel: {fuel_cost:,} $\n".replace(",", " ") +
-                    f"├ 🧳 Handling: {hand_cost:,} $\n".replace(",", " ") +
-                    f"├ 🛬 Landing: {land_cost:,} $\n".replace(",", " ") +
-                    f"└ 🧾 Total Expenses: {total_exp:,} $\n\n".replace(",", " ") +
-                    f"🏷️ **Economic Multipliers:**\n"
-                    f"├ 🛫 Departure: {dep_sc} ({fmt_sc(dep_sc, False)})\n"
-                    f"├ 🛬 Arrival: {arr_sc} ({fmt_sc(arr_sc, False)})\n"
-                    f"├ 🚜 Ground Handling: {gnd_sc} ({fmt_sc_g(gnd_sc, False)})\n"
-                    f"├ ⛽ Fuel: {fuel_sc} ({fmt_sc_g(fuel_sc, False)})\n"
-                    f"└ ⏱️ timeAcceleration: {time_accel}\n\n"
-                    f"🚨 **Penalties & Violations:**\n"
-                    f"{penalties_str}"
-                )
-                embed_adv = discord.Embed(title="📊 Advanced Flight Stats", description=adv_desc, color=0x95a5a6)
-
             # ==========================================
             # --- 4. ВІДПРАВЛЕННЯ СТАТИСТИКИ (3 ЕМБЕДИ РАЗОМ) ---
             # ==========================================
             # Discord дозволяє передати масив з embed-ів, тоді вони будуть як окремі візуальні картки
-            sent_stats_msg = await interaction.followup.send(embeds=[embed_fuel, embed_payload, embed_adv], ephemeral=True)
-            
-            async def delete_stats_msg():
-                await asyncio.sleep(120)
-                try: await sent_stats_msg.delete()
-                except: pass
-            client.loop.create_task(delete_stats_msg())
+            embeds = [discord.Embed.from_dict(e) for e in card["embeds"]]
+            sent_stats_msg = await interaction.followup.send(embeds=embeds, ephemeral=True)
+            schedule_message_delete(sent_stats_msg, 120, interaction)
 
-                        # 5. НАДСИЛАЄМО ЛОГ У КАНАЛ
+            # 5. ЛОГ У КАНАЛ АУДИТУ — через фонову чергу, клік його не чекає
             if interaction.user.id not in ADMIN_IDS:
-                try:
-                    log_channel = client.get_channel(1474817440516018186)
-                    flight_cs = f.get("flightNumber") or f.get("callsign") or flight_id
-                    msg_url = interaction.message.jump_url
-                    user_locale = str(interaction.locale)
-                    
-                    log_desc = (
-                        f"👤 **Користувач:** **{interaction.user.display_name}** (`{interaction.user.name}`) *(lang: {user_locale.upper()})*\n"
-                        f"🆔 **ID акаунту:** `{interaction.user.id}`\n"
-                        f"✈️ **Рейс:** {flight_cs}\n"
-                        f"🔗 **Повідомлення:** [Перейти до звіту]({msg_url})\n"
-                        f"🔍 **Дія:** Переглянув статистику."
-                    )
-                    log_embed = discord.Embed(title="🔔 Лог натискання кнопки", description=log_desc, color=0x3498db)
-                    await log_channel.send(embed=log_embed)
-                except Exception as e:
-                    print(f"Помилка відправки логу в канал: {e}")
+                audit_log(interaction.user, "Переглянув статистику.", flight_cs=card.get("cs") or flight_id,
+                          msg_url=interaction.message.jump_url, locale=str(interaction.locale))
 					
 # -----------------------------------------------------------------
 
+# --- 🧭 РОУТЕР КОМАНД: ТАБЛИЦЯ ДІЄСЛІВ ЗАМІСТЬ ЛАНЦЮЖКА IF ---
+# Кожна команда реєструється декоратором @command і отримує (message, is_admin).
+# Права, режим "тільки ПП" та кулдаун описуються метаданими, а не кодом у тілі.
+COMMANDS = {}
+COMMAND_STATS = {}  # verb -> {"calls", "total", "max"} (секунди)
+
+
+def command(*verbs, admin=False, dm_only=False, cooldown=0):
+    def register(func):
+        spec = {"func": func, "verb": verbs[0], "admin": admin, "dm_only": dm_only, "cooldown": cooldown, "last_used": 0.0}
+        for verb in verbs:
+            if verb in COMMANDS:
+                raise ValueError(f"Команду {verb} зареєстровано двічі")
+            COMMANDS[verb] = spec
+        return func
+    return register
+
+
+# --- 🛂 КЕШ ПРАВ АДМІНА ДЛЯ КОМАНД З ПП ---
+# У ПП права перевіряються на головному сервері. Щоб не робити fetch_member на кожну команду,
+# тримаємо user_id -> (is_admin, expires_at). Без привілейованого members-інтенту Discord
+# не надсилає on_member_update, тож зміни ролей конкретного юзера підхоплює TTL,
+# а зміну прав самої ролі — on_guild_role_update/delete.
+# "Не адмін" живе повний TTL, а "адмін" — коротко: відкликані права не мають триматися 10 хвилин.
+ADMIN_CACHE_TTL = int(os.getenv("ADMIN_CACHE_TTL", 600))
+ADMIN_CACHE_POSITIVE_TTL = int(os.getenv("ADMIN_CACHE_POSITIVE_TTL", 60))
+ADMIN_CACHE = {}
+ADMIN_CACHE_STATS = {"hits": 0, "misses": 0}
+
+
+def main_guild():
+    main_channel = client.get_channel(CHANNEL_ID)
+    return main_channel.guild if main_channel else None
+
+
+def cache_member_admin(member):
+    is_admin = member.guild_permissions.administrator
+    ttl = ADMIN_CACHE_POSITIVE_TTL if is_admin else ADMIN_CACHE_TTL
+    ADMIN_CACHE[member.id] = (is_admin, time.monotonic() + ttl)
+
+
+def warm_admin_cache():
+    ADMIN_CACHE.clear()
+    guild = main_guild()
+    if not guild:
+        return
+    for member in guild.members:
+        cache_member_admin(member)
+    print(f"🛂 Admin cache warmed: {len(ADMIN_CACHE)} members")
+
+
+async def resolve_is_admin(message):
+    if message.author.id in ADMIN_IDS:
+        return True
+    # 1. Якщо пишуть прямо на сервері
+    if message.guild:
+        return message.author.guild_permissions.administrator
+    # 2. Якщо пишуть у ПП, перевіряємо їхні права на головному сервері
+    cached = ADMIN_CACHE.get(message.author.id)
+    if cached and cached[1] > time.monotonic():
+        ADMIN_CACHE_STATS["hits"] += 1
+        return cached[0]
+    ADMIN_CACHE_STATS["misses"] += 1
+
+    guild = main_guild()
+    if not guild:
+        return False
+    try:
+        # Шукаємо цього користувача на сервері
+        member = guild.get_member(message.author.id)
+        if not member: # Якщо його немає в кеші, робимо запит
+            member = await guild.fetch_member(message.author.id)
+    except discord.NotFound:
+        # Не учасник сервера — теж кешуємо, щоб не питати Discord на кожне ПП
+        ADMIN_CACHE[message.author.id] = (False, time.monotonic() + ADMIN_CACHE_TTL)
+        return False
+    except Exception as e:
+        print(f"Admin check error: {e}")
+        return False
+    cache_member_admin(member)
+    return member.guild_permissions.administrator
+
+
+@client.event
+async def on_member_update(before, after):
+    # Приходить лише з увімкненим members-інтентом; інакше працює TTL
+    if after.guild != main_guild(): return
+    if before.roles != after.roles:
+        ADMIN_CACHE.pop(after.id, None) # Ролі змінились — наступна команда перевірить права наново
+    else:
+        cache_member_admin(after)
+
+
+@client.event
+async def on_member_remove(member):
+    if member.guild == main_guild():
+        ADMIN_CACHE.pop(member.id, None)
+
+
+@client.event
+async def on_guild_role_update(before, after):
+    if after.guild == main_guild() and before.permissions.administrator != after.permissions.administrator:
+        ADMIN_CACHE.clear()
+
+
+@client.event
+async def on_guild_role_delete(role):
+    if role.guild == main_guild() and role.permissions.administrator:
+        ADMIN_CACHE.clear()
+
+
+async def dispatch_command(spec, message):
+    is_admin = await resolve_is_admin(message)
+    if spec["admin"] and not is_admin:
+        return await message.channel.send("🚫 **Access Denied**")
+    if spec["dm_only"] and not isinstance(message.channel, discord.DMChannel):
+        return await message.channel.send("⚠️ **This command ONLY works in Direct Messages (DM)!** Please send me a private message.")
+
+    if spec["cooldown"]:
+        now = time.time()
+        if now - spec["last_used"] < spec["cooldown"]:
+            remaining = int(spec["cooldown"] - (now - spec["last_used"]))
+            warning_msg = await message.channel.send(f"⏳ **Please wait {remaining} seconds** before using `{spec['verb']}` again.")
+            schedule_message_delete(warning_msg, 3)
+            return
+        spec["last_used"] = now
+
+    started = time.perf_counter()
+    try:
+        await spec["func"](message, is_admin)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats = COMMAND_STATS.setdefault(spec["verb"], {"calls": 0, "total": 0.0, "max": 0.0})
+        stats["calls"] += 1
+        stats["total"] += elapsed
+        stats["max"] = max(stats["max"], elapsed)
+
+
+def command_stats_report(limit=5):
+    # Найдовші за сумарним часом команди (для !status)
+    top = sorted(COMMAND_STATS.items(), key=lambda kv: kv[1]["total"], reverse=True)[:limit]
+    lines = [
+        f"`{verb}` ×{st['calls']} · avg {st['total'] / st['calls'] * 1000:.0f} ms · max {st['max'] * 1000:.0f} ms"
+        for verb, st in top
+    ] or ["No commands yet"]
+    lines.append(f"Admin cache: {len(ADMIN_CACHE)} users | hits {ADMIN_CACHE_STATS['hits']} / misses {ADMIN_CACHE_STATS['misses']}")
+    return "\n".join(lines)
+
+# -----------------------------------------------------------------
+
 @client.event
 async def on_message(message):
-    global last_sent_message
-    
-    if message.author == client.user: return
+    if message.author == client.user:
+        # Запам'ятовуємо, де лежать наші власні повідомлення — для команд з <Message_ID>
+        index_message(message.id, message.channel.id)
+        return
 
 	# --- 🥷 ФІЛЬТР: МИТТЄВЕ ВИДАЛЕННЯ ПОВІДОМЛЕНЬ ВІД ПРИХОВАНИХ ЮЗЕРІВ ---
     # Переводимо ID каналу в текст, бо JSON зберігає ключі як текст
@@ -1736,2564 +3220,2634 @@ async def on_message(message):
             except Exception as e:
                 print(f"DM Intercept Error: {e}")
 
-    is_admin = False
-    if message.author.id in ADMIN_IDS:
-        is_admin = True
-    else:
-        # 1. Якщо пишуть прямо на сервері
-        if message.guild and message.author.guild_permissions.administrator:
-            is_admin = True
-        # 2. Якщо пишуть у ПП, перевіряємо їхні права на головному сервері
-        elif not message.guild:
-            main_channel = client.get_channel(CHANNEL_ID)
-            if main_channel and main_channel.guild:
-                try:
-                    # Шукаємо цього користувача на сервері
-                    member = main_channel.guild.get_member(message.author.id)
-                    if not member: # Якщо його немає в кеші, робимо запит
-                        member = await main_channel.guild.fetch_member(message.author.id)
-                        
-                    if member and member.guild_permissions.administrator:
-                        is_admin = True
-                except:
-                    pass
-    
-    # --- 📥 КОМАНДА: !cache (СКАЧАТИ ВСІ ФАЙЛИ ПАМ'ЯТІ) ---
-    if message.content == "!cache":
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        folder_path = Path("/app/data")
-        if not folder_path.exists():
-            return await message.channel.send("⚠️ **Дані ще не створені.**")
-            
-        files_to_send = []
-        # Проходимося по всіх файлах у папці /app/data
-        for file in folder_path.iterdir():
-            if file.is_file() and file.name.endswith(".json") and file.stat().st_size > 0:
-                files_to_send.append(discord.File(file))
-                
-        if not files_to_send:
-            return await message.channel.send("⚠️ **Файли кешу порожні або відсутні.**")
-            
-        await message.channel.send(
-            content="📂 **Всі файли пам'яті бота:**", 
-            files=files_to_send[:10] # Відправляємо всі знайдені файли (до 10 шт.)
-        )
-        return
+    # --- 🧭 РОУТЕР: звичайні повідомлення відсіюємо одним символом ---
+    if not message.content.startswith("!"): return
+    spec = COMMANDS.get(message.content.split(maxsplit=1)[0])
+    if spec:
+        # Команди теж індексуємо; чужі повідомлення потрапляють в індекс лише після пошуку
+        index_message(message.id, message.channel.id)
+        await dispatch_command(spec, message)
+
+# --- 📥 КОМАНДА: !cache (СКАЧАТИ ВСІ ФАЙЛИ ПАМ'ЯТІ) ---
+@command("!cache", admin=True)
+async def cmd_cache(message, is_admin):
+    folder_path = Path("/app/data")
+    if not folder_path.exists():
+        return await message.channel.send("⚠️ **Дані ще не створені.**")
+
+    files_to_send = []
+    checkpoint_db()
+    if DB_FILE.exists():
+        files_to_send.append(discord.File(DB_FILE))
+    # Проходимося по всіх файлах у папці /app/data
+    for file in folder_path.iterdir():
+        if file.is_file() and file.name.endswith(".json") and file.stat().st_size > 0:
+            if file == STATE_FILE:
+                # sent.json на диску — лише знімок; віддаємо його разом із непрокомпактованим журналом
+                merged = read_state_files()[0]
+                files_to_send.append(discord.File(io.BytesIO(json.dumps(merged, indent=4).encode("utf-8")), filename=file.name))
+                continue
+            files_to_send.append(discord.File(file))
+
+    if not files_to_send:
+        return await message.channel.send("⚠️ **Файли кешу порожні або відсутні.**")
+
+    await message.channel.send(
+        content="📂 **Всі файли пам'яті бота:**", 
+        files=files_to_send[:10] # Відправляємо всі знайдені файли (до 10 шт.)
+    )
+    return
+
 
 #  -------------------------------------------------------------
 
 # --- 🌍 КОМАНДА: !syncall (РОЗУМНИЙ ЕКСПОРТ З ПІДТВЕРДЖЕННЯМ ДЛЯ ВСІХ ТИЖНІВ) ---
-    if message.content.startswith("!syncall"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        status_msg = await message.channel.send("⏳ **Запуск розумної глибокої синхронізації...** Викачую всі рейси до дна.")
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                # 1. Викачуємо всі рейси (з анти-лімітом)
-                flights_list = []
-                skip_count = 0
-                batch_size = 100
-                retry_count = 0
-                
-                while True:
-                    if retry_count == 0:
-                        await status_msg.edit(content=f"⏳ Завантажую з Newsky (зміщення: {skip_count})...")
-                        
-                    body = {"count": batch_size, "skip": skip_count, "start": "2026-01-01T00:00:00Z"}
-                    recent = await fetch_api(session, "/flights/recent", method="POST", body=body)
-                    
-                    # Якщо Newsky заблокував запит (429 ліміт), чекаємо 5 сек і пробуємо знову
-                    if recent is None:
-                        retry_count += 1
-                        if retry_count > 5:
-                            await status_msg.edit(content=f"❌ **Зупинка:** API Newsky не відповідає після 5 спроб. Вже викачано {len(flights_list)} рейсів.")
-                            break
-                        await asyncio.sleep(5)
-                        continue
-                        
-                    retry_count = 0 # Успіх! Скидаємо лічильник
-                    
-                    if "results" not in recent or not recent["results"]: 
-                        break # Справжнє дно списку
-                        
-                    flights_list.extend(recent["results"])
-                    if len(recent["results"]) < batch_size: 
-                        break # Менше 100 рейсів — це остання сторінка
-                        
-                    skip_count += batch_size
-                    
-                if not flights_list:
-                    return await status_msg.edit(content="✅ **Рейсів не знайдено.**")
+@command("!syncall", admin=True)
+async def cmd_syncall(message, is_admin):
+    status_msg = await message.channel.send("⏳ **Запуск розумної глибокої синхронізації...** Викачую всі рейси до дна.")
 
-                await status_msg.edit(content=f"⏳ **Знайдено {len(flights_list)} рейсів. Читаю базу GitHub...**")
-                
-                # 2. Читаємо список файлів з GitHub
-                gh_headers = {"Authorization": f"token {GITHUB_TOKEN}", "Accept": "application/vnd.github.v3+json", "Cache-Control": "no-cache"}
-                dir_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/FLIGHTS?t={int(time.time())}"
-                
-                github_files = {} # week_filename -> sha
-                async with session.get(dir_url, headers=gh_headers) as dir_resp:
-                    if dir_resp.status == 200:
-                        for item in await dir_resp.json():
-                            if item.get("name", "").endswith(".json"):
-                                github_files[item["name"]] = item["sha"]
-
-                # 3. Групуємо рейси та шукаємо відсутні
-                ignored_list = load_ignored()
-                missing_flights = []
-                flights_list.sort(key=lambda x: x.get("updatedAt", ""))
-                
-                # Кеш для вже завантажених файлів тижнів
-                loaded_weeks = {}
-                
-                valid_count = 0
-                for raw_f in flights_list:
-                    if raw_f.get("deleted") or not raw_f.get("close"): continue
-                    fid = str(raw_f.get("_id") or raw_f.get("id"))
-                    if fid in ignored_list: continue
-                    
-                    arrival_time = raw_f.get("arrTimeAct") or raw_f.get("close")
-                    week_tag = get_iso_week(arrival_time)
-                    week_filename = f"{week_tag}.json"
-                    
-                    # Завантажуємо файл тижня з GitHub, якщо ще не завантажили
-                    if week_filename not in loaded_weeks:
-                        loaded_weeks[week_filename] = []
-                        if week_filename in github_files:
-                            blob_url = f"https://api.github.com/repos/{GITHUB_REPO}/git/blobs/{github_files[week_filename]}"
-                            async with session.get(blob_url, headers=gh_headers) as blob_resp:
-                                if blob_resp.status == 200:
-                                    blob_data = await blob_resp.json()
-                                    loaded_weeks[week_filename] = json.loads(base64.b64decode(blob_data['content']).decode('utf-8'))
-                    
-                    # Перевіряємо, чи є рейс у цьому файлі
-                    already_exists = any(
-                        str(f.get("_id")) == fid or str(f.get("id")) == fid 
-                        for p in loaded_weeks[week_filename] for f in p.get("flights", [])
-                    )
-                    
-                    if not already_exists:
-                        det = await fetch_api(session, f"/flight/{fid}")
-                        if det and "flight" in det:
-                            missing_flights.append((week_tag, det["flight"]))
-                            
-                    valid_count += 1
-                    if valid_count % 50 == 0:
-                        await status_msg.edit(content=f"⏳ **Звіряю з GitHub... Оброблено {valid_count}/{len(flights_list)} рейсів. Знайдено пропущених: {len(missing_flights)}**")
+    try:
+        async with shared_http_session() as session:
+            # 1. Викачуємо всі рейси (з анти-лімітом)
+            flights_list = []
+            skip_count = 0
+            batch_size = 100
+            retry_count = 0
+
+            while True:
+                if retry_count == 0:
+                    await status_msg.edit(content=f"⏳ Завантажую з Newsky (зміщення: {skip_count})...")
+
+                body = {"count": batch_size, "skip": skip_count, "start": "2026-01-01T00:00:00Z"}
+                recent = await fetch_api(session, "/flights/recent", method="POST", body=body, priority="bulk")
+
+                # Якщо Newsky заблокував запит (429 ліміт), чекаємо 5 сек і пробуємо знову
+                if recent is None:
+                    retry_count += 1
+                    if retry_count > 5:
+                        await status_msg.edit(content=f"❌ **Зупинка:** API Newsky не відповідає після 5 спроб. Вже викачано {len(flights_list)} рейсів.")
+                        break
+                    await asyncio.sleep(5)
+                    continue
 
-                if not missing_flights:
-                    return await status_msg.edit(content="✅ **Усі рейси за всі тижні вже на GitHub!** Відсутніх рейсів немає.")
+                retry_count = 0 # Успіх! Скидаємо лічильник
 
-                # 4. Показуємо список ВСІХ рейсів (з розумним розбиттям на повідомлення)
-                header = f"📋 **Маю додати ось такі рейси ({len(missing_flights)} шт):**\n"
-                chunks = []
-                current_chunk = header
-                
-                for w_tag, mf in missing_flights:
-                    fid = mf.get("_id") or mf.get("id")
-                    cs = mf.get("flightNumber") or mf.get("callsign") or "Unknown"
-                    line = f"✈️ [{cs}](https://newsky.app/flight/{fid}) (Тиждень {w_tag})\n"
-                    
-                    # Ліміт Discord - 2000 символів, ми беремо із запасом 1900
-                    if len(current_chunk) + len(line) > 1900:
-                        chunks.append(current_chunk)
-                        current_chunk = line
-                    else:
-                        current_chunk += line
-                
-                current_chunk += "\n✍️ Напиши `yes` щоб підтвердити, або `no` щоб скасувати (маєш 180 секунд)."
-                chunks.append(current_chunk)
+                if "results" not in recent or not recent["results"]: 
+                    break # Справжнє дно списку
 
-                await status_msg.edit(content=chunks[0], suppress=True)
-                
-                # Якщо шматків багато, відправляємо додаткові повідомлення
-                extra_msgs = []
-                for chunk in chunks[1:]:
-                    msg = await message.channel.send(content=chunk, suppress_embeds=True)
-                    extra_msgs.append(msg)
+                flights_list.extend(recent["results"])
+                if len(recent["results"]) < batch_size: 
+                    break # Менше 100 рейсів — це остання сторінка
 
-                def check(m):
-                    return m.author == message.author and m.channel == message.channel and m.content.lower() in ['yes', 'no']
+                skip_count += batch_size
 
-                try:
-                    reply = await client.wait_for('message', check=check, timeout=180.0)
-                    if reply.content.lower() == 'no':
-                        return await status_msg.edit(content="❌ **Синхронізацію скасовано.**")
-                except asyncio.TimeoutError:
-                    return await status_msg.edit(content="⏳ **Час вийшов (180 сек).** Синхронізацію скасовано.")
-                finally:
-                    # Очищаємо додаткові повідомлення, щоб не засмічувати чат
-                    for msg in extra_msgs:
-                        try: await msg.delete()
-                        except: pass
-
-                # 5. КОРИСТУВАЧ ПІДТВЕРДИВ (yes) -> М'ясорубка і Єдиний Batch Push
-                await status_msg.edit(content="⏳ **Підтверджено! Обробляю рейси та записую на GitHub єдиним комітом...**")
-                
-                async with GITHUB_DB_LOCK:
-                    files_to_push = {}
-                    
-                    for w_tag, f in missing_flights:
-                        week_filename = f"{w_tag}.json"
-                        file_path = f"FLIGHTS/{week_filename}"
-                        fid = str(f.get("_id") or f.get("id"))
-                        
-                        t = f.get("result", {}).get("totals", {})
-                        if t.get("distance", 0) == 0 and t.get("time", 0) == 0: continue
-                        
-                        clean_flight = format_flight_for_db(f)
-                        pilot_data = f.get("pilot", {})
-                        pilot_id = pilot_data.get("_id", "unknown")
-                        pilot_name = pilot_data.get("fullname", "Unknown Pilot")
-                        pilot_avatar = pilot_data.get("avatar", "default")
-                        
-                        file_content = loaded_weeks[week_filename]
-                        
-                        existing_pilot = next((p for p in file_content if p.get("pilot_id") == pilot_id), None)
-                        if existing_pilot:
-                            existing_pilot["flights"].append(clean_flight)
-                        else:
-                            file_content.append({
-                                "pilot_id": pilot_id, "fullname": pilot_name, "avatar": pilot_avatar, "flights": [clean_flight]
-                            })
-                            
-                        # Готуємо файл до масового пушу
-                        files_to_push[file_path] = json.dumps(file_content, ensure_ascii=False, indent=4)
-                        
-                    # Відправляємо єдиним комітом через push_to_github_batch
-                    success = await push_to_github_batch(session, files_to_push, f"🤖 Auto-sync: added {len(missing_flights)} missing flights across multiple weeks")
-                    
-                    if success:
-                        await status_msg.edit(content=f"✅ **Успіх!** Додано **{len(missing_flights)}** пропущених рейсів у {len(files_to_push)} файлів на GitHub (одним комітом).")
-                    else:
-                        await status_msg.edit(content=f"❌ **Помилка пакетного запису на GitHub.**")
+            if not flights_list:
+                return await status_msg.edit(content="✅ **Рейсів не знайдено.**")
 
-        except Exception as e:
-            await status_msg.edit(content=f"❌ **Сталася помилка:** {e}")
-        return
-    # -------------------------------------------------------------
+            await status_msg.edit(content=f"⏳ **Знайдено {len(flights_list)} рейсів. Читаю базу GitHub...**")
 
-	# --- 🛠️ КОМАНДА: !patchnames (ДОДАТИ ТІЛЬКИ customName В СТАРІ ФАЙЛИ) ---
-    if message.content == "!patchnames":
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        # Список файлів, які треба опрацювати
-        target_weeks = [f"2026-W{i:02d}.json" for i in range(2, 26)]
-        status_msg = await message.channel.send(f"⏳ **Починаю патчинг файлів: {', '.join(target_weeks)}...**\n*(Додаю ТІЛЬКИ customName, ваші ручні зміни не чіпаю)*")
-        
-        gh_headers = {
-            "Authorization": f"token {GITHUB_TOKEN}",
-            "Accept": "application/vnd.github.v3+json",
-            "Cache-Control": "no-cache"
-        }
-        
-        try:
-            async with GITHUB_DB_LOCK:
-                async with aiohttp.ClientSession() as session:
-                    for week_file in target_weeks:
-                        file_path = f"FLIGHTS/{week_file}"
-                        await status_msg.edit(content=f"⏳ **Обробка файлу `{week_file}`...** (Завантаження бази з GitHub)")
-                        
-                        # 1. Отримуємо SHA файлу
-                        file_sha = None
-                        dir_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/FLIGHTS?t={int(time.time())}"
-                        async with session.get(dir_url, headers=gh_headers) as dir_resp:
-                            if dir_resp.status == 200:
-                                dir_data = await dir_resp.json()
-                                if isinstance(dir_data, list):
-                                    for item in dir_data:
-                                        if item.get("name") == week_file:
-                                            file_sha = item.get("sha")
-                                            break
-                                            
-                        if not file_sha:
-                            continue # Якщо файлу немає, просто пропускаємо
-                            
-                        # 2. Завантажуємо вміст файлу
-                        blob_url = f"https://api.github.com/repos/{GITHUB_REPO}/git/blobs/{file_sha}"
-                        async with session.get(blob_url, headers=gh_headers) as blob_resp:
-                            if blob_resp.status != 200: continue
-                            blob_data = await blob_resp.json()
-                            text_content = base64.b64decode(blob_data['content']).decode('utf-8')
-                            file_content = json.loads(text_content)
-                            
-                        # 3. Перебираємо рейси і ТОЧКОВО додаємо customName
-                        total_flights = sum(len(p.get("flights", [])) for p in file_content)
-                        processed = 0
-                        changed = False
-                        
-                        for p in file_content:
-                            for f in p.get("flights", []):
-                                fid = str(f.get("_id") or f.get("id"))
-                                
-                                # Запит до Newsky чисто щоб дістати назву та ID борта
-                                det = await fetch_api(session, f"/flight/{fid}")
-                                if det and "flight" in det:
-                                    ns_flight = det["flight"]
-                                    custom_name = ns_flight.get("aircraft", {}).get("name")
-                                    ac_id = ns_flight.get("aircraft", {}).get("_id")
-                                    
-                                    # Ювелірна операція: додаємо поля, інше не чіпаємо
-                                    if "aircraft" in f:
-                                        if custom_name:
-                                            f["aircraft"]["customName"] = custom_name
-                                            changed = True
-                                        if ac_id:
-                                            f["aircraft"]["_id"] = ac_id
-                                            changed = True
-                                        
-                                processed += 1
-                                if processed % 10 == 0:
-                                    await status_msg.edit(content=f"⏳ **Обробка файлу `{week_file}`:** Звіряю з Newsky... ({processed}/{total_flights} рейсів)")
-                                    
-                        # 4. Зберігаємо файл назад на GitHub одним пушем
-                        if changed:
-                            await status_msg.edit(content=f"📤 **Обробка `{week_file}` завершена! Пушу оновлений файл на GitHub...**")
-                            new_content_str = json.dumps(file_content, ensure_ascii=False, indent=4)
-                            new_content_b64 = base64.b64encode(new_content_str.encode('utf-8')).decode('utf-8')
-                            
-                            push_payload = {
-                                "message": f"🤖 Auto-patch: added customName to {week_file}",
-                                "content": new_content_b64,
-                                "sha": file_sha
-                            }
-                            
-                            put_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{file_path}"
-                            async with session.put(put_url, headers=gh_headers, json=push_payload) as put_resp:
-                                if put_resp.status not in [200, 201]:
-                                    print(f"Помилка запису {week_file}: {await put_resp.text()}")
-                                    
-            await status_msg.edit(content="✅ **Операція `!patchnames` успішно завершена!**\nТільки `customName` було додано, всі ваші ручні редагування ідеально збережені.")
-            
-        except Exception as e:
-            await status_msg.edit(content=f"❌ **Помилка під час патчингу:** {e}")
-        return
-    # -------------------------------------------------------------
+            # 2. Оновлюємо локальне дзеркало бази GitHub (качаються лише змінені тижні)
+            await refresh_flights_mirror(session)
 
-	# --- 🔄 КОМАНДА: !syncghweek (СИНХРОНІЗАЦІЯ РЕЙСІВ ТИЖНЯ З ПІДТВЕРДЖЕННЯМ) ---
-    if message.content.startswith("!syncghweek"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
+            # 3. Групуємо рейси та шукаємо відсутні
+            ignored_list = load_ignored()
+            missing_flights = []
+            flights_list.sort(key=lambda x: x.get("updatedAt", ""))
 
-        # 1. Визначаємо початок тижня (вказаного або поточного)
-        parts = message.content.split()
-        now = datetime.now(timezone.utc)
-        
-        if len(parts) > 1 and parts[1].isdigit():
-            target_week = int(parts[1])
-            try:
-                # Шукаємо понеділок для вказаного тижня у поточному році
-                monday_start = datetime.fromisocalendar(now.year, target_week, 1).replace(tzinfo=timezone.utc)
-                monday_start = monday_start.replace(hour=0, minute=0, second=0, microsecond=0)
-            except ValueError:
-                return await message.channel.send("❌ **Помилка:** Неіснуючий номер тижня.")
-        else:
-            # Якщо номер не вказано — беремо поточний тиждень
-            monday_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+            valid_count = 0
+            for raw_f in flights_list:
+                if raw_f.get("deleted") or not raw_f.get("close"): continue
+                fid = str(raw_f.get("_id") or raw_f.get("id"))
+                if fid in ignored_list: continue
+
+                arrival_time = raw_f.get("arrTimeAct") or raw_f.get("close")
+                week_tag = get_iso_week(arrival_time)
+
+                # Перевіряємо, чи є рейс у базі (індекс дзеркала)
+                if find_flight_in_mirror(fid) is None:
+                    det = await fetch_flight(session, fid, priority="bulk")
+                    if det and "flight" in det:
+                        missing_flights.append((week_tag, det["flight"]))
+
+                valid_count += 1
+                if valid_count % 50 == 0:
+                    await status_msg.edit(content=f"⏳ **Звіряю з GitHub... Оброблено {valid_count}/{len(flights_list)} рейсів. Знайдено пропущених: {len(missing_flights)}**")
+
+            if not missing_flights:
+                return await status_msg.edit(content="✅ **Усі рейси за всі тижні вже на GitHub!** Відсутніх рейсів немає.")
+
+            # 4. Показуємо список ВСІХ рейсів (з розумним розбиттям на повідомлення)
+            header = f"📋 **Маю додати ось такі рейси ({len(missing_flights)} шт):**\n"
+            chunks = []
+            current_chunk = header
+
+            for w_tag, mf in missing_flights:
+                fid = mf.get("_id") or mf.get("id")
+                cs = mf.get("flightNumber") or mf.get("callsign") or "Unknown"
+                line = f"✈️ [{cs}](https://newsky.app/flight/{fid}) (Тиждень {w_tag})\n"
+
+                # Ліміт Discord - 2000 символів, ми беремо із запасом 1900
+                if len(current_chunk) + len(line) > 1900:
+                    chunks.append(current_chunk)
+                    current_chunk = line
+                else:
+                    current_chunk += line
 
-        start_iso = monday_start.strftime("%Y-%m-%dT%H:%M:%S.000Z")
-        current_week_tag = get_iso_week(start_iso) # Запускаємо через твою функцію для ідеального збігу формату
+            current_chunk += "\n✍️ Напиши `yes` щоб підтвердити, або `no` щоб скасувати (маєш 180 секунд)."
+            chunks.append(current_chunk)
 
-        status_msg = await message.channel.send(f"⏳ **Синхронізація з GitHub:** перевіряю рейси тижня (`{current_week_tag}`)...")
+            await status_msg.edit(content=chunks[0], suppress=True)
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                # 2. Завантажуємо рейси за тиждень з Newsky (з анти-лімітом)
-                flights_list = []
-                skip_count = 0
-                batch_size = 100
-                retry_count = 0
-                
-                while True:
-                    if retry_count == 0:
-                        await status_msg.edit(content=f"⏳ Завантажую з Newsky (зміщення: {skip_count})...")
-                        
-                    body = {"count": batch_size, "skip": skip_count, "start": start_iso}
-                    recent = await fetch_api(session, "/flights/recent", method="POST", body=body)
-                    
-                    # Якщо Newsky заблокував запит (429 ліміт), чекаємо 5 сек і пробуємо знову
-                    if recent is None:
-                        retry_count += 1
-                        if retry_count > 5:
-                            await status_msg.edit(content=f"❌ **Зупинка:** API Newsky не відповідає після 5 спроб. Вже викачано {len(flights_list)} рейсів.")
-                            break
-                        await asyncio.sleep(5)
-                        continue
-                        
-                    retry_count = 0 # Успіх! Скидаємо лічильник
-                    
-                    if not recent or "results" not in recent or not recent["results"]: 
-                        break # Справжнє дно списку для цього тижня
-                        
-                    flights_list.extend(recent["results"])
-                    if len(recent["results"]) < batch_size: 
-                        break # Менше 100 рейсів — це остання сторінка
-                        
-                    skip_count += batch_size
-                    
-                total_found = len(flights_list)
-                if total_found == 0:
-                    return await status_msg.edit(content=f"✅ **За тиждень `{current_week_tag}` ще немає рейсів на Newsky.**")
-
-                await status_msg.edit(content=f"⏳ **Знайдено {total_found} рейсів на Newsky. Читаю базу GitHub...**")
-
-                # 3. Читаємо поточний файл тижня з GitHub
-                week_filename = f"{current_week_tag}.json"
-                file_path = f"FLIGHTS/{week_filename}"
-                gh_headers = {
-                    "Authorization": f"token {GITHUB_TOKEN}",
-                    "Accept": "application/vnd.github.v3+json",
-                    "Cache-Control": "no-cache"
-                }
-                
-                file_sha = None
-                github_file_content = []
-                
-                dir_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/FLIGHTS?t={int(time.time())}"
-                async with session.get(dir_url, headers=gh_headers) as dir_resp:
-                    if dir_resp.status == 200:
-                        dir_data = await dir_resp.json()
-                        if isinstance(dir_data, list):
-                            for item in dir_data:
-                                if item.get("name") == week_filename:
-                                    file_sha = item.get("sha")
-                                    break
-                                    
-                if file_sha:
-                    blob_url = f"https://api.github.com/repos/{GITHUB_REPO}/git/blobs/{file_sha}"
-                    async with session.get(blob_url, headers=gh_headers) as blob_resp:
-                        if blob_resp.status == 200:
-                            blob_data = await blob_resp.json()
-                            text_content = base64.b64decode(blob_data['content']).decode('utf-8')
-                            github_file_content = json.loads(text_content)
-
-                # 4. Визначаємо відсутні рейси
-                ignored_list = load_ignored()
-                missing_flights = []
-                flights_list.sort(key=lambda x: x.get("updatedAt", ""))
-
-                for raw_f in flights_list:
-                    if raw_f.get("deleted") or not raw_f.get("close"): continue
-                    
-                    fid = str(raw_f.get("_id") or raw_f.get("id"))
-                    if fid in ignored_list: continue
-                    
-                    arrival_time = raw_f.get("arrTimeAct") or raw_f.get("close")
-                    if get_iso_week(arrival_time) != current_week_tag: continue
-                    
-                    # Перевіряємо, чи рейс ВЖЕ Є на гітхабі
-                    already_exists = any(
-                        str(f.get("_id")) == fid or str(f.get("id")) == fid 
-                        for p in github_file_content for f in p.get("flights", [])
-                    )
-                    
-                    if not already_exists:
-                        det = await fetch_api(session, f"/flight/{fid}")
-                        if det and "flight" in det:
-                            missing_flights.append(det["flight"])
-
-                if not missing_flights:
-                    return await status_msg.edit(content=f"✅ **Усі рейси за тиждень `{current_week_tag}` вже на GitHub!** Відсутніх рейсів немає.")
-
-                # 5. Показуємо список ВСІХ рейсів (з розумним розбиттям на повідомлення)
-                header = f"📋 **Маю додати ось такі рейси ({len(missing_flights)} шт) для {current_week_tag}:**\n"
-                chunks = []
-                current_chunk = header
-                
-                for mf in missing_flights:
-                    fid = mf.get("_id") or mf.get("id")
-                    cs = mf.get("flightNumber") or mf.get("callsign") or "Unknown"
-                    line = f"✈️ [{cs}](https://newsky.app/flight/{fid})\n"
-                    
-                    if len(current_chunk) + len(line) > 1900:
-                        chunks.append(current_chunk)
-                        current_chunk = line
+            # Якщо шматків багато, відправляємо додаткові повідомлення
+            extra_msgs = []
+            for chunk in chunks[1:]:
+                msg = await message.channel.send(content=chunk, suppress_embeds=True)
+                extra_msgs.append(msg)
+
+            def check(m):
+                return m.author == message.author and m.channel == message.channel and m.content.lower() in ['yes', 'no']
+
+            try:
+                reply = await client.wait_for('message', check=check, timeout=180.0)
+                if reply.content.lower() == 'no':
+                    return await status_msg.edit(content="❌ **Синхронізацію скасовано.**")
+            except asyncio.TimeoutError:
+                return await status_msg.edit(content="⏳ **Час вийшов (180 сек).** Синхронізацію скасовано.")
+            finally:
+                # Очищаємо додаткові повідомлення, щоб не засмічувати чат
+                for msg in extra_msgs:
+                    try: await msg.delete()
+                    except: pass
+
+            # 5. КОРИСТУВАЧ ПІДТВЕРДИВ (yes) -> М'ясорубка і Єдиний Batch Push
+            await status_msg.edit(content="⏳ **Підтверджено! Обробляю рейси та записую на GitHub єдиним комітом...**")
+
+            async with GITHUB_DB_LOCK:
+                # За 180 секунд очікування база могла змінитися — звіряємо дзеркало ще раз
+                await refresh_flights_mirror(session)
+                files_to_push = {}
+                loaded_weeks = {}
+
+                for w_tag, f in missing_flights:
+                    week_filename = f"{w_tag}.json"
+                    file_path = f"FLIGHTS/{week_filename}"
+                    fid = str(f.get("_id") or f.get("id"))
+                    if find_flight_in_mirror(fid) is not None: continue
+
+                    t = f.get("result", {}).get("totals", {})
+                    if t.get("distance", 0) == 0 and t.get("time", 0) == 0: continue
+
+                    clean_flight = format_flight_for_db(f)
+                    pilot_data = f.get("pilot", {})
+                    pilot_id = pilot_data.get("_id", "unknown")
+                    pilot_name = pilot_data.get("fullname", "Unknown Pilot")
+                    pilot_avatar = pilot_data.get("avatar", "default")
+
+                    if week_filename not in loaded_weeks:
+                        loaded_weeks[week_filename] = get_mirror_week(week_filename)[0]
+                    file_content = loaded_weeks[week_filename]
+
+                    existing_pilot = next((p for p in file_content if p.get("pilot_id") == pilot_id), None)
+                    if existing_pilot:
+                        existing_pilot["flights"].append(clean_flight)
                     else:
-                        current_chunk += line
-                
-                current_chunk += "\n✍️ Напиши `yes` щоб підтвердити, або `no` щоб скасувати (маєш 180 секунд)."
-                chunks.append(current_chunk)
+                        file_content.append({
+                            "pilot_id": pilot_id, "fullname": pilot_name, "avatar": pilot_avatar, "flights": [clean_flight]
+                        })
 
-                await status_msg.edit(content=chunks[0], suppress=True)
-                
-                extra_msgs = []
-                for chunk in chunks[1:]:
-                    msg = await message.channel.send(content=chunk, suppress=True)
-                    extra_msgs.append(msg)
+                    # Готуємо файл до масового пушу
+                    files_to_push[file_path] = json.dumps(file_content, ensure_ascii=False, indent=4)
 
-                def check(m):
-                    return m.author == message.author and m.channel == message.channel and m.content.lower() in ['yes', 'no']
+                # Відправляємо єдиним комітом через push_to_github_batch
+                success = await push_to_github_batch(session, files_to_push, f"🤖 Auto-sync: added {len(missing_flights)} missing flights across multiple weeks")
 
-                try:
-                    reply = await client.wait_for('message', check=check, timeout=180.0)
-                    if reply.content.lower() == 'no':
-                        return await status_msg.edit(content="❌ **Синхронізацію скасовано.**")
-                except asyncio.TimeoutError:
-                    return await status_msg.edit(content="⏳ **Час вийшов (180 сек).** Синхронізацію скасовано.")
-                finally:
-                    # Очищаємо додаткові повідомлення
-                    for msg in extra_msgs:
-                        try: await msg.delete()
-                        except: pass
-
-                # 6. КОРИСТУВАЧ ПІДТВЕРДИВ (yes) -> М'ясорубка і Єдиний Пуш
-                await status_msg.edit(content="⏳ **Підтверджено! Обробляю рейси та записую на GitHub єдиним комітом...**")
-                
-                async with GITHUB_DB_LOCK:
-                    # Повторно витягуємо SHA, на випадок, якщо файл змінився під час 180 секунд очікування
-                    async with session.get(dir_url, headers=gh_headers) as dir_resp:
-                        if dir_resp.status == 200:
-                            dir_data = await dir_resp.json()
-                            if isinstance(dir_data, list):
-                                for item in dir_data:
-                                    if item.get("name") == week_filename:
-                                        file_sha = item.get("sha")
-                                        break
-                                        
-                    if file_sha:
-                        blob_url = f"https://api.github.com/repos/{GITHUB_REPO}/git/blobs/{file_sha}"
-                        async with session.get(blob_url, headers=gh_headers) as blob_resp:
-                            if blob_resp.status == 200:
-                                blob_data = await blob_resp.json()
-                                github_file_content = json.loads(base64.b64decode(blob_data['content']).decode('utf-8'))
-
-                    for f in missing_flights:
-                        # Подвійний захист від дублів
-                        fid = str(f.get("_id") or f.get("id"))
-                        if any(str(ex_f.get("_id")) == fid for p in github_file_content for ex_f in p.get("flights", [])):
-                            continue
-                            
-                        t = f.get("result", {}).get("totals", {})
-                        if t.get("distance", 0) == 0 and t.get("time", 0) == 0: continue
-                        
-                        clean_flight = format_flight_for_db(f)
-                        pilot_data = f.get("pilot", {})
-                        pilot_id = pilot_data.get("_id", "unknown")
-                        pilot_name = pilot_data.get("fullname", "Unknown Pilot")
-                        pilot_avatar = pilot_data.get("avatar", "default")
-                        
-                        existing_pilot = next((p for p in github_file_content if p.get("pilot_id") == pilot_id), None)
-                        if existing_pilot:
-                            existing_pilot["flights"].append(clean_flight)
-                        else:
-                            github_file_content.append({
-                                "pilot_id": pilot_id, "fullname": pilot_name, "avatar": pilot_avatar, "flights": [clean_flight]
-                            })
-                            
-                    # Пушимо одним комітом
-                    new_content_str = json.dumps(github_file_content, ensure_ascii=False, indent=4)
-                    new_content_b64 = base64.b64encode(new_content_str.encode('utf-8')).decode('utf-8')
-                    
-                    push_payload = {
-                        "message": f"🤖 Auto-sync: confirmed addition of {len(missing_flights)} flights to {current_week_tag}",
-                        "content": new_content_b64
-                    }
-                    if file_sha: push_payload["sha"] = file_sha
-                    
-                    put_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{file_path}"
-                    async with session.put(put_url, headers=gh_headers, json=push_payload) as put_resp:
-                        if put_resp.status in [200, 201]:
-                            await status_msg.edit(content=f"✅ **Успіх!** Додано **{len(missing_flights)}** рейсів у файл `{week_filename}` на GitHub.")
-                        else:
-                            await status_msg.edit(content=f"❌ **Помилка запису на GitHub:** {await put_resp.text()}")
+                if success:
+                    for file_path, content_str in files_to_push.items():
+                        record_mirror_week(file_path.split("/", 1)[1], content_str)
+                    await status_msg.edit(content=f"✅ **Успіх!** Додано **{len(missing_flights)}** пропущених рейсів у {len(files_to_push)} файлів на GitHub (одним комітом).")
+                else:
+                    await status_msg.edit(content=f"❌ **Помилка пакетного запису на GitHub.**")
 
-        except Exception as e:
-            await status_msg.edit(content=f"❌ **Сталася помилка:** {e}")
-        return
-    # -------------------------------------------------------------
-	
-# --- 📥 КОМАНДА: !syncweek (СИНХРОНІЗАЦІЯ ЗА ЧАСОМ ЗАКРИТТЯ РЕЙСІВ) ---
-    if message.content.startswith("!syncweek"):
-        if not is_admin: 
-            return await message.channel.send("🚫 **Access Denied**")
-        
-        # 1. Читаємо кількість рейсів (за замовчуванням 100)
-        parts = message.content.split()
-        target_count = 100
-        if len(parts) > 1 and parts[1].isdigit():
-            target_count = int(parts[1])
-            
-        # 2. Визначаємо початок поточного тижня (Понеділок, 00:00:00 UTC)
-        now = datetime.now(timezone.utc)
-        monday = now - timedelta(days=now.weekday())
-        monday_start = monday.replace(hour=0, minute=0, second=0, microsecond=0)
-        start_iso = monday_start.strftime("%Y-%m-%dT%H:%M:%S.000Z")
-        current_week_tag = get_iso_week()
-        
-        status_msg = await message.channel.send(f"⏳ **Рахую рейси (ліміт: {target_count}) з початку тижня ({monday_start.strftime('%d.%m.%Y')})...**")
-        
+    except Exception as e:
+        await status_msg.edit(content=f"❌ **Сталася помилка:** {e}")
+    return
+
+# -------------------------------------------------------------
+
+# --- 🛠️ КОМАНДА: !patchnames (ДОДАТИ ТІЛЬКИ customName В СТАРІ ФАЙЛИ) ---
+@command("!patchnames", admin=True)
+async def cmd_patchnames(message, is_admin):
+    # Список файлів, які треба опрацювати
+    target_weeks = [f"2026-W{i:02d}.json" for i in range(2, 26)]
+    status_msg = await message.channel.send(f"⏳ **Починаю патчинг файлів: {', '.join(target_weeks)}...**\n*(Додаю ТІЛЬКИ customName, ваші ручні зміни не чіпаю)*")
+
+    gh_headers = {
+        "Authorization": f"token {GITHUB_TOKEN}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+
+    try:
+        async with GITHUB_DB_LOCK:
+            async with shared_http_session() as session:
+                # 1. Один раз звіряємо дзеркало з GitHub (замість списку файлів на кожен тиждень)
+                await status_msg.edit(content="⏳ **Звіряю локальне дзеркало бази з GitHub...**")
+                await refresh_flights_mirror(session)
+
+                for week_file in target_weeks:
+                    file_path = f"FLIGHTS/{week_file}"
+                    await status_msg.edit(content=f"⏳ **Обробка файлу `{week_file}`...**")
+
+                    # 2. Беремо вміст файлу з дзеркала
+                    file_content, file_sha = get_mirror_week(week_file)
+                    if not file_sha:
+                        continue # Якщо файлу немає, просто пропускаємо
+
+                    # 3. Перебираємо рейси і ТОЧКОВО додаємо customName
+                    total_flights = sum(len(p.get("flights", [])) for p in file_content)
+                    processed = 0
+                    changed = False
+
+                    for p in file_content:
+                        for f in p.get("flights", []):
+                            fid = str(f.get("_id") or f.get("id"))
+
+                            # Запит до Newsky чисто щоб дістати назву та ID борта
+                            det = await fetch_flight(session, fid, priority="bulk")
+                            if det and "flight" in det:
+                                ns_flight = det["flight"]
+                                custom_name = ns_flight.get("aircraft", {}).get("name")
+                                ac_id = ns_flight.get("aircraft", {}).get("_id")
+
+                                # Ювелірна операція: додаємо поля, інше не чіпаємо
+                                if "aircraft" in f:
+                                    if custom_name:
+                                        f["aircraft"]["customName"] = custom_name
+                                        changed = True
+                                    if ac_id:
+                                        f["aircraft"]["_id"] = ac_id
+                                        changed = True
+
+                            processed += 1
+                            if processed % 10 == 0:
+                                await status_msg.edit(content=f"⏳ **Обробка файлу `{week_file}`:** Звіряю з Newsky... ({processed}/{total_flights} рейсів)")
+
+                    # 4. Зберігаємо файл назад на GitHub одним пушем
+                    if changed:
+                        await status_msg.edit(content=f"📤 **Обробка `{week_file}` завершена! Пушу оновлений файл на GitHub...**")
+                        new_content_str = json.dumps(file_content, ensure_ascii=False, indent=4)
+                        new_content_b64 = base64.b64encode(new_content_str.encode('utf-8')).decode('utf-8')
+
+                        push_payload = {
+                            "message": f"🤖 Auto-patch: added customName to {week_file}",
+                            "content": new_content_b64,
+                            "sha": file_sha
+                        }
+
+                        put_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{file_path}"
+                        async with session.put(put_url, headers=gh_headers, json=push_payload) as put_resp:
+                            if put_resp.status not in [200, 201]:
+                                print(f"Помилка запису {week_file}: {await put_resp.text()}")
+                            else:
+                                record_mirror_week(week_file, new_content_str)
+
+        await status_msg.edit(content="✅ **Операція `!patchnames` успішно завершена!**\nТільки `customName` було додано, всі ваші ручні редагування ідеально збережені.")
+
+    except Exception as e:
+        await status_msg.edit(content=f"❌ **Помилка під час патчингу:** {e}")
+    return
+
+# -------------------------------------------------------------
+
+# --- 🔄 КОМАНДА: !syncghweek (СИНХРОНІЗАЦІЯ РЕЙСІВ ТИЖНЯ З ПІДТВЕРДЖЕННЯМ) ---
+@command("!syncghweek", admin=True)
+async def cmd_syncghweek(message, is_admin):
+    # 1. Визначаємо початок тижня (вказаного або поточного)
+    parts = message.content.split()
+    now = datetime.now(timezone.utc)
+
+    if len(parts) > 1 and parts[1].isdigit():
+        target_week = int(parts[1])
         try:
-            async with aiohttp.ClientSession() as session:
-                # --- НОВИЙ БЛОК ЗБОРУ РЕЙСІВ (ПАГІНАЦІЯ) ---
-                flights_list = []
-                skip_count = 0
-                
-                while len(flights_list) < target_count:
-                    request_count = min(100, target_count - len(flights_list))
-                    
-                    body = {
-                        "count": request_count, 
-                        "start": start_iso,
-                        "skip": skip_count
-                    }
-                    recent = await fetch_api(session, "/flights/recent", method="POST", body=body)
-                    
-                    if not recent or "results" not in recent:
-                        if skip_count == 0:
-                            return await status_msg.edit(content="❌ **Помилка:** Не вдалося отримати список рейсів від Newsky.")
-                        break
-                    
-                    batch = recent["results"]
-                    flights_list.extend(batch)
-                    
-                    if len(batch) < request_count:
+            # Шукаємо понеділок для вказаного тижня у поточному році
+            monday_start = datetime.fromisocalendar(now.year, target_week, 1).replace(tzinfo=timezone.utc)
+            monday_start = monday_start.replace(hour=0, minute=0, second=0, microsecond=0)
+        except ValueError:
+            return await message.channel.send("❌ **Помилка:** Неіснуючий номер тижня.")
+    else:
+        # Якщо номер не вказано — беремо поточний тиждень
+        monday_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    start_iso = monday_start.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    current_week_tag = get_iso_week(start_iso) # Запускаємо через твою функцію для ідеального збігу формату
+
+    status_msg = await message.channel.send(f"⏳ **Синхронізація з GitHub:** перевіряю рейси тижня (`{current_week_tag}`)...")
+
+    try:
+        async with shared_http_session() as session:
+            # 2. Завантажуємо рейси за тиждень з Newsky (з анти-лімітом)
+            flights_list = []
+            skip_count = 0
+            batch_size = 100
+            retry_count = 0
+
+            while True:
+                if retry_count == 0:
+                    await status_msg.edit(content=f"⏳ Завантажую з Newsky (зміщення: {skip_count})...")
+
+                body = {"count": batch_size, "skip": skip_count, "start": start_iso}
+                recent = await fetch_api(session, "/flights/recent", method="POST", body=body, priority="bulk")
+
+                # Якщо Newsky заблокував запит (429 ліміт), чекаємо 5 сек і пробуємо знову
+                if recent is None:
+                    retry_count += 1
+                    if retry_count > 5:
+                        await status_msg.edit(content=f"❌ **Зупинка:** API Newsky не відповідає після 5 спроб. Вже викачано {len(flights_list)} рейсів.")
                         break
-                        
-                    skip_count += request_count
-                # ---------------------------------------------
-                
-                # --- СТАРА ЛОГІКА ОБРОБКИ (БЕЗ ЗМІН) ---
-                total_found = len(flights_list)
-                added_count = 0
-                
-                if total_found == 0:
-                    return await status_msg.edit(content="✅ **За цей тиждень ще немає завершених рейсів.**")
-                
-                # 🔥 МАГІЯ ТУТ: Сортуємо строго за часом ЗАКРИТТЯ рейсу (updatedAt)
-                # Від тих, що закрилися першими, до тих, що закрилися щойно.
-                # Це повністю імітує роботу живого бота!
-                flights_list.sort(key=lambda x: x.get("updatedAt", ""))
-                
-                await status_msg.edit(content=f"⏳ **Знайдено {total_found} рейсів. Додаю в порядку їх закриття...**")
+                    await asyncio.sleep(5)
+                    continue
 
-                ignored_list = load_ignored()
-                fid = "Невідомо"
-                for raw_f in flights_list:
-                    if raw_f.get("deleted") or not raw_f.get("close"):
-                        continue
-                        
-                    fid = str(raw_f.get("_id") or raw_f.get("id"))
-                    
-                    if fid in ignored_list:
-                        continue
-                    
-                    det = await fetch_api(session, f"/flight/{fid}")
-                    if not det or "flight" not in det: 
+                retry_count = 0 # Успіх! Скидаємо лічильник
+
+                if not recent or "results" not in recent or not recent["results"]: 
+                    break # Справжнє дно списку для цього тижня
+
+                flights_list.extend(recent["results"])
+                if len(recent["results"]) < batch_size: 
+                    break # Менше 100 рейсів — це остання сторінка
+
+                skip_count += batch_size
+
+            total_found = len(flights_list)
+            if total_found == 0:
+                return await status_msg.edit(content=f"✅ **За тиждень `{current_week_tag}` ще немає рейсів на Newsky.**")
+
+            await status_msg.edit(content=f"⏳ **Знайдено {total_found} рейсів на Newsky. Читаю базу GitHub...**")
+
+            # 3. Читаємо поточний файл тижня з GitHub
+            week_filename = f"{current_week_tag}.json"
+            file_path = f"FLIGHTS/{week_filename}"
+            gh_headers = {
+                "Authorization": f"token {GITHUB_TOKEN}",
+                "Accept": "application/vnd.github.v3+json"
+            }
+
+            await refresh_flights_mirror(session)
+
+            # 4. Визначаємо відсутні рейси
+            ignored_list = load_ignored()
+            missing_flights = []
+            flights_list.sort(key=lambda x: x.get("updatedAt", ""))
+
+            for raw_f in flights_list:
+                if raw_f.get("deleted") or not raw_f.get("close"): continue
+
+                fid = str(raw_f.get("_id") or raw_f.get("id"))
+                if fid in ignored_list: continue
+
+                arrival_time = raw_f.get("arrTimeAct") or raw_f.get("close")
+                if get_iso_week(arrival_time) != current_week_tag: continue
+
+                # Перевіряємо, чи рейс ВЖЕ Є на гітхабі
+                if find_flight_in_mirror(fid) is None:
+                    det = await fetch_flight(session, fid, priority="bulk")
+                    if det and "flight" in det:
+                        missing_flights.append(det["flight"])
+
+            if not missing_flights:
+                return await status_msg.edit(content=f"✅ **Усі рейси за тиждень `{current_week_tag}` вже на GitHub!** Відсутніх рейсів немає.")
+
+            # 5. Показуємо список ВСІХ рейсів (з розумним розбиттям на повідомлення)
+            header = f"📋 **Маю додати ось такі рейси ({len(missing_flights)} шт) для {current_week_tag}:**\n"
+            chunks = []
+            current_chunk = header
+
+            for mf in missing_flights:
+                fid = mf.get("_id") or mf.get("id")
+                cs = mf.get("flightNumber") or mf.get("callsign") or "Unknown"
+                line = f"✈️ [{cs}](https://newsky.app/flight/{fid})\n"
+
+                if len(current_chunk) + len(line) > 1900:
+                    chunks.append(current_chunk)
+                    current_chunk = line
+                else:
+                    current_chunk += line
+
+            current_chunk += "\n✍️ Напиши `yes` щоб підтвердити, або `no` щоб скасувати (маєш 180 секунд)."
+            chunks.append(current_chunk)
+
+            await status_msg.edit(content=chunks[0], suppress=True)
+
+            extra_msgs = []
+            for chunk in chunks[1:]:
+                msg = await message.channel.send(content=chunk, suppress=True)
+                extra_msgs.append(msg)
+
+            def check(m):
+                return m.author == message.author and m.channel == message.channel and m.content.lower() in ['yes', 'no']
+
+            try:
+                reply = await client.wait_for('message', check=check, timeout=180.0)
+                if reply.content.lower() == 'no':
+                    return await status_msg.edit(content="❌ **Синхронізацію скасовано.**")
+            except asyncio.TimeoutError:
+                return await status_msg.edit(content="⏳ **Час вийшов (180 сек).** Синхронізацію скасовано.")
+            finally:
+                # Очищаємо додаткові повідомлення
+                for msg in extra_msgs:
+                    try: await msg.delete()
+                    except: pass
+
+            # 6. КОРИСТУВАЧ ПІДТВЕРДИВ (yes) -> М'ясорубка і Єдиний Пуш
+            await status_msg.edit(content="⏳ **Підтверджено! Обробляю рейси та записую на GitHub єдиним комітом...**")
+
+            async with GITHUB_DB_LOCK:
+                # Повторно звіряємо дзеркало, на випадок, якщо файл змінився під час 180 секунд очікування
+                await refresh_flights_mirror(session)
+                github_file_content, file_sha = get_mirror_week(week_filename)
+
+                for f in missing_flights:
+                    # Подвійний захист від дублів
+                    fid = str(f.get("_id") or f.get("id"))
+                    if find_flight_in_mirror(fid) is not None:
                         continue
-                        
-                    f = det["flight"]
+
                     t = f.get("result", {}).get("totals", {})
-                    
-                    if t.get("distance", 0) == 0 and t.get("time", 0) == 0:
-                        continue
-                        
-                    sched_time = f.get("depTime") or f.get("createdAt")
-                    week_tag = get_iso_week(sched_time)
-                    
-                    if week_tag != current_week_tag:
-                        continue
-                    
-                    update_weekly_stats(f, week_tag)
-                    added_count += 1
-                    
-                    if added_count % 5 == 0:
-                        await status_msg.edit(content=f"⏳ **Синхронізація: додано {added_count} / {total_found} рейсів...**")
-                        
-                await status_msg.edit(content=f"✅ **Синхронізація завершена!**\nДодано **{added_count}** рейсів у статистику так, якби бот був онлайн весь тиждень.")
-                
-        except Exception as e:
-            await status_msg.edit(content=f"❌ **Сталася помилка на рейсі {fid}:** {e}")
-        return
-    # -------------------------------------------------------------
-    
-    # --- 🧪 КОМАНДА: !testcharter (ПРОТЕСТУВАТИ ДИЗАЙН ЧАРТЕРУ - ТІЛЬКИ В ПП) ---
-    if message.content == "!testcharter":
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        # 🔥 Перевірка на те, чи це ПП (Direct Messages) 🔥
-        if not isinstance(message.channel, discord.DMChannel):
-            return await message.channel.send("⚠️ **This command ONLY works in Direct Messages (DM)!** Please send me a private message.")
-        
-        status_msg = await message.channel.send("⏳ **Шукаю будь-який чартер для тесту дизайну...**")
-        try:
-            ns_headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                "Cookie": f"sid={NEWSKY_SID}" if not NEWSKY_SID.startswith("sid=") else NEWSKY_SID,
-                "Accept": "application/json"
-            }
-            async with aiohttp.ClientSession() as session:
-                async with session.get("https://newsky.app/api/charter/recent/pax", headers=ns_headers, timeout=15) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if data:
-                            # Беремо просто перший чартер зі списку для тесту
-                            charter = data[0] 
-                            
-                            dep_icao = charter.get("dep", {}).get("icao", "")
-                            arr_icao = charter.get("arr", {}).get("icao", "")
-                            
-                            dep_str = format_airport_string(dep_icao, charter.get("dep", {}).get("name", ""))
-                            arr_str = format_airport_string(arr_icao, charter.get("arr", {}).get("name", ""))
-                            
-                            exp_dt = datetime.fromisoformat(charter.get("activeTo", "").replace("Z", "+00:00"))
-                            exp_str = exp_dt.strftime("%d %b, %H:%M UTC")
-                            
-                            quota = charter.get("quota", 0)
-                            dist = charter.get("distance", 0)
-                            
-                            desc = (
-                                    f"{dep_str} ➔ {arr_str}\n\n"
-                                    f"📊 **Contract Info**\n"
-                                    f"╰ 👫 Quota: **{quota} Pax**\n"
-                                    f"╰ 📏 Dist: **{dist} nm**\n"
-                                    f"╰ ⏳ Exp: **{exp_str}**"
-                                )
-                            
-                            embed = discord.Embed(
-                                title="<:charter:1499317989483221063> New Charter Contract Available!", 
-                                description=desc, 
-                                color=0xffcc00
+                    if t.get("distance", 0) == 0 and t.get("time", 0) == 0: continue
+
+                    clean_flight = format_flight_for_db(f)
+                    pilot_data = f.get("pilot", {})
+                    pilot_id = pilot_data.get("_id", "unknown")
+                    pilot_name = pilot_data.get("fullname", "Unknown Pilot")
+                    pilot_avatar = pilot_data.get("avatar", "default")
+
+                    existing_pilot = next((p for p in github_file_content if p.get("pilot_id") == pilot_id), None)
+                    if existing_pilot:
+                        existing_pilot["flights"].append(clean_flight)
+                    else:
+                        github_file_content.append({
+                            "pilot_id": pilot_id, "fullname": pilot_name, "avatar": pilot_avatar, "flights": [clean_flight]
+                        })
+
+                # Пушимо одним комітом
+                new_content_str = json.dumps(github_file_content, ensure_ascii=False, indent=4)
+                new_content_b64 = base64.b64encode(new_content_str.encode('utf-8')).decode('utf-8')
+
+                push_payload = {
+                    "message": f"🤖 Auto-sync: confirmed addition of {len(missing_flights)} flights to {current_week_tag}",
+                    "content": new_content_b64
+                }
+                if file_sha: push_payload["sha"] = file_sha
+
+                put_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{file_path}"
+                async with session.put(put_url, headers=gh_headers, json=push_payload) as put_resp:
+                    if put_resp.status in [200, 201]:
+                        record_mirror_week(week_filename, new_content_str)
+                        await status_msg.edit(content=f"✅ **Успіх!** Додано **{len(missing_flights)}** рейсів у файл `{week_filename}` на GitHub.")
+                    else:
+                        await status_msg.edit(content=f"❌ **Помилка запису на GitHub:** {await put_resp.text()}")
+
+    except Exception as e:
+        await status_msg.edit(content=f"❌ **Сталася помилка:** {e}")
+    return
+
+# -------------------------------------------------------------
+
+# --- 📥 КОМАНДА: !syncweek (СИНХРОНІЗАЦІЯ ЗА ЧАСОМ ЗАКРИТТЯ РЕЙСІВ) ---
+@command("!syncweek", admin=True)
+async def cmd_syncweek(message, is_admin):
+    # 1. Читаємо кількість рейсів (за замовчуванням 100)
+    parts = message.content.split()
+    target_count = 100
+    if len(parts) > 1 and parts[1].isdigit():
+        target_count = int(parts[1])
+
+    # 2. Визначаємо початок поточного тижня (Понеділок, 00:00:00 UTC)
+    now = datetime.now(timezone.utc)
+    monday = now - timedelta(days=now.weekday())
+    monday_start = monday.replace(hour=0, minute=0, second=0, microsecond=0)
+    start_iso = monday_start.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    current_week_tag = get_iso_week()
+
+    status_msg = await message.channel.send(f"⏳ **Рахую рейси (ліміт: {target_count}) з початку тижня ({monday_start.strftime('%d.%m.%Y')})...**")
+
+    try:
+        async with shared_http_session() as session:
+            # --- НОВИЙ БЛОК ЗБОРУ РЕЙСІВ (ПАГІНАЦІЯ) ---
+            flights_list = []
+            skip_count = 0
+
+            while len(flights_list) < target_count:
+                request_count = min(100, target_count - len(flights_list))
+
+                body = {
+                    "count": request_count, 
+                    "start": start_iso,
+                    "skip": skip_count
+                }
+                recent = await fetch_api(session, "/flights/recent", method="POST", body=body, priority="bulk")
+
+                if not recent or "results" not in recent:
+                    if skip_count == 0:
+                        return await status_msg.edit(content="❌ **Помилка:** Не вдалося отримати список рейсів від Newsky.")
+                    break
+
+                batch = recent["results"]
+                flights_list.extend(batch)
+
+                if len(batch) < request_count:
+                    break
+
+                skip_count += request_count
+            # ---------------------------------------------
+
+            # --- СТАРА ЛОГІКА ОБРОБКИ (БЕЗ ЗМІН) ---
+            total_found = len(flights_list)
+            added_count = 0
+
+            if total_found == 0:
+                return await status_msg.edit(content="✅ **За цей тиждень ще немає завершених рейсів.**")
+
+            # 🔥 МАГІЯ ТУТ: Сортуємо строго за часом ЗАКРИТТЯ рейсу (updatedAt)
+            # Від тих, що закрилися першими, до тих, що закрилися щойно.
+            # Це повністю імітує роботу живого бота!
+            flights_list.sort(key=lambda x: x.get("updatedAt", ""))
+
+            await status_msg.edit(content=f"⏳ **Знайдено {total_found} рейсів. Додаю в порядку їх закриття...**")
+
+            ignored_list = load_ignored()
+            fid = "Невідомо"
+            for raw_f in flights_list:
+                if raw_f.get("deleted") or not raw_f.get("close"):
+                    continue
+
+                fid = str(raw_f.get("_id") or raw_f.get("id"))
+
+                if fid in ignored_list:
+                    continue
+
+                det = await fetch_flight(session, fid, priority="bulk")
+                if not det or "flight" not in det: 
+                    continue
+
+                f = det["flight"]
+                t = f.get("result", {}).get("totals", {})
+
+                if t.get("distance", 0) == 0 and t.get("time", 0) == 0:
+                    continue
+
+                sched_time = f.get("depTime") or f.get("createdAt")
+                week_tag = get_iso_week(sched_time)
+
+                if week_tag != current_week_tag:
+                    continue
+
+                update_weekly_stats(f, week_tag)
+                added_count += 1
+
+                if added_count % 5 == 0:
+                    await status_msg.edit(content=f"⏳ **Синхронізація: додано {added_count} / {total_found} рейсів...**")
+
+            await status_msg.edit(content=f"✅ **Синхронізація завершена!**\nДодано **{added_count}** рейсів у статистику так, якби бот був онлайн весь тиждень.")
+
+    except Exception as e:
+        await status_msg.edit(content=f"❌ **Сталася помилка на рейсі {fid}:** {e}")
+    return
+
+# -------------------------------------------------------------
+
+# --- 🧪 КОМАНДА: !testcharter (ПРОТЕСТУВАТИ ДИЗАЙН ЧАРТЕРУ - ТІЛЬКИ В ПП) ---
+@command("!testcharter", admin=True, dm_only=True)
+async def cmd_testcharter(message, is_admin):
+    status_msg = await message.channel.send("⏳ **Шукаю будь-який чартер для тесту дизайну...**")
+    try:
+        ns_headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "Cookie": f"sid={NEWSKY_SID}" if not NEWSKY_SID.startswith("sid=") else NEWSKY_SID,
+            "Accept": "application/json"
+        }
+        async with shared_http_session() as session:
+            async with session.get("https://newsky.app/api/charter/recent/pax", headers=ns_headers, timeout=15) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    if data:
+                        # Беремо просто перший чартер зі списку для тесту
+                        charter = data[0] 
+
+                        dep_icao = charter.get("dep", {}).get("icao", "")
+                        arr_icao = charter.get("arr", {}).get("icao", "")
+
+                        dep_str = format_airport_string(dep_icao, charter.get("dep", {}).get("name", ""))
+                        arr_str = format_airport_string(arr_icao, charter.get("arr", {}).get("name", ""))
+
+                        exp_dt = datetime.fromisoformat(charter.get("activeTo", "").replace("Z", "+00:00"))
+                        exp_str = exp_dt.strftime("%d %b, %H:%M UTC")
+
+                        quota = charter.get("quota", 0)
+                        dist = charter.get("distance", 0)
+
+                        desc = (
+                                f"{dep_str} ➔ {arr_str}\n\n"
+                                f"📊 **Contract Info**\n"
+                                f"╰ 👫 Quota: **{quota} Pax**\n"
+                                f"╰ 📏 Dist: **{dist} nm**\n"
+                                f"╰ ⏳ Exp: **{exp_str}**"
                             )
-                            
-                            await message.channel.send(content="🛠️ **Ось так виглядатиме сповіщення:**", embed=embed)
-                            await status_msg.delete()
-                        else:
-                            await status_msg.edit(content="❌ **Наразі немає жодного чартеру в API для тесту.**")
-        except Exception as e:
-            await status_msg.edit(content=f"❌ **Помилка:** {e}")
-        return
-    # -------------------------------------------------------------
 
-	# --- 🔄 КОМАНДА: !updatedemand (ПРИМУСОВЕ ОНОВЛЕННЯ GITHUB) ---
-    if message.content == "!updatedemand":
-        if not is_admin: 
-            return await message.channel.send("🚫 **Access Denied**")
+                        embed = discord.Embed(
+                            title="<:charter:1499317989483221063> New Charter Contract Available!", 
+                            description=desc, 
+                            color=0xffcc00
+                        )
+
+                        await message.channel.send(content="🛠️ **Ось так виглядатиме сповіщення:**", embed=embed)
+                        await status_msg.delete()
+                    else:
+                        await status_msg.edit(content="❌ **Наразі немає жодного чартеру в API для тесту.**")
+    except Exception as e:
+        await status_msg.edit(content=f"❌ **Помилка:** {e}")
+    return
+
+# -------------------------------------------------------------
+
+# --- 🔄 КОМАНДА: !updatedemand (ПРИМУСОВЕ ОНОВЛЕННЯ GITHUB) ---
+@command("!updatedemand", admin=True)
+async def cmd_updatedemand(message, is_admin):
+    status_msg = await message.channel.send("⏳ **Step 1: Updating raw base `newsky-airports.txt` via API...**")
+
+    try:
+        async with GITHUB_DB_LOCK:
+            async with shared_http_session() as session:
+                demand_content = await fetch_demand_data(session)
+                if not demand_content:
+                    return await status_msg.edit(content="❌ **Error:** Failed to fetch or parse demand data.")
+
+                success = await push_to_github_batch(session, {GITHUB_FILE_PATH: demand_content}, "🤖 Manual Demand Update")
+
+                if success:
+                    await status_msg.edit(content="✅ **Base updated on GitHub!**")
+                    await run_analytics_pipeline(message.channel)
+                else:
+                    await status_msg.edit(content="❌ **Error pushing to GitHub.**")
+    except Exception as e:
+        await status_msg.edit(content=f"❌ **Error:** {e}")
+    return
+
+# -------------------------------------------------------------
+
+# --- 🧪 КОМАНДА: !testgh <ID> (ПРИМУСОВИЙ ЗАПИС РЕЙСУ НА GITHUB) ---
+@command("!testgh", admin=True)
+async def cmd_testgh(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2:
+        return await message.channel.send("⚠️ Usage: `!testgh <Flight_ID>`")
+
+    fid = parts[1]
+    status_msg = await message.channel.send(f"⏳ **Шукаю рейс `{fid}` та записую на GitHub...**")
+
+    try:
+        async with shared_http_session() as session:
+            det = await fetch_flight(session, fid)
+
+            if not det or "flight" not in det:
+                return await status_msg.edit(content=f"❌ **Помилка:** Рейс `{fid}` не знайдено в API.")
+
+            f = det["flight"]
+            cs = f.get("flightNumber") or f.get("callsign") or "Unknown"
+
+            # 1. Визначаємо тиждень за часом посадки
+            arrival_time = f.get("arrTimeAct") or f.get("close")
+            target_week = get_iso_week(arrival_time)
+
+            # 2. Форматуємо рейс
+            clean_flight = format_flight_for_db(f)
+
+            # 3. Дістаємо дані пілота
+            pilot_data = f.get("pilot", {})
+            pilot_id = pilot_data.get("_id", "unknown")
+            pilot_name = pilot_data.get("fullname", "Unknown Pilot")
+            pilot_avatar = pilot_data.get("avatar", "default")
+
+            # 4. Записуємо на GitHub (тут використовуємо await, щоб дочекатися результату)
+            if not await save_flight_to_github(clean_flight, pilot_id, pilot_name, pilot_avatar, target_week, flush_now=True):
+                return await status_msg.edit(content=f"❌ **Помилка запису на GitHub.** Рейс `{cs}` залишено в черзі, бот дошле його автоматично.")
+
+            await status_msg.edit(content=f"✅ **Успіх!** Рейс `{cs}` (ID: `{fid}`) відправлено на GitHub у папку `FLIGHTS/{target_week}.json`!")
+
+    except Exception as e:
+        await status_msg.edit(content=f"❌ **Внутрішня помилка:** {e}")
+    return
+
+# -------------------------------------------------------------
+
+# --- 🌪️ КОМАНДА: !testwind <ID> (ТЕСТОВЕ ПОВІДОМЛЕННЯ ПРО ПОСАДКУ) ---
+@command("!testwind", admin=True)
+async def cmd_testwind(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2:
+        return await message.channel.send("⚠️ Usage: `!testwind <Flight_ID>`")
+
+    fid = parts[1]
+    msg = await message.channel.send(f"⏳ **Fetching data for flight `{fid}`...**")
+
+    try:
+        async with shared_http_session() as session:
+            det = await fetch_flight(session, fid)
+
+            if not det or "flight" not in det:
+                return await msg.edit(content=f"❌ **Error:** Flight `{fid}` not found in API.")
+
+            f = det["flight"]
+
+            # Відправляємо тестове повідомлення "Completed" у той же канал (або ПП)
+            await send_flight_message(message.channel, "Completed", f, "result")
+
+            await msg.edit(content=f"✅ **Test message generated successfully!** (Stats were NOT updated)")
+
+    except Exception as e:
+        await msg.edit(content=f"❌ **Internal error occurred:** {e}")
+    return
+
+# -------------------------------------------------------------
+
+# --- ✏️ КОМАНДА: !rename <Channel_ID> <нова назва> (ПЕРЕЙМЕНУВАТИ КАНАЛ) ---
+@command("!rename", admin=True)
+async def cmd_rename(message, is_admin):
+    parts = message.content.split(" ", 2)
+    if len(parts) < 3:
+        return await message.channel.send("⚠️ **Format:** `!rename <Channel_ID> <нова_назва>`")
 
-        status_msg = await message.channel.send("⏳ **Step 1: Updating raw base `newsky-airports.txt` via API...**")
+    target_id_str = parts[1]
+    if not target_id_str.isdigit():
+         return await message.channel.send("⚠️ **Error:** Channel ID має бути числом.")
 
+    target_channel_id = int(target_id_str)
+    new_name = parts[2]
+
+    # Визначаємо сервер (працюватиме навіть якщо ти пишеш команду в ПП)
+    main_channel = client.get_channel(CHANNEL_ID)
+    guild = message.guild if message.guild else (main_channel.guild if main_channel else None)
+
+    if not guild:
+        return await message.channel.send("❌ **Error:** Не вдалося визначити сервер.")
+
+    # Шукаємо канал
+    target_channel = guild.get_channel(target_channel_id)
+    if not target_channel:
+         try:
+             target_channel = await guild.fetch_channel(target_channel_id)
+         except:
+             return await message.channel.send("❌ **Error:** Канал з таким ID не знайдено.")
+
+    try:
+        old_name = target_channel.name
+        await target_channel.edit(name=new_name)
+        await message.add_reaction("✅")
+        await message.channel.send(f"✅ **Успіх!** Канал `{old_name}` перейменовано на `{new_name}`.")
+
+    except discord.Forbidden:
+        await message.channel.send("❌ **Error:** У бота немає прав керувати цим каналом (потрібен дозвіл Manage Channels).")
+    except discord.HTTPException as e:
+        # Відловлюємо ліміти Discord (Rate Limit: 2 перейменування на 10 хвилин)
+        if e.status == 429:
+            await message.channel.send("⏳ **Discord Rate Limit:** Ти занадто часто перейменовував цей канал. Почекай 10 хвилин і спробуй ще раз.")
+        else:
+            await message.channel.send(f"❌ **HTTP Error:** {e}")
+    except Exception as e:
+        await message.channel.send(f"❌ **Error:** {e}")
+
+    return
+
+# -------------------------------------------------------------
+
+# --- 🧪 КОМАНДА 1: !teststatspin (ЗІ ЗАКРІПЛЕННЯМ ТА ВІДКРІПЛЕННЯМ) ---
+@command("!teststatspin", admin=True)
+async def cmd_teststatspin(message, is_admin):
+    stats = load_weekly_stats()
+    if not stats: return await message.channel.send("⚠️ **Stats file is empty.**")
+
+    await message.channel.send("🛠️ **Generating real report (WITH pins)...**")
+    try:
+        pinned_msgs = await message.channel.pins()
+        for p_msg in pinned_msgs:
+            if p_msg.author == client.user and p_msg.embeds and p_msg.embeds[0].title and "Weekly Summary" in p_msg.embeds[0].title:
+                await p_msg.unpin()
+    except Exception as e:
+        print(f"Error unpinning: {e}")
+
+    for week_tag, s in stats.items():
+        new_msg = await publish_weekly_embed(message.channel, week_tag, s)
+        if new_msg:
+            try: await new_msg.pin()
+            except Exception as e: print(f"Error pinning: {e}")
+    return
+
+
+# --- 📌 КОМАНДА 2: !teststats (БЕЗ ЗАКРІПЛЕННЯ) ---
+@command("!teststats", admin=True)
+async def cmd_teststats(message, is_admin):
+    stats = load_weekly_stats()
+    if not stats: return await message.channel.send("⚠️ **Stats file is empty.**")
+
+    await message.channel.send("🛠️ **Generating real report (NO pins)...**")
+    for week_tag, s in stats.items():
+        await publish_weekly_embed(message.channel, week_tag, s)
+    return
+
+
+# --- 🤡 КОМАНДА 3: !teststatstest (ФЕЙКОВІ ДАНІ ДЛЯ ПРЕЗЕНТАЦІЇ) ---
+@command("!teststatstest", admin=True)
+async def cmd_teststatstest(message, is_admin):
+    await message.channel.send("🛠️ **Generating presentation report (Randomized Fake Data)...**")
+
+    # Рандомні базові значення
+    f_count = random.randint(80, 200)
+
+    # Допоміжна функція для генерації випадкових рейсів (ТОП-3)
+    def gen_random_flights(time_min, time_max):
+        apts = ["UKBB", "UKLL", "UKOO", "UKLU", "EPWA", "LOWW", "KJFK", "LTFM", "EDDF"]
+        return [
+            {
+                "time": random.randint(time_min, time_max),
+                "pilot": f"Pilot {random.choice(['Alpha', 'Bravo', 'Charlie', 'Delta', 'Echo'])}",
+                "dep": random.choice(apts),
+                "arr": random.choice(apts)
+            } for _ in range(3)
+        ]
+
+    # Генеруємо красиві штучні дані
+    dummy_s = {
+        "flights": f_count, 
+        "earnings": f_count * random.randint(8000, 20000), 
+        "pax": f_count * random.randint(120, 250), 
+        "cargo": f_count * random.randint(1500, 5000),
+
+        "rating_sum": f_count * random.uniform(9.0, 9.9), 
+        "fpm_sum": f_count * random.randint(-350, -150),    
+        "g_sum": f_count * random.uniform(1.05, 1.25),      
+
+        "pilots": {f"Capt. {name}": random.randint(10, 40) for name in ["Shevchenko", "Kovalenko", "Boyko"]},
+        "airports": {apt: random.randint(15, 60) for apt in ["UKBB", "UKLL", "LOWW"]},
+        "aircrafts": {ac: random.randint(20, 70) for ac in ["B738", "A320", "B77W"]},
+
+        "records": {
+            "butter": {"fpm": random.randint(-60, -10), "g": round(random.uniform(1.0, 1.05), 2), "pilot": "Capt. Silk"},
+            "hardest": {"fpm": random.randint(-800, -500), "g": round(random.uniform(1.6, 2.2), 2), "pilot": "Capt. Ryan"},
+
+            # Рандомні списки для ТОП-3 (відсортовані)
+            "longest": sorted(gen_random_flights(400, 700), key=lambda x: x["time"], reverse=True),
+            "shortest": sorted(gen_random_flights(25, 60), key=lambda x: x["time"])
+        }
+    }
+
+    current_week = get_iso_week()
+    await publish_weekly_embed(message.channel, current_week, dummy_s)
+    return
+
+
+# --- 🧹 КОМАНДА: !clearstats (ОЧИСТИТИ ВСЮ СТАТИСТИКУ З ПЕРЕВІРКОЮ) ---
+@command("!clearstats", admin=True)
+async def cmd_clearstats(message, is_admin):
+    # Генеруємо два числа від 3 до 9
+    num1 = random.randint(3, 9)
+    num2 = random.randint(3, 9)
+    correct_answer = num1 * num2
+
+    await message.channel.send(f"⚠️ **WARNING!** You are about to completely wipe all weekly statistics.\nTo confirm this action, please solve this math problem:\n**What is {num1} x {num2}?**\n*(Just type the number in the chat, you have 10 seconds)*")
+
+    # Фільтр: бот прийме відповідь тільки від того, хто запустив команду, і тільки в цьому ж каналі
+    def check(m):
+        return m.author == message.author and m.channel == message.channel
+
+    try:
+        # Бот чекає на повідомлення 10 секунд
+        reply = await client.wait_for('message', check=check, timeout=10.0)
+
+        # Перевіряємо, чи зійшлася математика
+        if reply.content.strip() == str(correct_answer):
+            save_weekly_stats({})
+            await message.channel.send("🗑️ **Weekly stats completely wiped!**")
+        else:
+            await message.channel.send(f"❌ **Wrong answer (it should be {correct_answer}).** Protection triggered, deletion cancelled! 😅")
+
+    except asyncio.TimeoutError:
+        # Якщо за 20 секунд ніхто нічого не написав
+        await message.channel.send("⏳ **Time's up.** Deletion operation cancelled.")
+
+    return
+
+# -------------------------------------------------------------
+
+# --- 🛑 КОМАНДА: !ignore <ID> (ІГНОРУВАТИ БАГОВАНИЙ РЕЙС) ---
+@command("!ignore", admin=True)
+async def cmd_ignore(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2:
+        return await message.channel.send("⚠️ Usage: `!ignore <Flight_ID>`")
+
+    fid = parts[1]
+    add_ignored_flight(fid)
+
+    await message.channel.send(f"🛑 **Рейс `{fid}` назавжди додано в ігнор-лист!**")
+    return
+
+# -------------------------------------------------------------
+
+# --- ➕ КОМАНДА: !addghflight <ID> [emer] (ЗАПИСАТИ РЕЙС НА GITHUB ВРУЧНУ) ---
+@command("!addghflight", admin=True)
+async def cmd_addghflight(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2:
+        return await message.channel.send("⚠️ **Формат:** `!addghflight <Flight_ID> [emer]`")
+
+    fid = parts[1]
+    # Перевіряємо, чи є третє слово і чи це "emer"
+    force_emer = len(parts) > 2 and parts[2].lower() == "emer"
+
+    status_text = f"⏳ **Шукаю рейс `{fid}` в API Newsky...**"
+    if force_emer:
+        status_text += "\n*(Увімкнено режим примусового EMERGENCY 🚨)*"
+
+    msg = await message.channel.send(status_text)
+
+    try:
+        async with shared_http_session() as session:
+            det = await fetch_flight(session, fid)
+
+            if not det or "flight" not in det:
+                return await msg.edit(content=f"❌ **Помилка:** Рейс `{fid}` не знайдено в API.")
+
+            f = det["flight"]
+            cs = f.get("flightNumber") or f.get("callsign") or "Unknown"
+
+            # 1. Пропускаємо через м'ясорубку
+            clean_flight = format_flight_for_db(f)
+
+            # 2. Якщо вказано emer — імітуємо СПРАВЖНІЙ emergency!
+            if force_emer:
+                clean_flight["emergency"] = True
+
+                if "result" in clean_flight:
+                    # Анулюємо фінансові показники
+                    if "totals" in clean_flight["result"]:
+                        clean_flight["result"]["totals"]["expenses"] = 0
+                        clean_flight["result"]["totals"]["penalties"] = 0
+                        clean_flight["result"]["totals"]["revenue"] = 0
+                        clean_flight["result"]["totals"]["balance"] = 0
+
+                    # Додаємо запис про Emergency Declared, нічого не замінюючи
+                    if "violations" in clean_flight["result"]:
+                        clean_flight["result"]["violations"].append({
+                            "title": "Emergency Declared",
+                            "penalty": {
+                                "points": 0,
+                                "cash": 0
+                            },
+                            "entry": {
+                                "type": "emergency",
+                                "payload": {}
+                            },
+                            "wiki": "https://wiki.newsky.app/en/flight/rating-system#emergency"
+                        })
+
+            # 3. Визначаємо тиждень за часом посадки
+            arrival_time = f.get("arrTimeAct") or f.get("close")
+            target_week = get_iso_week(arrival_time)
+
+            # 4. Витягуємо дані пілота
+            pilot_data = f.get("pilot", {})
+            pilot_id = pilot_data.get("_id", "unknown")
+            pilot_name = pilot_data.get("fullname", "Unknown Pilot")
+            pilot_avatar = pilot_data.get("avatar", "default")
+
+            await msg.edit(content=f"⏳ Дані отримано. Записую рейс `{cs}` у файл `{target_week}.json` на GitHub...")
+
+            # 5. Відправляємо на GitHub
+            if not await save_flight_to_github(clean_flight, pilot_id, pilot_name, pilot_avatar, target_week, flush_now=True):
+                return await msg.edit(content=f"❌ **Помилка запису на GitHub.** Рейс `{cs}` залишено в черзі, бот дошле його автоматично.")
+
+            # 6. Звіт про успіх
+            if force_emer:
+                await msg.edit(content=f"🚨 **Успіх!** Рейс `{cs}` (ID: `{fid}`) записано на GitHub у тиждень `{target_week}` **із повною імітацією EMERGENCY (штрафи анульовано, лог додано)!**")
+            else:
+                await msg.edit(content=f"✅ **Успіх!** Рейс `{cs}` (ID: `{fid}`) успішно додано на GitHub у тиждень `{target_week}`.")
+
+    except Exception as e:
+        await msg.edit(content=f"❌ **Внутрішня помилка:** {e}")
+    return
+
+# -------------------------------------------------------------
+
+# --- ➕ КОМАНДА: !addflight <ID> (ДОДАТИ ПРОПУЩЕНИЙ РЕЙС) ---
+@command("!addflight", admin=True)
+async def cmd_addflight(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2:
+        return await message.channel.send("⚠️ Usage: `!addflight <Flight_ID>`")
+
+    fid = parts[1]
+    msg = await message.channel.send(f"⏳ **Searching for flight `{fid}` in Newsky DB...**")
+
+    try:
+        async with shared_http_session() as session:
+            det = await fetch_flight(session, fid)
+
+            if not det or "flight" not in det:
+                return await msg.edit(content=f"❌ **Error:** Flight `{fid}` not found in API.")
+
+            f = det["flight"]
+
+            sched_time = f.get("depTimeSched") or f.get("creationDate")
+            week_tag = get_iso_week(sched_time)
+
+            update_weekly_stats(f, week_tag)
+
+            cs = f.get("flightNumber") or f.get("callsign") or "Unknown"
+            await msg.edit(content=f"✅ **Flight `{cs}` successfully found and added to week `{week_tag}`!**")
+
+    except Exception as e:
+        await msg.edit(content=f"❌ **Internal error occurred:** {e}")
+    return
+
+# -------------------------------------------------------------
+
+# --- 🗑️ КОМАНДА: !delghflight <ID> (ВИДАЛИТИ РЕЙС З GITHUB) ---
+@command("!delghflight", admin=True)
+async def cmd_delghflight(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2:
+        return await message.channel.send("⚠️ Usage: `!delghflight <Flight_ID>`")
+
+    target_id = parts[1]
+    status_msg = await message.channel.send(f"⏳ **Шукаю рейс `{target_id}` у базі GitHub...**")
+
+    if not GITHUB_TOKEN:
+        return await status_msg.edit(content="❌ **Помилка:** Немає токену GITHUB_TOKEN.")
+
+    gh_headers = {
+        "Authorization": f"token {GITHUB_TOKEN}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+
+    deleted = False
+    target_file = ""
+
+    try:
+        async with GITHUB_DB_LOCK:
+            async with shared_http_session() as session:
+                # 1. Звіряємо дзеркало і одразу знаходимо тиждень рейсу через індекс
+                if not await refresh_flights_mirror(session):
+                    return await status_msg.edit(content="❌ **Помилка:** Не вдалося отримати список файлів з GitHub.")
+                location = find_flight_in_mirror(target_id)
+
+                # 2. Відкриваємо тільки той файл, де лежить рейс
+                if location:
+                    file_name = f"{location[0]}.json"
+                    file_path = f"FLIGHTS/{file_name}"
+
+                    # 3. Вміст беремо з дзеркала (воно щойно звірене з GitHub)
+                    file_content, file_sha = get_mirror_week(file_name)
+
+                    changed = False
+
+                    # 4. Шукаємо рейс усередині файлу
+                    for p in file_content:
+                        original_len = len(p["flights"])
+                        # Фільтруємо рейси, залишаючи всі, крім того, що треба видалити
+                        p["flights"] = [f for f in p["flights"] if str(f.get("_id")) != target_id and str(f.get("id")) != target_id]
+
+                        # Якщо довжина масиву змінилася, значить рейс був тут!
+                        if len(p["flights"]) < original_len:
+                            changed = True
+
+                    # 5. Якщо рейс знайшли і видалили — записуємо файл назад
+                    if changed:
+                        # Підчищаємо пілотів, у яких 0 рейсів після видалення
+                        file_content = [p for p in file_content if len(p["flights"]) > 0]
+
+                        new_content_str = json.dumps(file_content, ensure_ascii=False, indent=4)
+                        new_content_b64 = base64.b64encode(new_content_str.encode('utf-8')).decode('utf-8')
+
+                        push_payload = {
+                            "message": f"🤖 Auto delete flight {target_id}",
+                            "content": new_content_b64,
+                            "sha": file_sha
+                        }
+
+                        put_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{file_path}"
+                        async with session.put(put_url, headers=gh_headers, json=push_payload) as put_resp:
+                            if put_resp.status in [200, 201]:
+                                deleted = True
+                                target_file = file_name
+                                record_mirror_week(file_name, new_content_str)
+
+    except Exception as e:
+        return await status_msg.edit(content=f"❌ **Помилка під час видалення:** {e}")
+
+    # 6. Виводимо результат
+    if deleted:
+        await status_msg.edit(content=f"✅ **Успіх!** Рейс `{target_id}` назавжди видалено з файлу `{target_file}` на GitHub.")
+    else:
+        await status_msg.edit(content=f"⚠️ **Рейс не знайдено.** Рейсу `{target_id}` немає в жодному JSON-файлі на GitHub.")
+    return
+
+# -------------------------------------------------------------
+
+# --- ➖ КОМАНДА: !delflight <ID> (ВІДНЯТИ РЕЙС ЗІ СТАТИСТИКИ) ---
+@command("!delflight", admin=True)
+async def cmd_delflight(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2:
+        return await message.channel.send("⚠️ Usage: `!delflight <Flight_ID>`")
+
+    fid = parts[1]
+    msg = await message.channel.send(f"⏳ **Removing flight `{fid}` from stats...**")
+
+    try:
+        async with shared_http_session() as session:
+            det = await fetch_flight(session, fid)
+
+            if not det or "flight" not in det:
+                return await msg.edit(content=f"❌ **Error:** Flight `{fid}` not found in API.")
+
+            f = det["flight"]
+            sched_time = f.get("depTimeSched") or f.get("creationDate")
+            week_tag = get_iso_week(sched_time)
+
+            s = load_week_stats(week_tag)
+            if s is None:
+                return await msg.edit(content=f"⚠️ Week `{week_tag}` not found in stats.")
+
+            t = f.get("result", {}).get("totals", {})
+            balance = int(t.get("balance", 0))
+
+            raw_pax = t.get("payload", {}).get("pax", 0)
+            if raw_pax == 0 and f.get("type") != "cargo":
+                raw_pax = int(f.get("payload", {}).get("pax", 0))
+
+            cargo_kg = int(f.get("payload", {}).get("weights", {}).get("cargo", 0))
+            rating = float(f.get("rating", 0.0))
+
+            pilot = f.get("pilot", {}).get("fullname", "Unknown Pilot")
+
+            check_g, check_fpm = 0.0, 0
+            if "result" in f and "violations" in f["result"]:
+                for v in f["result"]["violations"]:
+                    entry = v.get("entry", {}).get("payload", {}).get("touchDown", {})
+                    if entry:
+                        check_g = float(entry.get("gForce", 0))
+                        check_fpm = int(entry.get("rate", 0))
+                        break 
+            if check_g == 0 and "landing" in f:
+                check_g = float(f.get("landing", {}).get("gForce", 0))
+                check_fpm = int(f.get("landing", {}).get("rate", 0) or f.get("landing", {}).get("touchDownRate", 0))
+
+            fpm_val = -abs(check_fpm) if check_fpm != 0 else 0
+
+            if s["flights"] > 0:
+                s["flights"] -= 1
+                s["earnings"] -= balance
+                s["pax"] -= raw_pax
+                s["cargo"] -= cargo_kg
+                s["rating_sum"] -= rating
+                s["fpm_sum"] -= fpm_val
+                s["g_sum"] -= check_g
+
+            if pilot in s.get("pilots", {}):
+                s["pilots"][pilot] -= 1
+                if s["pilots"][pilot] <= 0: del s["pilots"][pilot]
+
+            save_week_stats(week_tag, s)
+
+            cs = f.get("flightNumber") or f.get("callsign") or "Unknown"
+            await msg.edit(content=f"✅ **Flight `{cs}` successfully REMOVED from week `{week_tag}`!**\n*(Note: Totals and averages are fixed. Weekly records like 'Hardest Landing' are not changed).*")
+
+    except Exception as e:
+        await msg.edit(content=f"❌ **Internal error occurred:** {e}")
+    return
+
+# -------------------------------------------------------------
+
+# --- 📊 КОМАНДА: !stats (СКАЧАТИ ФАЙЛ СТАТИСТИКИ) ---
+@command("!stats", admin=True)
+async def cmd_stats(message, is_admin):
+    try:
+        stats = load_weekly_stats()
+        if not stats:
+            return await message.channel.send("⚠️ **Weekly stats are empty or do not exist yet.**")
+
+        file_bin = io.BytesIO(json.dumps(stats, indent=4).encode("utf-8"))
+        await message.channel.send(
+            content="📊 **Weekly Stats File:**", 
+            file=discord.File(file_bin, filename="weekly_stats.json")
+        )
+    except Exception as e:
+        await message.channel.send(f"❌ **Error sending file:** {e}")
+    return
+
+# --------------------------------------------------------
+
+# --- 📜 КОМАНДА: !audit [all/кількість] (СКАЧАТИ ЖУРНАЛ АУДИТУ) ---
+@command("!audit", admin=True)
+async def cmd_audit(message, is_admin):
+    parts = message.content.split()
+
+    fetch_limit = 50
+    is_all = False
+
+    if len(parts) > 1:
+        if parts[1].lower() == "all":
+            fetch_limit = None
+            is_all = True
+        elif parts[1].isdigit():
+            fetch_limit = int(parts[1])
+
+    main_channel = client.get_channel(CHANNEL_ID)
+    if not main_channel:
+        return await message.channel.send("❌ **Error:** Cannot find the main server. Check CHANNEL_ID.")
+
+    guild = main_channel.guild
+
+    if is_all:
+        await message.channel.send(f"⏳ **Gathering ALL available logs (up to 90 days) from '{guild.name}'... This may take a minute.**")
+    else:
+        await message.channel.send(f"⏳ **Gathering the last {fetch_limit} audit logs from '{guild.name}'...**")
+
+    try:
+        audit_text = f"=== Audit Log: {guild.name} ===\n"
+        audit_text += f"Limit: {'All available (up to 90 days)' if is_all else fetch_limit}\n" + "="*50 + "\n\n"
+
+        count = 0
+        async for entry in guild.audit_logs(limit=fetch_limit):
+            time_str = entry.created_at.strftime("%Y-%m-%d %H:%M:%S UTC")
+            user = entry.user
+            action = entry.action.name
+            target = entry.target
+            reason = entry.reason or "Not specified"
+
+            audit_text += f"[{time_str}] {user} -> ACTION: {action}\n"
+            audit_text += f"   Target: {target}\n"
+            audit_text += f"   Reason: {reason}\n"
+            audit_text += "-"*50 + "\n"
+            count += 1
+
+        audit_text += f"\nTotal logs gathered: {count}"
+
+        file_bin = io.BytesIO(audit_text.encode('utf-8'))
+
+        await message.channel.send(
+            content=f"✅ **Done! Found {count} logs.** Here is your report:", 
+            file=discord.File(file_bin, filename=f"audit_log_{'all' if is_all else fetch_limit}.txt")
+        )
+
+    except discord.Forbidden:
+        await message.channel.send("❌ **Error:** I don't have the 'View Audit Log' (Перегляд журналу аудиту) permission.")
+    except Exception as e:
+        await message.channel.send(f"❌ **Error:** {e}")
+    return
+
+# -------------------------------------------------------------
+
+# --- 🗑️ КОМАНДА: !del (РОЗУМНЕ ВИДАЛЕННЯ ТІЛЬКИ ЗА ID) ---
+@command("!del", admin=True)
+async def cmd_del(message, is_admin):
+    parts = message.content.split()
+    if len(parts) != 2:
+        return await message.channel.send("⚠️ **Format:** `!del <Message_ID>`")
+
+    try:
+        msg_id = int(parts[1])
+    except ValueError:
+        return await message.channel.send("❌ **Error:** Message ID must be a number.")
+
+    status_msg = await message.channel.send("⏳ **Searching for message across all channels...**")
+
+    found_msg = await find_discord_message(msg_id)
+
+    if found_msg:
         try:
-            async with GITHUB_DB_LOCK:
-                async with aiohttp.ClientSession() as session:
-                    demand_content = await fetch_demand_data(session)
-                    if not demand_content:
-                        return await status_msg.edit(content="❌ **Error:** Failed to fetch or parse demand data.")
-                    
-                    success = await push_to_github_batch(session, {GITHUB_FILE_PATH: demand_content}, "🤖 Manual Demand Update")
-                    
-                    if success:
-                        await status_msg.edit(content="✅ **Base updated on GitHub!**")
-                        await run_analytics_pipeline(message.channel)
-                    else:
-                        await status_msg.edit(content="❌ **Error pushing to GitHub.**")
-        except Exception as e:
-            await status_msg.edit(content=f"❌ **Error:** {e}")
-        return
-    # -------------------------------------------------------------
+            await found_msg.delete()
+            await status_msg.edit(content=f"✅ **Success!** Message silently deleted in channel `#{found_msg.channel.name}` 🥷")
+        except discord.Forbidden:
+            await status_msg.edit(content="❌ **Error:** Found the message, but lack permission to delete it (check Manage Messages).")
+    else:
+        await status_msg.edit(content="❌ **Error:** Message with this ID not found on the server (or already deleted).")
 
-	# --- 🧪 КОМАНДА: !testgh <ID> (ПРИМУСОВИЙ ЗАПИС РЕЙСУ НА GITHUB) ---
-    if message.content.startswith("!testgh"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split()
-        if len(parts) < 2:
-            return await message.channel.send("⚠️ Usage: `!testgh <Flight_ID>`")
-            
-        fid = parts[1]
-        status_msg = await message.channel.send(f"⏳ **Шукаю рейс `{fid}` та записую на GitHub...**")
-        
+    return
+
+# -------------------------------------------------------------------------
+
+# --- 🧹 КОМАНДА: !clearwow <ID> (ОЧИСТИТИ ВСІ РЕАКЦІЇ) ---
+@command("!clearwow", admin=True)
+async def cmd_clearwow(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2:
+        return await message.channel.send("⚠️ Usage: `!clearwow <Message_ID>`")
+
+    target_id = parts[1]
+    if not target_id.isdigit():
+         return await message.channel.send("⚠️ ID must be a number.")
+
+    found_message = await find_discord_message(int(target_id), message)
+
+    if found_message:
         try:
-            async with aiohttp.ClientSession() as session:
-                det = await fetch_api(session, f"/flight/{fid}")
-                
-                if not det or "flight" not in det:
-                    return await status_msg.edit(content=f"❌ **Помилка:** Рейс `{fid}` не знайдено в API.")
-                
-                f = det["flight"]
-                cs = f.get("flightNumber") or f.get("callsign") or "Unknown"
-                
-                # 1. Визначаємо тиждень за часом посадки
-                arrival_time = f.get("arrTimeAct") or f.get("close")
-                target_week = get_iso_week(arrival_time)
-                
-                # 2. Форматуємо рейс
-                clean_flight = format_flight_for_db(f)
-                
-                # 3. Дістаємо дані пілота
-                pilot_data = f.get("pilot", {})
-                pilot_id = pilot_data.get("_id", "unknown")
-                pilot_name = pilot_data.get("fullname", "Unknown Pilot")
-                pilot_avatar = pilot_data.get("avatar", "default")
-                
-                # 4. Записуємо на GitHub (тут використовуємо await, щоб дочекатися результату)
-                await save_flight_to_github(clean_flight, pilot_id, pilot_name, pilot_avatar, target_week)
-                
-                await status_msg.edit(content=f"✅ **Успіх!** Рейс `{cs}` (ID: `{fid}`) відправлено на GitHub у папку `FLIGHTS/{target_week}.json`!")
-                
+            await found_message.clear_reactions()
+            channel_mention = found_message.channel.mention if hasattr(found_message.channel, 'mention') else "Direct Messages"
+            await message.channel.send(f"✅ **Cleared all reactions from message in {channel_mention}**")
+        except discord.Forbidden:
+            await message.channel.send("❌ **Error:** I don't have 'Manage Messages' permission to clear reactions. Please check role settings.")
         except Exception as e:
-            await status_msg.edit(content=f"❌ **Внутрішня помилка:** {e}")
-        return
-    # -------------------------------------------------------------
+            await message.channel.send(f"❌ **Error clearing reactions:** {e}")
+    else:
+        await message.channel.send("❌ **Message not found.** (Check ID or bot permissions)")
+    return
+
+# -------------------------------------------------------------
+
+# --- 🔇 КОМАНДА: !hideuser <User_ID> <Channel_ID> (ПРИХОВАТИ ЮЗЕРА) ---
+@command("!hideuser", admin=True)
+async def cmd_hideuser(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 3:
+        return await message.channel.send("⚠️ **Формат:** `!hideuser <ID_користувача> <ID_каналу>`")
+
+    target_user = int(parts[1])
+    target_channel = str(parts[2]) # Зберігаємо як текст для JSON
+
+    if target_channel not in HIDDEN_USERS:
+        HIDDEN_USERS[target_channel] = []
+
+    if target_user not in HIDDEN_USERS[target_channel]:
+        HIDDEN_USERS[target_channel].append(target_user)
+        add_hidden_user(target_channel, target_user) # 🔥 ЗБЕРІГАЄМО В БАЗУ
+        await message.channel.send(f"🥷 **Готово!** Тепер повідомлення від користувача `{target_user}` у каналі `{target_channel}` будуть назавжди приховані.")
+    else:
+        await message.channel.send("⚠️ Цей користувач вже прихований у цьому каналі.")
+    return
+
+
+# --- 🔊 КОМАНДА: !unhideuser <User_ID> <Channel_ID> (ПОВЕРНУТИ ЮЗЕРА) ---
+@command("!unhideuser", admin=True)
+async def cmd_unhideuser(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 3:
+        return await message.channel.send("⚠️ **Формат:** `!unhideuser <ID_користувача> <ID_каналу>`")
+
+    target_user = int(parts[1])
+    target_channel = str(parts[2])
+
+    if target_channel in HIDDEN_USERS and target_user in HIDDEN_USERS[target_channel]:
+        HIDDEN_USERS[target_channel].remove(target_user)
+        # Якщо список порожній, підчищаємо канал з бази
+        if not HIDDEN_USERS[target_channel]:
+            del HIDDEN_USERS[target_channel]
+
+        remove_hidden_user(target_channel, target_user) # 🔥 ЗБЕРІГАЄМО В БАЗУ
+        await message.channel.send(f"✅ **Знято!** Користувач `{target_user}` знову може писати в канал `{target_channel}`.")
+    else:
+        await message.channel.send("⚠️ Цього користувача не було в списку прихованих для цього каналу.")
+    return
+
+
+# --- 🛡️ КОМАНДА: !banwow <ID> (ЗАБОРОНИТИ СМАЙЛИ) ---
+@command("!banwow", admin=True)
+async def cmd_banwow(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2 or not parts[1].isdigit():
+        return await message.channel.send("⚠️ Usage: `!banwow <Message_ID>`")
+
+    msg_id = int(parts[1])
+    BANNED_WOW_MESSAGES.add(msg_id)
+    await message.channel.send(f"🛡️ **Message {msg_id} is now protected!**\nAny new reactions will be instantly deleted.")
+    return
+
+
+# --- 🟢 КОМАНДА: !unbanwow <ID> (ДОЗВОЛИТИ СМАЙЛИ) ---
+@command("!unbanwow", admin=True)
+async def cmd_unbanwow(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2 or not parts[1].isdigit():
+        return await message.channel.send("⚠️ Usage: `!unbanwow <Message_ID>`")
+
+    msg_id = int(parts[1])
+    if msg_id in BANNED_WOW_MESSAGES:
+        BANNED_WOW_MESSAGES.remove(msg_id)
+        await message.channel.send(f"✅ **Protection removed.** You can now react to message {msg_id} again.")
+    else:
+        await message.channel.send("⚠️ This message is not currently blacklisted.")
+    return
 
-	# --- 🌪️ КОМАНДА: !testwind <ID> (ТЕСТОВЕ ПОВІДОМЛЕННЯ ПРО ПОСАДКУ) ---
-    if message.content.startswith("!testwind"):
-        if not is_admin: 
-            return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split()
-        if len(parts) < 2:
-            return await message.channel.send("⚠️ Usage: `!testwind <Flight_ID>`")
-        
-        fid = parts[1]
-        msg = await message.channel.send(f"⏳ **Fetching data for flight `{fid}`...**")
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                det = await fetch_api(session, f"/flight/{fid}")
-                
-                if not det or "flight" not in det:
-                    return await msg.edit(content=f"❌ **Error:** Flight `{fid}` not found in API.")
-                
-                f = det["flight"]
-                
-                # Відправляємо тестове повідомлення "Completed" у той же канал (або ПП)
-                await send_flight_message(message.channel, "Completed", f, "result")
-                
-                await msg.edit(content=f"✅ **Test message generated successfully!** (Stats were NOT updated)")
-                
-        except Exception as e:
-            await msg.edit(content=f"❌ **Internal error occurred:** {e}")
-        return
-    # -------------------------------------------------------------
 
-	# --- ✏️ КОМАНДА: !rename <Channel_ID> <нова назва> (ПЕРЕЙМЕНУВАТИ КАНАЛ) ---
-    if message.content.startswith("!rename"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split(" ", 2)
-        if len(parts) < 3:
-            return await message.channel.send("⚠️ **Format:** `!rename <Channel_ID> <нова_назва>`")
-            
-        target_id_str = parts[1]
-        if not target_id_str.isdigit():
-             return await message.channel.send("⚠️ **Error:** Channel ID має бути числом.")
-             
-        target_channel_id = int(target_id_str)
-        new_name = parts[2]
-        
-        # Визначаємо сервер (працюватиме навіть якщо ти пишеш команду в ПП)
-        main_channel = client.get_channel(CHANNEL_ID)
-        guild = message.guild if message.guild else (main_channel.guild if main_channel else None)
-        
-        if not guild:
-            return await message.channel.send("❌ **Error:** Не вдалося визначити сервер.")
-            
-        # Шукаємо канал
-        target_channel = guild.get_channel(target_channel_id)
-        if not target_channel:
-             try:
-                 target_channel = await guild.fetch_channel(target_channel_id)
-             except:
-                 return await message.channel.send("❌ **Error:** Канал з таким ID не знайдено.")
-                 
+# --- 👹 КОМАНДА: !wow <ID> <EMOJI> (СТАВИТИ РЕАКЦІЮ) ---
+@command("!wow", admin=True)
+async def cmd_wow(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 3:
+        return await message.channel.send("⚠️ Usage: `!wow <Message_ID> <Emoji>`")
+
+    target_id = parts[1]
+    emoji_input = parts[2]
+    if not target_id.isdigit():
+         return await message.channel.send("⚠️ ID must be a number.")
+
+    found_message = await find_discord_message(int(target_id), message)
+
+    if found_message:
+        reaction_emoji = emoji_input
+
+        # 🔥 Перевіряємо, чи це ПРОСТО НАЗВА (тільки букви, цифри та нижнє підкреслення)
+        if re.match(r"^[a-zA-Z0-9_]+$", emoji_input):
+            # Якщо команду написали на сервері — шукаємо на цьому ж сервері
+            if message.guild:
+                found_emoji = discord.utils.get(message.guild.emojis, name=emoji_input)
+                if found_emoji:
+                    reaction_emoji = found_emoji
+                else:
+                    return await message.channel.send(f"❌ **Емодзі `{emoji_input}` не знайдено на цьому сервері!**")
+            else:
+                # Якщо команду написали в ПП (тут немає бази кастомних емодзі)
+                return await message.channel.send("❌ **Помилка:** В особистих повідомленнях не можна шукати кастомні емодзі за назвою. Відправ стандартний смайлик або його повний код `<:name:ID>`.")
+
         try:
-            old_name = target_channel.name
-            await target_channel.edit(name=new_name)
-            await message.add_reaction("✅")
-            await message.channel.send(f"✅ **Успіх!** Канал `{old_name}` перейменовано на `{new_name}`.")
-            
-        except discord.Forbidden:
-            await message.channel.send("❌ **Error:** У бота немає прав керувати цим каналом (потрібен дозвіл Manage Channels).")
+            await found_message.add_reaction(reaction_emoji)
+            channel_mention = found_message.channel.mention if hasattr(found_message.channel, 'mention') else "Direct Messages"
+            await message.channel.send(f"✅ **Reacted {reaction_emoji} to message in {channel_mention}**")
         except discord.HTTPException as e:
-            # Відловлюємо ліміти Discord (Rate Limit: 2 перейменування на 10 хвилин)
-            if e.status == 429:
-                await message.channel.send("⏳ **Discord Rate Limit:** Ти занадто часто перейменовував цей канал. Почекай 10 хвилин і спробуй ще раз.")
+            if e.status == 400:
+                await message.channel.send(f"❌ **Помилка:** Неправильний формат емодзі або бот не має до нього доступу.")
             else:
-                await message.channel.send(f"❌ **HTTP Error:** {e}")
+                await message.channel.send(f"❌ **Error adding reaction:** {e}")
         except Exception as e:
-            await message.channel.send(f"❌ **Error:** {e}")
-            
-        return
-    # -------------------------------------------------------------
+            await message.channel.send(f"❌ **Error adding reaction:** {e}")
+    else:
+        await message.channel.send("❌ **Message not found.** (Check ID or bot permissions)")
+    return
 
-	# --- 🧪 КОМАНДА 1: !teststatspin (ЗІ ЗАКРІПЛЕННЯМ ТА ВІДКРІПЛЕННЯМ) ---
-    if message.content == "!teststatspin":
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        stats = load_weekly_stats()
-        if not stats: return await message.channel.send("⚠️ **Stats file is empty.**")
-        
-        await message.channel.send("🛠️ **Generating real report (WITH pins)...**")
-        try:
-            pinned_msgs = await message.channel.pins()
-            for p_msg in pinned_msgs:
-                if p_msg.author == client.user and p_msg.embeds and p_msg.embeds[0].title and "Weekly Summary" in p_msg.embeds[0].title:
-                    await p_msg.unpin()
-        except Exception as e:
-            print(f"Error unpinning: {e}")
-            
-        for week_tag, s in stats.items():
-            new_msg = await publish_weekly_embed(message.channel, week_tag, s)
-            if new_msg:
-                try: await new_msg.pin()
-                except Exception as e: print(f"Error pinning: {e}")
-        return
+# -------------------------------------------------------------
 
-    # --- 📌 КОМАНДА 2: !teststats (БЕЗ ЗАКРІПЛЕННЯ) ---
-    if message.content == "!teststats":
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        stats = load_weekly_stats()
-        if not stats: return await message.channel.send("⚠️ **Stats file is empty.**")
-        
-        await message.channel.send("🛠️ **Generating real report (NO pins)...**")
-        for week_tag, s in stats.items():
-            await publish_weekly_embed(message.channel, week_tag, s)
-        return
+# --- 💽 КОМАНДА: !disk (РЕАЛЬНА ПАМ'ЯТЬ БОТА) ---
+@command("!disk")
+async def cmd_disk(message, is_admin):
+    def get_size(path="."):
+        total = 0
+        for dirpath, _, filenames in os.walk(path):
+            for f in filenames:
+                fp = os.path.join(dirpath, f)
+                if not os.path.islink(fp):
+                    total += os.path.getsize(fp)
+        return total / (1024 * 1024)
+
+    app_size_mb = get_size("/app") 
+    volume_size_mb = get_size("/app/data") if os.path.exists("/app/data") else 0
+
+    temp_used_mb = app_size_mb - volume_size_mb
+
+    LIMIT_MB = 1024.0
+    free_mb = LIMIT_MB - temp_used_mb
+
+    text = (
+        f"💽 **Bot's Real Memory Stats:**\n"
+        f"**Available Limit:** {LIMIT_MB} MB (1 GB)\n"
+        f"**Currently Used:** {temp_used_mb:.2f} MB\n"
+        f"**FREE TO WRITE:** {free_mb:.2f} MB\n"
+        f"*(Reference: Volume persistent memory takes {volume_size_mb:.2f} MB)*"
+    )
+    return await message.channel.send(text)
 
-    # --- 🤡 КОМАНДА 3: !teststatstest (ФЕЙКОВІ ДАНІ ДЛЯ ПРЕЗЕНТАЦІЇ) ---
-    if message.content == "!teststatstest":
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        await message.channel.send("🛠️ **Generating presentation report (Randomized Fake Data)...**")
-        
-        # Рандомні базові значення
-        f_count = random.randint(80, 200)
-        
-        # Допоміжна функція для генерації випадкових рейсів (ТОП-3)
-        def gen_random_flights(time_min, time_max):
-            apts = ["UKBB", "UKLL", "UKOO", "UKLU", "EPWA", "LOWW", "KJFK", "LTFM", "EDDF"]
-            return [
-                {
-                    "time": random.randint(time_min, time_max),
-                    "pilot": f"Pilot {random.choice(['Alpha', 'Bravo', 'Charlie', 'Delta', 'Echo'])}",
-                    "dep": random.choice(apts),
-                    "arr": random.choice(apts)
-                } for _ in range(3)
-            ]
-
-        # Генеруємо красиві штучні дані
-        dummy_s = {
-            "flights": f_count, 
-            "earnings": f_count * random.randint(8000, 20000), 
-            "pax": f_count * random.randint(120, 250), 
-            "cargo": f_count * random.randint(1500, 5000),
-            
-            "rating_sum": f_count * random.uniform(9.0, 9.9), 
-            "fpm_sum": f_count * random.randint(-350, -150),    
-            "g_sum": f_count * random.uniform(1.05, 1.25),      
-            
-            "pilots": {f"Capt. {name}": random.randint(10, 40) for name in ["Shevchenko", "Kovalenko", "Boyko"]},
-            "airports": {apt: random.randint(15, 60) for apt in ["UKBB", "UKLL", "LOWW"]},
-            "aircrafts": {ac: random.randint(20, 70) for ac in ["B738", "A320", "B77W"]},
-            
-            "records": {
-                "butter": {"fpm": random.randint(-60, -10), "g": round(random.uniform(1.0, 1.05), 2), "pilot": "Capt. Silk"},
-                "hardest": {"fpm": random.randint(-800, -500), "g": round(random.uniform(1.6, 2.2), 2), "pilot": "Capt. Ryan"},
-                
-                # Рандомні списки для ТОП-3 (відсортовані)
-                "longest": sorted(gen_random_flights(400, 700), key=lambda x: x["time"], reverse=True),
-                "shortest": sorted(gen_random_flights(25, 60), key=lambda x: x["time"])
-            }
-        }
-        
-        current_week = get_iso_week()
-        await publish_weekly_embed(message.channel, current_week, dummy_s)
-        return
+# -------------------------------------------------------------
 
-    # --- 🧹 КОМАНДА: !clearstats (ОЧИСТИТИ ВСЮ СТАТИСТИКУ З ПЕРЕВІРКОЮ) ---
-    if message.content == "!clearstats":
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        # Генеруємо два числа від 3 до 9
-        num1 = random.randint(3, 9)
-        num2 = random.randint(3, 9)
-        correct_answer = num1 * num2
-        
-        await message.channel.send(f"⚠️ **WARNING!** You are about to completely wipe all weekly statistics.\nTo confirm this action, please solve this math problem:\n**What is {num1} x {num2}?**\n*(Just type the number in the chat, you have 10 seconds)*")
-        
-        # Фільтр: бот прийме відповідь тільки від того, хто запустив команду, і тільки в цьому ж каналі
-        def check(m):
-            return m.author == message.author and m.channel == message.channel
-            
-        try:
-            # Бот чекає на повідомлення 10 секунд
-            reply = await client.wait_for('message', check=check, timeout=10.0)
-            
-            # Перевіряємо, чи зійшлася математика
-            if reply.content.strip() == str(correct_answer):
-                save_weekly_stats({})
-                await message.channel.send("🗑️ **Stats file (`weekly_stats.json`) completely wiped!**")
-            else:
-                await message.channel.send(f"❌ **Wrong answer (it should be {correct_answer}).** Protection triggered, deletion cancelled! 😅")
-                
-        except asyncio.TimeoutError:
-            # Якщо за 20 секунд ніхто нічого не написав
-            await message.channel.send("⏳ **Time's up.** Deletion operation cancelled.")
-            
-        return
-    # -------------------------------------------------------------
+# --- 📋 КОМАНДА: !chlist (СПИСОК ВСІХ КАНАЛІВ) ---
+@command("!chlist", admin=True)
+async def cmd_chlist(message, is_admin):
+    main_channel = client.get_channel(CHANNEL_ID)
+    if not main_channel:
+        return await message.channel.send("❌ **Помилка:** Не вдалося знайти головний сервер (перевір CHANNEL_ID).")
+
+    guild = main_channel.guild
+    await message.channel.send(f"⏳ **Збираю список каналів сервера `{guild.name}`...**")
+
+    lines = [f"=== Список каналів сервера: {guild.name} ===\n"]
+
+    # Спочатку категорії та канали всередині них
+    for category in guild.categories:
+        lines.append(f"📂 [Категорія] {category.name} (ID: {category.id})")
+        for ch in category.channels:
+            lines.append(f"   ├─ [{ch.type.name.upper()}] {ch.name} (ID: {ch.id})")
+        lines.append("")
+
+    # Канали без категорій (якщо такі є)
+    uncategorized = [ch for ch in guild.channels if ch.category is None]
+    if uncategorized:
+        lines.append("📁 [Без категорії]")
+        for ch in uncategorized:
+            lines.append(f"   ├─ [{ch.type.name.upper()}] {ch.name} (ID: {ch.id})")
+
+    file_bin = io.BytesIO("\n".join(lines).encode('utf-8'))
+    await message.channel.send(
+        content=f"✅ **Готово! Знайдено {len(guild.channels)} каналів.**",
+        file=discord.File(file_bin, filename="channel_list.txt")
+    )
+    return
 
-	# --- 🛑 КОМАНДА: !ignore <ID> (ІГНОРУВАТИ БАГОВАНИЙ РЕЙС) ---
-    if message.content.startswith("!ignore"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        parts = message.content.split()
-        if len(parts) < 2:
-            return await message.channel.send("⚠️ Usage: `!ignore <Flight_ID>`")
-        
-        fid = parts[1]
-        ignored_list = load_ignored()
-        if fid not in ignored_list:
-            ignored_list.append(fid)
-            save_ignored(ignored_list)
-        
-        await message.channel.send(f"🛑 **Рейс `{fid}` назавжди додано в `ignored.json`!**")
-        return
-    # -------------------------------------------------------------
 
-	# --- ➕ КОМАНДА: !addghflight <ID> [emer] (ЗАПИСАТИ РЕЙС НА GITHUB ВРУЧНУ) ---
-    if message.content.startswith("!addghflight"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split()
-        if len(parts) < 2:
-            return await message.channel.send("⚠️ **Формат:** `!addghflight <Flight_ID> [emer]`")
-            
-        fid = parts[1]
-        # Перевіряємо, чи є третє слово і чи це "emer"
-        force_emer = len(parts) > 2 and parts[2].lower() == "emer"
-        
-        status_text = f"⏳ **Шукаю рейс `{fid}` в API Newsky...**"
-        if force_emer:
-            status_text += "\n*(Увімкнено режим примусового EMERGENCY 🚨)*"
-            
-        msg = await message.channel.send(status_text)
-        
+# --- 📥 КОМАНДА: !chview <ID> (ВИКАЧАТИ ІСТОРІЮ КАНАЛУ) ---
+@command("!chview", admin=True)
+async def cmd_chview(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2 or not parts[1].isdigit():
+        return await message.channel.send("⚠️ **Формат:** `!chview <Channel_ID>`")
+
+    target_id = int(parts[1])
+    main_channel = client.get_channel(CHANNEL_ID)
+    guild = main_channel.guild if main_channel else None
+
+    if not guild:
+        return await message.channel.send("❌ **Помилка:** Не вдалося знайти головний сервер.")
+
+    # Знаходимо канал
+    target_channel = guild.get_channel(target_id)
+    if not target_channel:
         try:
-            async with aiohttp.ClientSession() as session:
-                det = await fetch_api(session, f"/flight/{fid}")
-                
-                if not det or "flight" not in det:
-                    return await msg.edit(content=f"❌ **Помилка:** Рейс `{fid}` не знайдено в API.")
-                
-                f = det["flight"]
-                cs = f.get("flightNumber") or f.get("callsign") or "Unknown"
-                
-                # 1. Пропускаємо через м'ясорубку
-                clean_flight = format_flight_for_db(f)
-                
-                # 2. Якщо вказано emer — імітуємо СПРАВЖНІЙ emergency!
-                if force_emer:
-                    clean_flight["emergency"] = True
-                    
-                    if "result" in clean_flight:
-                        # Анулюємо фінансові показники
-                        if "totals" in clean_flight["result"]:
-                            clean_flight["result"]["totals"]["expenses"] = 0
-                            clean_flight["result"]["totals"]["penalties"] = 0
-                            clean_flight["result"]["totals"]["revenue"] = 0
-                            clean_flight["result"]["totals"]["balance"] = 0
-                            
-                        # Додаємо запис про Emergency Declared, нічого не замінюючи
-                        if "violations" in clean_flight["result"]:
-                            clean_flight["result"]["violations"].append({
-                                "title": "Emergency Declared",
-                                "penalty": {
-                                    "points": 0,
-                                    "cash": 0
-                                },
-                                "entry": {
-                                    "type": "emergency",
-                                    "payload": {}
-                                },
-                                "wiki": "https://wiki.newsky.app/en/flight/rating-system#emergency"
-                            })
-                
-                # 3. Визначаємо тиждень за часом посадки
-                arrival_time = f.get("arrTimeAct") or f.get("close")
-                target_week = get_iso_week(arrival_time)
-                
-                # 4. Витягуємо дані пілота
-                pilot_data = f.get("pilot", {})
-                pilot_id = pilot_data.get("_id", "unknown")
-                pilot_name = pilot_data.get("fullname", "Unknown Pilot")
-                pilot_avatar = pilot_data.get("avatar", "default")
-                
-                await msg.edit(content=f"⏳ Дані отримано. Записую рейс `{cs}` у файл `{target_week}.json` на GitHub...")
-                
-                # 5. Відправляємо на GitHub
-                await save_flight_to_github(clean_flight, pilot_id, pilot_name, pilot_avatar, target_week)
-                
-                # 6. Звіт про успіх
-                if force_emer:
-                    await msg.edit(content=f"🚨 **Успіх!** Рейс `{cs}` (ID: `{fid}`) записано на GitHub у тиждень `{target_week}` **із повною імітацією EMERGENCY (штрафи анульовано, лог додано)!**")
-                else:
-                    await msg.edit(content=f"✅ **Успіх!** Рейс `{cs}` (ID: `{fid}`) успішно додано на GitHub у тиждень `{target_week}`.")
-                
-        except Exception as e:
-            await msg.edit(content=f"❌ **Внутрішня помилка:** {e}")
-        return
+            target_channel = await guild.fetch_channel(target_id)
+        except:
+            return await message.channel.send("❌ **Помилка:** Канал з таким ID не знайдено.")
+
+    # Перевіряємо, чи можна в ньому взагалі читати повідомлення
+    if not hasattr(target_channel, 'history'):
+        return await message.channel.send("❌ **Помилка:** Цей тип каналу не підтримує історію повідомлень (наприклад, це голосовий канал без чату).")
+
+    status_msg = await message.channel.send(f"⏳ **Викачую історію з каналу `{target_channel.name}`...** Це може зайняти деякий час.")
+
+    try:
+        lines = [f"=== Історія повідомлень каналу: {target_channel.name} (ID: {target_id}) ===\n"]
+        count = 0
+
+        # oldest_first=True викачує від найстаріших повідомлень до найновіших
+        async for msg in target_channel.history(limit=None, oldest_first=True):
+            time_str = msg.created_at.strftime("%Y-%m-%d %H:%M:%S UTC")
+            author = msg.author.name
+
+            # Замінюємо переноси рядків на пробіли, щоб одне повідомлення займало один рядок у файлі
+            content = msg.content.replace('\n', ' ') 
+
+            lines.append(f"[{time_str}] {author}: {content}")
+
+            # Якщо є вкладення (фото, файли), зберігаємо посилання на них
+            for att in msg.attachments:
+                lines.append(f"   📎 [Вкладення]: {att.url}")
+
+            count += 1
+            if count % 1000 == 0:
+                await status_msg.edit(content=f"⏳ **Викачую... Вже оброблено {count} повідомлень.**")
+
+        if count == 0:
+            return await status_msg.edit(content="✅ **Канал абсолютно порожній.**")
+
+        file_bin = io.BytesIO("\n".join(lines).encode('utf-8'))
+
+        await status_msg.delete()
+        await message.channel.send(
+            content=f"✅ **Готово! Викачано {count} повідомлень з `#{target_channel.name}`.**",
+            file=discord.File(file_bin, filename=f"export_{target_channel.name}.txt")
+        )
+
+    except discord.Forbidden:
+        await status_msg.edit(content="❌ **Помилка:** У бота немає прав на читання історії цього каналу.")
+    except Exception as e:
+        await status_msg.edit(content=f"❌ **Сталася помилка:** {e}")
+
+    return
+
 # -------------------------------------------------------------
 
-    # --- ➕ КОМАНДА: !addflight <ID> (ДОДАТИ ПРОПУЩЕНИЙ РЕЙС) ---
-    if message.content.startswith("!addflight"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split()
-        if len(parts) < 2:
-            return await message.channel.send("⚠️ Usage: `!addflight <Flight_ID>`")
-        
-        fid = parts[1]
-        msg = await message.channel.send(f"⏳ **Searching for flight `{fid}` in Newsky DB...**")
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                det = await fetch_api(session, f"/flight/{fid}")
-                
-                if not det or "flight" not in det:
-                    return await msg.edit(content=f"❌ **Error:** Flight `{fid}` not found in API.")
-                
-                f = det["flight"]
-                
-                sched_time = f.get("depTimeSched") or f.get("creationDate")
-                week_tag = get_iso_week(sched_time)
-                
-                update_weekly_stats(f, week_tag)
-                
-                cs = f.get("flightNumber") or f.get("callsign") or "Unknown"
-                await msg.edit(content=f"✅ **Flight `{cs}` successfully found and added to week `{week_tag}`!**")
-                
-        except Exception as e:
-            await msg.edit(content=f"❌ **Internal error occurred:** {e}")
-        return
-    # -------------------------------------------------------------
+# --- 🔍 КОМАНДА: !idemoji <назва> (ДІЗНАТИСЯ КОД ЕМОДЗІ) ---
+@command("!idemoji", admin=True)
+async def cmd_idemoji(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2:
+        return await message.channel.send("⚠️ Usage: `!idemoji <name>` (without colons)")
 
-	# --- 🗑️ КОМАНДА: !delghflight <ID> (ВИДАЛИТИ РЕЙС З GITHUB) ---
-    if message.content.startswith("!delghflight"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split()
-        if len(parts) < 2:
-            return await message.channel.send("⚠️ Usage: `!delghflight <Flight_ID>`")
-            
-        target_id = parts[1]
-        status_msg = await message.channel.send(f"⏳ **Шукаю рейс `{target_id}` у базі GitHub...**")
-        
-        if not GITHUB_TOKEN:
-            return await status_msg.edit(content="❌ **Помилка:** Немає токену GITHUB_TOKEN.")
+    if not message.guild:
+        return await message.channel.send("⚠️ Please use this command in a server channel, not in DM.")
 
-        gh_headers = {
-            "Authorization": f"token {GITHUB_TOKEN}",
-            "Accept": "application/vnd.github.v3+json",
-            "Cache-Control": "no-cache"
-        }
+    emoji_name = parts[1].replace(":", "") # Прибираємо двокрапки, якщо випадково написав
 
-        deleted = False
-        target_file = ""
+    # Шукаємо емодзі на сервері
+    found_emoji = discord.utils.get(message.guild.emojis, name=emoji_name)
 
-        try:
-            async with GITHUB_DB_LOCK:
-                async with aiohttp.ClientSession() as session:
-                    # 1. Отримуємо актуальний список файлів (з антикешем)
-                    dir_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/FLIGHTS?t={int(time.time())}"
-                    async with session.get(dir_url, headers=gh_headers) as dir_resp:
-                        if dir_resp.status != 200:
-                            return await status_msg.edit(content="❌ **Помилка:** Не вдалося отримати список файлів з GitHub.")
-                        dir_data = await dir_resp.json()
-
-                    # 2. Перебираємо всі файли у папці
-                    for item in dir_data:
-                        file_name = item.get("name", "")
-                        if not file_name.endswith(".json"): continue
-                        
-                        file_path = item["path"]
-                        file_sha = item["sha"]
-                        
-                        # 3. Читаємо файл через Blob API (найсвіжіші дані)
-                        blob_url = f"https://api.github.com/repos/{GITHUB_REPO}/git/blobs/{file_sha}"
-                        async with session.get(blob_url, headers=gh_headers) as blob_resp:
-                            if blob_resp.status != 200: continue
-                            try:
-                                blob_data = await blob_resp.json()
-                                text_content = base64.b64decode(blob_data['content']).decode('utf-8')
-                                file_content = json.loads(text_content)
-                            except:
-                                continue
-                        
-                        changed = False
-                        
-                        # 4. Шукаємо рейс усередині файлу
-                        for p in file_content:
-                            original_len = len(p["flights"])
-                            # Фільтруємо рейси, залишаючи всі, крім того, що треба видалити
-                            p["flights"] = [f for f in p["flights"] if str(f.get("_id")) != target_id and str(f.get("id")) != target_id]
-                            
-                            # Якщо довжина масиву змінилася, значить рейс був тут!
-                            if len(p["flights"]) < original_len:
-                                changed = True
-                        
-                        # 5. Якщо рейс знайшли і видалили — записуємо файл назад
-                        if changed:
-                            # Підчищаємо пілотів, у яких 0 рейсів після видалення
-                            file_content = [p for p in file_content if len(p["flights"]) > 0]
-                            
-                            new_content_str = json.dumps(file_content, ensure_ascii=False, indent=4)
-                            new_content_b64 = base64.b64encode(new_content_str.encode('utf-8')).decode('utf-8')
-                            
-                            push_payload = {
-                                "message": f"🤖 Auto delete flight {target_id}",
-                                "content": new_content_b64,
-                                "sha": file_sha
-                            }
-                            
-                            put_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{file_path}"
-                            async with session.put(put_url, headers=gh_headers, json=push_payload) as put_resp:
-                                if put_resp.status in [200, 201]:
-                                    deleted = True
-                                    target_file = file_name
-                            
-                            # Оскільки рейс унікальний, якщо ми його знайшли і видалили — далі шукати немає сенсу
-                            break 
-                            
-        except Exception as e:
-            return await status_msg.edit(content=f"❌ **Помилка під час видалення:** {e}")
+    if found_emoji:
+        # Формуємо правильний код (з 'a', якщо анімований)
+        emoji_code = f"<{'a' if found_emoji.animated else ''}:{found_emoji.name}:{found_emoji.id}>"
+        await message.channel.send(f"✅ **Found it!**\nCopy this code:\n`{emoji_code}`\n\nPreview: {emoji_code}")
+    else:
+        await message.channel.send(f"❌ **Error:** Emoji named `{emoji_name}` not found on this server.")
+    return
 
-        # 6. Виводимо результат
-        if deleted:
-            await status_msg.edit(content=f"✅ **Успіх!** Рейс `{target_id}` назавжди видалено з файлу `{target_file}` на GitHub.")
-        else:
-            await status_msg.edit(content=f"⚠️ **Рейс не знайдено.** Рейсу `{target_id}` немає в жодному JSON-файлі на GitHub.")
-        return
-    # -------------------------------------------------------------
+# -------------------------------------------------------------
 
-	# --- ➖ КОМАНДА: !delflight <ID> (ВІДНЯТИ РЕЙС ЗІ СТАТИСТИКИ) ---
-    if message.content.startswith("!delflight"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split()
-        if len(parts) < 2:
-            return await message.channel.send("⚠️ Usage: `!delflight <Flight_ID>`")
-        
-        fid = parts[1]
-        msg = await message.channel.send(f"⏳ **Removing flight `{fid}` from stats...**")
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                det = await fetch_api(session, f"/flight/{fid}")
-                
-                if not det or "flight" not in det:
-                    return await msg.edit(content=f"❌ **Error:** Flight `{fid}` not found in API.")
-                
-                f = det["flight"]
-                sched_time = f.get("depTimeSched") or f.get("creationDate")
-                week_tag = get_iso_week(sched_time)
-                
-                stats = load_weekly_stats()
-                if week_tag not in stats:
-                    return await msg.edit(content=f"⚠️ Week `{week_tag}` not found in stats.")
-                
-                s = stats[week_tag]
-                
-                t = f.get("result", {}).get("totals", {})
-                balance = int(t.get("balance", 0))
-                
-                raw_pax = t.get("payload", {}).get("pax", 0)
-                if raw_pax == 0 and f.get("type") != "cargo":
-                    raw_pax = int(f.get("payload", {}).get("pax", 0))
-                    
-                cargo_kg = int(f.get("payload", {}).get("weights", {}).get("cargo", 0))
-                rating = float(f.get("rating", 0.0))
-                
-                pilot = f.get("pilot", {}).get("fullname", "Unknown Pilot")
-                
-                check_g, check_fpm = 0.0, 0
-                if "result" in f and "violations" in f["result"]:
-                    for v in f["result"]["violations"]:
-                        entry = v.get("entry", {}).get("payload", {}).get("touchDown", {})
-                        if entry:
-                            check_g = float(entry.get("gForce", 0))
-                            check_fpm = int(entry.get("rate", 0))
-                            break 
-                if check_g == 0 and "landing" in f:
-                    check_g = float(f.get("landing", {}).get("gForce", 0))
-                    check_fpm = int(f.get("landing", {}).get("rate", 0) or f.get("landing", {}).get("touchDownRate", 0))
-                    
-                fpm_val = -abs(check_fpm) if check_fpm != 0 else 0
-                
-                if s["flights"] > 0:
-                    s["flights"] -= 1
-                    s["earnings"] -= balance
-                    s["pax"] -= raw_pax
-                    s["cargo"] -= cargo_kg
-                    s["rating_sum"] -= rating
-                    s["fpm_sum"] -= fpm_val
-                    s["g_sum"] -= check_g
-                
-                if pilot in s.get("pilots", {}):
-                    s["pilots"][pilot] -= 1
-                    if s["pilots"][pilot] <= 0: del s["pilots"][pilot]
-                
-                save_weekly_stats(stats)
-                
-                cs = f.get("flightNumber") or f.get("callsign") or "Unknown"
-                await msg.edit(content=f"✅ **Flight `{cs}` successfully REMOVED from week `{week_tag}`!**\n*(Note: Totals and averages are fixed. Weekly records like 'Hardest Landing' are not changed).*")
-                
-        except Exception as e:
-            await msg.edit(content=f"❌ **Internal error occurred:** {e}")
-        return
-    # -------------------------------------------------------------
+# --- 🖼️ КОМАНДА: !avatar <User_ID> (СКАЧАТИ АВАТАРКУ КОРИСТУВАЧА) ---
+@command("!avatar", admin=True)
+async def cmd_avatar(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2:
+        return await message.channel.send("⚠️ **Формат:** `!avatar <User_ID>`")
 
-        # --- 📊 КОМАНДА: !stats (СКАЧАТИ ФАЙЛ СТАТИСТИКИ) ---
-    if message.content == "!stats":
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        try:
-            if not WEEKLY_STATS_FILE.exists() or os.path.getsize(WEEKLY_STATS_FILE) == 0:
-                return await message.channel.send("⚠️ **Stats file (weekly_stats.json) is empty or does not exist yet.**")
-                
-            with open(WEEKLY_STATS_FILE, "rb") as fp:
-                await message.channel.send(
-                    content="📊 **Weekly Stats File:**", 
-                    file=discord.File(fp, filename="weekly_stats.json")
-                )
-        except Exception as e:
-            await message.channel.send(f"❌ **Error sending file:** {e}")
-        return
-    # --------------------------------------------------------
+    target_id_str = parts[1]
+    if not target_id_str.isdigit():
+         return await message.channel.send("⚠️ **Помилка:** ID користувача має бути числом.")
 
-    # --- 📜 КОМАНДА: !audit [all/кількість] (СКАЧАТИ ЖУРНАЛ АУДИТУ) ---
-    if message.content.startswith("!audit"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split()
-        
-        fetch_limit = 50
-        is_all = False
-        
-        if len(parts) > 1:
-            if parts[1].lower() == "all":
-                fetch_limit = None
-                is_all = True
-            elif parts[1].isdigit():
-                fetch_limit = int(parts[1])
-
-        main_channel = client.get_channel(CHANNEL_ID)
-        if not main_channel:
-            return await message.channel.send("❌ **Error:** Cannot find the main server. Check CHANNEL_ID.")
-        
-        guild = main_channel.guild
-        
-        if is_all:
-            await message.channel.send(f"⏳ **Gathering ALL available logs (up to 90 days) from '{guild.name}'... This may take a minute.**")
-        else:
-            await message.channel.send(f"⏳ **Gathering the last {fetch_limit} audit logs from '{guild.name}'...**")
-        
-        try:
-            audit_text = f"=== Audit Log: {guild.name} ===\n"
-            audit_text += f"Limit: {'All available (up to 90 days)' if is_all else fetch_limit}\n" + "="*50 + "\n\n"
-            
-            count = 0
-            async for entry in guild.audit_logs(limit=fetch_limit):
-                time_str = entry.created_at.strftime("%Y-%m-%d %H:%M:%S UTC")
-                user = entry.user
-                action = entry.action.name
-                target = entry.target
-                reason = entry.reason or "Not specified"
-                
-                audit_text += f"[{time_str}] {user} -> ACTION: {action}\n"
-                audit_text += f"   Target: {target}\n"
-                audit_text += f"   Reason: {reason}\n"
-                audit_text += "-"*50 + "\n"
-                count += 1
-                
-            audit_text += f"\nTotal logs gathered: {count}"
-                
-            file_bin = io.BytesIO(audit_text.encode('utf-8'))
-            
-            await message.channel.send(
-                content=f"✅ **Done! Found {count} logs.** Here is your report:", 
-                file=discord.File(file_bin, filename=f"audit_log_{'all' if is_all else fetch_limit}.txt")
-            )
-            
-        except discord.Forbidden:
-            await message.channel.send("❌ **Error:** I don't have the 'View Audit Log' (Перегляд журналу аудиту) permission.")
-        except Exception as e:
-            await message.channel.send(f"❌ **Error:** {e}")
-        return
-    # -------------------------------------------------------------
+    target_user_id = int(target_id_str)
 
-    # --- 🗑️ КОМАНДА: !del (РОЗУМНЕ ВИДАЛЕННЯ ТІЛЬКИ ЗА ID) ---
-    if message.content.startswith("!del "):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split()
-        if len(parts) != 2:
-            return await message.channel.send("⚠️ **Format:** `!del <Message_ID>`")
-            
-        try:
-            msg_id = int(parts[1])
-        except ValueError:
-            return await message.channel.send("❌ **Error:** Message ID must be a number.")
-            
-        status_msg = await message.channel.send("⏳ **Searching for message across all channels...**")
-        
-        found_msg = None
-        
-        for guild in client.guilds:
-            for channel in guild.text_channels:
-                try:
-                    found_msg = await channel.fetch_message(msg_id)
-                    break
-                except:
-                    continue
-            if found_msg:
-                break
-                
-        if found_msg:
-            try:
-                await found_msg.delete()
-                await status_msg.edit(content=f"✅ **Success!** Message silently deleted in channel `#{found_msg.channel.name}` 🥷")
-            except discord.Forbidden:
-                await status_msg.edit(content="❌ **Error:** Found the message, but lack permission to delete it (check Manage Messages).")
-        else:
-            await status_msg.edit(content="❌ **Error:** Message with this ID not found on the server (or already deleted).")
-            
-        return
-    # -------------------------------------------------------------------------
+    status_msg = await message.channel.send("⏳ **Шукаю користувача та завантажую аватарку...**")
 
-    # --- 🧹 КОМАНДА: !clearwow <ID> (ОЧИСТИТИ ВСІ РЕАКЦІЇ) ---
-    if message.content.startswith("!clearwow"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        parts = message.content.split()
-        if len(parts) < 2:
-            return await message.channel.send("⚠️ Usage: `!clearwow <Message_ID>`")
-        
-        target_id = parts[1]
-        if not target_id.isdigit():
-             return await message.channel.send("⚠️ ID must be a number.")
+    try:
+        # Шукаємо користувача глобально через API Discord
+        target_user = await client.fetch_user(target_user_id)
 
-        found_message = await find_discord_message(int(target_id), message)
-        
-        if found_message:
-            try:
-                await found_message.clear_reactions()
-                channel_mention = found_message.channel.mention if hasattr(found_message.channel, 'mention') else "Direct Messages"
-                await message.channel.send(f"✅ **Cleared all reactions from message in {channel_mention}**")
-            except discord.Forbidden:
-                await message.channel.send("❌ **Error:** I don't have 'Manage Messages' permission to clear reactions. Please check role settings.")
-            except Exception as e:
-                await message.channel.send(f"❌ **Error clearing reactions:** {e}")
-        else:
-            await message.channel.send("❌ **Message not found.** (Check ID or bot permissions)")
-        return
-    # -------------------------------------------------------------
+        # Беремо аватарку (display_avatar автоматично віддає кастомну або дефолтну)
+        avatar_asset = target_user.display_avatar
 
-	# --- 🔇 КОМАНДА: !hideuser <User_ID> <Channel_ID> (ПРИХОВАТИ ЮЗЕРА) ---
-    if message.content.startswith("!hideuser"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split()
-        if len(parts) < 3:
-            return await message.channel.send("⚠️ **Формат:** `!hideuser <ID_користувача> <ID_каналу>`")
-            
-        target_user = int(parts[1])
-        target_channel = str(parts[2]) # Зберігаємо як текст для JSON
-        
-        if target_channel not in HIDDEN_USERS:
-            HIDDEN_USERS[target_channel] = []
-            
-        if target_user not in HIDDEN_USERS[target_channel]:
-            HIDDEN_USERS[target_channel].append(target_user)
-            save_hidden_users(HIDDEN_USERS) # 🔥 ЗБЕРІГАЄМО У ФАЙЛ
-            await message.channel.send(f"🥷 **Готово!** Тепер повідомлення від користувача `{target_user}` у каналі `{target_channel}` будуть назавжди приховані.")
-        else:
-            await message.channel.send("⚠️ Цей користувач вже прихований у цьому каналі.")
-        return
+        # Скачуємо картинку в оперативну пам'ять (як байти)
+        avatar_bytes = await avatar_asset.read()
+
+        # Перетворюємо байти на файл для відправки в Discord
+        image_file = discord.File(io.BytesIO(avatar_bytes), filename=f"avatar_{target_user.name}.png")
+
+        # Створюємо гарний Embed, щоб прикріпити туди цю фотку
+        embed = discord.Embed(
+            title=f"🖼️ Аватарка: {target_user.display_name}", 
+            description=f"**Нікнейм:** `{target_user.name}`\n**ID:** `{target_user.id}`",
+            color=0x3498db
+        )
+        # Прив'язуємо файл до Embed
+        embed.set_image(url=f"attachment://avatar_{target_user.name}.png")
 
-    # --- 🔊 КОМАНДА: !unhideuser <User_ID> <Channel_ID> (ПОВЕРНУТИ ЮЗЕРА) ---
-    if message.content.startswith("!unhideuser"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split()
-        if len(parts) < 3:
-            return await message.channel.send("⚠️ **Формат:** `!unhideuser <ID_користувача> <ID_каналу>`")
-            
-        target_user = int(parts[1])
-        target_channel = str(parts[2])
-        
-        if target_channel in HIDDEN_USERS and target_user in HIDDEN_USERS[target_channel]:
-            HIDDEN_USERS[target_channel].remove(target_user)
-            # Якщо список порожній, підчищаємо канал з бази
-            if not HIDDEN_USERS[target_channel]:
-                del HIDDEN_USERS[target_channel]
-                
-            save_hidden_users(HIDDEN_USERS) # 🔥 ЗБЕРІГАЄМО У ФАЙЛ
-            await message.channel.send(f"✅ **Знято!** Користувач `{target_user}` знову може писати в канал `{target_channel}`.")
-        else:
-            await message.channel.send("⚠️ Цього користувача не було в списку прихованих для цього каналу.")
-        return
+        # Відправляємо повідомлення з файлом і видаляємо "годинник"
+        await message.channel.send(embed=embed, file=image_file)
+        await status_msg.delete()
 
-    # --- 🛡️ КОМАНДА: !banwow <ID> (ЗАБОРОНИТИ СМАЙЛИ) ---
-    if message.content.startswith("!banwow"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        parts = message.content.split()
-        if len(parts) < 2 or not parts[1].isdigit():
-            return await message.channel.send("⚠️ Usage: `!banwow <Message_ID>`")
-        
-        msg_id = int(parts[1])
-        BANNED_WOW_MESSAGES.add(msg_id)
-        await message.channel.send(f"🛡️ **Message {msg_id} is now protected!**\nAny new reactions will be instantly deleted.")
-        return
+    except discord.NotFound:
+        await status_msg.edit(content="❌ **Помилка:** Користувача з таким ID не знайдено в Discord.")
+    except Exception as e:
+        await status_msg.edit(content=f"❌ **Помилка під час завантаження:** {e}")
+    return
 
-    # --- 🟢 КОМАНДА: !unbanwow <ID> (ДОЗВОЛИТИ СМАЙЛИ) ---
-    if message.content.startswith("!unbanwow"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        parts = message.content.split()
-        if len(parts) < 2 or not parts[1].isdigit():
-            return await message.channel.send("⚠️ Usage: `!unbanwow <Message_ID>`")
-        
-        msg_id = int(parts[1])
-        if msg_id in BANNED_WOW_MESSAGES:
-            BANNED_WOW_MESSAGES.remove(msg_id)
-            await message.channel.send(f"✅ **Protection removed.** You can now react to message {msg_id} again.")
-        else:
-            await message.channel.send("⚠️ This message is not currently blacklisted.")
-        return
-    
-	# --- 👹 КОМАНДА: !wow <ID> <EMOJI> (СТАВИТИ РЕАКЦІЮ) ---
-    if message.content.startswith("!wow"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        parts = message.content.split()
-        if len(parts) < 3:
-            return await message.channel.send("⚠️ Usage: `!wow <Message_ID> <Emoji>`")
-        
-        target_id = parts[1]
-        emoji_input = parts[2]
-        if not target_id.isdigit():
-             return await message.channel.send("⚠️ ID must be a number.")
+# -------------------------------------------------------------
 
-        found_message = await find_discord_message(int(target_id), message)
-        
-        if found_message:
-            reaction_emoji = emoji_input
-            
-            # 🔥 Перевіряємо, чи це ПРОСТО НАЗВА (тільки букви, цифри та нижнє підкреслення)
-            if re.match(r"^[a-zA-Z0-9_]+$", emoji_input):
-                # Якщо команду написали на сервері — шукаємо на цьому ж сервері
-                if message.guild:
-                    found_emoji = discord.utils.get(message.guild.emojis, name=emoji_input)
-                    if found_emoji:
-                        reaction_emoji = found_emoji
-                    else:
-                        return await message.channel.send(f"❌ **Емодзі `{emoji_input}` не знайдено на цьому сервері!**")
-                else:
-                    # Якщо команду написали в ПП (тут немає бази кастомних емодзі)
-                    return await message.channel.send("❌ **Помилка:** В особистих повідомленнях не можна шукати кастомні емодзі за назвою. Відправ стандартний смайлик або його повний код `<:name:ID>`.")
+# --- 📂 КОМАНДА: !files (ВМІСТ ПОСТІЙНОЇ ПАМ'ЯТІ / VOLUME) ---
+@command("!files")
+async def cmd_files(message, is_admin):
+    folder_path = "/app/data"
 
-            try:
-                await found_message.add_reaction(reaction_emoji)
-                channel_mention = found_message.channel.mention if hasattr(found_message.channel, 'mention') else "Direct Messages"
-                await message.channel.send(f"✅ **Reacted {reaction_emoji} to message in {channel_mention}**")
-            except discord.HTTPException as e:
-                if e.status == 400:
-                    await message.channel.send(f"❌ **Помилка:** Неправильний формат емодзі або бот не має до нього доступу.")
-                else:
-                    await message.channel.send(f"❌ **Error adding reaction:** {e}")
-            except Exception as e:
-                await message.channel.send(f"❌ **Error adding reaction:** {e}")
+    if os.path.exists(folder_path):
+        files = os.listdir(folder_path)
+
+        if len(files) > 0:
+            file_list = "\n".join([f"📄 {file}" for file in files])
+            await message.channel.send(f"📂 **Contents of persistent folder `{folder_path}`:**\n```text\n{file_list}\n```")
         else:
-            await message.channel.send("❌ **Message not found.** (Check ID or bot permissions)")
-        return
-    # -------------------------------------------------------------
-
-    # --- 💽 КОМАНДА: !disk (РЕАЛЬНА ПАМ'ЯТЬ БОТА) ---
-    if message.content == "!disk":
-        def get_size(path="."):
-            total = 0
-            for dirpath, _, filenames in os.walk(path):
-                for f in filenames:
-                    fp = os.path.join(dirpath, f)
-                    if not os.path.islink(fp):
-                        total += os.path.getsize(fp)
-            return total / (1024 * 1024)
-
-        app_size_mb = get_size("/app") 
-        volume_size_mb = get_size("/app/data") if os.path.exists("/app/data") else 0
-        
-        temp_used_mb = app_size_mb - volume_size_mb
-        
-        LIMIT_MB = 1024.0
-        free_mb = LIMIT_MB - temp_used_mb
-        
-        text = (
-            f"💽 **Bot's Real Memory Stats:**\n"
-            f"**Available Limit:** {LIMIT_MB} MB (1 GB)\n"
-            f"**Currently Used:** {temp_used_mb:.2f} MB\n"
-            f"**FREE TO WRITE:** {free_mb:.2f} MB\n"
-            f"*(Reference: Volume persistent memory takes {volume_size_mb:.2f} MB)*"
-        )
-        return await message.channel.send(text)
-    # -------------------------------------------------------------
+            await message.channel.send(f"📂 Folder `{folder_path}` is currently completely empty.")
+    else:
+        await message.channel.send(f"❌ Error: Folder `{folder_path}` does not exist! Volume is not attached or the path is incorrect.")
+    return
 
-	# --- 📋 КОМАНДА: !chlist (СПИСОК ВСІХ КАНАЛІВ) ---
-    if message.content == "!chlist":
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        main_channel = client.get_channel(CHANNEL_ID)
-        if not main_channel:
-            return await message.channel.send("❌ **Помилка:** Не вдалося знайти головний сервер (перевір CHANNEL_ID).")
-        
-        guild = main_channel.guild
-        await message.channel.send(f"⏳ **Збираю список каналів сервера `{guild.name}`...**")
-        
-        lines = [f"=== Список каналів сервера: {guild.name} ===\n"]
-        
-        # Спочатку категорії та канали всередині них
-        for category in guild.categories:
-            lines.append(f"📂 [Категорія] {category.name} (ID: {category.id})")
-            for ch in category.channels:
-                lines.append(f"   ├─ [{ch.type.name.upper()}] {ch.name} (ID: {ch.id})")
-            lines.append("")
-            
-        # Канали без категорій (якщо такі є)
-        uncategorized = [ch for ch in guild.channels if ch.category is None]
-        if uncategorized:
-            lines.append("📁 [Без категорії]")
-            for ch in uncategorized:
-                lines.append(f"   ├─ [{ch.type.name.upper()}] {ch.name} (ID: {ch.id})")
-                
-        file_bin = io.BytesIO("\n".join(lines).encode('utf-8'))
-        await message.channel.send(
-            content=f"✅ **Готово! Знайдено {len(guild.channels)} каналів.**",
-            file=discord.File(file_bin, filename="channel_list.txt")
-        )
-        return
 
-    # --- 📥 КОМАНДА: !chview <ID> (ВИКАЧАТИ ІСТОРІЮ КАНАЛУ) ---
-    if message.content.startswith("!chview"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split()
-        if len(parts) < 2 or not parts[1].isdigit():
-            return await message.channel.send("⚠️ **Формат:** `!chview <Channel_ID>`")
-            
-        target_id = int(parts[1])
-        main_channel = client.get_channel(CHANNEL_ID)
-        guild = main_channel.guild if main_channel else None
-        
-        if not guild:
-            return await message.channel.send("❌ **Помилка:** Не вдалося знайти головний сервер.")
-            
-        # Знаходимо канал
-        target_channel = guild.get_channel(target_id)
-        if not target_channel:
-            try:
-                target_channel = await guild.fetch_channel(target_id)
-            except:
-                return await message.channel.send("❌ **Помилка:** Канал з таким ID не знайдено.")
-                
-        # Перевіряємо, чи можна в ньому взагалі читати повідомлення
-        if not hasattr(target_channel, 'history'):
-            return await message.channel.send("❌ **Помилка:** Цей тип каналу не підтримує історію повідомлень (наприклад, це голосовий канал без чату).")
-            
-        status_msg = await message.channel.send(f"⏳ **Викачую історію з каналу `{target_channel.name}`...** Це може зайняти деякий час.")
-        
+# --- 🗑️ КОМАНДА: !unwow <ID> <EMOJI> (ПРИБРАТИ РЕАКЦІЮ) ---
+@command("!unwow", admin=True)
+async def cmd_unwow(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 3:
+        return await message.channel.send("⚠️ Usage: `!unwow <Message_ID> <Emoji>`")
+
+    target_id = parts[1]
+    emoji_input = parts[2]
+    if not target_id.isdigit():
+         return await message.channel.send("⚠️ ID must be a number.")
+
+    found_message = await find_discord_message(int(target_id), message)
+
+    if found_message:
+        # 🔥 ДОДАТКОВО: Шукаємо емодзі, якщо передана тільки назва
+        reaction_emoji = emoji_input
+        if ":" not in emoji_input and not emoji_input.startswith("<"):
+            found_emoji = discord.utils.get(message.guild.emojis, name=emoji_input)
+            if found_emoji:
+                reaction_emoji = found_emoji
+            else:
+                return await message.channel.send(f"❌ **Емодзі `{emoji_input}` не знайдено на цьому сервері!**")
+
         try:
-            lines = [f"=== Історія повідомлень каналу: {target_channel.name} (ID: {target_id}) ===\n"]
-            count = 0
-            
-            # oldest_first=True викачує від найстаріших повідомлень до найновіших
-            async for msg in target_channel.history(limit=None, oldest_first=True):
-                time_str = msg.created_at.strftime("%Y-%m-%d %H:%M:%S UTC")
-                author = msg.author.name
-                
-                # Замінюємо переноси рядків на пробіли, щоб одне повідомлення займало один рядок у файлі
-                content = msg.content.replace('\n', ' ') 
-                
-                lines.append(f"[{time_str}] {author}: {content}")
-                
-                # Якщо є вкладення (фото, файли), зберігаємо посилання на них
-                for att in msg.attachments:
-                    lines.append(f"   📎 [Вкладення]: {att.url}")
-                    
-                count += 1
-                if count % 1000 == 0:
-                    await status_msg.edit(content=f"⏳ **Викачую... Вже оброблено {count} повідомлень.**")
-                    
-            if count == 0:
-                return await status_msg.edit(content="✅ **Канал абсолютно порожній.**")
-                
-            file_bin = io.BytesIO("\n".join(lines).encode('utf-8'))
-            
-            await status_msg.delete()
-            await message.channel.send(
-                content=f"✅ **Готово! Викачано {count} повідомлень з `#{target_channel.name}`.**",
-                file=discord.File(file_bin, filename=f"export_{target_channel.name}.txt")
-            )
-            
-        except discord.Forbidden:
-            await status_msg.edit(content="❌ **Помилка:** У бота немає прав на читання історії цього каналу.")
+            # Видаляємо реакцію саме від бота (client.user)
+            await found_message.remove_reaction(reaction_emoji, client.user)
+            await message.channel.send(f"✅ **Removed {reaction_emoji} from message in {found_message.channel.mention}**")
         except Exception as e:
-            await status_msg.edit(content=f"❌ **Сталася помилка:** {e}")
-            
-        return
-    # -------------------------------------------------------------
+            await message.channel.send(f"❌ **Error removing reaction:** {e}")
+    else:
+        await message.channel.send("❌ **Message not found.** (Check ID or bot permissions)")
+    return
 
-	# --- 🔍 КОМАНДА: !idemoji <назва> (ДІЗНАТИСЯ КОД ЕМОДЗІ) ---
-    if message.content.startswith("!idemoji"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        parts = message.content.split()
-        if len(parts) < 2:
-            return await message.channel.send("⚠️ Usage: `!idemoji <name>` (without colons)")
-        
-        if not message.guild:
-            return await message.channel.send("⚠️ Please use this command in a server channel, not in DM.")
+# -------------------------------------------------------------
 
-        emoji_name = parts[1].replace(":", "") # Прибираємо двокрапки, якщо випадково написав
-        
-        # Шукаємо емодзі на сервері
-        found_emoji = discord.utils.get(message.guild.emojis, name=emoji_name)
-        
-        if found_emoji:
-            # Формуємо правильний код (з 'a', якщо анімований)
-            emoji_code = f"<{'a' if found_emoji.animated else ''}:{found_emoji.name}:{found_emoji.id}>"
-            await message.channel.send(f"✅ **Found it!**\nCopy this code:\n`{emoji_code}`\n\nPreview: {emoji_code}")
-        else:
-            await message.channel.send(f"❌ **Error:** Emoji named `{emoji_name}` not found on this server.")
-        return
-    # -------------------------------------------------------------
+# --- 💬 НОВА КОМАНДА: !reply <ID> <text> (ВІДПОВІСТИ НА ПОВІДОМЛЕННЯ) ---
+@command("!reply", admin=True)
+async def cmd_reply(message, is_admin):
+    global last_sent_message
+    parts = message.content.split()
+    if len(parts) < 3:
+        return await message.channel.send("⚠️ Usage: `!reply <Message_ID> <text>`")
 
-	# --- 🖼️ КОМАНДА: !avatar <User_ID> (СКАЧАТИ АВАТАРКУ КОРИСТУВАЧА) ---
-    if message.content.startswith("!avatar"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split()
-        if len(parts) < 2:
-            return await message.channel.send("⚠️ **Формат:** `!avatar <User_ID>`")
-            
-        target_id_str = parts[1]
-        if not target_id_str.isdigit():
-             return await message.channel.send("⚠️ **Помилка:** ID користувача має бути числом.")
-             
-        target_user_id = int(target_id_str)
-        
-        status_msg = await message.channel.send("⏳ **Шукаю користувача та завантажую аватарку...**")
-        
+    target_id = parts[1]
+    if not target_id.isdigit():
+         return await message.channel.send("⚠️ ID must be a number.")
+
+    content = " ".join(parts[2:])
+    found_message = await find_discord_message(int(target_id), message)
+
+    if found_message:
         try:
-            # Шукаємо користувача глобально через API Discord
-            target_user = await client.fetch_user(target_user_id)
-            
-            # Беремо аватарку (display_avatar автоматично віддає кастомну або дефолтну)
-            avatar_asset = target_user.display_avatar
-            
-            # Скачуємо картинку в оперативну пам'ять (як байти)
-            avatar_bytes = await avatar_asset.read()
-            
-            # Перетворюємо байти на файл для відправки в Discord
-            image_file = discord.File(io.BytesIO(avatar_bytes), filename=f"avatar_{target_user.name}.png")
-            
-            # Створюємо гарний Embed, щоб прикріпити туди цю фотку
-            embed = discord.Embed(
-                title=f"🖼️ Аватарка: {target_user.display_name}", 
-                description=f"**Нікнейм:** `{target_user.name}`\n**ID:** `{target_user.id}`",
-                color=0x3498db
-            )
-            # Прив'язуємо файл до Embed
-            embed.set_image(url=f"attachment://avatar_{target_user.name}.png")
-            
-            # Відправляємо повідомлення з файлом і видаляємо "годинник"
-            await message.channel.send(embed=embed, file=image_file)
-            await status_msg.delete()
-            
-        except discord.NotFound:
-            await status_msg.edit(content="❌ **Помилка:** Користувача з таким ID не знайдено в Discord.")
+            sent_msg = await found_message.reply(content)
+            last_sent_message = sent_msg # 🔥 Зберігаємо для команди !undo
+            await message.channel.send(f"✅ **Replied to message in {found_message.channel.mention}:**\n{content}")
         except Exception as e:
-            await status_msg.edit(content=f"❌ **Помилка під час завантаження:** {e}")
-        return
-    # -------------------------------------------------------------
+            await message.channel.send(f"❌ **Error replying:** {e}")
+    else:
+        await message.channel.send("❌ **Message not found.** (Check ID or bot permissions)")
+    return
 
-    # --- 📂 КОМАНДА: !files (ВМІСТ ПОСТІЙНОЇ ПАМ'ЯТІ / VOLUME) ---
-    if message.content == "!files":
-        folder_path = "/app/data"
-        
-        if os.path.exists(folder_path):
-            files = os.listdir(folder_path)
-            
-            if len(files) > 0:
-                file_list = "\n".join([f"📄 {file}" for file in files])
-                await message.channel.send(f"📂 **Contents of persistent folder `{folder_path}`:**\n```text\n{file_list}\n```")
-            else:
-                await message.channel.send(f"📂 Folder `{folder_path}` is currently completely empty.")
-        else:
-            await message.channel.send(f"❌ Error: Folder `{folder_path}` does not exist! Volume is not attached or the path is incorrect.")
-        return
+# -------------------------------------------------------------
 
-# --- 🗑️ КОМАНДА: !unwow <ID> <EMOJI> (ПРИБРАТИ РЕАКЦІЮ) ---
-    if message.content.startswith("!unwow"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        parts = message.content.split()
-        if len(parts) < 3:
-            return await message.channel.send("⚠️ Usage: `!unwow <Message_ID> <Emoji>`")
-        
-        target_id = parts[1]
-        emoji_input = parts[2]
-        if not target_id.isdigit():
-             return await message.channel.send("⚠️ ID must be a number.")
+# --- 🔨 КОМАНДА: !ban <User_ID> [reason] (БАН КОРИСТУВАЧА НА СЕРВЕРІ) ---
+@command("!ban", admin=True)
+async def cmd_ban(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2:
+        return await message.channel.send("⚠️ Usage: `!ban <User_ID> [reason]`")
 
-        found_message = await find_discord_message(int(target_id), message)
-        
-        if found_message:
-            # 🔥 ДОДАТКОВО: Шукаємо емодзі, якщо передана тільки назва
-            reaction_emoji = emoji_input
-            if ":" not in emoji_input and not emoji_input.startswith("<"):
-                found_emoji = discord.utils.get(message.guild.emojis, name=emoji_input)
-                if found_emoji:
-                    reaction_emoji = found_emoji
-                else:
-                    return await message.channel.send(f"❌ **Емодзі `{emoji_input}` не знайдено на цьому сервері!**")
+    target_id_str = parts[1]
+    if not target_id_str.isdigit():
+         return await message.channel.send("⚠️ User ID must be a number.")
 
-            try:
-                # Видаляємо реакцію саме від бота (client.user)
-                await found_message.remove_reaction(reaction_emoji, client.user)
-                await message.channel.send(f"✅ **Removed {reaction_emoji} from message in {found_message.channel.mention}**")
-            except Exception as e:
-                await message.channel.send(f"❌ **Error removing reaction:** {e}")
-        else:
-            await message.channel.send("❌ **Message not found.** (Check ID or bot permissions)")
-        return
-    # -------------------------------------------------------------
+    target_user_id = int(target_id_str)
 
-    # --- 💬 НОВА КОМАНДА: !reply <ID> <text> (ВІДПОВІСТИ НА ПОВІДОМЛЕННЯ) ---
-    if message.content.startswith("!reply"):
-        if not is_admin: 
-            return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split()
-        if len(parts) < 3:
-            return await message.channel.send("⚠️ Usage: `!reply <Message_ID> <text>`")
-        
-        target_id = parts[1]
-        if not target_id.isdigit():
-             return await message.channel.send("⚠️ ID must be a number.")
+    ban_reason = " ".join(parts[2:]) if len(parts) > 2 else None
 
-        content = " ".join(parts[2:])
-        found_message = await find_discord_message(int(target_id), message)
-        
-        if found_message:
-            try:
-                sent_msg = await found_message.reply(content)
-                last_sent_message = sent_msg # 🔥 Зберігаємо для команди !undo
-                await message.channel.send(f"✅ **Replied to message in {found_message.channel.mention}:**\n{content}")
-            except Exception as e:
-                await message.channel.send(f"❌ **Error replying:** {e}")
-        else:
-            await message.channel.send("❌ **Message not found.** (Check ID or bot permissions)")
-        return
-    # -------------------------------------------------------------
+    main_channel = client.get_channel(CHANNEL_ID)
+    if not main_channel:
+        return await message.channel.send("❌ **Error:** Cannot find the main server. Check CHANNEL_ID.")
 
-    # --- 🔨 КОМАНДА: !ban <User_ID> [reason] (БАН КОРИСТУВАЧА НА СЕРВЕРІ) ---
-    if message.content.startswith("!ban ") or message.content == "!ban":
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        parts = message.content.split()
-        if len(parts) < 2:
-            return await message.channel.send("⚠️ Usage: `!ban <User_ID> [reason]`")
-        
-        target_id_str = parts[1]
-        if not target_id_str.isdigit():
-             return await message.channel.send("⚠️ User ID must be a number.")
-        
-        target_user_id = int(target_id_str)
+    guild = main_channel.guild
 
-        ban_reason = " ".join(parts[2:]) if len(parts) > 2 else None
+    try:
+        user_to_ban = discord.Object(id=target_user_id)
+        await guild.ban(user_to_ban, reason=ban_reason, delete_message_seconds=0)
 
-        main_channel = client.get_channel(CHANNEL_ID)
-        if not main_channel:
-            return await message.channel.send("❌ **Error:** Cannot find the main server. Check CHANNEL_ID.")
-        
-        guild = main_channel.guild
-        
-        try:
-            user_to_ban = discord.Object(id=target_user_id)
-            await guild.ban(user_to_ban, reason=ban_reason, delete_message_seconds=0)
-            
-            reason_text = f" for: {ban_reason}" if ban_reason else " (No reason provided)"
-            await message.channel.send(f"✅ **User {target_user_id} has been banned{reason_text}.** (Messages kept)")
-        except discord.Forbidden:
-            await message.channel.send("❌ **Error:** I don't have the 'Ban Members' permission, or my role is lower than the target's role.")
-        except Exception as e:
-            await message.channel.send(f"❌ **Error banning user:** {e}")
-        return
-    # -------------------------------------------------------------
+        reason_text = f" for: {ban_reason}" if ban_reason else " (No reason provided)"
+        await message.channel.send(f"✅ **User {target_user_id} has been banned{reason_text}.** (Messages kept)")
+    except discord.Forbidden:
+        await message.channel.send("❌ **Error:** I don't have the 'Ban Members' permission, or my role is lower than the target's role.")
+    except Exception as e:
+        await message.channel.send(f"❌ **Error banning user:** {e}")
+    return
 
-    # --- 🕊️ КОМАНДА: !unban <User_ID> (РОЗБАН КОРИСТУВАЧА) ---
-    if message.content.startswith("!unban"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        parts = message.content.split()
-        if len(parts) < 2:
-            return await message.channel.send("⚠️ Usage: `!unban <User_ID>`")
-        
-        target_id_str = parts[1]
-        if not target_id_str.isdigit():
-             return await message.channel.send("⚠️ User ID must be a number.")
-        
-        target_user_id = int(target_id_str)
-        main_channel = client.get_channel(CHANNEL_ID)
-        if not main_channel:
-            return await message.channel.send("❌ **Error:** Cannot find the main server.")
-        
-        guild = main_channel.guild
-        
-        try:
-            user_to_unban = discord.Object(id=target_user_id)
-            await guild.unban(user_to_unban, reason="Unbanned via bot.")
-            
-            await message.channel.send(f"✅ **User {target_user_id} has been unbanned in '{guild.name}'.**")
-        except discord.NotFound:
-            await message.channel.send(f"⚠️ **User {target_user_id} is not banned on this server.**")
-        except discord.Forbidden:
-            await message.channel.send("❌ **Error:** I don't have the 'Ban Members' permission.")
-        except Exception as e:
-            await message.channel.send(f"❌ **Error unbanning user:** {e}")
-        return
-    # -------------------------------------------------------------
-    
-    # --- 📋 КОМАНДА: !banlist (ПОКАЗАТИ СПИСОК ЗАБАНЕНИХ) ---
-    if message.content == "!banlist":
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        main_channel = client.get_channel(CHANNEL_ID)
-        if not main_channel:
-            return await message.channel.send("❌ **Error:** Cannot find the main server.")
-        
-        guild = main_channel.guild
-        
-        try:
-            await message.channel.send(f"⏳ **Fetching ban list for server '{guild.name}'...**")
-            
-            ban_list_text = f"=== Ban List for Server: {guild.name} ===\n\n"
-            count = 0
-            
-            async for ban_entry in guild.bans():
-                user = ban_entry.user
-                reason = ban_entry.reason or "Not specified"
-                ban_list_text += f"User: {user} (ID: {user.id})\nReason: {reason}\n{'-'*40}\n"
-                count += 1
-                
-            if count == 0:
-                return await message.channel.send("✅ **The ban list is empty!** No banned users on this server.")
-                
-            ban_list_text += f"\nTotal banned users: {count}."
-            
-            file_bin = io.BytesIO(ban_list_text.encode('utf-8'))
-            await message.channel.send(
-                content=f"📜 **Done! Found {count} banned users.** Here is the file:", 
-                file=discord.File(file_bin, filename="banlist.txt")
-            )
-            
-        except discord.Forbidden:
-            await message.channel.send("❌ **Error:** I don't have the 'Ban Members' permission to view the ban list.")
-        except Exception as e:
-            await message.channel.send(f"❌ **Error fetching ban list:** {e}")
-        return
-    # -------------------------------------------------------------
+# -------------------------------------------------------------
 
-	# --- 📝 КОМАНДА: !rename <ID> <текст> (ДОДАТИ ТЕКСТ В КАРТКУ ЧЕРЕЗ ПП) ---
-    if message.content.startswith("!rename"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split(maxsplit=2)
-        if len(parts) < 3:
-            return await message.channel.send("⚠️ Usage: `!rename <Message_ID> <text>`")
-            
-        target_id_str = parts[1]
-        if not target_id_str.isdigit():
-             return await message.channel.send("⚠️ ID must be a number.")
-             
-        new_text = parts[2]
-        
-        found_message = await find_discord_message(int(target_id_str), message)
-        
-        if found_message:
-            if found_message.author == client.user and found_message.embeds:
-                try:
-                    embed = found_message.embeds[0]
-                    
-                    old_desc = embed.description or ""
-                    embed.description = f"{old_desc}\n\n{new_text}"
-                    
-                    await found_message.edit(embed=embed)
-                    
-                    channel_mention = found_message.channel.mention if hasattr(found_message.channel, 'mention') else "Direct Messages"
-                    await message.channel.send(f"✅ **Success!** Text added to message in {channel_mention}.")
-                    
-                    if not isinstance(message.channel, discord.DMChannel):
-                        try:
-                            await message.delete()
-                        except discord.Forbidden:
-                            pass
-                            
-                except Exception as e:
-                    await message.channel.send(f"❌ **Error updating message:** {e}")
-            else:
-                await message.channel.send("❌ **Error:** Message must be sent by the bot and contain an embed.")
-        else:
-            await message.channel.send("❌ **Message not found.** (Check ID or bot permissions)")
-        return
-    # -------------------------------------------------------------
+# --- 🕊️ КОМАНДА: !unban <User_ID> (РОЗБАН КОРИСТУВАЧА) ---
+@command("!unban", admin=True)
+async def cmd_unban(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2:
+        return await message.channel.send("⚠️ Usage: `!unban <User_ID>`")
+
+    target_id_str = parts[1]
+    if not target_id_str.isdigit():
+         return await message.channel.send("⚠️ User ID must be a number.")
+
+    target_user_id = int(target_id_str)
+    main_channel = client.get_channel(CHANNEL_ID)
+    if not main_channel:
+        return await message.channel.send("❌ **Error:** Cannot find the main server.")
+
+    guild = main_channel.guild
+
+    try:
+        user_to_unban = discord.Object(id=target_user_id)
+        await guild.unban(user_to_unban, reason="Unbanned via bot.")
+
+        await message.channel.send(f"✅ **User {target_user_id} has been unbanned in '{guild.name}'.**")
+    except discord.NotFound:
+        await message.channel.send(f"⚠️ **User {target_user_id} is not banned on this server.**")
+    except discord.Forbidden:
+        await message.channel.send("❌ **Error:** I don't have the 'Ban Members' permission.")
+    except Exception as e:
+        await message.channel.send(f"❌ **Error unbanning user:** {e}")
+    return
+
+# -------------------------------------------------------------
+
+# --- 📋 КОМАНДА: !banlist (ПОКАЗАТИ СПИСОК ЗАБАНЕНИХ) ---
+@command("!banlist", admin=True)
+async def cmd_banlist(message, is_admin):
+    main_channel = client.get_channel(CHANNEL_ID)
+    if not main_channel:
+        return await message.channel.send("❌ **Error:** Cannot find the main server.")
+
+    guild = main_channel.guild
+
+    try:
+        await message.channel.send(f"⏳ **Fetching ban list for server '{guild.name}'...**")
+
+        ban_list_text = f"=== Ban List for Server: {guild.name} ===\n\n"
+        count = 0
+
+        async for ban_entry in guild.bans():
+            user = ban_entry.user
+            reason = ban_entry.reason or "Not specified"
+            ban_list_text += f"User: {user} (ID: {user.id})\nReason: {reason}\n{'-'*40}\n"
+            count += 1
+
+        if count == 0:
+            return await message.channel.send("✅ **The ban list is empty!** No banned users on this server.")
+
+        ban_list_text += f"\nTotal banned users: {count}."
+
+        file_bin = io.BytesIO(ban_list_text.encode('utf-8'))
+        await message.channel.send(
+            content=f"📜 **Done! Found {count} banned users.** Here is the file:", 
+            file=discord.File(file_bin, filename="banlist.txt")
+        )
+
+    except discord.Forbidden:
+        await message.channel.send("❌ **Error:** I don't have the 'Ban Members' permission to view the ban list.")
+    except Exception as e:
+        await message.channel.send(f"❌ **Error fetching ban list:** {e}")
+    return
+
+# -------------------------------------------------------------
+
+# --- ✉️ КОМАНДА: !pmsg <User_ID> <текст> (НАПИСАТИ В ПП КОРИСТУВАЧУ) ---
+@command("!pmsg", admin=True)
+async def cmd_pmsg(message, is_admin):
+    parts = message.content.split(" ", 2)
+    if len(parts) < 2 and not message.attachments:
+        return await message.channel.send("⚠️ **Format:** `!pmsg <User_ID> <text>` (можна прикріплювати картинки)")
+
+    target_id_str = parts[1]
+    if not target_id_str.isdigit():
+         return await message.channel.send("⚠️ **Error:** User ID має бути числом.")
+
+    target_user_id = int(target_id_str)
+    text_to_send = parts[2] if len(parts) > 2 else ""
+
+    files_to_send = []
+    for attachment in message.attachments:
+        files_to_send.append(await attachment.to_file())
+
+    if not text_to_send and not files_to_send:
+        return await message.channel.send("⚠️ **Error:** Немає тексту або зображення для відправки.")
+
+    try:
+        # Шукаємо користувача
+        target_user = await client.fetch_user(target_user_id)
+        if not target_user:
+            return await message.channel.send("❌ **Error:** Користувача з таким ID не знайдено.")
+
+        # Відправляємо повідомлення
+        await target_user.send(content=text_to_send, files=files_to_send)
+        await message.add_reaction("✅")
+        await message.channel.send(f"✅ **Повідомлення успішно доставлено в ПП користувачу {target_user.display_name}.**")
+
+    except discord.Forbidden:
+        await message.channel.send(f"❌ **Error:** Неможливо надіслати повідомлення {target_user_id}. Можливо, у нього закриті ПП для не-друзів, або він заблокував бота.")
+    except Exception as e:
+        await message.channel.send(f"❌ **Error:** {e}")
+    return
+
+# -------------------------------------------------------------------------
+
+# --- ✉️ КОМАНДА: !msg <ID_каналу> <текст> (+ МОЖНА ПРИКРІПЛЯТИ КАРТИНКИ) ---
+@command("!msg", admin=True)
+async def cmd_msg(message, is_admin):
+    global last_sent_message
+    parts = message.content.split(" ", 2)
+    if len(parts) < 2 and not message.attachments:
+        return await message.channel.send("⚠️ **Format:** `!msg <Channel_ID> <text>` (and/or attach an image)")
+
+    try:
+        channel_id = int(parts[1])
+        target_channel = client.get_channel(channel_id) 
+        if not target_channel:
+            return await message.channel.send("❌ **Error:** Channel with this ID not found.")
 
-	# --- ✉️ КОМАНДА: !pmsg <User_ID> <текст> (НАПИСАТИ В ПП КОРИСТУВАЧУ) ---
-    if message.content.startswith("!pmsg"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split(" ", 2)
-        if len(parts) < 2 and not message.attachments:
-            return await message.channel.send("⚠️ **Format:** `!pmsg <User_ID> <text>` (можна прикріплювати картинки)")
-            
-        target_id_str = parts[1]
-        if not target_id_str.isdigit():
-             return await message.channel.send("⚠️ **Error:** User ID має бути числом.")
-             
-        target_user_id = int(target_id_str)
         text_to_send = parts[2] if len(parts) > 2 else ""
-        
+
         files_to_send = []
         for attachment in message.attachments:
             files_to_send.append(await attachment.to_file())
-            
+
         if not text_to_send and not files_to_send:
-            return await message.channel.send("⚠️ **Error:** Немає тексту або зображення для відправки.")
-            
-        try:
-            # Шукаємо користувача
-            target_user = await client.fetch_user(target_user_id)
-            if not target_user:
-                return await message.channel.send("❌ **Error:** Користувача з таким ID не знайдено.")
-                
-            # Відправляємо повідомлення
-            await target_user.send(content=text_to_send, files=files_to_send)
-            await message.add_reaction("✅")
-            await message.channel.send(f"✅ **Повідомлення успішно доставлено в ПП користувачу {target_user.display_name}.**")
-            
-        except discord.Forbidden:
-            await message.channel.send(f"❌ **Error:** Неможливо надіслати повідомлення {target_user_id}. Можливо, у нього закриті ПП для не-друзів, або він заблокував бота.")
-        except Exception as e:
-            await message.channel.send(f"❌ **Error:** {e}")
-        return
-    # -------------------------------------------------------------------------
+            return await message.channel.send("⚠️ **Error:** No text or image to send.")
+
+        sent_msg = await target_channel.send(content=text_to_send, files=files_to_send)
+
+        last_sent_message = sent_msg
+
+        await message.add_reaction("✅") 
+
+    except ValueError:
+        await message.channel.send("❌ **Error:** Channel ID must be a number.")
+    except Exception as e:
+        await message.channel.send(f"❌ **Error sending message:** {e}")
+    return
+
+# -------------------------------------------------------------------------
+
+# --- 🛩️ КОМАНДА: !fleet [ICAO/назва] (ДЕ СТОЇТЬ ФЛОТ — З ПАМ'ЯТІ, БЕЗ ЗАПИТІВ) ---
+@command("!fleet")
+async def cmd_fleet(message, is_admin):
+    if not FLEET:
+        return await message.channel.send("⏳ **Fleet data is still loading, try again in a minute.**")
+
+    query = message.content[len("!fleet"):].strip().upper()
+    embed = discord.Embed(title="🛩️ Kazuar Fleet", color=0x3498db)
+
+    if query:
+        matches = [
+            ac for ac in FLEET.values()
+            if ac.get("locationIcao", "").upper() == query or query in ac.get("name", "").upper() or ac.get("airframe", "").upper() == query
+        ]
+        if not matches:
+            return await message.channel.send(f"⚠️ **Nothing found for `{query}`.**")
+        lines = [
+            f"✈️ **{ac.get('name', 'Unknown')}** ({ac.get('airframe', '?')}) — 📍 **{ac.get('locationIcao', '?')}**"
+            for ac in sorted(matches, key=lambda x: x.get("name", ""))
+        ]
+        embed.description = "\n".join(lines[:30])
+        if len(lines) > 30:
+            embed.description += f"\n*...and {len(lines) - 30} more*"
+    else:
+        by_airport = {}
+        for ac in FLEET.values():
+            by_airport.setdefault(ac.get("locationIcao", "?"), []).append(ac)
+        lines = [
+            f"📍 **{icao}** — {len(acs)} ({', '.join(sorted(a.get('name', '?') for a in acs)[:5])}{'...' if len(acs) > 5 else ''})"
+            for icao, acs in sorted(by_airport.items(), key=lambda item: -len(item[1]))
+        ]
+        embed.description = f"**Aircraft:** {len(FLEET)} at {len(by_airport)} airports\n\n" + "\n".join(lines[:25])
+
+    if FLEET_REFRESHED_AT:
+        embed.set_footer(text=f"Updated {FLEET_REFRESHED_AT.strftime('%H:%M UTC')}")
+    await message.channel.send(embed=embed)
+    return
+
+# -------------------------------------------------------------
 
-   # --- ✉️ КОМАНДА: !msg <ID_каналу> <текст> (+ МОЖНА ПРИКРІПЛЯТИ КАРТИНКИ) ---
-    if message.content.startswith("!msg"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split(" ", 2)
-        if len(parts) < 2 and not message.attachments:
-            return await message.channel.send("⚠️ **Format:** `!msg <Channel_ID> <text>` (and/or attach an image)")
-            
-        try:
-            channel_id = int(parts[1])
-            target_channel = client.get_channel(channel_id) 
-            if not target_channel:
-                return await message.channel.send("❌ **Error:** Channel with this ID not found.")
-                
-            text_to_send = parts[2] if len(parts) > 2 else ""
-            
-            files_to_send = []
-            for attachment in message.attachments:
-                files_to_send.append(await attachment.to_file())
-                
-            if not text_to_send and not files_to_send:
-                return await message.channel.send("⚠️ **Error:** No text or image to send.")
-                
-            sent_msg = await target_channel.send(content=text_to_send, files=files_to_send)
-            
-            last_sent_message = sent_msg
-            
-            await message.add_reaction("✅") 
-            
-        except ValueError:
-            await message.channel.send("❌ **Error:** Channel ID must be a number.")
-        except Exception as e:
-            await message.channel.send(f"❌ **Error sending message:** {e}")
-        return
-    # -------------------------------------------------------------------------
-    
 # --- 📡 КОМАНДА: !traffic (ПОКАЗАТИ АКТИВНІ РЕЙСИ) ---
-    if message.content == "!traffic":
-        global LAST_TRAFFIC_TIME
-        current_time = time.time()
-
-        if current_time - LAST_TRAFFIC_TIME < 10:
-            remaining = int(10 - (current_time - LAST_TRAFFIC_TIME))
-            warning_msg = await message.channel.send(f"⏳ **Please wait {remaining} seconds** before requesting traffic again.")
-            await asyncio.sleep(3)
-            try:
-                await warning_msg.delete()
-            except:
-                pass
-            return
-            
-        LAST_TRAFFIC_TIME = current_time
-        
-        msg = await message.channel.send("🔄 **Fetching live traffic data...**")
-        
-        async with aiohttp.ClientSession() as session:
-            ongoing = await fetch_api(session, "/flights/ongoing")
-            
-            # 1. ОБРОБКА СИТУАЦІЇ, КОЛИ НЕМАЄ РЕЙСІВ
-            if not ongoing or "results" not in ongoing or len(ongoing["results"]) == 0:
-                embed = discord.Embed(title="📡 Live Traffic - Ukraine Classic Air Alliance", description="😴 **No active flights.**", color=0xffff00)
-                current_utc_time = datetime.now(timezone.utc).strftime('%H:%M')
-                return await msg.edit(content=None, embed=embed)
-            
-            # 2. ЯКЩО РЕЙСИ Є, ОБРОБЛЯЄМО ЇХ
-            desc_lines = []
-            for raw_f in ongoing["results"]:
-                fid = str(raw_f.get("_id") or raw_f.get("id"))
-                
-                det = await fetch_api(session, f"/flight/{fid}")
-                
-                alt_str, gs_str = "---", "---"
-                phase_str = "⏳ Unknown"
-                
-                if det and "flight" in det:
-                    f = det["flight"]
-                    last_state = f.get("lastState", {})
-                    
-                    loc = last_state.get("location", {})
-                    spd = last_state.get("speed", {})
-                    
-                    # alt_ft - стандартна висота (MSL) для ешелону, agl_ft - радіовисотомір
-                    alt_ft = int(loc.get("alt", 0))
-                    alt_str = f"{alt_ft:,}".replace(",", ".") + " ft"
-                    
-                    gs_kts = int(spd.get("gs", 0))
-                    gs_str = f"{gs_kts} kts"
-                    
-                    agl_ft = int(loc.get("agl", alt_ft))
-                    vs_fpm = int(spd.get("vs", 0))
-                    
-                    dep_time = f.get("depTimeAct")
-                    takeoff_time = f.get("takeoffTimeAct")
-                    arr_time = f.get("arrTimeAct") or f.get("landing")
-                    
-                    # --- ЛОГІКА ФАЗ ПОЛЬОТУ ---
-                    if not takeoff_time:
-                        if dep_time:
-                            phase_str = "🚜 Taxiing"
+@command("!traffic", cooldown=10)
+async def cmd_traffic(message, is_admin):
+    msg = await message.channel.send("🔄 **Fetching live traffic data...**")
+
+    async with shared_http_session() as session:
+        ongoing = await fetch_api(session, "/flights/ongoing")
+
+        # 1. ОБРОБКА СИТУАЦІЇ, КОЛИ НЕМАЄ РЕЙСІВ
+        if not ongoing or "results" not in ongoing or len(ongoing["results"]) == 0:
+            embed = discord.Embed(title="📡 Live Traffic - Ukraine Classic Air Alliance", description="😴 **No active flights.**", color=0xffff00)
+            current_utc_time = datetime.now(timezone.utc).strftime('%H:%M')
+            return await msg.edit(content=None, embed=embed)
+
+        # 2. ЯКЩО РЕЙСИ Є, ОБРОБЛЯЄМО ЇХ
+        desc_lines = []
+        traffic_fids = [str(raw_f.get("_id") or raw_f.get("id")) for raw_f in ongoing["results"]]
+        traffic_details = await fetch_flight_details(session, traffic_fids, priority="interactive")
+
+        for raw_f, det in zip(ongoing["results"], traffic_details):
+            alt_str, gs_str = "---", "---"
+            phase_str = "⏳ Unknown"
+            near_str = ""
+
+            if det and "flight" in det:
+                f = det["flight"]
+                last_state = f.get("lastState", {})
+
+                loc = last_state.get("location", {})
+                spd = last_state.get("speed", {})
+
+                # Найближчий аеропорт до поточної позиції (з просторового індексу)
+                if loc.get("lat") is not None and loc.get("lon") is not None:
+                    nearest = AIRPORTS_DB.nearest(float(loc["lat"]), float(loc["lon"]), max_nm=TRAFFIC_NEAR_NM)
+                    if nearest:
+                        near_str = f"📍 near {nearest[1]}"
+
+                # alt_ft - стандартна висота (MSL) для ешелону, agl_ft - радіовисотомір
+                alt_ft = int(loc.get("alt", 0))
+                alt_str = f"{alt_ft:,}".replace(",", ".") + " ft"
+
+                gs_kts = int(spd.get("gs", 0))
+                gs_str = f"{gs_kts} kts"
+
+                agl_ft = int(loc.get("agl", alt_ft))
+                vs_fpm = int(spd.get("vs", 0))
+
+                dep_time = f.get("depTimeAct")
+                takeoff_time = f.get("takeoffTimeAct")
+                arr_time = f.get("arrTimeAct") or f.get("landing")
+
+                # --- ЛОГІКА ФАЗ ПОЛЬОТУ ---
+                if not takeoff_time:
+                    if dep_time:
+                        phase_str = "🚜 Taxiing"
+                    else:
+                        phase_str = "🧳 Boarding"
+                else:
+                    if arr_time or (agl_ft < 200 and gs_kts < 50):
+                        if agl_ft > 200:
+                            phase_str = "⤴️ Go Around"
                         else:
-                            phase_str = "🧳 Boarding"
+                            phase_str = "🏁 Arrived"
                     else:
-                        if arr_time or (agl_ft < 200 and gs_kts < 50):
-                            if agl_ft > 200:
-                                phase_str = "⤴️ Go Around"
+                        # Аналіз історії для Cruise (перевірка MSL висоти 60 сек тому)
+                        current_ts = last_state.get("timestamp", time.time() * 1000) / 1000.0
+                        found_old = False
+                        old_alt = alt_ft
+
+                        for p in reversed(f.get("path", [])):
+                            p_time = p.get("createdAt")
+                            if p_time:
+                                p_ts = datetime.fromisoformat(p_time.replace("Z", "+00:00")).timestamp()
+                                if (current_ts - p_ts) >= 60:
+                                    old_alt = int(p.get("alt", alt_ft))
+                                    found_old = True
+                                    break
+
+                        is_cruising = False
+                        if found_old and abs(alt_ft - old_alt) <= 250:
+                            is_cruising = True
+                        elif not found_old and abs(vs_fpm) <= 250:
+                            is_cruising = True
+
+                        if is_cruising:
+                            phase_str = "✈️ Cruise"
+                        elif vs_fpm < -250 or (found_old and (old_alt - alt_ft) > 250):
+                            if agl_ft < 10000:
+                                phase_str = "🛬 Approach"
                             else:
-                                phase_str = "🏁 Arrived"
+                                phase_str = "↘️ Descent"
                         else:
-                            # Аналіз історії для Cruise (перевірка MSL висоти 60 сек тому)
-                            current_ts = last_state.get("timestamp", time.time() * 1000) / 1000.0
-                            found_old = False
-                            old_alt = alt_ft
-                            
-                            for p in reversed(f.get("path", [])):
-                                p_time = p.get("createdAt")
-                                if p_time:
-                                    p_ts = datetime.fromisoformat(p_time.replace("Z", "+00:00")).timestamp()
-                                    if (current_ts - p_ts) >= 60:
-                                        old_alt = int(p.get("alt", alt_ft))
-                                        found_old = True
-                                        break
-                                        
-                            is_cruising = False
-                            if found_old and abs(alt_ft - old_alt) <= 250:
-                                is_cruising = True
-                            elif not found_old and abs(vs_fpm) <= 250:
-                                is_cruising = True
-                                
-                            if is_cruising:
-                                phase_str = "✈️ Cruise"
-                            elif vs_fpm < -250 or (found_old and (old_alt - alt_ft) > 250):
-                                if agl_ft < 10000:
-                                    phase_str = "🛬 Approach"
-                                else:
-                                    phase_str = "↘️ Descent"
+                            if agl_ft < 10000:
+                                phase_str = "🛫 Departed"
                             else:
-                                if agl_ft < 10000:
-                                    phase_str = "🛫 Departed"
-                                else:
-                                    phase_str = "↗️ Climb"
-                else:
-                    f = raw_f
+                                phase_str = "↗️ Climb"
+            else:
+                f = raw_f
 
-                cs = f.get("flightNumber") or f.get("callsign") or "N/A"
-                airline = f.get("airline", {}).get("icao", "")
-                full_cs = f"{airline} {cs}".strip() if airline else cs
-                
-                pilot_data = f.get("pilot", {})
-                pilot = pilot_data.get("fullname", "Unknown Pilot") if isinstance(pilot_data, dict) else "Unknown Pilot"
-                
-                ac_data = f.get("aircraft", {})
-                ac = "A/C"
-                if isinstance(ac_data, dict):
-                    ac = ac_data.get("icao") or ac_data.get("airframe", {}).get("icao") or ac_data.get("airframe", {}).get("name") or "A/C"
-                
-                dep = f.get("dep", {}).get("icao", "???") if isinstance(f.get("dep"), dict) else "???"
-                arr = f.get("arr", {}).get("icao", "???") if isinstance(f.get("arr"), dict) else "???"
-                
-                desc_lines.append(f"**{full_cs}** • {pilot} • {ac} • {dep} ➔ {arr}\n╰ ⛰️ {alt_str}  |  🛰️ {gs_str}  |  {phase_str}")
-            
-            embed = discord.Embed(title="📡 Live Traffic - Ukraine Classic Air Alliance", description="\n\n".join(desc_lines), color=0x3498db)
-            
-            current_utc_time = datetime.now(timezone.utc).strftime('%H:%M')
-            total_flights = len(ongoing["results"])
-            embed.set_footer(text=f"✈️ Active flights: {total_flights}  |  🔄 Updated: {current_utc_time} UTC  |  Newsky API")
-            
-            await msg.edit(content=None, embed=embed)
-        return
-    # -------------------------------------------------------------
-	
-	# --- 🎤 КОМАНДА: !enter <Channel_ID> (Зайти в голосовий канал) ---
-    if message.content.startswith("!enter"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        parts = message.content.split()
-        if len(parts) < 2 or not parts[1].isdigit():
-            return await message.channel.send("⚠️ Usage: `!enter <Voice_Channel_ID>`")
+            cs = f.get("flightNumber") or f.get("callsign") or "N/A"
+            airline = f.get("airline", {}).get("icao", "")
+            full_cs = f"{airline} {cs}".strip() if airline else cs
+
+            pilot_data = f.get("pilot", {})
+            pilot = pilot_data.get("fullname", "Unknown Pilot") if isinstance(pilot_data, dict) else "Unknown Pilot"
+
+            ac_data = f.get("aircraft", {})
+            ac = "A/C"
+            if isinstance(ac_data, dict):
+                ac = ac_data.get("icao") or ac_data.get("airframe", {}).get("icao") or ac_data.get("airframe", {}).get("name") or "A/C"
+
+            dep = f.get("dep", {}).get("icao", "???") if isinstance(f.get("dep"), dict) else "???"
+            arr = f.get("arr", {}).get("icao", "???") if isinstance(f.get("arr"), dict) else "???"
+
+            line = f"**{full_cs}** • {pilot} • {ac} • {dep} ➔ {arr}\n╰ ⛰️ {alt_str}  |  🛰️ {gs_str}  |  {phase_str}"
+            if near_str:
+                line += f"  |  {near_str}"
+            desc_lines.append(line)
+
+        embed = discord.Embed(title="📡 Live Traffic - Ukraine Classic Air Alliance", description="\n\n".join(desc_lines), color=0x3498db)
+
+        current_utc_time = datetime.now(timezone.utc).strftime('%H:%M')
+        total_flights = len(ongoing["results"])
+        embed.set_footer(text=f"✈️ Active flights: {total_flights}  |  🔄 Updated: {current_utc_time} UTC  |  Newsky API")
+
+        await msg.edit(content=None, embed=embed)
+    return
+
+# -------------------------------------------------------------
+
+# --- 🎤 КОМАНДА: !enter <Channel_ID> (Зайти в голосовий канал) ---
+@command("!enter", admin=True)
+async def cmd_enter(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2 or not parts[1].isdigit():
+        return await message.channel.send("⚠️ Usage: `!enter <Voice_Channel_ID>`")
+
+    vc_id = int(parts[1])
+    target_vc = client.get_channel(vc_id)
+
+    if not target_vc or not isinstance(target_vc, discord.VoiceChannel):
+        return await message.channel.send("❌ **Error:** Voice channel with this ID not found.")
+
+    guild = target_vc.guild
+
+    if guild.voice_client:
+        await guild.voice_client.disconnect()
+
+    try:
+        await target_vc.connect()
+        await message.channel.send(f"✅ **Bot joined channel:** {target_vc.name}")
+    except Exception as e:
+        await message.channel.send(f"❌ **Error:** {e}\n*(Make sure `PyNaCl` is in your requirements.txt)*")
+    return
+
+# -------------------------------------------------------------
+
+# --- 🔇 КОМАНДА: !mute (Замутити/Розмутити бота) ---
+@command("!mute", admin=True)
+async def cmd_mute(message, is_admin):
+    main_channel = client.get_channel(CHANNEL_ID)
+    guild = message.guild if message.guild else (main_channel.guild if main_channel else None)
+
+    if not guild or not guild.voice_client:
+        return await message.channel.send("⚠️ **Bot is not currently in any voice channel.**")
 
-        vc_id = int(parts[1])
-        target_vc = client.get_channel(vc_id)
+    bot_voice_state = guild.me.voice
+    current_mute = bot_voice_state.self_mute if bot_voice_state else False
+    new_mute_state = not current_mute
 
-        if not target_vc or not isinstance(target_vc, discord.VoiceChannel):
-            return await message.channel.send("❌ **Error:** Voice channel with this ID not found.")
+    try:
+        await guild.change_voice_state(channel=guild.voice_client.channel, self_mute=new_mute_state)
+        status_text = "🔇 **Bot microphone MUTED.**" if new_mute_state else "🔊 **Bot microphone UNMUTED.**"
+        await message.channel.send(f"✅ {status_text}")
+    except Exception as e:
+        await message.channel.send(f"❌ **Error:** {e}")
+    return
+
+# -------------------------------------------------------------
+
+# --- 🚪 КОМАНДА: !leave (Вийти з голосового) ---
+@command("!leave", admin=True)
+async def cmd_leave(message, is_admin):
+    main_channel = client.get_channel(CHANNEL_ID)
+    guild = message.guild if message.guild else (main_channel.guild if main_channel else None)
+
+    if guild and guild.voice_client:
+        await guild.voice_client.disconnect()
+        await message.channel.send("✅ **Bot left the voice channel.**")
+    else:
+        await message.channel.send("⚠️ **Bot is already not in a voice channel.**")
+    return
 
-        guild = target_vc.guild
+# -------------------------------------------------------------
+
+# --- 📌 КОМАНДА: !pin <ID> (ЗАКРІПИТИ ПОВІДОМЛЕННЯ) ---
+@command("!pin", admin=True)
+async def cmd_pin(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2:
+        return await message.channel.send("⚠️ Usage: `!pin <Message_ID>`")
 
-        if guild.voice_client:
-            await guild.voice_client.disconnect()
+    target_id = parts[1]
+    if not target_id.isdigit():
+         return await message.channel.send("⚠️ ID must be a number.")
 
+    found_message = await find_discord_message(int(target_id), message)
+
+    if found_message:
         try:
-            await target_vc.connect()
-            await message.channel.send(f"✅ **Bot joined channel:** {target_vc.name}")
+            await found_message.pin()
+            await message.channel.send(f"📌 **Message successfully pinned in {found_message.channel.mention}!**")
+        except discord.Forbidden:
+            await message.channel.send("❌ **Error:** I don't have 'Manage Messages' permission to pin this.")
         except Exception as e:
-            await message.channel.send(f"❌ **Error:** {e}\n*(Make sure `PyNaCl` is in your requirements.txt)*")
-        return
-    # -------------------------------------------------------------
+            await message.channel.send(f"❌ **Error pinning message:** {e}")
+    else:
+        await message.channel.send("❌ **Message not found.** (Check ID or bot permissions)")
+    return
 
-    # --- 🔇 КОМАНДА: !mute (Замутити/Розмутити бота) ---
-    if message.content == "!mute":
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
+# -------------------------------------------------------------
 
-        main_channel = client.get_channel(CHANNEL_ID)
-        guild = message.guild if message.guild else (main_channel.guild if main_channel else None)
-        
-        if not guild or not guild.voice_client:
-            return await message.channel.send("⚠️ **Bot is not currently in any voice channel.**")
+# --- 🧲 КОМАНДА: !unpin <ID> (ВІДКРІПИТИ ПОВІДОМЛЕННЯ) ---
+@command("!unpin", admin=True)
+async def cmd_unpin(message, is_admin):
+    parts = message.content.split()
+    if len(parts) < 2:
+        return await message.channel.send("⚠️ Usage: `!unpin <Message_ID>`")
 
-        bot_voice_state = guild.me.voice
-        current_mute = bot_voice_state.self_mute if bot_voice_state else False
-        new_mute_state = not current_mute
+    target_id = parts[1]
+    if not target_id.isdigit():
+         return await message.channel.send("⚠️ ID must be a number.")
 
+    found_message = await find_discord_message(int(target_id), message)
+
+    if found_message:
         try:
-            await guild.change_voice_state(channel=guild.voice_client.channel, self_mute=new_mute_state)
-            status_text = "🔇 **Bot microphone MUTED.**" if new_mute_state else "🔊 **Bot microphone UNMUTED.**"
-            await message.channel.send(f"✅ {status_text}")
+            await found_message.unpin()
+            await message.channel.send(f"🧲 **Message successfully unpinned in {found_message.channel.mention}!**")
+        except discord.Forbidden:
+            await message.channel.send("❌ **Error:** I don't have 'Manage Messages' permission to unpin this.")
         except Exception as e:
-            await message.channel.send(f"❌ **Error:** {e}")
-        return
-    # -------------------------------------------------------------
+            await message.channel.send(f"❌ **Error unpinning message:** {e}")
+    else:
+        await message.channel.send("❌ **Message not found.** (Check ID or bot permissions)")
+    return
 
-    # --- 🚪 КОМАНДА: !leave (Вийти з голосового) ---
-    if message.content == "!leave":
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
+# -------------------------------------------------------------
 
-        main_channel = client.get_channel(CHANNEL_ID)
-        guild = message.guild if message.guild else (main_channel.guild if main_channel else None)
+# --- 📝 КОМАНДА: !editsent (ЗАМІНИТИ ФАЙЛ ПАМ'ЯТІ - ТІЛЬКИ В ПП) ---
+@command("!editsent", admin=True, dm_only=True)
+async def cmd_editsent(message, is_admin):
+    attachment = None
 
-        if guild and guild.voice_client:
-            await guild.voice_client.disconnect()
-            await message.channel.send("✅ **Bot left the voice channel.**")
-        else:
-            await message.channel.send("⚠️ **Bot is already not in a voice channel.**")
-        return
-    # -------------------------------------------------------------
+    # Перевіряємо, чи файл прикріплено відразу до повідомлення з командою
+    if message.attachments:
+        attachment = message.attachments[0]
+    else:
+        await message.channel.send("📥 **Please send the new `sent.json` file here.** You have 60 seconds.")
 
-	# --- 📌 КОМАНДА: !pin <ID> (ЗАКРІПИТИ ПОВІДОМЛЕННЯ) ---
-    if message.content.startswith("!pin"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split()
-        if len(parts) < 2:
-            return await message.channel.send("⚠️ Usage: `!pin <Message_ID>`")
-            
-        target_id = parts[1]
-        if not target_id.isdigit():
-             return await message.channel.send("⚠️ ID must be a number.")
+        # Фільтр: чекаємо повідомлення від тебе, в цьому ж каналі (ПП), з файлом
+        def check(m):
+            return m.author == message.author and m.channel == message.channel and m.attachments
 
-        found_message = await find_discord_message(int(target_id), message)
-        
-        if found_message:
-            try:
-                await found_message.pin()
-                await message.channel.send(f"📌 **Message successfully pinned in {found_message.channel.mention}!**")
-            except discord.Forbidden:
-                await message.channel.send("❌ **Error:** I don't have 'Manage Messages' permission to pin this.")
-            except Exception as e:
-                await message.channel.send(f"❌ **Error pinning message:** {e}")
-        else:
-            await message.channel.send("❌ **Message not found.** (Check ID or bot permissions)")
-        return
-    # -------------------------------------------------------------
+        try:
+            reply = await client.wait_for('message', check=check, timeout=60.0)
+            attachment = reply.attachments[0]
+        except asyncio.TimeoutError:
+            return await message.channel.send("⏳ **Time's up.** Operation cancelled.")
 
-    # --- 🧲 КОМАНДА: !unpin <ID> (ВІДКРІПИТИ ПОВІДОМЛЕННЯ) ---
-    if message.content.startswith("!unpin"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        
-        parts = message.content.split()
-        if len(parts) < 2:
-            return await message.channel.send("⚠️ Usage: `!unpin <Message_ID>`")
-            
-        target_id = parts[1]
-        if not target_id.isdigit():
-             return await message.channel.send("⚠️ ID must be a number.")
+    # Перевірка формату файлу
+    if not attachment.filename.endswith('.json'):
+        return await message.channel.send("❌ **Error:** The file must be in `.json` format!")
 
-        found_message = await find_discord_message(int(target_id), message)
-        
-        if found_message:
-            try:
-                await found_message.unpin()
-                await message.channel.send(f"🧲 **Message successfully unpinned in {found_message.channel.mention}!**")
-            except discord.Forbidden:
-                await message.channel.send("❌ **Error:** I don't have 'Manage Messages' permission to unpin this.")
-            except Exception as e:
-                await message.channel.send(f"❌ **Error unpinning message:** {e}")
+    try:
+        # Читаємо файл і перевіряємо, чи це валідний JSON
+        file_bytes = await attachment.read()
+        new_data = json.loads(file_bytes.decode('utf-8'))
+
+        if not isinstance(new_data, dict):
+            return await message.channel.send("❌ **Error:** Invalid file structure (must be a JSON dictionary).")
+
+        # Записуємо нові дані у файл
+        replace_state_file(new_data)
+
+        await message.channel.send("✅ **File `sent.json` successfully replaced!**\n🔄 Performing automatic reboot to apply new data...")
+
+        # Вбиваємо процес. Railway автоматично перезапустить бота за секунду!
+        await asyncio.sleep(1)
+        os._exit(1)
+
+    except json.JSONDecodeError as e:
+        await message.channel.send(f"❌ **Error:** File is corrupted or invalid JSON!\n`{e}`")
+    except Exception as e:
+        await message.channel.send(f"❌ **An error occurred:** {e}")
+
+    return
+
+# -------------------------------------------------------------
+
+# --- 📚 КОМАНДА: !help (ДИНАМІЧНА ДЛЯ КОРИСТУВАЧІВ, АДМІНІВ ТА ВЛАСНИКА) ---
+@command("!help")
+async def cmd_help(message, is_admin):
+    is_owner = message.author.id in ADMIN_IDS
+
+    embed = discord.Embed(title="📚 Bot Commands", color=0x3498db)
+
+    # 1. Це бачать УСІ користувачі
+    desc = "**🔹 User Commands:**\n"
+    desc += "**`!help`** — Show command list\n"
+    desc += "**`!traffic`** — Show active flights\n"
+    desc += "**`!fleet [ICAO/name]`** — Where our aircraft are parked\n\n"
+
+    # 2. Це бачать АДМІНІСТРАТОРИ сервера (і ти також)
+    if is_admin:
+        desc += "**🔒 Admin Commands:**\n"
+        desc += "**`!status`** — System status\n"
+        desc += "**`!test [min]`** — Run test scenarios\n"
+        desc += "**`!syncweek`** — Sync flights for current week\n"
+        desc += "**`!updatedemand`** — Force GitHub demand update\n"
+        desc += "**`!delflight <ID>`** — Remove specific flight from stats\n"
+        desc += "**`!ban <ID> [reason]`** — Ban user on server\n"
+        desc += "**`!unban <ID>`** — Unban user on server\n"
+        desc += "**`!audit [all/num]`** — Download server audit log\n"
+        desc += "**`!cache`** — Download bot memory (sent.json)\n"
+        desc += "**`!spy <ID>`** — Dump raw flight JSON data\n"
+        desc += "**`!stats`** — Download weekly_stats.json\n"
+        desc += "**`!banlist`** — Download banned users list\n"
+        desc += "**`!disk`** — Show server disk/memory usage\n"
+        desc += "**`!benchairports [N]`** — Airport label render benchmark\n"
+        desc += "**`!airportsmem`** — Airports DB memory: compact table vs dicts\n\n"
+
+        desc += "**💬 Message & UI Management:**\n"
+        desc += "**`!msg [ID] <text/pic>`** — Send text or image message\n"
+        desc += "**`!reply <ID> <text>`** — Reply to a message\n"
+        desc += "**`!rename <ID> <text>`** — Append text to an existing embed\n"
+        desc += "**`!del <msg_ID>`** — Delete any message globally\n"
+        desc += "**`!pin <ID>`** — Pin a message\n"
+        desc += "**`!unpin <ID>`** — Unpin a message\n"
+        desc += "**`!wow <ID> <emoji>`** — Add reaction to a message\n"
+        desc += "**`!unwow <ID> <emoji>`** — Remove reaction\n"
+        desc += "**`!teststatspin`** — Generate weekly report (PINS message)\n"
+        desc += "**`!teststats`** — Generate weekly report (NO pin)\n"
+        desc += "**`!teststatstest`** — Generate presentation report (Fake Data)\n"
+        desc += "**`!addflight <ID>`** — Force add missed flight to stats\n"
+        desc += "**`!clearstats`** — Wipe all weekly stats data\n"
+        desc += "**`!idemoji <name>`** — Get code for a custom server emoji\n\n"
+
+        desc += "**🎭 Status Management:**\n"
+        desc += "**`!next`** — Force next bot status\n"
+        desc += "**`!addstatus <type> <text>`** — Save & Add status\n"
+        desc += "**`!delstatus [num]`** — Delete status\n\n"
+
+    # 3. Це бачиш ТІЛЬКИ ТИ (ID з ADMIN_IDS)
+    if is_owner:
+        desc += "**👑 Owner Commands (Super Secret):**\n"
+        desc += "**`!clearwow <ID>`** — Clear ALL reactions from a msg\n"
+        desc += "**`!banwow <ID>`** — Protect msg from new reactions\n"
+        desc += "**`!unbanwow <ID>`** — Remove reaction protection\n"
+        desc += "**`!enter <ID>`** — Enter voice channel\n"
+        desc += "**`!leave`** — Leave voice channel\n"
+        desc += "**`!mute`** — Toggle bot microphone mute\n"
+        desc += "**`!files`** — List files in local storage (/app/data)\n\n"
+
+    embed.description = desc
+    await message.channel.send(embed=embed)
+    return
+
+# ----------------------------------------------------------------
+
+@command("!next", admin=True)
+async def cmd_next(message, is_admin):
+    await change_status()
+    await message.channel.send("✅ **Status switched!**")
+    return
+
+
+@command("!addstatus", admin=True)
+async def cmd_addstatus(message, is_admin):
+    parts = message.content.split(maxsplit=2)
+    if len(parts) < 3: return await message.channel.send("⚠️ Usage: `!addstatus <watch/play> <text>`")
+    sType = parts[1].lower()
+    if sType not in ["watch", "play", "listen"]: return await message.channel.send("⚠️ Use: `watch`, `play`, `listen`")
+    status_list.append({"type": sType, "name": parts[2]})
+    save_statuses()
+    global status_cycle
+    status_cycle = cycle(status_list)
+    await message.channel.send(f"✅ Saved & Added: **{parts[2]}**")
+    return
+
+
+@command("!delstatus", admin=True)
+async def cmd_delstatus(message, is_admin):
+    global status_cycle
+    parts = message.content.split()
+    if len(parts) == 1:
+        list_str = "\n".join([f"`{i+1}.` {s['type'].upper()}: {s['name']}" for i, s in enumerate(status_list)])
+        embed = discord.Embed(title="🗑️ Delete Status", description=f"Type `!delstatus <number>` to delete.\n\n{list_str}", color=0xe74c3c)
+        return await message.channel.send(embed=embed)
+    try:
+        idx = int(parts[1]) - 1
+        if 0 <= idx < len(status_list):
+            if len(status_list) <= 1: return await message.channel.send("⚠️ Cannot delete the last status!")
+            removed = status_list.pop(idx)
+            save_statuses()
+            status_cycle = cycle(status_list) 
+            await message.channel.send(f"🗑️ Deleted & Saved: **{removed['name']}**")
         else:
-            await message.channel.send("❌ **Message not found.** (Check ID or bot permissions)")
-        return
-    # -------------------------------------------------------------
+            await message.channel.send("⚠️ Invalid number.")
+    except ValueError:
+        await message.channel.send("⚠️ Please enter a number.")
+    return
+
+
+@command("!status", admin=True)
+async def cmd_status(message, is_admin):
+    msg = await message.channel.send("🔄 **Checking Systems...**")
+    api_status = "❌ API Error"
+    flights_count = 0 
+
+    async with shared_http_session() as session:
+        test = await fetch_api(session, "/flights/ongoing")
+        if test is not None: 
+            api_status = "✅ Connected to Newsky"
+            if "results" in test:
+                flights_count = len(test["results"])
+
+    launch_str = START_TIME.strftime("%d-%m-%Y %H:%M:%S UTC")
+
+    embed = discord.Embed(title="🤖 Bot System Status", color=0x2ecc71)
+    embed.add_field(name="📡 Newsky API", value=api_status, inline=False)
+    embed.add_field(name="✈️ Active Flights", value=f"**{flights_count}** tracking", inline=False)
+    embed.add_field(name="🌍 Airports DB", value=f"✅ Loaded ({len(AIRPORTS_DB)} airports)", inline=False)
+    embed.add_field(name="🚦 API Scheduler", value=api_scheduler_report(), inline=False)
+    embed.add_field(name="🗃️ Flight Cache", value=flight_cache_report(), inline=False)
+    embed.add_field(name="🏷️ GitHub ETag", value=github_etag_report(), inline=False)
+    embed.add_field(name="⌨️ Commands", value=command_stats_report(), inline=False)
+    embed.add_field(name="⏲️ Scheduler", value=scheduler_report(), inline=False)
+    embed.add_field(name="🔔 Audit Log", value=audit_log_report(), inline=False)
+    embed.add_field(name="📶 Discord Ping", value=f"**{round(client.latency * 1000)}ms**", inline=False)
+    embed.add_field(name="🚀 Launched at", value=f"`{launch_str}`", inline=False)
+    await msg.edit(content=None, embed=embed)
+    return
+
+
+# --- ⏱️ КОМАНДА: !benchairports [N] (ВАРТІСТЬ ПІДПИСІВ АЕРОПОРТІВ НА ОДНУ КАРТКУ) ---
+BENCH_AIRPORTS_MAX_ROUNDS = 20000
+
+def legacy_clean_text(text):
+    # Копія старого clean_text (регулярки компілюються на кожен виклик) — лише для порівняння в бенчмарку
+    if not text: return ""
+    text = re.sub(r"\(.*?\)", "", text)
+    removals = ["International", "Regional", "Airport", "Aerodrome", "Air Base", "Intl"]
+    for word in removals:
+        pattern = re.compile(re.escape(word), re.IGNORECASE)
+        text = pattern.sub("", text)
+    return text.strip().strip(",").strip()
 
-	# --- 📝 КОМАНДА: !editsent (ЗАМІНИТИ ФАЙЛ ПАМ'ЯТІ - ТІЛЬКИ В ПП) ---
-    if message.content.startswith("!editsent"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
+def legacy_format_airport_string(icao, api_name, airports):
+    # Копія старого format_airport_string над словником словників, як було до таблиці аеропортів
+    icao = icao.upper()
+    db_data = airports.get(icao)
+    
+    if db_data:
+        city = db_data.get("city", "") or ""
+        name = db_data.get("name", "") or ""
+        country = db_data.get("country", "XX")
+        
+        CITY_FIXES = {
+            "Kiev": "Kyiv",
+            "Dnipropetrovsk": "Dnipro",
+            "Kirovograd": "Kropyvnytskyi",
+            "Nikolayev": "Mykolaiv",
+            "Odessa": "Odesa",
+            "Vinnitsa": "Vinnytsia",
+            "Zaporizhia": "Zaporizhzhia",
+            "Larnarca": "Larnaca",
+            "Frankfurt-am-Main": "Frankfurt am Main",
+            "Sharm el-Sheikh": "Sharm El Sheikh",
+            "Ajaccio/Napoléon Bonaparte": "Ajaccio",
+            "Ajaccio/Napoleon Bonaparte": "Ajaccio"
+        }
         
-        # 🔥 Перевірка на те, чи це ПП (Direct Messages) 🔥
-        if not isinstance(message.channel, discord.DMChannel):
-            return await message.channel.send("⚠️ **This command ONLY works in Direct Messages (DM)!** Please send me a private message.")
+        for old, new in CITY_FIXES.items():
+            if city.lower() == old.lower(): 
+                city = new
+            name = name.replace(old, new)
         
-        attachment = None
+        clean_name = legacy_clean_text(name)
+        display_text = ""
         
-        # Перевіряємо, чи файл прикріплено відразу до повідомлення з командою
-        if message.attachments:
-            attachment = message.attachments[0]
+        if city and clean_name:
+            if city.lower() in clean_name.lower():
+                display_text = clean_name
+            else:
+                display_text = f"{city} {clean_name}"
+        elif clean_name:
+            display_text = clean_name
+        elif city:
+            display_text = city
         else:
-            await message.channel.send("📥 **Please send the new `sent.json` file here.** You have 60 seconds.")
-            
-            # Фільтр: чекаємо повідомлення від тебе, в цьому ж каналі (ПП), з файлом
-            def check(m):
-                return m.author == message.author and m.channel == message.channel and m.attachments
-                
-            try:
-                reply = await client.wait_for('message', check=check, timeout=60.0)
-                attachment = reply.attachments[0]
-            except asyncio.TimeoutError:
-                return await message.channel.send("⏳ **Time's up.** Operation cancelled.")
-                
-        # Перевірка формату файлу
-        if not attachment.filename.endswith('.json'):
-            return await message.channel.send("❌ **Error:** The file must be in `.json` format!")
-            
-        try:
-            # Читаємо файл і перевіряємо, чи це валідний JSON
-            file_bytes = await attachment.read()
-            new_data = json.loads(file_bytes.decode('utf-8'))
-            
-            if not isinstance(new_data, dict):
-                return await message.channel.send("❌ **Error:** Invalid file structure (must be a JSON dictionary).")
-                
-            # Записуємо нові дані у файл
-            STATE_FILE.write_text(json.dumps(new_data, indent=4), encoding="utf-8")
-            
-            await message.channel.send("✅ **File `sent.json` successfully replaced!**\n🔄 Performing automatic reboot to apply new data...")
-            
-            # Вбиваємо процес. Railway автоматично перезапустить бота за секунду!
-            await asyncio.sleep(1)
-            os._exit(1)
-            
-        except json.JSONDecodeError as e:
-            await message.channel.send(f"❌ **Error:** File is corrupted or invalid JSON!\n`{e}`")
-        except Exception as e:
-            await message.channel.send(f"❌ **An error occurred:** {e}")
-            
-        return
-    # -------------------------------------------------------------
+            display_text = legacy_clean_text(api_name)
 
-# --- 📚 КОМАНДА: !help (ДИНАМІЧНА ДЛЯ КОРИСТУВАЧІВ, АДМІНІВ ТА ВЛАСНИКА) ---
-    if message.content == "!help":
-        is_owner = message.author.id in ADMIN_IDS
-        
-        embed = discord.Embed(title="📚 Bot Commands", color=0x3498db)
-        
-        # 1. Це бачать УСІ користувачі
-        desc = "**🔹 User Commands:**\n"
-        desc += "**`!help`** — Show command list\n"
-        desc += "**`!traffic`** — Show active flights\n\n"
-        
-        # 2. Це бачать АДМІНІСТРАТОРИ сервера (і ти також)
-        if is_admin:
-            desc += "**🔒 Admin Commands:**\n"
-            desc += "**`!status`** — System status\n"
-            desc += "**`!test [min]`** — Run test scenarios\n"
-            desc += "**`!syncweek`** — Sync flights for current week\n"
-            desc += "**`!updatedemand`** — Force GitHub demand update\n"
-            desc += "**`!delflight <ID>`** — Remove specific flight from stats\n"
-            desc += "**`!ban <ID> [reason]`** — Ban user on server\n"
-            desc += "**`!unban <ID>`** — Unban user on server\n"
-            desc += "**`!audit [all/num]`** — Download server audit log\n"
-            desc += "**`!cache`** — Download bot memory (sent.json)\n"
-            desc += "**`!spy <ID>`** — Dump raw flight JSON data\n"
-            desc += "**`!stats`** — Download weekly_stats.json\n"
-            desc += "**`!banlist`** — Download banned users list\n"
-            desc += "**`!disk`** — Show server disk/memory usage\n\n"
-            
-            desc += "**💬 Message & UI Management:**\n"
-            desc += "**`!msg [ID] <text/pic>`** — Send text or image message\n"
-            desc += "**`!reply <ID> <text>`** — Reply to a message\n"
-            desc += "**`!rename <ID> <text>`** — Append text to an existing embed\n"
-            desc += "**`!del <msg_ID>`** — Delete any message globally\n"
-            desc += "**`!pin <ID>`** — Pin a message\n"
-            desc += "**`!unpin <ID>`** — Unpin a message\n"
-            desc += "**`!wow <ID> <emoji>`** — Add reaction to a message\n"
-            desc += "**`!unwow <ID> <emoji>`** — Remove reaction\n"
-            desc += "**`!teststatspin`** — Generate weekly report (PINS message)\n"
-            desc += "**`!teststats`** — Generate weekly report (NO pin)\n"
-            desc += "**`!teststatstest`** — Generate presentation report (Fake Data)\n"
-            desc += "**`!addflight <ID>`** — Force add missed flight to stats\n"
-            desc += "**`!clearstats`** — Wipe all weekly stats data\n"
-            desc += "**`!idemoji <name>`** — Get code for a custom server emoji\n\n"
-            
-            desc += "**🎭 Status Management:**\n"
-            desc += "**`!next`** — Force next bot status\n"
-            desc += "**`!addstatus <type> <text>`** — Save & Add status\n"
-            desc += "**`!delstatus [num]`** — Delete status\n\n"
-            
-        # 3. Це бачиш ТІЛЬКИ ТИ (ID з ADMIN_IDS)
-        if is_owner:
-            desc += "**👑 Owner Commands (Super Secret):**\n"
-            desc += "**`!clearwow <ID>`** — Clear ALL reactions from a msg\n"
-            desc += "**`!banwow <ID>`** — Protect msg from new reactions\n"
-            desc += "**`!unbanwow <ID>`** — Remove reaction protection\n"
-            desc += "**`!enter <ID>`** — Enter voice channel\n"
-            desc += "**`!leave`** — Leave voice channel\n"
-            desc += "**`!mute`** — Toggle bot microphone mute\n"
-            desc += "**`!files`** — List files in local storage (/app/data)\n\n"
-            
-        embed.description = desc
-        await message.channel.send(embed=embed)
-        return
-    # ----------------------------------------------------------------
+        return f"{get_flag(country)} **{icao}** ({display_text})"
     
-    if message.content == "!next":
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        await change_status()
-        await message.channel.send("✅ **Status switched!**")
-        return
-
-    if message.content.startswith("!addstatus"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        parts = message.content.split(maxsplit=2)
-        if len(parts) < 3: return await message.channel.send("⚠️ Usage: `!addstatus <watch/play> <text>`")
-        sType = parts[1].lower()
-        if sType not in ["watch", "play", "listen"]: return await message.channel.send("⚠️ Use: `watch`, `play`, `listen`")
-        status_list.append({"type": sType, "name": parts[2]})
-        save_statuses()
-        global status_cycle
-        status_cycle = cycle(status_list)
-        await message.channel.send(f"✅ Saved & Added: **{parts[2]}**")
-        return
+    flag = "🏳️"
+    if len(icao) >= 2:
+        prefix = icao[:2]
+        manual_map = {'UK': 'UA', 'VH': 'HK'}
+        code = manual_map.get(prefix, "XX")
+        if code != "XX": flag = get_flag(code)
 
-    if message.content.startswith("!delstatus"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
+    return f"{flag} **{icao}** ({legacy_clean_text(api_name)})"
+
+def run_airport_benchmark(rounds):
+    # Синхронна частина !benchairports — виконується в окремому потоці, щоб не блокувати цикл подій
+    # Картка = виліт + приліт; "до" — стара реалізація, "після" — готовий підпис з AIRPORT_LABELS
+    sample = [(icao, AIRPORTS_DB.get(icao)) for icao in random.choices(AIRPORTS_DB.icaos, k=rounds * 2)]
+    legacy_db = {icao: {"country": rec.country, "city": rec.city, "name": rec.name} for icao, rec in sample}
+    started = time.perf_counter()
+    for icao, db_data in sample:
+        legacy_format_airport_string(icao, db_data.name, legacy_db)
+    legacy = (time.perf_counter() - started) / rounds
+
+    started = time.perf_counter()
+    for icao, db_data in sample:
+        format_airport_string(icao, db_data.name)
+    cached = (time.perf_counter() - started) / rounds
+
+    # Просторовий індекс: найближчий аеропорт і всі в радіусі 100 nm навколо випадкових аеропортів
+    points = [(rec.lat, rec.lon) for _, rec in sample[:200] if not math.isnan(rec.lat)]
+    started = time.perf_counter()
+    for lat, lon in points:
+        AIRPORTS_DB.nearest(lat + 0.1, lon + 0.1)
+    nearest_cost = (time.perf_counter() - started) / max(len(points), 1)
+    started = time.perf_counter()
+    for lat, lon in points:
+        AIRPORTS_DB.within(lat, lon, 100)
+    within_cost = (time.perf_counter() - started) / max(len(points), 1)
+    return legacy, cached, nearest_cost, within_cost
+
+@command("!benchairports", admin=True)
+async def cmd_benchairports(message, is_admin):
+    parts = message.content.split()
+    rounds = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 2000
+    rounds = min(max(rounds, 1), BENCH_AIRPORTS_MAX_ROUNDS)
+    if not AIRPORTS_DB:
+        return await message.channel.send("⚠️ **Airports DB is not loaded yet.**")
+
+    legacy, cached, nearest_cost, within_cost = await asyncio.to_thread(run_airport_benchmark, rounds)
+
+    fallback = format_airport_fallback.cache_info()
+    embed = discord.Embed(title="⏱️ Airport Label Benchmark", color=0x3498db)
+    embed.add_field(name="Before (legacy format_airport_string)", value=f"**{legacy * 1e6:.1f} µs** / embed", inline=True)
+    embed.add_field(name="After (precomputed)", value=f"**{cached * 1e6:.2f} µs** / embed", inline=True)
+    embed.add_field(name="Spatial grid", value=f"nearest **{nearest_cost * 1e6:.0f} µs** | within 100 nm **{within_cost * 1e6:.0f} µs** ({len(AIRPORTS_DB.grid)} cells)", inline=False)
+    embed.add_field(name="Labels", value=f"{len(AIRPORT_LABELS)} precomputed | fallback memo {fallback.currsize}/{fallback.maxsize} (hits {fallback.hits})", inline=False)
+    embed.set_footer(text=f"{rounds} embeds × 2 airports")
+    await message.channel.send(embed=embed)
+    return
+
+# --- 🧮 КОМАНДА: !airportsmem (ПАМ'ЯТЬ БАЗИ АЕРОПОРТІВ: КОЛОНКИ VS СЛОВНИКИ) ---
+def deep_sizeof(obj, seen=None):
+    # Грубий глибокий розмір: контейнери + вміст, кожен об'єкт рахуємо один раз
+    seen = set() if seen is None else seen
+    if id(obj) in seen: return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, slot), seen) for slot in obj.__slots__)
+    return size
+
+def airports_memory_report():
+    table = AIRPORTS_DB
+    # Та сама база у старому вигляді: словник словників (і без координат)
+    as_dicts = {
+        icao: {"country": table.countries[row], "city": table.cities[row], "name": table.names[row]}
+        for icao, row in table.index.items()
+    }
+    return deep_sizeof(table), deep_sizeof(as_dicts), deep_sizeof(AIRPORT_LABELS)
+
+@command("!airportsmem", admin=True)
+async def cmd_airportsmem(message, is_admin):
+    if not AIRPORTS_DB:
+        return await message.channel.send("⚠️ **Airports DB is not loaded yet.**")
+
+    table_size, dicts_size, labels_size = await asyncio.to_thread(airports_memory_report)
+    mb = lambda n: f"{n / 1024 / 1024:.2f} MB"
+    embed = discord.Embed(title="🧮 Airports DB Memory", color=0x3498db)
+    embed.add_field(name="Before (dict of dicts)", value=f"**{mb(dicts_size)}**", inline=True)
+    embed.add_field(name="After (AirportTable)", value=f"**{mb(table_size)}** (incl. lat/lon/elev)", inline=True)
+    embed.add_field(name="Precomputed labels", value=mb(labels_size), inline=True)
+    embed.set_footer(text=f"{len(AIRPORTS_DB)} airports | {len(set(AIRPORTS_DB.countries))} countries")
+    await message.channel.send(embed=embed)
+    return
+
+@command("!spy", admin=True)
+async def cmd_spy(message, is_admin):
+    try:
         parts = message.content.split()
-        if len(parts) == 1:
-            list_str = "\n".join([f"`{i+1}.` {s['type'].upper()}: {s['name']}" for i, s in enumerate(status_list)])
-            embed = discord.Embed(title="🗑️ Delete Status", description=f"Type `!delstatus <number>` to delete.\n\n{list_str}", color=0xe74c3c)
-            return await message.channel.send(embed=embed)
+        if len(parts) < 2: return await message.channel.send("⚠️ Usage: `!spy <ID>`")
+        fid = parts[1]
+        await message.channel.send(f"🕵️ **Analyzing {fid}...**")
+        async with shared_http_session() as session:
+            data = await fetch_flight(session, fid, force=True)
+            if not data: return await message.channel.send("❌ API Error")
+            file_bin = io.BytesIO(json.dumps(data, indent=4).encode())
+            await message.channel.send(content=f"📂 **Dump {fid}:**", file=discord.File(file_bin, filename=f"flight_{fid}.json"))
+    except Exception as e: await message.channel.send(f"Error: {e}")
+    return
+
+
+@command("!test", admin=True)
+async def cmd_test(message, is_admin):
+    parts = message.content.split()
+    if len(parts) == 2:
         try:
-            idx = int(parts[1]) - 1
-            if 0 <= idx < len(status_list):
-                if len(status_list) <= 1: return await message.channel.send("⚠️ Cannot delete the last status!")
-                removed = status_list.pop(idx)
-                save_statuses()
-                status_cycle = cycle(status_list) 
-                await message.channel.send(f"🗑️ Deleted & Saved: **{removed['name']}**")
-            else:
-                await message.channel.send("⚠️ Invalid number.")
-        except ValueError:
-            await message.channel.send("⚠️ Please enter a number.")
-        return
-
-    if message.content == "!status":
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        msg = await message.channel.send("🔄 **Checking Systems...**")
-        api_status = "❌ API Error"
-        flights_count = 0 
-        
-        async with aiohttp.ClientSession() as session:
-            test = await fetch_api(session, "/flights/ongoing")
-            if test is not None: 
-                api_status = "✅ Connected to Newsky"
-                if "results" in test:
-                    flights_count = len(test["results"])
-        
-        launch_str = START_TIME.strftime("%d-%m-%Y %H:%M:%S UTC")
-
-        embed = discord.Embed(title="🤖 Bot System Status", color=0x2ecc71)
-        embed.add_field(name="📡 Newsky API", value=api_status, inline=False)
-        embed.add_field(name="✈️ Active Flights", value=f"**{flights_count}** tracking", inline=False)
-        embed.add_field(name="🌍 Airports DB", value=f"✅ Loaded ({len(AIRPORTS_DB)} airports)", inline=False)
-        embed.add_field(name="📶 Discord Ping", value=f"**{round(client.latency * 1000)}ms**", inline=False)
-        embed.add_field(name="🚀 Launched at", value=f"`{launch_str}`", inline=False)
-        await msg.edit(content=None, embed=embed)
-        return
+            custom_delay = int(parts[1])
+            await message.channel.send(f"🛠️ **Custom Test (Delay: {custom_delay} min)...**")
+            mock_custom = {"_id": "test_custom", "flightNumber": "TEST1", "airline": {"icao": "OSA"}, "dep": {"icao": "UKBB", "name": "Boryspil"}, "arr": {"icao": "LPMA", "name": "Madeira"}, "aircraft": {"airframe": {"name": "B738"}}, "pilot": {"fullname": "Capt. Test"}, "payload": {"pax": 140, "cargo": 35}, "network": "VATSIM", "rating": 9.9, "landing": {"rate": -120, "gForce": 1.05}, "delay": custom_delay, "result": {"totals": {"distance": 350, "time": 55, "balance": 12500, "payload": {"pax": 140, "cargo": 35}}}}
+            await send_flight_message(message.channel, "Completed", mock_custom, "test")
+            return
+        except ValueError: pass
 
-    if message.content.startswith("!spy"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        try:
-            parts = message.content.split()
-            if len(parts) < 2: return await message.channel.send("⚠️ Usage: `!spy <ID>`")
-            fid = parts[1]
-            await message.channel.send(f"🕵️ **Analyzing {fid}...**")
-            async with aiohttp.ClientSession() as session:
-                data = await fetch_api(session, f"/flight/{fid}")
-                if not data: return await message.channel.send("❌ API Error")
-                file_bin = io.BytesIO(json.dumps(data, indent=4).encode())
-                await message.channel.send(content=f"📂 **Dump {fid}:**", file=discord.File(file_bin, filename=f"flight_{fid}.json"))
-        except Exception as e: await message.channel.send(f"Error: {e}")
-        return
+    await message.channel.send("🛠️ **Running Full Test Suite...**")
+    mock_dep = {"_id": "test_dep", "flightNumber": "TEST1", "airline": {"icao": "OSA"}, "dep": {"icao": "UKBB", "name": "Boryspil"}, "arr": {"icao": "LPMA", "name": "Madeira"}, "aircraft": {"airframe": {"name": "B738"}}, "pilot": {"fullname": "Capt. Test"}, "payload": {"pax": 145, "cargo": 35}, "delay": 2}
+    await send_flight_message(message.channel, "Departed", mock_dep, "test")
+    mock_norm = {"_id": "test_norm", "schedule": True, "flightNumber": "TEST1", "airline": {"icao": "OSA"}, "dep": {"icao": "UKBB", "name": "Boryspil"}, "arr": {"icao": "LPMA", "name": "Madeira"}, "aircraft": {"airframe": {"name": "B738"}}, "pilot": {"fullname": "Capt. Test"}, "payload": {"pax": 100, "cargo": 40}, "network": "VATSIM", "rating": 9.9, "landing": {"rate": -150, "gForce": 1.1}, "delay": -10, "result": {"totals": {"distance": 350, "time": 55, "balance": 12500, "payload": {"pax": 100, "cargo": 40}}}}
+    await send_flight_message(message.channel, "Completed", mock_norm, "test")
+    mock_emerg = mock_norm.copy(); mock_emerg["_id"] = "test_emerg"; mock_emerg["emergency"] = True; mock_emerg["delay"] = 45; mock_emerg["result"] = {"totals": {"distance": 350, "time": 55, "balance": 0, "payload": {"pax": 100, "cargo": 40}}}
+    await send_flight_message(message.channel, "Completed", mock_emerg, "test")
+    mock_crash = mock_norm.copy(); mock_crash["_id"] = "test_crash"; mock_crash["landing"] = {"rate": -2500, "gForce": 4.5}; mock_crash["rating"] = 0.0; mock_crash["delay"] = 0; mock_crash["result"] = {"totals": {"distance": 350, "time": 55, "balance": -1150000, "payload": {"pax": 100, "cargo": 40}}}
+    await send_flight_message(message.channel, "Completed", mock_crash, "test")
+    return
 
-    if message.content.startswith("!test"):
-        if not is_admin: return await message.channel.send("🚫 **Access Denied**")
-        parts = message.content.split()
-        if len(parts) == 2:
-            try:
-                custom_delay = int(parts[1])
-                await message.channel.send(f"🛠️ **Custom Test (Delay: {custom_delay} min)...**")
-                mock_custom = {"_id": "test_custom", "flightNumber": "TEST1", "airline": {"icao": "OSA"}, "dep": {"icao": "UKBB", "name": "Boryspil"}, "arr": {"icao": "LPMA", "name": "Madeira"}, "aircraft": {"airframe": {"name": "B738"}}, "pilot": {"fullname": "Capt. Test"}, "payload": {"pax": 140, "cargo": 35}, "network": "VATSIM", "rating": 9.9, "landing": {"rate": -120, "gForce": 1.05}, "delay": custom_delay, "result": {"totals": {"distance": 350, "time": 55, "balance": 12500, "payload": {"pax": 140, "cargo": 35}}}}
-                await send_flight_message(message.channel, "Completed", mock_custom, "test")
-                return
-            except ValueError: pass
-
-        await message.channel.send("🛠️ **Running Full Test Suite...**")
-        mock_dep = {"_id": "test_dep", "flightNumber": "TEST1", "airline": {"icao": "OSA"}, "dep": {"icao": "UKBB", "name": "Boryspil"}, "arr": {"icao": "LPMA", "name": "Madeira"}, "aircraft": {"airframe": {"name": "B738"}}, "pilot": {"fullname": "Capt. Test"}, "payload": {"pax": 145, "cargo": 35}, "delay": 2}
-        await send_flight_message(message.channel, "Departed", mock_dep, "test")
-        mock_norm = {"_id": "test_norm", "schedule": True, "flightNumber": "TEST1", "airline": {"icao": "OSA"}, "dep": {"icao": "UKBB", "name": "Boryspil"}, "arr": {"icao": "LPMA", "name": "Madeira"}, "aircraft": {"airframe": {"name": "B738"}}, "pilot": {"fullname": "Capt. Test"}, "payload": {"pax": 100, "cargo": 40}, "network": "VATSIM", "rating": 9.9, "landing": {"rate": -150, "gForce": 1.1}, "delay": -10, "result": {"totals": {"distance": 350, "time": 55, "balance": 12500, "payload": {"pax": 100, "cargo": 40}}}}
-        await send_flight_message(message.channel, "Completed", mock_norm, "test")
-        mock_emerg = mock_norm.copy(); mock_emerg["_id"] = "test_emerg"; mock_emerg["emergency"] = True; mock_emerg["delay"] = 45; mock_emerg["result"] = {"totals": {"distance": 350, "time": 55, "balance": 0, "payload": {"pax": 100, "cargo": 40}}}
-        await send_flight_message(message.channel, "Completed", mock_emerg, "test")
-        mock_crash = mock_norm.copy(); mock_crash["_id"] = "test_crash"; mock_crash["landing"] = {"rate": -2500, "gForce": 4.5}; mock_crash["rating"] = 0.0; mock_crash["delay"] = 0; mock_crash["result"] = {"totals": {"distance": 350, "time": 55, "balance": -1150000, "payload": {"pax": 100, "cargo": 40}}}
-        await send_flight_message(message.channel, "Completed", mock_crash, "test")
-        return
 
 async def main_loop():
     await client.wait_until_ready()
-    await update_airports_db()
+    # База аеропортів — з диска; свіжість перевіряється у фоні й не затримує відстеження
+    load_airports_cache()
+    if not airports_refresh_task.is_running():
+        airports_refresh_task.start()
     
-    # 🔥 ЗАПУСКАЄМО РАДАР ТУТ (після того, як база 100% завантажена) 🔥
     if not check_charters_task.is_running():
         check_charters_task.start()
         print("🚁 Charter radar started!")
@@ -4302,29 +5856,41 @@ async def main_loop():
     state = load_state()
     first_run = True
     
+    # Рейси, що не встигли потрапити в коміт до рестарту, досилаємо одразу
+    if load_github_queue():
+        print(f"📮 Resuming {len(GH_PENDING)} queued GitHub flight(s)...")
+        schedule_github_flush(delay=0)
+    
     channel = client.get_channel(CHANNEL_ID)
     state = load_state()
     first_run = True
 
-    async with aiohttp.ClientSession() as session:
+    async with shared_http_session() as session:
         while True:
             try:
                 ongoing_ids = None
-                ongoing = await fetch_api(session, "/flights/ongoing")
+                seen_ids = set()
+                ongoing = await fetch_api(session, "/flights/ongoing", priority="live")
                 if ongoing and "results" in ongoing:
                     ongoing_ids = set()
                     print(f"📡 Tracking {len(ongoing['results'])} flights...", end='\r')
+                    pending_fids = []
                     for raw_f in ongoing["results"]:
                         fid = str(raw_f.get("_id") or raw_f.get("id"))
                         ongoing_ids.add(fid)
+                        seen_ids.add(fid)
                         
                         state.setdefault(fid, {})
                         
                         # --- 1. ЛІНИВА ПЕРЕВІРКА ---
                         if state[fid].get("takeoff"):
                             continue
-                            
-                        det = await fetch_api(session, f"/flight/{fid}")
+                        pending_fids.append(fid)
+                        
+                    # Деталі всіх рейсів тягнемо паралельно, а обробляємо строго по порядку списку
+                    pending_details = await fetch_flight_details(session, pending_fids, priority="live")
+                    
+                    for fid, det in zip(pending_fids, pending_details):
                         if not det or "flight" not in det: continue
                         f = det["flight"]
                         cs = f.get("flightNumber") or f.get("callsign") or "N/A"
@@ -4341,10 +5907,21 @@ async def main_loop():
                             if msg_id:
                                 state[fid]["msg_id"] = msg_id
 
-                recent = await fetch_api(session, "/flights/recent", method="POST", body={"count": 5})
+                recent = await fetch_api(session, "/flights/recent", method="POST", body={"count": 5}, priority="live")
                 if recent and "results" in recent:
+                    # Заздалегідь (паралельно) тягнемо деталі всіх нових закритих/видалених рейсів
+                    prefetch_fids = []
+                    if not first_run:
+                        for raw_f in recent["results"]:
+                            fid = str(raw_f.get("_id") or raw_f.get("id"))
+                            if fid in state and state[fid].get("completed"): continue
+                            if raw_f.get("close") or raw_f.get("deleted"):
+                                prefetch_fids.append(fid)
+                    prefetched = dict(zip(prefetch_fids, await fetch_flight_details(session, prefetch_fids, priority="live")))
+                    
                     for raw_f in recent["results"]:
                         fid = str(raw_f.get("_id") or raw_f.get("id"))
+                        seen_ids.add(fid)
                         if first_run:
                             state.setdefault(fid, {})["completed"] = True
                             continue
@@ -4352,7 +5929,7 @@ async def main_loop():
                         
                         # --- ЛОГІКА ДЛЯ ЗАКРИТИХ ТА ВИДАЛЕНИХ РЕЙСІВ ---
                         if raw_f.get("close"):
-                            det = await fetch_api(session, f"/flight/{fid}")
+                            det = prefetched.get(fid)
                             
                             # Універсальний аналізатор запобіжників
                             def check_safeguards(api_data):
@@ -4376,7 +5953,7 @@ async def main_loop():
                                 await asyncio.sleep(3) # Чекаємо САМЕ 3 секунди
                                 
                                 # Робимо ТОЙ САМИЙ ЗАПИТ ще раз
-                                det = await fetch_api(session, f"/flight/{fid}")
+                                det = await fetch_flight(session, fid, priority="live", force=True)
                                 new_reason = check_safeguards(det)
                                 
                                 if new_reason:
@@ -4405,6 +5982,11 @@ async def main_loop():
 
                             reply_id = state.get(fid, {}).get("msg_id")
                             await send_flight_message(channel, "Completed", f, "result", reply_to_id=reply_id)
+                            # Картки для кнопки "🌍 Global Stats" — одразу, поки дані рейсу під рукою
+                            try:
+                                store_gstats_cards(fid, f)
+                            except Exception as e:
+                                print(f"⚠️ Failed to store gstats cards for {fid}: {e}")
                             
                             # 🔥 НОВЕ: Збір статистики після посадки 🔥
                             week_tag = state.get(fid, {}).get("week") or get_iso_week()
@@ -4424,11 +6006,9 @@ async def main_loop():
                             pilot_name = pilot_data.get("fullname", "Unknown Pilot")
                             pilot_avatar = pilot_data.get("avatar", "default")
                             
-                            # Відправляємо на GitHub як окреме фонове завдання, 
-                            # щоб бот не зависав і миттєво відправляв повідомлення в Discord
-                            client.loop.create_task(
-                                save_flight_to_github(clean_flight, pilot_id, pilot_name, pilot_avatar, target_week)
-                            )
+                            # Ставимо рейс у чергу: всі посадки за GITHUB_BATCH_WINDOW підуть одним комітом,
+                            # а бот не зависає і миттєво відправляє повідомлення в Discord
+                            await save_flight_to_github(clean_flight, pilot_id, pilot_name, pilot_avatar, target_week)
                             # ==========================================
                             
                             state.setdefault(fid, {})["completed"] = True
@@ -4436,7 +6016,7 @@ async def main_loop():
                         
                         elif raw_f.get("deleted"):
                             
-                            det = await fetch_api(session, f"/flight/{fid}")
+                            det = prefetched.get(fid)
                             if not det or "flight" not in det: continue
                             f = det["flight"]
                             cs = f.get("flightNumber") or f.get("callsign") or "N/A"
@@ -4451,7 +6031,7 @@ async def main_loop():
                     print("🔕 First run sync complete. No spam.")
                     first_run = False
 
-                save_state(state)
+                save_state(state, keep_ids=seen_ids)
                 
                 # 🔥 ОНОВЛЕНИЙ ВИКЛИК: Передаємо список живих рейсів (ongoing_ids)
                 if ongoing_ids is not None:
@@ -4557,6 +6137,17 @@ async def start_web_server():
     print(f"🌐 Web-сервер успішно запущено на порту {port}! (Шлях: /webhook)")
 # ====================================================================
 
+def is_charter_relevant(icao):
+    icao = (icao or "").upper()
+    airport = AIRPORTS_DB.get(icao)
+    country = airport.country if airport else AIRPORTS_DB.prefix_country(icao)
+    if country == "UA" or (not AIRPORTS_DB and icao.startswith("UK")):
+        return True
+    if CHARTER_RADIUS_NM:
+        dist = AIRPORTS_DB.distance_nm(HOME_AIRPORT, icao)
+        return dist is not None and dist <= CHARTER_RADIUS_NM
+    return False
+
 @tasks.loop(minutes=10)
 async def check_charters_task():
     if not NEWSKY_SID:
@@ -4573,24 +6164,20 @@ async def check_charters_task():
     }
     
     try:
-        async with aiohttp.ClientSession() as session:
+        async with shared_http_session() as session:
             async with session.get("https://newsky.app/api/charter/recent/pax", headers=ns_headers, timeout=15) as resp:
                 if resp.status == 200:
                     data = await resp.json()
                     
-                    # 🔥 ВИКОРИСТОВУЄМО НОВИЙ ФАЙЛ ПАМ'ЯТІ 🔥
-                    charters_state = load_charters_state()
-                    updated = False
-                    
                     for charter in data:
                         cid = str(charter.get("_id"))
                         dep_icao = charter.get("dep", {}).get("icao", "")
                         arr_icao = charter.get("arr", {}).get("icao", "")
                         
-                        # Перевіряємо, чи є Україна (UK) у вильоті або прильоті
-                        if dep_icao.startswith("UK") or arr_icao.startswith("UK"):
-                            # Якщо ID ще немає в charters.json
-                            if cid not in charters_state:
+                        # Україна у вильоті/прильоті (або аеропорт у радіусі CHARTER_RADIUS_NM від бази)
+                        if is_charter_relevant(dep_icao) or is_charter_relevant(arr_icao):
+                            # Якщо ID ще немає в базі чартерів
+                            if not is_charter_known(cid):
                                 dep_str = format_airport_string(dep_icao, charter.get("dep", {}).get("name", ""))
                                 arr_str = format_airport_string(arr_icao, charter.get("arr", {}).get("name", ""))
                                 
@@ -4616,14 +6203,9 @@ async def check_charters_task():
                                 
                                 await channel.send(embed=embed)
                                 
-                                # Записуємо в charters.json
-                                charters_state[cid] = {"notified": True}
-                                updated = True
+                                # Записуємо в базу одразу — наступний тік вже не відправить дубль
+                                mark_charter_notified(cid)
                                 await asyncio.sleep(1) # пауза між відправками, щоб не спамити API Discord
-                                
-                    # Зберігаємо файл тільки якщо були знайдені нові чартери
-                    if updated:
-                        save_charters_state(charters_state)
     except Exception as e:
         print(f"Error checking charters: {e}")
 
@@ -4735,37 +6317,101 @@ async def fetch_demand_data(session):
     return f"UPDATED: {now_str}\n\n" + "\n\n---\n\n".join(fresh_data)
 
 # ФУНКЦІЯ ЄДИНОГО КОМІТУ (GIT TREE API)
+# Вміст файлів іде прямо в запит на дерево (без окремого blob на кожен файл), тож коміт
+# будь-якого розміру — це фіксована кількість запитів. Якщо main за цей час посунувся (годинний sync, сайт),
+# PATCH без force отримує 422 — тоді перебудовуємо коміт на новій голові, але лише якщо
+# чужий коміт не чіпав наших файлів (інакше ми б затерли його зміни своєю старою версією).
+GITHUB_PUSH_RETRIES = 3
+
+# Перед комітом порівнюємо blob SHA кожного файлу з базовим деревом і викидаємо незмінені.
+# Для файлів з "живими" мітками часу SHA буде різним завжди, тому для них порівнюємо
+# вміст без цих полів: якщо змінилась лише мітка — файл теж не комітимо.
+def _without_json_keys(*keys):
+    def normalize(text):
+        try: data = json.loads(text)
+        except Exception: return text
+        if isinstance(data, dict):
+            for key in keys: data.pop(key, None)
+        return json.dumps(data, sort_keys=True, ensure_ascii=False)
+    return normalize
+
+def _without_line_prefixes(*prefixes):
+    def normalize(text):
+        return "\n".join(line for line in text.splitlines() if not line.startswith(prefixes)).strip()
+    return normalize
+
+GITHUB_VOLATILE_RULES = {
+    LIVERY_FILE_PATH: _without_json_keys("generatedAtUtc"),
+    GITHUB_FILE_PATH: _without_line_prefixes("UPDATED:"),
+}
+
+async def drop_unchanged_files(session, files_dict, base_tree_sha):
+    remote = await get_github_repo_tree(session, base_tree_sha)
+    changed = {}
+    for path, content in files_dict.items():
+        remote_sha = remote.get(path)
+        if remote_sha == git_blob_sha(content): continue
+        normalize = GITHUB_VOLATILE_RULES.get(path)
+        if normalize and remote_sha:
+            remote_text = await fetch_github_blob_text(session, remote_sha)
+            if remote_text is not None and normalize(remote_text) == normalize(content): continue
+        changed[path] = content
+    return changed
+
 async def push_to_github_batch(session, files_dict, commit_msg):
     if not files_dict or not GITHUB_TOKEN: return False
     gh_headers = {"Authorization": f"token {GITHUB_TOKEN}", "Accept": "application/vnd.github.v3+json"}
+    api = f"https://api.github.com/repos/{GITHUB_REPO}"
     
     # 1. Отримуємо SHA останнього коміту
-    async with session.get(f"https://api.github.com/repos/{GITHUB_REPO}/git/refs/heads/main", headers=gh_headers) as r:
+    async with session.get(f"{api}/git/refs/heads/main", headers=gh_headers) as r:
         if r.status != 200: return False
         latest_commit_sha = (await r.json())['object']['sha']
-
-    # 2. Отримуємо SHA базового дерева
-    async with session.get(f"https://api.github.com/repos/{GITHUB_REPO}/git/commits/{latest_commit_sha}", headers=gh_headers) as r:
-        base_tree_sha = (await r.json())['tree']['sha']
-
-    # 3. Завантажуємо нові файли як Blobs
-    tree_items = []
-    for path, content in files_dict.items():
-        async with session.post(f"https://api.github.com/repos/{GITHUB_REPO}/git/blobs", headers=gh_headers, json={"content": content, "encoding": "utf-8"}) as r:
-            blob_sha = (await r.json())['sha']
-        tree_items.append({"path": path, "mode": "100644", "type": "blob", "sha": blob_sha})
-
-    # 4. Створюємо нове дерево
-    async with session.post(f"https://api.github.com/repos/{GITHUB_REPO}/git/trees", headers=gh_headers, json={"base_tree": base_tree_sha, "tree": tree_items}) as r:
-        new_tree_sha = (await r.json())['sha']
-
-    # 5. Робимо єдиний коміт
-    async with session.post(f"https://api.github.com/repos/{GITHUB_REPO}/git/commits", headers=gh_headers, json={"message": commit_msg, "tree": new_tree_sha, "parents": [latest_commit_sha]}) as r:
-        new_commit_sha = (await r.json())['sha']
-
-    # 6. Оновлюємо гілку main
-    async with session.patch(f"https://api.github.com/repos/{GITHUB_REPO}/git/refs/heads/main", headers=gh_headers, json={"sha": new_commit_sha}) as r:
-        return r.status == 200
+    first_base_sha = latest_commit_sha
+
+    for attempt in range(GITHUB_PUSH_RETRIES + 1):
+        # 2. Отримуємо SHA базового дерева
+        async with session.get(f"{api}/git/commits/{latest_commit_sha}", headers=gh_headers) as r:
+            if r.status != 200: return False
+            base_tree_sha = (await r.json())['tree']['sha']
+            
+        # 3. Залишаємо тільки файли, які реально відрізняються від main
+        changed_files = await drop_unchanged_files(session, files_dict, base_tree_sha)
+        if not changed_files:
+            print(f"💤 GitHub push skipped: nothing changed ({commit_msg})")
+            return True
+        tree_items = [{"path": path, "mode": "100644", "type": "blob", "content": content} for path, content in changed_files.items()]
+
+        # 4. Створюємо нове дерево одразу з вмістом файлів
+        async with session.post(f"{api}/git/trees", headers=gh_headers, json={"base_tree": base_tree_sha, "tree": tree_items}) as r:
+            if r.status != 201: 
+                print(f"❌ GitHub tree error: {await r.text()}")
+                return False
+            new_tree_sha = (await r.json())['sha']
+
+        # 5. Робимо єдиний коміт
+        async with session.post(f"{api}/git/commits", headers=gh_headers, json={"message": commit_msg, "tree": new_tree_sha, "parents": [latest_commit_sha]}) as r:
+            if r.status != 201: return False
+            new_commit_sha = (await r.json())['sha']
+
+        # 6. Оновлюємо гілку main (тільки fast-forward)
+        async with session.patch(f"{api}/git/refs/heads/main", headers=gh_headers, json={"sha": new_commit_sha}) as r:
+            if r.status == 200: return True
+            if r.status != 422: return False
+            
+        # 7. Хтось встиг закомітити — беремо нову голову і перевіряємо, чи не чіпали наші файли
+        async with session.get(f"{api}/git/refs/heads/main", headers=gh_headers) as r:
+            if r.status != 200: return False
+            latest_commit_sha = (await r.json())['object']['sha']
+        async with session.get(f"{api}/compare/{first_base_sha}...{latest_commit_sha}", headers=gh_headers) as r:
+            if r.status != 200: return False
+            touched = {f.get("filename") for f in (await r.json()).get("files", [])}
+        if touched & set(changed_files):
+            print(f"⚠️ GitHub push aborted: {', '.join(sorted(touched & set(changed_files)))} changed on main meanwhile.")
+            return False
+        print(f"🔁 main moved during push, rebuilding commit on new head (attempt {attempt + 1}/{GITHUB_PUSH_RETRIES})...")
+        
+    return False
 
 # ГОЛОВНИЙ ДИСПЕТЧЕР
 @tasks.loop()
@@ -4786,7 +6432,7 @@ async def master_github_sync_task():
     run_analytics = False
 
     async with GITHUB_DB_LOCK:
-        async with aiohttp.ClientSession() as session:
+        async with shared_http_session() as session:
             try:
                 # 1. Авіакомпанії (Щогодини)
                 airlines_content = await fetch_airlines_data(session)
@@ -4798,6 +6444,10 @@ async def master_github_sync_task():
                     files_to_push["FLIGHTS/awards.json"] = awards_content
                     files_to_push["FLIGHTS/pilots_awards.json"] = pilots_content
 
+                # 2.5 Локації флоту (тільки якщо якийсь борт реально змінив аеропорт)
+                livery_content = await get_updated_liveries_content(session, {})
+                if livery_content: files_to_push[LIVERY_FILE_PATH] = livery_content
+
                 # 3. Аеропорти та Чартери (Раз на 6 годин: 0, 6, 12, 18)
                 if current_hour % 6 == 0:
                     print("🌍 Прийшов час оновлювати аеропорти (6-годинний цикл)!")
@@ -4810,6 +6460,8 @@ async def master_github_sync_task():
                 if files_to_push:
                     success = await push_to_github_batch(session, files_to_push, f"🤖 Master Sync: Hour {current_hour} UTC update")
                     if success:
+                        if LIVERY_FILE_PATH in files_to_push:
+                            mark_livery_pushed(files_to_push[LIVERY_FILE_PATH])
                         print(f"✅ Успішний Batch-Commit! Оновлено файлів: {len(files_to_push)}")
                         if run_analytics:
                             await run_analytics_pipeline(ctx=None)
@@ -4835,7 +6487,7 @@ async def run_analytics_pipeline(ctx=None):
         "newsky_charter_with_tops_v4.py"
     ]
 
-    async with aiohttp.ClientSession() as session:
+    async with shared_http_session() as session:
         for file_name in files_to_download:
             async with session.get(f"{base_raw_url}/{file_name}", headers=gh_headers) as resp:
                 if resp.status == 200:
@@ -4867,7 +6519,7 @@ async def run_analytics_pipeline(ctx=None):
     github_api_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/newsky-charter-results.txt"
     gh_put_headers = {"Authorization": f"token {GITHUB_TOKEN}", "Accept": "application/vnd.github.v3+json"}
 
-    async with aiohttp.ClientSession() as session:
+    async with shared_http_session() as session:
         async with session.get(github_api_url, headers=gh_put_headers) as sha_resp:
             latest_sha = (await sha_resp.json()).get('sha') if sha_resp.status == 200 else None
 
@@ -4890,16 +6542,29 @@ async def run_analytics_pipeline(ctx=None):
 @client.event
 async def on_ready():
     global MONITORING_STARTED
+    # Після кожного (пере)підключення кеш прав будуємо заново з кешу учасників сервера
+    warm_admin_cache()
+
     if MONITORING_STARTED: return
     MONITORING_STARTED = True
     
+    # Піднімаємо спільний пул з'єднань до старту всіх фонових задач
+    await get_http_session()
+    
     # Запускаємо єдиний розумний диспетчер замість трьох старих!
     if not master_github_sync_task.is_running():
         master_github_sync_task.start()
         print("🤖 Master GitHub Sync Dispatcher started!")
+        
+    if not fleet_refresh_task.is_running():
+        fleet_refresh_task.start()
+
+    if not audit_log_task.is_running():
+        audit_log_task.start()
 
     print(f"✅ Bot online: {client.user}")
     print("🚀 MONITORING STARTED")
+    client.loop.create_task(scheduler_loop())
     client.loop.create_task(status_loop())
     client.loop.create_task(main_loop())
     client.loop.create_task(start_web_server())